@@ -0,0 +1,31 @@
+// 模板基准测试驱动的公共部分，bench_templates.py 把它拼接在每个驱动之前编译
+// 驱动需要定义:
+//   void setup(int n, mt19937 &rng)  生成规模为 n 的数据并重置模板状态 (不计时)
+//   unsigned long long run()          执行被测操作，返回校验值防止被优化掉
+// 用法: 驱动 n seed warmup repeat，每次计时的纳秒数输出一行
+#include <bits/stdc++.h>
+using namespace std;
+
+void setup(int n, mt19937 &rng);
+unsigned long long run();
+
+volatile unsigned long long bench_sink;
+
+int main(int argc, char **argv)
+{
+    if (argc < 5) {
+        fprintf(stderr, "用法: %s n seed warmup repeat\n", argv[0]);
+        return 1;
+    }
+    int n = atoi(argv[1]), warmup = atoi(argv[3]), repeat = atoi(argv[4]);
+    unsigned seed = strtoul(argv[2], nullptr, 10);
+    for (int i = 0; i < warmup + repeat; i++) {
+        mt19937 rng(seed); // 每次重复使用相同的数据
+        setup(n, rng);
+        auto start = chrono::steady_clock::now();
+        bench_sink = bench_sink + run();
+        auto elapsed = chrono::duration_cast<chrono::nanoseconds>(chrono::steady_clock::now() - start).count();
+        if (i >= warmup) printf("%lld\n", (long long)elapsed);
+    }
+    return 0;
+}
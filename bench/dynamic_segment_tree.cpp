@@ -0,0 +1,26 @@
+// 动态开点线段树: 值域 1e9 上 n 次随机区间赋值
+// 每次修改最多新建约 4log(值域) 个节点，规模受代码块中 N 的限制
+// @sizes 1000 10000 100000
+// @block 动态开点线段树
+vector<array<int, 3>> ops;
+void setup(int size, mt19937 &rng)
+{
+    n = 1000000000, m = size;
+    for (int i = 0; i <= idx; i++) tr[i] = {0, 0, 0, 0};
+    root = idx = 0;
+    ops.resize(m);
+    for (auto &[t, l, r] : ops) {
+        t = rng() % 2, l = rng() % n + 1, r = rng() % n + 1;
+        if (l > r) swap(l, r);
+    }
+}
+unsigned long long run()
+{
+    unsigned long long res = 0;
+    root = modify(root, 1, n, 1, n, 1);
+    for (auto [t, l, r] : ops) {
+        root = modify(root, 1, n, l, r, t);
+        res += tr[root].sum;
+    }
+    return res;
+}
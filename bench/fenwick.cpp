@@ -0,0 +1,26 @@
+// 基本树状数组: n 次单点修改与 n 次区间查询交替进行
+// 章节中没有复杂度标注: 单点修改与区间查询均为 O(log n)
+// @complexity O(n \log n)
+// @sizes 10000 100000 1000000
+const int N = 1000010;
+// @block 基本树状数组
+vector<array<int, 3>> ops;
+void setup(int size, mt19937 &rng)
+{
+    n = size;
+    memset(tr, 0, sizeof(int) * (n + 1));
+    ops.resize(n);
+    for (auto &[x, l, r] : ops) {
+        x = rng() % n + 1, l = rng() % n + 1, r = rng() % n + 1;
+        if (l > r) swap(l, r);
+    }
+}
+unsigned long long run()
+{
+    unsigned long long res = 0;
+    for (auto [x, l, r] : ops) {
+        add(x, 1);
+        res += query(l, r);
+    }
+    return res;
+}
@@ -0,0 +1,26 @@
+// LCT: n 个点的随机森林上交替进行 link、cut 与路径异或和查询
+// 章节中没有复杂度标注: 每次操作均摊 O(log n)
+// @complexity O(n \log n)
+// @sizes 10000 100000 300000
+const int N = 300010;
+// @block Link-Cut Tree (LCT)#1
+int n;
+vector<array<int, 3>> ops;
+void setup(int size, mt19937 &rng)
+{
+    n = size;
+    for (int i = 0; i <= n; i++) lct.tr[i] = {};
+    for (int i = 1; i <= n; i++) lct.tr[i].v = lct.tr[i].sum = rng() % 1024;
+    ops.resize(n);
+    for (auto &[t, x, y] : ops) t = rng() % 3, x = rng() % n + 1, y = rng() % n + 1;
+}
+unsigned long long run()
+{
+    unsigned long long res = 0;
+    for (auto [t, x, y] : ops) {
+        if (t == 0) lct.link(x, y);
+        else if (t == 1) lct.cut(x, y);
+        else if (lct.connected(x, y)) res += lct.path_sum(x, y);
+    }
+    return res;
+}
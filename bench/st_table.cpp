@@ -0,0 +1,23 @@
+// 一维ST表: 建表后 n 次随机区间最大值查询
+// @sizes 10000 100000 1000000
+const int N = 1000010, M = 20;
+// 代码块中第二种写法 (记录位置) 与第一种同名，只取第一种
+// @block 一维ST表:1-14
+vector<array<int, 2>> qs;
+void setup(int size, mt19937 &rng)
+{
+    n = size;
+    for (int i = 1; i <= n; i++) w[i] = rng();
+    qs.resize(n);
+    for (auto &[l, r] : qs) {
+        l = rng() % n + 1, r = rng() % n + 1;
+        if (l > r) swap(l, r);
+    }
+}
+unsigned long long run()
+{
+    build();
+    unsigned long long res = 0;
+    for (auto [l, r] : qs) res += query(l, r);
+    return res;
+}
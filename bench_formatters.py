@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+C++格式化器性能基准
+在真实模板和按倍数放大的合成语料上测量各个格式化实现的吞吐量、
+单个代码块延迟分位数和峰值内存，并与保存的JSON基线比较；
+--adversarial 在长空格串、逗号列表等对抗输入上测量单行耗时随行长的增长
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import random
+import argparse
+import platform
+import tracemalloc
+
+from tex_index import TexIndex
+from regex_guard import ADVERSARIAL_LINES, SUPERLINEAR_EXPONENT, time_call
+
+# 性能下降超过该比例视为回归
+DEFAULT_THRESHOLD = 0.2
+# 对抗输入的行长
+ADVERSARIAL_LENGTHS = '1000,10000,100000'
+# 合成语料的放大倍数，1 倍即真实模板本身；每放大 1 倍，6 个格式化器每轮约多用 8 秒，
+# 默认不含 100 倍，完整的 1x-100x 测量需指定 --scales 1,10,100
+DEFAULT_SCALES = '1,10'
+
+
+def load_formatters():
+    """返回 {名称: 格式化单个代码块的函数}"""
+    import format_cpp
+    import format_simple
+    import format_tex_cpp
+    import format_tex_cpp_v2
+    import format_template
+
+    cpp_formatter = format_cpp.CPPFormatter()
+    template_formatter = format_template.LatexTemplateFormatter()
+
+    def format_simple_block(code):
+        return '\n'.join(format_simple.format_cpp_line(line) for line in code.split('\n'))
+
+    return {
+        'format_cpp.CPPFormatter': cpp_formatter.format_code,
+        'format_simple.format_cpp_line': format_simple_block,
+        'format_tex_cpp.format_cpp_code': format_tex_cpp.format_cpp_code,
+        'format_tex_cpp_v2.format_cpp_code': format_tex_cpp_v2.format_cpp_code,
+        'format_tex_cpp_v2.format_cpp_code[lexer]':
+            lambda code: format_tex_cpp_v2.format_cpp_code(code, 'lexer'),
+        'format_template.LatexTemplateFormatter': template_formatter.format_cpp_code,
+    }
+
+
+def load_blocks(tex_file):
+    """从模板中取出全部C++代码块"""
+    index = TexIndex.load(tex_file)
+    return [index.block_code(block) for block in index.blocks_by_language('cpp', 'c++', 'cc', 'cxx', 'c')]
+
+
+def synthetic_corpus(blocks, scale, seed=0):
+    """把真实代码块重复 scale 次并打乱顺序，得到放大后的合成语料"""
+    corpus = list(blocks) * scale
+    random.Random(seed + scale).shuffle(corpus)
+    return corpus
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    pos = (len(ordered) - 1) * q
+    low = int(pos)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (pos - low)
+
+
+def run_benchmark(format_func, corpus, repeat=3):
+    """测量一个格式化器在一份语料上的表现"""
+    total_lines = sum(code.count('\n') + 1 for code in corpus)
+    latencies = []
+    totals = []
+
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for code in corpus:
+            block_started = time.perf_counter()
+            format_func(code)
+            latencies.append(time.perf_counter() - block_started)
+        totals.append(time.perf_counter() - started)
+
+    # 单独跑一遍测峰值内存，避免 tracemalloc 影响计时
+    tracemalloc.start()
+    for code in corpus:
+        format_func(code)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    seconds = percentile(totals, 0.5)
+    return {
+        'blocks': len(corpus),
+        'lines': total_lines,
+        'seconds': seconds,
+        'lines_per_sec': total_lines / seconds if seconds > 0 else float('inf'),
+        'p50_ms': percentile(latencies, 0.5) * 1000,
+        'p90_ms': percentile(latencies, 0.9) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        'peak_kb': peak / 1024,
+    }
+
+
+def run_adversarial(format_func, generator, lengths):
+    """测量一个格式化器在一种对抗输入上的单行耗时，返回 (增长指数, [每个行长的秒数])"""
+    timings = [time_call(format_func, generator(n, 'vector'), minimum=0.01) for n in lengths]
+    exponent = math.log(timings[-1] / timings[0]) / math.log(lengths[-1] / lengths[0])
+    return exponent, timings
+
+
+def print_adversarial_table(results, lengths):
+    header = f"{'格式化器':<44}{'输入':<12}" + ''.join(f"{f'{n}字符(ms)':>15}" for n in lengths) + f"{'k':>7}"
+    print(header)
+    print('-' * len(header))
+    for name, rows in results.items():
+        for input_name, (exponent, timings) in rows.items():
+            mark = ' ❌' if exponent > SUPERLINEAR_EXPONENT else ''
+            # 中文字符占两列，按显示宽度补齐
+            padding = 14 - len(input_name) * 2
+            print(f"{name:<44}{input_name}{' ' * padding}" + ''.join(f"{t * 1000:>15.2f}" for t in timings)
+                  + f"{exponent:>7.2f}{mark}")
+
+
+def compare_with_baseline(results, baseline, threshold):
+    """返回吞吐量低于基线 (1 - threshold) 倍的条目"""
+    regressions = []
+    for key, result in results.items():
+        old = baseline.get('results', {}).get(key)
+        if not old:
+            continue
+        ratio = result['lines_per_sec'] / old['lines_per_sec']
+        if ratio < 1 - threshold:
+            regressions.append((key, old['lines_per_sec'], result['lines_per_sec'], ratio))
+    return regressions
+
+
+def print_table(results):
+    header = f"{'格式化器':<44}{'语料':>8}{'行/秒':>12}{'p50(ms)':>10}{'p90(ms)':>10}{'p99(ms)':>10}{'峰值(KB)':>11}"
+    print(header)
+    print('-' * len(header))
+    for key, result in results.items():
+        name, corpus = key.rsplit('@', 1)
+        print(f"{name:<44}{corpus:>8}{result['lines_per_sec']:>12,.0f}{result['p50_ms']:>10.3f}"
+              f"{result['p90_ms']:>10.3f}{result['p99_ms']:>10.3f}{result['peak_kb']:>11,.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='C++格式化器性能基准')
+    parser.add_argument('file', nargs='?', default='Algorithm-template.tex',
+                       help='提供代码块的LaTeX文件 (默认: Algorithm-template.tex)')
+    parser.add_argument('--scales', default=DEFAULT_SCALES,
+                       help=f'语料的放大倍数，逗号分隔，1 表示真实模板；完整测量 1x-100x 用 1,10,100，'
+                            f'其中 100 倍在 --repeat 3 时约需一小时，可配合 --only 缩小范围 (默认: {DEFAULT_SCALES})')
+    parser.add_argument('--only', action='append', default=[],
+                       help='只测试名称包含该字符串的格式化器，可重复指定')
+    parser.add_argument('--repeat', type=int, default=3,
+                       help='每项重复次数，取中位数 (默认: 3)')
+    parser.add_argument('--json', help='把结果写入JSON文件')
+    parser.add_argument('--save-baseline', help='把结果保存为基线文件')
+    parser.add_argument('--baseline', help='与基线文件比较，出现回归时返回非零退出码')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                       help=f'吞吐量下降超过该比例视为回归 (默认: {DEFAULT_THRESHOLD})')
+    parser.add_argument('--adversarial', action='store_true',
+                       help='在对抗输入上测量单行耗时随行长的增长，超线性时返回非零退出码')
+    parser.add_argument('--lengths', default=ADVERSARIAL_LENGTHS,
+                       help=f'对抗输入的行长，逗号分隔 (默认: {ADVERSARIAL_LENGTHS})')
+
+    args = parser.parse_args()
+
+    formatters = load_formatters()
+    if args.only:
+        formatters = {name: func for name, func in formatters.items()
+                      if any(pattern in name for pattern in args.only)}
+
+    if args.adversarial:
+        lengths = [int(n) for n in args.lengths.split(',') if n.strip()]
+        if len(lengths) < 2:
+            print("错误: 至少需要两个行长")
+            sys.exit(1)
+        print(f"😈 {len(formatters)} 个格式化器, {len(ADVERSARIAL_LINES)} 种对抗输入, 行长: {', '.join(map(str, lengths))}")
+        results = {name: {input_name: run_adversarial(func, generator, lengths)
+                          for input_name, generator in ADVERSARIAL_LINES.items()}
+                   for name, func in formatters.items()}
+        print_adversarial_table(results, lengths)
+        if args.json:
+            with open(args.json, 'w', encoding='utf-8') as f:
+                json.dump({'lengths': lengths, 'results': {
+                    name: {input_name: {'exponent': exponent, 'ms': [t * 1000 for t in timings]}
+                           for input_name, (exponent, timings) in rows.items()}
+                    for name, rows in results.items()}}, f, ensure_ascii=False, indent=2)
+            print(f"💾 结果已写入: {args.json}")
+        superlinear = [(name, input_name) for name, rows in results.items()
+                       for input_name, (exponent, _) in rows.items() if exponent > SUPERLINEAR_EXPONENT]
+        if superlinear:
+            print(f"❌ {len(superlinear)} 项耗时随行长超线性增长 (k > {SUPERLINEAR_EXPONENT})")
+            sys.exit(1)
+        print(f"✅ 全部对抗输入上单行耗时随行长线性增长 (k ≤ {SUPERLINEAR_EXPONENT})")
+        return
+
+    if not os.path.exists(args.file):
+        print(f"错误: 文件 {args.file} 不存在")
+        sys.exit(1)
+
+    blocks = load_blocks(args.file)
+
+    corpora = {}
+    for scale in (int(s) for s in args.scales.split(',') if s.strip()):
+        if scale < 1:
+            print(f"错误: 放大倍数必须是正整数: {scale}")
+            sys.exit(1)
+        if scale == 1:
+            corpora['real'] = blocks
+        else:
+            corpora[f'{scale}x'] = synthetic_corpus(blocks, scale)
+
+    print(f"📏 {len(blocks)} 个代码块, {len(formatters)} 个格式化器, 语料: {', '.join(corpora)}")
+    results = {}
+    for name, func in formatters.items():
+        for corpus_name, corpus in corpora.items():
+            results[f'{name}@{corpus_name}'] = run_benchmark(func, corpus, args.repeat)
+
+    print_table(results)
+
+    report = {
+        'machine': platform.node(),
+        'python': platform.python_version(),
+        'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'results': results,
+    }
+    for path in (args.json, args.save_baseline):
+        if path:
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+            print(f"💾 结果已写入: {path}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare_with_baseline(results, baseline, args.threshold)
+        if regressions:
+            print(f"❌ 发现 {len(regressions)} 项性能回归 (阈值 {args.threshold:.0%}):")
+            for key, old, new, ratio in regressions:
+                print(f"  {key}: {old:,.0f} -> {new:,.0f} 行/秒 ({ratio:.0%})")
+            sys.exit(1)
+        print("✅ 未发现性能回归")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+C++模板性能基准
+bench/ 下每个驱动通过 `// @block 章节` 引用模板中的代码块，拼接后以 -O2 编译，
+在几个规模上用固定种子的数据预热并重复计时，报告中位数和四分位距；
+结果按机器保存为JSON基线，代码块修改后与基线比较，发现性能回归
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import hashlib
+import argparse
+import platform
+import subprocess
+
+from tex_index import TexIndex, write_if_changed
+from tex_preview import resolve_section
+from judge import Judge, RELEASE_FLAGS
+from bench_formatters import percentile, DEFAULT_THRESHOLD
+
+BENCH_DIR = 'bench'
+HEADER_NAME = 'bench.h'
+BASELINE_DIR = os.path.join(BENCH_DIR, 'baselines')
+DEFAULT_CACHE_DIR = '.bench_cache'
+DEFAULT_SIZES = [1000, 10000, 100000]
+DEFAULT_WARMUP = 2
+DEFAULT_REPEAT = 7
+DEFAULT_SEED = 1
+RUN_TIMEOUT = 120
+
+# `// @block 章节[#第几个代码块][:起始行-结束行]`，行号相对于代码块
+BLOCK_PATTERN = re.compile(r'^[ \t]*//[ \t]*@block[ \t]+(.+?)(?:#(\d+))?(?::(\d+)-(\d+))?[ \t]*$', re.MULTILINE)
+SIZES_PATTERN = re.compile(r'^[ \t]*//[ \t]*@sizes[ \t]+(.+?)[ \t]*$', re.MULTILINE)
+
+
+class Driver:
+    """一个基准测试驱动"""
+
+    def __init__(self, path):
+        self.path = path
+        self.name = os.path.splitext(os.path.basename(path))[0]
+        with open(path, 'r', encoding='utf-8') as f:
+            self.text = f.read()
+        match = SIZES_PATTERN.search(self.text)
+        self.sizes = [int(size) for size in match.group(1).split()] if match else list(DEFAULT_SIZES)
+
+    def expand(self, index, header):
+        """把 @block 替换为代码块内容，返回 (完整源码, 引用的代码块信息)"""
+        blocks = []
+
+        def replace(match):
+            section = resolve_section(index, match.group(1).strip())
+            candidates = section.all_blocks()
+            number = int(match.group(2) or 1)
+            if not 1 <= number <= len(candidates):
+                raise ValueError(f"{self.name}: 章节 '{section.title}' 只有 {len(candidates)} 个代码块")
+            block = candidates[number - 1]
+            code = index.block_code(block)
+            if match.group(3):
+                lines = code.split('\n')
+                code = '\n'.join(lines[int(match.group(3)) - 1:int(match.group(4))])
+            blocks.append({'ref': match.group(0).split('@block', 1)[1].strip(), 'section': '/'.join(section.path),
+                           'line': block.line, 'hash': block.hash,
+                           'code_hash': hashlib.sha256(code.encode('utf-8')).hexdigest()})
+            # 编译错误能对应到 .tex 中的行号
+            return f'#line {block.line + int(match.group(3) or 1)} "{index.path}"\n{code}\n' \
+                   f'#line {self.text.count(chr(10), 0, match.end()) + 2} "{self.path}"'
+
+        body = BLOCK_PATTERN.sub(replace, self.text)
+        if not blocks:
+            raise ValueError(f"{self.name}: 没有 // @block 引用模板代码块")
+        return f'{header}\n#line 1 "{self.path}"\n{body}', blocks
+
+
+def find_drivers(bench_dir=BENCH_DIR, names=()):
+    drivers = []
+    for filename in sorted(os.listdir(bench_dir)):
+        if filename.endswith('.cpp') and (not names or any(name in filename for name in names)):
+            drivers.append(Driver(os.path.join(bench_dir, filename)))
+    return drivers
+
+
+def machine_id():
+    """基线文件名，不同机器的计时不可比较"""
+    return re.sub(r'[^\w.-]+', '_', f'{platform.node()}-{platform.machine()}')
+
+
+def cpu_model():
+    try:
+        with open('/proc/cpuinfo', 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.startswith('model name'):
+                    return line.split(':', 1)[1].strip()
+    except OSError:
+        pass
+    return platform.processor()
+
+
+def compiler_version(cxx):
+    try:
+        return subprocess.run([cxx, '--version'], capture_output=True, text=True).stdout.split('\n')[0]
+    except OSError:
+        return cxx
+
+
+def summarize(times):
+    """纳秒计时 -> 中位数、四分位数"""
+    q1, median, q3 = (percentile(times, q) for q in (0.25, 0.5, 0.75))
+    return {'median_ns': median, 'q1_ns': q1, 'q3_ns': q3, 'iqr_ns': q3 - q1, 'runs': len(times)}
+
+
+def run_driver(binary, size, seed, warmup, repeat):
+    result = subprocess.run([binary, str(size), str(seed), str(warmup), str(repeat)],
+                            capture_output=True, text=True, timeout=RUN_TIMEOUT)
+    if result.returncode != 0:
+        raise RuntimeError(f"规模 {size} 运行失败 (退出码 {result.returncode}): {result.stderr.strip()[:200]}")
+    return [int(line) for line in result.stdout.split()]
+
+
+class TemplateBenchmark:
+    def __init__(self, tex_file, bench_dir=BENCH_DIR, cache_dir=DEFAULT_CACHE_DIR, cxx='g++',
+                 seed=DEFAULT_SEED, warmup=DEFAULT_WARMUP, repeat=DEFAULT_REPEAT):
+        self.index = TexIndex.load(tex_file)
+        self.bench_dir = bench_dir
+        self.cache_dir = cache_dir
+        self.cxx = cxx
+        self.seed = seed
+        self.warmup = warmup
+        self.repeat = repeat
+        with open(os.path.join(bench_dir, HEADER_NAME), 'r', encoding='utf-8') as f:
+            self.header = f.read()
+
+    def prepare(self, driver):
+        """生成并编译驱动，返回 (可执行文件, 引用的代码块, 源码摘要)"""
+        source, blocks = driver.expand(self.index, self.header)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        source_path = os.path.join(self.cache_dir, f'{driver.name}.cpp')
+        write_if_changed(source_path, source)
+        judge = Judge(source_path, self.cxx, RELEASE_FLAGS, cache_dir=self.cache_dir)
+        _, error = judge.compile()
+        if error is not None:
+            raise RuntimeError(f"{driver.name} 编译错误:\n{error}")
+        return judge.binary, blocks, hashlib.sha256(source.encode('utf-8')).hexdigest()
+
+    def run(self, driver, sizes=None):
+        binary, blocks, source_hash = self.prepare(driver)
+        results = {}
+        for size in sizes or driver.sizes:
+            results[str(size)] = summarize(run_driver(binary, size, self.seed, self.warmup, self.repeat))
+        return {'blocks': blocks, 'source': source_hash, 'sizes': results}
+
+
+def edited_blocks(result, old):
+    """与基线相比内容发生变化的代码块"""
+    old_hashes = {block['ref']: block['code_hash'] for block in old.get('blocks', [])}
+    return [block['ref'] for block in result['blocks']
+            if block['ref'] in old_hashes and old_hashes[block['ref']] != block['code_hash']]
+
+
+def compare_with_baseline(results, baseline, threshold):
+    """返回中位数变慢超过 threshold 且超出两次测量四分位距之和的 (名称, 规模, 基线, 当前, 比值)"""
+    regressions = []
+    for name, result in results.items():
+        old = baseline.get('results', {}).get(name)
+        if not old:
+            continue
+        for size, stats in result['sizes'].items():
+            old_stats = old['sizes'].get(size)
+            if not old_stats:
+                continue
+            ratio = stats['median_ns'] / old_stats['median_ns']
+            noise = stats['iqr_ns'] + old_stats['iqr_ns']
+            if ratio > 1 + threshold and stats['median_ns'] - old_stats['median_ns'] > noise:
+                regressions.append((name, size, old_stats['median_ns'], stats['median_ns'], ratio))
+    return regressions
+
+
+def print_table(results, baseline):
+    header = f"{'模板':<24}{'规模':>10}{'中位数(ms)':>12}{'IQR(ms)':>10}{'ns/规模':>10}{'基线(ms)':>11}{'变化':>8}"
+    print(header)
+    print('-' * len(header))
+    for name, result in results.items():
+        old = baseline.get('results', {}).get(name, {}).get('sizes', {})
+        for size, stats in result['sizes'].items():
+            line = (f"{name:<24}{size:>10}{stats['median_ns'] / 1e6:>12.3f}{stats['iqr_ns'] / 1e6:>10.3f}"
+                    f"{stats['median_ns'] / int(size):>10.1f}")
+            if size in old:
+                line += f"{old[size]['median_ns'] / 1e6:>11.3f}{stats['median_ns'] / old[size]['median_ns'] - 1:>+8.0%}"
+            print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='C++模板性能基准')
+    parser.add_argument('names', nargs='*',
+                       help='只运行名称包含这些字符串的驱动 (默认: 全部)')
+    parser.add_argument('--file', default='Algorithm-template.tex',
+                       help='LaTeX文件 (默认: Algorithm-template.tex)')
+    parser.add_argument('--sizes', help='代替驱动中 @sizes 的规模，逗号分隔')
+    parser.add_argument('--warmup', type=int, default=DEFAULT_WARMUP,
+                       help=f'每个规模预热次数 (默认: {DEFAULT_WARMUP})')
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT,
+                       help=f'每个规模计时次数 (默认: {DEFAULT_REPEAT})')
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED,
+                       help=f'数据种子 (默认: {DEFAULT_SEED})')
+    parser.add_argument('--cxx', default=os.environ.get('CXX', 'g++'),
+                       help='C++编译器 (默认: g++)')
+    parser.add_argument('--changed', action='store_true',
+                       help='只运行代码块或驱动相对基线有改动的驱动')
+    parser.add_argument('--baseline',
+                       help=f'基线文件 (默认: {BASELINE_DIR}/<机器名>.json)')
+    parser.add_argument('--save-baseline', action='store_true',
+                       help='把本次结果写入基线文件')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                       help=f'中位数变慢超过该比例视为回归 (默认: {DEFAULT_THRESHOLD})')
+    parser.add_argument('--json', help='把结果写入JSON文件')
+
+    args = parser.parse_args()
+
+    if not os.path.exists(args.file):
+        print(f"错误: 文件 {args.file} 不存在")
+        sys.exit(1)
+
+    baseline_path = args.baseline or os.path.join(BASELINE_DIR, f'{machine_id()}.json')
+    baseline = {}
+    if os.path.exists(baseline_path):
+        with open(baseline_path, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    bench = TemplateBenchmark(args.file, cxx=args.cxx, seed=args.seed, warmup=args.warmup, repeat=args.repeat)
+    drivers = find_drivers(names=args.names)
+    sizes = [int(size) for size in args.sizes.split(',')] if args.sizes else None
+    if args.changed:
+        changed = []
+        for driver in drivers:
+            _, _, source_hash = bench.prepare(driver)
+            if baseline.get('results', {}).get(driver.name, {}).get('source') != source_hash:
+                changed.append(driver)
+        drivers = changed
+        if not drivers:
+            print("✅ 代码块和驱动与基线相同，无需重新测量")
+            return
+
+    print(f"⏱️  {len(drivers)} 个驱动, 预热 {args.warmup} 次, 计时 {args.repeat} 次, 种子 {args.seed}")
+    results = {}
+    try:
+        for driver in drivers:
+            results[driver.name] = bench.run(driver, sizes)
+    except (RuntimeError, ValueError, subprocess.TimeoutExpired) as e:
+        print(f"错误: {e}")
+        sys.exit(1)
+
+    print_table(results, baseline)
+
+    report = {
+        'machine': machine_id(),
+        'cpu': cpu_model(),
+        'compiler': compiler_version(args.cxx),
+        'flags': RELEASE_FLAGS,
+        'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'seed': args.seed,
+        'warmup': args.warmup,
+        'repeat': args.repeat,
+        'results': results,
+    }
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"💾 结果已写入: {args.json}")
+
+    regressions = []
+    if baseline:
+        for name, result in results.items():
+            edited = edited_blocks(result, baseline['results'].get(name, {}))
+            if edited:
+                print(f"✏️  {name}: 代码块已修改 ({', '.join(edited)})")
+        regressions = compare_with_baseline(results, baseline, args.threshold)
+
+    if args.save_baseline:
+        # 只更新本次运行的驱动，其余驱动的基线保留
+        merged = dict(report, results=dict(baseline.get('results', {}), **results))
+        os.makedirs(os.path.dirname(baseline_path) or '.', exist_ok=True)
+        with open(baseline_path, 'w', encoding='utf-8') as f:
+            json.dump(merged, f, ensure_ascii=False, indent=2)
+        print(f"💾 基线已保存: {baseline_path}")
+
+    if regressions:
+        print(f"❌ 发现 {len(regressions)} 项性能回归 (阈值 {args.threshold:.0%}):")
+        for name, size, old, new, ratio in regressions:
+            print(f"  {name}@{size}: {old / 1e6:.3f} -> {new / 1e6:.3f} ms ({ratio:.0%})")
+        sys.exit(1)
+    if baseline:
+        print("✅ 未发现性能回归")
+    elif not args.save_baseline:
+        print(f"ℹ️  没有基线 {baseline_path}，使用 --save-baseline 保存")
+
+
+if __name__ == '__main__':
+    main()
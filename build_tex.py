@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+LaTeX增量编译驱动
+记录输入文件哈希，没有改动时直接跳过编译；有改动时重复运行 xelatex，
+直到 .aux/.toc/.out 的哈希不再变化 (或达到最大次数)，辅助文件和 minted 缓存在两次编译之间保留
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import argparse
+import subprocess
+
+# 编译状态文件格式版本，修改存储结构时递增
+STATE_VERSION = 1
+
+DEFAULT_STATE_DIR = '.build_cache'
+DEFAULT_ENGINE = 'xelatex'
+DEFAULT_ENGINE_ARGS = ['-shell-escape', '-interaction=nonstopmode', '-recorder']
+# 代码块已预渲染时不需要 -shell-escape
+PRERENDERED_ENGINE_ARGS = ['-interaction=nonstopmode', '-recorder']
+DEFAULT_MAX_PASSES = 5
+DEFAULT_LOG_FILE = 'compile.log'
+
+# 判断是否达到不动点所比较的辅助文件
+TRACKED_EXTENSIONS = ['.aux', '.toc', '.out']
+# 由编译本身生成、不作为输入跟踪的文件
+GENERATED_EXTENSIONS = {'.aux', '.toc', '.out', '.log', '.fls', '.pdf', '.lof', '.lot', '.pyg', '.w18', '.synctex.gz'}
+# 冷编译时删除的辅助文件
+AUX_EXTENSIONS = ['.aux', '.log', '.out', '.toc', '.pyg', '.w18', '.fls']
+
+
+def file_hash(path):
+    """文件内容的 sha256，文件不存在时返回 None"""
+    try:
+        with open(path, 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except OSError:
+        return None
+
+
+def default_state_path(tex_file):
+    """状态文件放在 .tex 同目录的 .build_cache/ 下"""
+    directory = os.path.dirname(os.path.abspath(tex_file))
+    name = os.path.splitext(os.path.basename(tex_file))[0]
+    return os.path.join(directory, DEFAULT_STATE_DIR, f'{name}.json')
+
+
+class PassResult:
+    def __init__(self, number, seconds, returncode, changed):
+        self.number = number
+        self.seconds = seconds
+        self.returncode = returncode
+        # 本次运行后内容发生变化的辅助文件
+        self.changed = changed
+
+    def to_dict(self):
+        return {'pass': self.number, 'seconds': self.seconds,
+                'returncode': self.returncode, 'changed': self.changed}
+
+
+class BuildResult:
+    def __init__(self, status, reason, passes=None, converged=True, seconds=0.0):
+        # skipped / built / failed / cancelled
+        self.status = status
+        self.reason = reason
+        self.passes = passes or []
+        self.converged = converged
+        self.seconds = seconds
+
+    @property
+    def ok(self):
+        return self.status != 'failed'
+
+    def to_dict(self):
+        return {'status': self.status, 'reason': self.reason, 'converged': self.converged,
+                'seconds': self.seconds, 'passes': [p.to_dict() for p in self.passes]}
+
+
+class TexBuilder:
+    """对单个 .tex 文件执行增量编译"""
+
+    def __init__(self, tex_file, engine=DEFAULT_ENGINE, engine_args=None,
+                 max_passes=DEFAULT_MAX_PASSES, state_path=None, log_file=DEFAULT_LOG_FILE, jobname=None):
+        self.tex_file = os.path.abspath(tex_file)
+        self.directory = os.path.dirname(self.tex_file)
+        # 输出文件名 (.pdf/.aux 等)，默认与 .tex 同名
+        self.stem = jobname or os.path.splitext(os.path.basename(self.tex_file))[0]
+        self.engine = engine
+        self.engine_args = list(DEFAULT_ENGINE_ARGS if engine_args is None else engine_args)
+        if jobname:
+            self.engine_args.append(f'-jobname={jobname}')
+        self.max_passes = max_passes
+        self.state_path = state_path or default_state_path(self.tex_file)
+        self.log_path = os.path.join(self.directory, log_file)
+        # 正在运行的编译进程，cancel() 时终止
+        self.process = None
+        self.cancelled = False
+
+    def output_path(self, extension):
+        return os.path.join(self.directory, self.stem + extension)
+
+    @property
+    def pdf_path(self):
+        return self.output_path('.pdf')
+
+    def config(self):
+        """编译配置，变化时视为需要重新编译"""
+        return {'engine': self.engine, 'args': self.engine_args}
+
+    def recorded_inputs(self):
+        """从上次编译的 .fls 中读取项目目录内的输入文件 (不含编译生成的文件)"""
+        inputs = {self.tex_file}
+        fls_path = self.output_path('.fls')
+        if not os.path.exists(fls_path):
+            return inputs
+
+        with open(fls_path, 'r', encoding='utf-8', errors='replace') as f:
+            for line in f:
+                if not line.startswith('INPUT '):
+                    continue
+                path = os.path.normpath(os.path.join(self.directory, line[6:].strip()))
+                relative = os.path.relpath(path, self.directory)
+                if relative.startswith('..') or relative.startswith('_minted'):
+                    continue
+                if any(path.endswith(ext) for ext in GENERATED_EXTENSIONS):
+                    continue
+                inputs.add(path)
+        return inputs
+
+    def input_hashes(self):
+        return {path: file_hash(path) for path in sorted(self.recorded_inputs())}
+
+    def aux_hashes(self):
+        return {ext: file_hash(self.output_path(ext)) for ext in TRACKED_EXTENSIONS}
+
+    def load_state(self):
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return state if state.get('version') == STATE_VERSION else None
+
+    def save_state(self, snapshot=None):
+        """原子地写入本次成功编译的输入哈希
+
+        snapshot 为编译开始时的输入哈希，编译期间被再次修改的文件记录旧哈希，下次仍会重新编译
+        """
+        inputs = self.input_hashes()
+        for path, digest in (snapshot or {}).items():
+            if path in inputs:
+                inputs[path] = digest
+        state = {
+            'version': STATE_VERSION,
+            'config': self.config(),
+            'inputs': inputs,
+            'pdf': file_hash(self.pdf_path),
+        }
+        os.makedirs(os.path.dirname(self.state_path) or '.', exist_ok=True)
+        tmp_path = f'{self.state_path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.state_path)
+
+    def clear_state(self):
+        if os.path.exists(self.state_path):
+            os.remove(self.state_path)
+
+    def stale_reason(self):
+        """返回需要重新编译的原因，无需编译时返回 None"""
+        state = self.load_state()
+        if state is None:
+            return '没有编译记录'
+        if state.get('config') != self.config():
+            return '编译配置已改变'
+        if not os.path.exists(self.pdf_path) or file_hash(self.pdf_path) != state.get('pdf'):
+            return 'PDF缺失或已被修改'
+        recorded = state.get('inputs', {})
+        for path, digest in recorded.items():
+            if file_hash(path) != digest:
+                return f'{os.path.relpath(path, self.directory)} 已修改'
+        if self.tex_file not in recorded:
+            return '主文件不在编译记录中'
+        return None
+
+    def clean(self):
+        """删除辅助文件和 minted 缓存，下一次为冷编译"""
+        for ext in AUX_EXTENSIONS:
+            path = self.output_path(ext)
+            if os.path.exists(path):
+                os.remove(path)
+        minted_dir = os.path.join(self.directory, f'_minted-{self.stem}')
+        shutil.rmtree(minted_dir, ignore_errors=True)
+        self.clear_state()
+
+    def run_pass(self, number):
+        """运行一次编译引擎，输出追加到日志文件"""
+        command = [self.engine] + self.engine_args + [os.path.basename(self.tex_file)]
+        started = time.perf_counter()
+        with open(self.log_path, 'a', encoding='utf-8') as log:
+            log.write(f'===== 第{number}次编译: {" ".join(command)} =====\n')
+            log.flush()
+            self.process = subprocess.Popen(command, cwd=self.directory, stdin=subprocess.DEVNULL,
+                                            stdout=log, stderr=subprocess.STDOUT)
+            # 进程启动前已被取消
+            if self.cancelled:
+                self.process.terminate()
+            returncode = self.process.wait()
+            self.process = None
+        return time.perf_counter() - started, returncode
+
+    def cancel(self):
+        """从其他线程取消正在进行的编译，build() 返回 cancelled"""
+        self.cancelled = True
+        process = self.process
+        if process is not None and process.poll() is None:
+            process.terminate()
+
+    def build(self, force=False):
+        """编译到 .aux/.toc/.out 不再变化为止；无改动且未指定 force 时跳过"""
+        reason = '强制编译' if force else self.stale_reason()
+        if reason is None:
+            return BuildResult('skipped', '输入文件没有改动')
+
+        started = time.perf_counter()
+        snapshot = self.input_hashes()
+        with open(self.log_path, 'w', encoding='utf-8'):
+            pass
+
+        passes = []
+        previous = self.aux_hashes()
+        converged = False
+        for number in range(1, self.max_passes + 1):
+            seconds, returncode = self.run_pass(number)
+            current = self.aux_hashes()
+            changed = [ext for ext in TRACKED_EXTENSIONS if current[ext] != previous[ext]]
+            passes.append(PassResult(number, seconds, returncode, changed))
+
+            if self.cancelled:
+                # 辅助文件可能只写了一半，下次重新编译
+                self.cancelled = False
+                self.clear_state()
+                return BuildResult('cancelled', reason, passes, False, time.perf_counter() - started)
+            if returncode != 0:
+                self.clear_state()
+                return BuildResult('failed', reason, passes, False, time.perf_counter() - started)
+            if not changed:
+                converged = True
+                break
+            previous = current
+
+        self.save_state(snapshot)
+        return BuildResult('built', reason, passes, converged, time.perf_counter() - started)
+
+
+def print_report(result, builder):
+    """打印每次编译的耗时明细"""
+    if result.status == 'skipped':
+        print(f"⏭️  {result.reason}，跳过编译")
+        return
+    if result.status == 'cancelled':
+        print(f"🛑 编译已取消 ({len(result.passes)} 次, {result.seconds:.2f}s)")
+        return
+
+    print(f"🔧 编译原因: {result.reason}")
+    for item in result.passes:
+        changed = ', '.join(item.changed) if item.changed else '无变化'
+        mark = '✅' if item.returncode == 0 else '❌'
+        print(f"  {mark} 第{item.number}次: {item.seconds:7.2f}s  辅助文件: {changed}")
+
+    if result.status == 'failed':
+        print(f"❌ 编译失败！查看 {os.path.relpath(builder.log_path)} 了解详情")
+        return
+    if not result.converged:
+        print(f"⚠️  {builder.max_passes} 次编译后辅助文件仍在变化，目录或引用可能不完整")
+    print(f"✅ 编译成功: {os.path.relpath(builder.pdf_path)} "
+          f"({len(result.passes)} 次, 共 {result.seconds:.2f}s)")
+
+
+def prepare_builder(tex_file, engine, max_passes=DEFAULT_MAX_PASSES, prerender=False, jobs=0):
+    """创建 TexBuilder；prerender 时先预渲染代码块，改为编译生成的文档"""
+    engine_args, jobname = None, None
+    if prerender:
+        # 只有预渲染时才需要 pygments，不在模块开头导入
+        from prerender_minted import prerender_document
+        started = time.perf_counter()
+        jobs = jobs if jobs > 0 else (os.cpu_count() or 1)
+        prerendered = prerender_document(tex_file, jobs=jobs)
+        print(f"🎨 预渲染 {prerendered.blocks} 个代码块: 新渲染 {prerendered.rendered} 个, "
+              f"复用 {prerendered.reused} 个 ({time.perf_counter() - started:.2f}s)")
+        # 输出文件仍以原文件命名
+        jobname = os.path.splitext(os.path.basename(tex_file))[0]
+        tex_file, engine_args = prerendered.output, PRERENDERED_ENGINE_ARGS
+
+    return TexBuilder(tex_file, engine=engine, engine_args=engine_args,
+                      max_passes=max_passes, jobname=jobname)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='LaTeX增量编译驱动')
+    parser.add_argument('file', nargs='?', default='Algorithm-template.tex',
+                       help='要编译的LaTeX文件 (默认: Algorithm-template.tex)')
+    parser.add_argument('--engine', default=os.environ.get('XELATEX', DEFAULT_ENGINE),
+                       help='编译引擎，也可通过环境变量 XELATEX 指定 (默认: xelatex)')
+    parser.add_argument('--max-passes', type=int, default=DEFAULT_MAX_PASSES,
+                       help=f'最多编译次数 (默认: {DEFAULT_MAX_PASSES})')
+    parser.add_argument('--force', action='store_true',
+                       help='即使输入没有改动也重新编译')
+    parser.add_argument('--clean', action='store_true',
+                       help='先删除辅助文件和 minted 缓存，再冷编译')
+    parser.add_argument('--prerender', action='store_true',
+                       help='先用 prerender_minted.py 预渲染代码块，再不带 -shell-escape 编译')
+    parser.add_argument('-j', '--jobs', type=int, default=0,
+                       help='预渲染的并行进程数，0 表示使用全部CPU核心 (默认: 0)')
+    parser.add_argument('--json', help='把编译报告写入JSON文件')
+
+    args = parser.parse_args()
+
+    if not os.path.exists(args.file):
+        print(f"错误: {args.file} 文件不存在！")
+        sys.exit(1)
+    engine = shutil.which(args.engine)
+    if engine is None:
+        print(f"错误: {args.engine} 未找到！请确保已安装LaTeX发行版。")
+        sys.exit(1)
+
+    builder = prepare_builder(args.file, engine, max_passes=args.max_passes,
+                              prerender=args.prerender, jobs=args.jobs)
+    if args.clean:
+        print("🧹 清理辅助文件...")
+        builder.clean()
+
+    result = builder.build(force=args.force or args.clean)
+    print_report(result, builder)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(result.to_dict(), f, ensure_ascii=False, indent=2)
+
+    sys.exit(0 if result.ok else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,481 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+模板打包
+把解法中的 `// @use 主席树`、`// @use ds/fenwick-range` 替换为 Algorithm-template.tex 中对应的
+代码块，合并重复的 #include、using namespace 和 #define，生成可直接提交、可用 run.sh 运行的单个文件。
+只写章节标题时默认取代码块开头到第一条最外层语句 (用法示例) 之前的部分；
+打包结果中重复的全局定义和最外层语句会连同来源代码块一起报告，--check 时再用 g++ -fsyntax-only 检查。
+章节名 -> 代码块的映射缓存在 .tex_index/ 下，打包结果按解法和所引用代码块的哈希缓存在 .bundle_cache/ 下
+"""
+
+import os
+import re
+import sys
+import glob
+import json
+import time
+import hashlib
+import argparse
+import subprocess
+
+from tex_index import TexIndex, DEFAULT_INDEX_DIR, write_if_changed
+from format_cache import rules_version
+from check_cpp_blocks import STRING_PATTERN, STATEMENT_PATTERN, DEFAULT_STD, top_level_statements
+
+# 名称索引格式版本，修改存储结构时递增
+NAMES_VERSION = 1
+
+DEFAULT_ALIASES = 'bundle_aliases.txt'
+DEFAULT_CACHE_DIR = '.bundle_cache'
+
+# // @use 章节标题或路径或别名[#第几个代码块][:起始行-结束行]，与 bench/ 中的 @block 相同
+USE_PATTERN = re.compile(r'^[ \t]*//[ \t]*@use[ \t]+(.+?)(?:#(\d+))?(?::(\d+)-(\d+))?[ \t]*$')
+REF_PATTERN = re.compile(r'^(.+?)(?:#(\d+))?(?::(\d+)-(\d+))?$')
+INCLUDE_PATTERN = re.compile(r'^\s*#\s*include\s*([<"][^>"]+[>"])')
+PRAGMA_PATTERN = re.compile(r'^\s*#\s*pragma\s+GCC\s+(?:optimize|target)\b')
+USING_NAMESPACE_PATTERN = re.compile(r'^using\s+namespace\s+[\w:]+\s*;\s*$')
+DEFINE_PATTERN = re.compile(r'^\s*#\s*define\s+(\w+)(\([^)]*\))?(.*)$')
+UNDEF_PATTERN = re.compile(r'^\s*#\s*undef\s+(\w+)')
+# <bits/stdc++.h> 已包含全部标准库头文件
+UMBRELLA_HEADER = '<bits/stdc++.h>'
+
+# 最外层的类型、函数和变量定义
+TYPE_PATTERN = re.compile(r'^(?:template\s*<.*>\s*)?(?:struct|class|union|enum(?:\s+class)?)\s+(\w+)\s*(?:[:{].*)?$')
+TYPEDEF_PATTERN = re.compile(r'^(?:typedef\s+.+?\b(\w+)\s*;|using\s+(\w+)\s*=.+;)$')
+FUNCTION_PATTERN = re.compile(r'^(?:[\w:<>,\*&]+\s+)+[\*&]*(\w+)\s*\(([^()]*)\)\s*(?:const\s*)?(?:\{.*)?$')
+VARIABLE_PATTERN = re.compile(r'^(?:(?:static|const|constexpr|inline|unsigned|signed|long|short)\s+)*'
+                              r'[A-Za-z_][\w:]*(?:\s*<.*>)?[\s\*&]+(\w.*);$')
+CLOSING_PATTERN = re.compile(r'^\}\s*(\w.*);$')
+DECLARATOR_PATTERN = re.compile(r'^[\s\*&]*(\w+)')
+
+
+def default_names_path(tex_path):
+    directory = os.path.dirname(os.path.abspath(tex_path))
+    name = os.path.splitext(os.path.basename(tex_path))[0]
+    return os.path.join(directory, DEFAULT_INDEX_DIR, f'{name}.names.json')
+
+
+def file_stamp(path):
+    """(mtime_ns, 大小)，文件不存在时为 None"""
+    if not os.path.exists(path):
+        return None
+    stat = os.stat(path)
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def read_aliases(path):
+    """每行 `别名 = 引用`，# 开头的行为注释"""
+    aliases = {}
+    if path is None or not os.path.exists(path):
+        return aliases
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            if '=' not in line:
+                raise ValueError(f"{path}:{line_no}: 应为 `别名 = 引用`")
+            name, ref = (part.strip() for part in line.split('=', 1))
+            aliases[name] = ref
+    return aliases
+
+
+def normalize_name(name):
+    return '/'.join(part.strip() for part in name.split('/') if part.strip())
+
+
+def strip_line(line):
+    """去掉注释，把字符串和字符字面量换成空串"""
+    return STRING_PATTERN.sub(lambda m: '' if m.group().startswith('//') else '""', line).strip()
+
+
+def split_declarators(text):
+    """按最外层的逗号拆分 `n, m, w[N], g(n, 0)`"""
+    parts, depth, current = [], 0, ''
+    for char in text:
+        if char in '([{':
+            depth += 1
+        elif char in ')]}':
+            depth -= 1
+        if char == ',' and depth == 0:
+            parts.append(current)
+            current = ''
+        else:
+            current += char
+    return parts + [current]
+
+
+def global_definitions(line, depth):
+    """一行中最外层定义的名字 [(键, 名字)]，函数的键带上参数以允许重载"""
+    if line.startswith('#'):
+        return []
+    if depth == 1 and line.count('}') > line.count('{'):
+        match = CLOSING_PATTERN.match(line)
+        declarators = split_declarators(match.group(1)) if match else []
+    elif depth != 0 or STATEMENT_PATTERN.match(line):
+        return []
+    elif TYPE_PATTERN.match(line) and not line.endswith(';'):
+        name = TYPE_PATTERN.match(line).group(1)
+        return [(name, name)]
+    elif TYPEDEF_PATTERN.match(line):
+        match = TYPEDEF_PATTERN.match(line)
+        name = match.group(1) or match.group(2)
+        return [(name, name)]
+    elif FUNCTION_PATTERN.match(line):
+        name, params = FUNCTION_PATTERN.match(line).groups()
+        return [(f"{name}({' '.join(params.split())})", f'{name}()')]
+    elif VARIABLE_PATTERN.match(line) and not line.startswith('using '):
+        declarators = split_declarators(VARIABLE_PATTERN.match(line).group(1))
+    else:
+        return []
+    names = []
+    for declarator in declarators:
+        match = DECLARATOR_PATTERN.match(declarator)
+        if match and not STATEMENT_PATTERN.match(match.group(1)):
+            names.append((match.group(1), match.group(1)))
+    return names
+
+
+def find_problems(lines):
+    """检查 [(代码行, 来源)] 中重复的全局定义和最外层语句，来源为 None 的行 (起止标记) 分隔代码块"""
+    problems = []
+    defined = {}
+    depth = 0
+    for line, origin in lines:
+        if origin is None:
+            depth = 0
+            continue
+        line = strip_line(line)
+        if depth == 0 and STATEMENT_PATTERN.match(line):
+            problems.append(f"{origin}: 最外层语句 `{line}`")
+        for key, name in global_definitions(line, depth):
+            if key in defined:
+                problems.append(f"{origin}: {name} 重复定义，首次定义在 {defined[key]}")
+            else:
+                defined[key] = origin
+        depth = max(depth + line.count('{') - line.count('}'), 0)
+    return problems
+
+
+class NameIndex:
+    """章节标题、路径后缀和别名 -> 代码块位置，按 .tex 和别名文件的 mtime/大小校验缓存"""
+
+    def __init__(self, tex_path, sections, aliases, names=None):
+        self.tex_path = tex_path
+        self.sections = sections
+        self.aliases = aliases
+        self.names = names if names is not None else self.build_names(sections)
+        self._data = None
+
+    @staticmethod
+    def build_names(sections):
+        names = {}
+        for i, section in enumerate(sections):
+            path = section['path']
+            for k in range(len(path)):
+                names.setdefault('/'.join(path[k:]), []).append(i)
+        return names
+
+    @classmethod
+    def build(cls, tex_path, aliases_path=DEFAULT_ALIASES):
+        index = TexIndex.load(tex_path)
+        sections = []
+        for section in index.sections():
+            sections.append({
+                'path': section.path, 'line': section.line,
+                'blocks': [{'line': block.line, 'hash': block.hash, 'language': block.language,
+                            'code_start': block.code_start, 'code_end': block.code_end}
+                           for block in section.all_blocks()],
+            })
+        return cls(tex_path, sections, read_aliases(aliases_path))
+
+    @classmethod
+    def load(cls, tex_path, aliases_path=DEFAULT_ALIASES, cache_path=None, use_cache=True):
+        if cache_path is None:
+            cache_path = default_names_path(tex_path)
+        stamps = [file_stamp(tex_path), file_stamp(aliases_path) if aliases_path else None]
+
+        if use_cache and os.path.exists(cache_path):
+            try:
+                with open(cache_path, 'r', encoding='utf-8') as f:
+                    cached = json.load(f)
+                if cached.get('version') == NAMES_VERSION and cached.get('stamps') == stamps:
+                    return cls(tex_path, cached['sections'], cached['aliases'], cached['names'])
+            except (OSError, ValueError, KeyError, TypeError):
+                pass
+
+        names = cls.build(tex_path, aliases_path)
+        if use_cache:
+            os.makedirs(os.path.dirname(cache_path) or '.', exist_ok=True)
+            tmp_path = f'{cache_path}.{os.getpid()}.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'version': NAMES_VERSION, 'stamps': stamps, 'sections': names.sections,
+                           'aliases': names.aliases, 'names': names.names}, f, ensure_ascii=False)
+            os.replace(tmp_path, cache_path)
+        return names
+
+    def find(self, name):
+        """精确匹配标题或路径后缀，找不到时按子串匹配"""
+        name = normalize_name(name)
+        if name in self.names:
+            return [self.sections[i] for i in self.names[name]]
+        return [section for section in self.sections if name in '/'.join(section['path'])]
+
+    def resolve(self, ref):
+        """解析引用，返回 (章节, 代码块, 起始行, 结束行)，行号为代码块内从 1 开始的行号，None 表示整块"""
+        match = REF_PATTERN.match(ref.strip())
+        name, number, start, end = match.groups()
+        if name.strip() in self.aliases:
+            target = REF_PATTERN.match(self.aliases[name.strip()])
+            name = target.group(1)
+            number = number or target.group(2)
+            if start is None:
+                start, end = target.group(3), target.group(4)
+
+        candidates = self.find(name)
+        if not candidates:
+            raise ValueError(f"没有找到 '{name}' 对应的章节或别名")
+        if len(candidates) > 1:
+            choices = '\n'.join(f"  {'/'.join(section['path'])} (第{section['line']}行)"
+                                for section in candidates[:10])
+            raise ValueError(f"'{name}' 匹配到 {len(candidates)} 个章节，请用完整标题或路径指定:\n{choices}")
+        section = candidates[0]
+        number = int(number or 1)
+        if not 1 <= number <= len(section['blocks']):
+            raise ValueError(f"章节 '{section['path'][-1]}' 只有 {len(section['blocks'])} 个代码块")
+        block = section['blocks'][number - 1]
+        if start is None:
+            return (section, block) + self.clean_range(block)
+        return section, block, int(start), int(end)
+
+    def clean_range(self, block):
+        """代码块开头到第一条最外层语句 (及其前面的注释) 之前的行范围，没有最外层语句时为整块"""
+        lines = self.code(block).split('\n')
+        statements = top_level_statements('\n'.join(lines))
+        end = statements[0] if statements else 0
+        while end > 0 and (not lines[end - 1].strip() or lines[end - 1].strip().startswith('//')):
+            end -= 1
+        return (1, end) if end > 0 else (None, None)
+
+    def code(self, block, start=None, end=None):
+        if self._data is None:
+            with open(self.tex_path, 'rb') as f:
+                self._data = f.read()
+        code = self._data[block['code_start']:block['code_end']].decode('utf-8')
+        if start is not None:
+            code = '\n'.join(code.split('\n')[start - 1:end])
+        return code
+
+
+class Bundler:
+    """展开 @use 引用，合并头文件和宏定义"""
+
+    def __init__(self, names):
+        self.names = names
+
+    def references(self, source):
+        """解法中的全部引用 [(行号, 引用, 章节, 代码块, 起始行, 结束行)]"""
+        refs = []
+        for line_no, line in enumerate(source.split('\n'), 1):
+            match = USE_PATTERN.match(line)
+            if match:
+                ref = line.split('@use', 1)[1].strip()
+                try:
+                    refs.append((line_no, ref) + self.names.resolve(ref))
+                except ValueError as e:
+                    raise ValueError(f"第{line_no}行: {e}") from None
+        return refs
+
+    def bundle(self, source, refs, source_name='solution'):
+        """返回 (打包结果, 问题列表)"""
+        pragmas, includes, namespaces, body, origins = [], [], [], [], []
+        defines = {}
+        seen_blocks = set()
+
+        def add_line(line, origin):
+            if PRAGMA_PATTERN.match(line):
+                if line.strip() not in pragmas:
+                    pragmas.append(line.strip())
+                return
+            match = INCLUDE_PATTERN.match(line)
+            if match:
+                if match.group(1) not in includes:
+                    includes.append(match.group(1))
+                return
+            if USING_NAMESPACE_PATTERN.match(line):
+                if line.strip() not in namespaces:
+                    namespaces.append(line.strip())
+                return
+            match = UNDEF_PATTERN.match(line)
+            if match:
+                defines.pop(match.group(1), None)
+            match = DEFINE_PATTERN.match(line)
+            if match:
+                name = match.group(1)
+                definition = ' '.join((match.group(2) or '').split() + match.group(3).split())
+                if name in defines:
+                    if defines[name][0] != definition:
+                        raise ValueError(f"宏 {name} 在 {defines[name][1]} 和 {origin} 中的定义不同")
+                    return
+                defines[name] = (definition, origin)
+            body.append(line)
+            origins.append(origin)
+
+        refs_by_line = {ref[0]: ref for ref in refs}
+        for line_no, line in enumerate(source.split('\n'), 1):
+            if line_no not in refs_by_line:
+                add_line(line, f'{source_name}:{line_no}')
+                continue
+            _, ref, section, block, start, end = refs_by_line[line_no]
+            key = (block['hash'], start, end)
+            if key in seen_blocks:
+                continue
+            seen_blocks.add(key)
+            first_line = block['line'] + (start or 1)
+            body.append(f"// ---- {'/'.join(section['path'])} "
+                        f"({os.path.basename(self.names.tex_path)} 第{first_line}行) ----")
+            origins.append(None)
+            for offset, code_line in enumerate(self.names.code(block, start, end).split('\n')):
+                add_line(code_line, f"{'/'.join(section['path'])} (第{first_line + offset}行)")
+            body.append(f"// ---- end {ref} ----")
+            origins.append(None)
+
+        if UMBRELLA_HEADER in includes:
+            includes = [header for header in includes
+                        if header == UMBRELLA_HEADER or header.startswith('"') or '/' in header]
+        head = pragmas + [f'#include {header}' for header in includes] + namespaces
+        problems = find_problems(zip(body, origins))
+        while body and not body[0].strip():
+            body.pop(0)
+        return '\n'.join(head + ([''] if head and body else []) + body), problems
+
+
+def cache_key(source, refs):
+    """解法源码、引用的代码块 (及行范围) 和打包规则的哈希"""
+    digest = hashlib.sha256(rules_version(__file__).encode('utf-8'))
+    digest.update(source.encode('utf-8'))
+    for _, ref, _, block, start, end in refs:
+        digest.update(f'\0{ref}\0{block["hash"]}\0{start}\0{end}'.encode('utf-8'))
+    return digest.hexdigest()[:12]
+
+
+def bundle_file(source_path, output_path, names, cache_dir=DEFAULT_CACHE_DIR, use_cache=True):
+    """打包一个解法，返回 (引用列表, 是否命中缓存, 输出文件是否改变, 问题列表)"""
+    with open(source_path, 'r', encoding='utf-8') as f:
+        source = f.read()
+    bundler = Bundler(names)
+    refs = bundler.references(source)
+
+    stem = os.path.splitext(os.path.basename(source_path))[0]
+    cache_path = os.path.join(cache_dir, f'{stem}-{cache_key(source, refs)}.cpp')
+    # 问题列表和打包结果一起缓存
+    problems_path = f'{os.path.splitext(cache_path)[0]}.json'
+    if use_cache and os.path.exists(cache_path) and os.path.exists(problems_path):
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            text = f.read()
+        with open(problems_path, 'r', encoding='utf-8') as f:
+            problems = json.load(f)
+        return refs, True, write_if_changed(output_path, text), problems
+
+    text, problems = bundler.bundle(source, refs, os.path.basename(source_path))
+    if use_cache:
+        os.makedirs(cache_dir, exist_ok=True)
+        write_if_changed(cache_path, text)
+        write_if_changed(problems_path, json.dumps(problems, ensure_ascii=False))
+        # 同一解法的旧打包结果不再需要
+        for path in glob.glob(os.path.join(cache_dir, f'{stem}-*')):
+            if (os.path.splitext(path)[0] != os.path.splitext(cache_path)[0]
+                    and re.fullmatch(rf'{re.escape(stem)}-[0-9a-f]{{12}}\.(cpp|json)', os.path.basename(path))):
+                os.remove(path)
+    return refs, False, write_if_changed(output_path, text), problems
+
+
+def syntax_check(path, cxx='g++', std=DEFAULT_STD):
+    """g++ -fsyntax-only 检查打包结果，返回编译器输出，通过时为空"""
+    result = subprocess.run([cxx, f'-std={std}', '-fsyntax-only', path],
+                            capture_output=True, text=True)
+    return '' if result.returncode == 0 else (result.stderr.strip() or '编译失败')
+
+
+def default_output_path(source_path):
+    stem, ext = os.path.splitext(source_path)
+    return f'{stem}_submit{ext or ".cpp"}'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='把 // @use 引用的模板代码块展开到解法中')
+    parser.add_argument('source', nargs='?', help='解法源文件')
+    parser.add_argument('-o', '--output', help='输出文件 (默认: <源文件>_submit.cpp)')
+    parser.add_argument('-f', '--file', default='Algorithm-template.tex',
+                       help='模板文件 (默认: Algorithm-template.tex)')
+    parser.add_argument('--aliases', default=DEFAULT_ALIASES,
+                       help=f'别名文件 (默认: {DEFAULT_ALIASES})')
+    parser.add_argument('--no-cache', action='store_true',
+                       help='不使用名称索引和打包结果缓存')
+    parser.add_argument('--list', action='store_true',
+                       help='列出全部别名')
+    parser.add_argument('--check', action='store_true',
+                       help='打包后用 g++ -fsyntax-only 检查结果')
+    parser.add_argument('--cxx', default='g++',
+                       help='--check 使用的编译器 (默认: g++)')
+
+    args = parser.parse_args()
+
+    for path in (args.file, args.source):
+        if path is not None and not os.path.exists(path):
+            print(f"错误: 文件 {path} 不存在")
+            sys.exit(1)
+
+    started = time.perf_counter()
+    try:
+        names = NameIndex.load(args.file, args.aliases, use_cache=not args.no_cache)
+    except ValueError as e:
+        print(f"错误: {e}")
+        sys.exit(1)
+
+    if args.list:
+        for alias, ref in sorted(names.aliases.items()):
+            print(f"  {alias:<24} {ref}")
+        if args.source is None:
+            return
+    if args.source is None:
+        parser.error('需要指定解法源文件')
+
+    output = args.output or default_output_path(args.source)
+    try:
+        refs, cached, changed, problems = bundle_file(args.source, output, names, use_cache=not args.no_cache)
+    except ValueError as e:
+        print(f"错误: {e}")
+        sys.exit(1)
+    elapsed = time.perf_counter() - started
+
+    for line_no, ref, section, block, start, end in refs:
+        lines = f":{start}-{end}" if start is not None else ''
+        print(f"  第{line_no}行 @use {ref} -> {'/'.join(section['path'])}{lines} (第{block['line']}行)")
+    status = '使用缓存' if cached else '已打包'
+    print(f"📦 {args.source} -> {output}: {status}，引用 {len(refs)} 个代码块"
+          f"{'' if changed else '，内容未变'} ({elapsed * 1000:.1f} ms)")
+
+    if problems:
+        print(f"❌ 打包结果不能直接编译，发现 {len(problems)} 个问题:")
+        for problem in problems:
+            print(f"  {problem}")
+    if args.check:
+        try:
+            errors = syntax_check(output, args.cxx)
+        except FileNotFoundError:
+            print(f"错误: 找不到编译器 {args.cxx}")
+            sys.exit(1)
+        if errors:
+            print(f"❌ {args.cxx} -fsyntax-only 未通过:")
+            for line in errors.split('\n')[:20]:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"✅ {args.cxx} -fsyntax-only 通过")
+    if problems:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
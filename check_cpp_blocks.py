@@ -0,0 +1,514 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+检查模板中每个C++代码块能否通过编译
+先为 bits/stdc++.h 生成一次预编译头，再并行以 g++ -fsyntax-only 检查所有代码块；
+没有 main 的代码块补上 main，顶层直接写语句的片段包进 main 中；
+单独编译缺少上下文的代码块，再放在同一节前面的代码块之后编译一次；
+结果按代码内容、编译器和编译选项缓存，报错映射回 .tex 的行号
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import shlex
+import hashlib
+import argparse
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+from tex_index import load_index
+from format_cache import DEFAULT_CACHE_DIR, FormatCache, rules_version
+
+DEFAULT_CXX = 'g++'
+DEFAULT_STD = 'c++20'
+PCH_HEADER = 'stdc++.h'
+PRELUDE = 'using namespace std;\n'
+MAIN_PATTERN = re.compile(r'\bmain\s*\(')
+# 出现在最外层、只能写在函数体内的语句 (含赋值和函数调用)
+STATEMENT_PATTERN = re.compile(r'^(?:(?:for|while|if|else|do|switch|return|cin|cout|scanf|printf)\b|--|\+\+|'
+                               r'\w+(?:\[[^\]]*\])*\s*(?:[-+*/%^|&]|<<|>>)?=(?!=)|\w+(?:\.\w+)*\(.*\)\s*[,;])')
+# 模板中分隔代码与用法的 ----- 行
+SEPARATOR_PATTERN = re.compile(r'^\s*-{4,}\s*$', re.MULTILINE)
+# 数组大小中的全大写常量 (N、M 等)，模板约定在别处定义
+BOUND_PATTERN = re.compile(r'\[([^\[\]]*)\]')
+CONSTANT_PATTERN = re.compile(r'\b[A-Z][A-Z0-9_]*\b')
+# 代码块没有定义数组大小常量时预先声明的值
+BOUND_VALUE = 1010
+STRING_PATTERN = re.compile(r'"(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\'|//.*$')
+DIAGNOSTIC_PATTERN = re.compile(r'^(?P<file>[^:\n]+):(?P<line>\d+):(?P<column>\d+): (?:fatal )?error: (?P<message>.*)$')
+COMMAND_ERROR_PATTERN = re.compile(r'^(?:cc1plus|g\+\+|clang\+\+|clang): (?:fatal )?error: (?P<message>.*)$')
+# 由缺少上下文 (其他代码块中定义的数组、常量等) 引起的错误；
+# 其他代码块中的并查集 find 未声明时，调用会匹配到 std::find
+CONTEXT_ERROR_PATTERN = re.compile(r"was not declared in this scope|does not name a type|has not been declared|"
+                                   r"no matching function for call to 'find\(")
+# 缺少上下文的错误中未声明的名字，以及编译器猜测的拼写
+MISSING_NAME_PATTERN = re.compile(r"^'([^']+)' (?:was not declared|does not name a type|has not been declared)")
+SUGGESTION_PATTERN = re.compile(r"did you mean '([^']+)'")
+IDENTIFIER_PATTERN = re.compile(r'\b[A-Za-z_]\w*\b')
+# 未声明的类型被当作 int 后引起的连带错误，只在同时有缺少上下文的错误时忽略；
+# 数组大小中的常量未声明时，结构体成员不存在、成员类型退化为 int；
+# 花括号初始化列表中有未声明的名字时，整个赋值都会报错
+CASCADE_ERROR_PATTERN = re.compile(r"template argument \d+ is invalid|which is of non-class type 'int'|"
+                                   r"<expression error>|\(<brace-enclosed initializer list>\)|"
+                                   r"and '<brace-enclosed initializer list>'\)|has no member named|"
+                                   r"invalid types 'int\[")
+# 语句片段包进 main 后才出现的错误 (片段原本位于循环或其他函数中)
+WRAPPER_ERROR_PATTERN = re.compile(r'statement not within loop or switch|return-statement with (?:no )?value')
+# 代码块在编译单元中的文件名，报错时按此识别代码块内的行
+BLOCK_FILE = 'block.cpp'
+# 作为上下文的同节代码块的文件名，其中的错误归属于那些代码块本身，不计入
+CONTEXT_FILE = 'context.cpp'
+CPP_LANGUAGES = ('cpp', 'c++', 'cc', 'cxx')
+
+STATUS_LABELS = {'ok': '通过', 'fragment': '缺少上下文', 'error': '错误'}
+STATUS_RANK = {'ok': 0, 'fragment': 1, 'error': 2}
+
+
+def top_level_statements(code):
+    """代码块最外层直接写的语句所在的行号 (从 0 开始)"""
+    return [start for start, _ in statement_runs(code)]
+
+
+def statement_runs(code):
+    """最外层语句的行范围 [(起始行, 结束行后一行)]，一条语句到括号配平且以 ; 或 } 结尾为止"""
+    runs = []
+    depth = 0
+    start = None
+    for number, line in enumerate(code.split('\n')):
+        line = STRING_PATTERN.sub('""', line).strip()
+        if start is None and depth == 0 and STATEMENT_PATTERN.match(line):
+            start = number
+        depth += line.count('{') - line.count('}')
+        if start is not None and depth <= 0 and line.endswith((';', '}')):
+            runs.append((start, number + 1))
+            start = None
+            depth = 0
+    if start is not None:
+        runs.append((start, len(code.split('\n'))))
+    return runs
+
+
+def has_top_level_statements(code):
+    """代码块的最外层是否直接写了语句 (如只给出一段 for 循环的片段)"""
+    return bool(top_level_statements(code))
+
+
+def missing_bounds(code):
+    """代码块中用作数组大小、但没有定义的全大写常量"""
+    names = set()
+    for match in BOUND_PATTERN.finditer(code):
+        names.update(CONSTANT_PATTERN.findall(match.group(1)))
+    return sorted(name for name in names
+                  if not re.search(rf'#define\s+{name}\b|\b{name}\s*(?:=|\{{|;|,)', code))
+
+
+def wrap_block(code, context=()):
+    """把代码块包装成一个编译单元，返回 (源代码, 包装方式)；#line 使报错行号相对代码块首行
+
+    context 中的代码 (同一节前面的代码块) 放在代码块之前；没有定义的数组大小常量预先声明，
+    否则每个用到 N 的声明都会报错，掩盖代码块本身的问题
+    """
+    code = SEPARATOR_PATTERN.sub('', code)
+    prelude = PRELUDE
+    bounds = missing_bounds('\n'.join(context + (code,)))
+    if bounds:
+        prelude += 'const int ' + ', '.join(f'{name} = {BOUND_VALUE}' for name in bounds) + ';\n'
+    if context:
+        prelude += f'#line 1 "{CONTEXT_FILE}"\n' + '\n'.join(context) + '\n'
+    if MAIN_PATTERN.search(code):
+        return f'{prelude}#line 1 "{BLOCK_FILE}"\n{code}\n', None
+    # 用 signed main：代码块中常有 #define int long long
+    runs = statement_runs(code)
+    if runs:
+        # 声明留在最外层，语句移进 main，#line 保持各行的行号
+        lines = code.split('\n')
+        body = []
+        for start, end in runs:
+            body.append(f'#line {start + 1} "{BLOCK_FILE}"\n' + '\n'.join(lines[start:end]))
+            lines[start:end] = [''] * (end - start)
+        declarations = '\n'.join(lines)
+        return (f'{prelude}#line 1 "{BLOCK_FILE}"\n{declarations}\nsigned main() {{\n'
+                + '\n'.join(body) + '\n}\n'), 'statements'
+    return f'{prelude}#line 1 "{BLOCK_FILE}"\n{code}\nsigned main() {{}}\n', 'main'
+
+
+def parse_errors(output):
+    """提取编译器输出中的错误，line 为代码块内的行号 (代码块外的为 None)"""
+    errors = []
+    for line in output.splitlines():
+        match = DIAGNOSTIC_PATTERN.match(line)
+        if match and match.group('file') == CONTEXT_FILE:
+            continue
+        if match:
+            in_block = match.group('file') == BLOCK_FILE
+            errors.append({
+                'line': int(match.group('line')) if in_block else None,
+                'column': int(match.group('column')) if in_block else None,
+                'message': match.group('message') if in_block else f"{match.group('file')}: {match.group('message')}",
+            })
+            continue
+        match = COMMAND_ERROR_PATTERN.match(line)
+        if match:
+            errors.append({'line': None, 'column': None, 'message': match.group('message')})
+    return errors
+
+
+def document_names(index):
+    """在至少两个C++代码块中出现的标识符
+
+    只在一个代码块中出现的未声明名字不可能来自其他代码块，再由 context_names 判断是否写错了
+    """
+    counts = {}
+    for block in index.blocks_by_language(*CPP_LANGUAGES):
+        for name in set(IDENTIFIER_PATTERN.findall(index.block_code(block))):
+            counts[name] = counts.get(name, 0) + 1
+    return {name for name, count in counts.items() if count > 1}
+
+
+def is_typo(name, suggestion):
+    """两个名字等长 (至少 3 个字符)，只差大小写、一个字符或一对相邻字符的顺序"""
+    if len(name) != len(suggestion) or len(name) < 3:
+        return False
+    if name.lower() == suggestion.lower():
+        return True
+    diff = [i for i in range(len(name)) if name[i] != suggestion[i]]
+    return len(diff) == 1 or (len(diff) == 2 and diff[1] == diff[0] + 1 and
+                              name[diff[0]] == suggestion[diff[1]] and name[diff[1]] == suggestion[diff[0]])
+
+
+def context_names(code, errors):
+    """报未声明、但应当算作缺少上下文的名字
+
+    代码块自己声明过的名字 (声明因缺少上下文而失败：报这个名字的行以外还出现过它)，
+    以及不像拼写错误的名字：编译器猜测的拼写与它只差一处 (见 is_typo) 且在代码块中出现时才算写错了
+    """
+    lines = code.split('\n')
+    reported = {}
+    typos = set()
+    for error in errors:
+        match = MISSING_NAME_PATTERN.match(error['message'])
+        if match and error['line'] is not None:
+            name = match.group(1).split('::')[-1]
+            reported.setdefault(name, set()).add(error['line'])
+            suggestion = SUGGESTION_PATTERN.search(error['message'])
+            if (suggestion and is_typo(name, suggestion.group(1)) and
+                    re.search(rf'\b{re.escape(suggestion.group(1))}\b', code)):
+                typos.add(name)
+    names = set()
+    for name, numbers in reported.items():
+        pattern = re.compile(rf'\b{re.escape(name)}\b')
+        if name not in typos or any(pattern.search(line) for number, line in enumerate(lines, 1)
+                                    if number not in numbers):
+            names.add(name)
+    return names
+
+
+def is_context_error(error, wrap=None, names=None):
+    """错误是否只因缺少上下文而出现；给出 names 时，未声明的名字必须在其中"""
+    if CONTEXT_ERROR_PATTERN.search(error['message']):
+        match = MISSING_NAME_PATTERN.match(error['message'])
+        return names is None or match is None or match.group(1).split('::')[-1] in names
+    return wrap == 'statements' and WRAPPER_ERROR_PATTERN.search(error['message']) is not None
+
+
+def classify(returncode, errors, wrap=None, names=None):
+    """ok: 通过；fragment: 只能在其他代码块的上下文中编译；error: 代码本身有错
+
+    只有全部错误都由缺少上下文引起时才算 fragment，混有其他错误的仍是 error
+    """
+    if returncode == 0:
+        return 'ok'
+    undeclared = any(CONTEXT_ERROR_PATTERN.search(error['message']) for error in errors)
+    if errors and all(is_context_error(error, wrap, names) or
+                      (undeclared and CASCADE_ERROR_PATTERN.search(error['message'])) for error in errors):
+        return 'fragment'
+    return 'error'
+
+
+def first_error(errors, wrap=None, names=None):
+    """报告时显示的错误：优先显示缺少上下文以外的错误"""
+    for error in errors:
+        if not is_context_error(error, wrap, names) and not CASCADE_ERROR_PATTERN.search(error['message']):
+            return error
+    return errors[0] if errors else None
+
+
+def compiler_id(cxx):
+    """编译器版本，作为缓存键的一部分"""
+    try:
+        result = subprocess.run([cxx, '--version'], capture_output=True, text=True)
+    except OSError:
+        return None
+    lines = result.stdout.splitlines()
+    return lines[0] if result.returncode == 0 and lines else None
+
+
+class BlockResult:
+    def __init__(self, block, status, wrap, errors, cached=False, context=0, names=None):
+        self.block = block
+        self.status = status
+        self.wrap = wrap
+        self.errors = errors
+        self.cached = cached
+        # 编译时作为上下文的同节代码块数，0 表示单独编译
+        self.context = context
+        # 算作缺少上下文的未声明名字 (见 document_names 和 context_names)
+        self.names = names
+
+    def tex_line(self, error):
+        """代码块内的行号映射回 .tex 的行号"""
+        if error['line'] is None:
+            return self.block.line
+        return self.block.line + error['line']
+
+    def to_dict(self):
+        return {
+            'id': self.block.id, 'line': self.block.line, 'end_line': self.block.end_line,
+            'section': self.block.section.path if self.block.section else [],
+            'status': self.status, 'wrap': self.wrap, 'cached': self.cached, 'context': self.context,
+            'errors': [dict(error, tex_line=self.tex_line(error)) for error in self.errors],
+        }
+
+
+class BlockChecker:
+    """以同一组编译选项检查多个代码块"""
+
+    def __init__(self, cxx=DEFAULT_CXX, std=DEFAULT_STD, flags=None, cache_dir=DEFAULT_CACHE_DIR,
+                 use_cache=True, use_pch=True):
+        self.cxx = cxx
+        self.flags = [f'-std={std}'] + list(flags or [])
+        self.cache_dir = cache_dir
+        self.compiler = compiler_id(cxx)
+        if self.compiler is None:
+            raise RuntimeError(f"{cxx} 无法运行")
+        self.use_pch = use_pch
+        self.pch_header = None
+        self.cache = None
+        if use_cache:
+            self.cache = FormatCache(os.path.join(cache_dir, 'check_cpp_blocks.json'), rules_version(__file__))
+        self.salt = '\0'.join([self.compiler] + self.flags + [str(use_pch)])
+
+    def build_pch(self):
+        """生成 bits/stdc++.h 的预编译头，编译器和选项不变时复用；返回耗时 (秒)，复用时为 0"""
+        digest = hashlib.sha256(self.salt.encode('utf-8')).hexdigest()[:16]
+        directory = os.path.join(self.cache_dir, 'pch', digest)
+        header = os.path.join(directory, PCH_HEADER)
+        self.pch_header = header
+        if os.path.exists(header + '.gch'):
+            return 0.0
+
+        os.makedirs(directory, exist_ok=True)
+        with open(header, 'w', encoding='utf-8') as f:
+            f.write('#include <bits/stdc++.h>\n')
+        started = time.perf_counter()
+        tmp_path = f'{header}.{os.getpid()}.gch.tmp'
+        result = subprocess.run([self.cxx] + self.flags + ['-x', 'c++-header', header, '-o', tmp_path],
+                                capture_output=True, text=True)
+        if result.returncode != 0:
+            # 预编译头不可用时直接包含头文件，只是更慢
+            self.use_pch = False
+            return time.perf_counter() - started
+        os.replace(tmp_path, header + '.gch')
+        return time.perf_counter() - started
+
+    def command(self):
+        include = self.pch_header if self.use_pch and self.pch_header else 'bits/stdc++.h'
+        return [self.cxx] + self.flags + ['-fsyntax-only', '-include', include, '-x', 'c++', '-']
+
+    def compile(self, code, context=()):
+        """编译一个代码块 (可带上下文)，返回可缓存的结果 dict"""
+        source, wrap = wrap_block(code, context)
+        result = subprocess.run(self.command(), input=source, capture_output=True, text=True,
+                                env=dict(os.environ, LC_ALL='C'))
+        errors = parse_errors(result.stderr)
+        status = classify(result.returncode, errors, wrap)
+        if context and not errors:
+            # 只有上下文代码块自身出错，代码块本身没有错误
+            status = 'ok'
+        return {'status': status, 'wrap': wrap, 'errors': errors, 'context': len(context)}
+
+    def compile_all(self, units, jobs=1):
+        """并行编译 [(代码, 上下文), ...]，相同的单元只编译一次；返回 {单元: (结果, 是否来自缓存)}"""
+        results = {}
+        pending = []
+        for unit in units:
+            if unit in results:
+                continue
+            key = '\0'.join(unit[1] + (unit[0],))
+            cached = self.cache.get(key, self.salt) if self.cache is not None else None
+            results[unit] = (json.loads(cached), True) if cached is not None else None
+            if cached is None:
+                pending.append((unit, key))
+
+        if pending:
+            with ThreadPoolExecutor(max_workers=jobs) as executor:
+                outputs = executor.map(lambda item: self.compile(*item[0]), pending)
+                for (unit, key), result in zip(pending, outputs):
+                    results[unit] = (result, False)
+                    if self.cache is not None:
+                        self.cache.put(key, json.dumps(result, ensure_ascii=False), self.salt)
+            if self.cache is not None:
+                self.cache.save()
+        return results
+
+    def check(self, index, blocks, jobs=1):
+        """并行检查代码块，相同内容的代码块只编译一次
+
+        单独编译时有缺少上下文的错误的代码块，再以同一节前面的代码块为上下文编译一次；
+        结果更好时才采用 (同一节中常有同一模板的不同写法，放在一起会重复定义)
+        """
+        names = document_names(index)
+        units = {block.id: (index.block_code(block), ()) for block in blocks}
+        results = self.compile_all(list(units.values()), jobs)
+
+        retry = {}
+        for block in blocks:
+            result, _ = results[units[block.id]]
+            if result['status'] == 'ok' or not any(is_context_error(error, result['wrap'])
+                                                   for error in result['errors']):
+                continue
+            context = context_codes(index, block)
+            if context:
+                retry[block.id] = (units[block.id][0], context)
+        results.update(self.compile_all(list(retry.values()), jobs))
+
+        def status(result, block_names):
+            # 缓存的结果与文档无关，这里按文档中出现过的名字重新区分 fragment 与 error
+            return 'ok' if result['status'] == 'ok' else classify(1, result['errors'], result['wrap'], block_names)
+
+        checked = []
+        for block in blocks:
+            result, cached = results[units[block.id]]
+            block_names = names | context_names(units[block.id][0], result['errors'])
+            if block.id in retry:
+                with_context = results[retry[block.id]]
+                retry_names = names | context_names(units[block.id][0], with_context[0]['errors'])
+                if STATUS_RANK[status(with_context[0], retry_names)] < STATUS_RANK[status(result, block_names)]:
+                    (result, cached), block_names = with_context, retry_names
+            checked.append(BlockResult(block, status(result, block_names), result['wrap'], result['errors'], cached,
+                                       result.get('context', 0), block_names))
+        return checked
+
+
+def context_codes(index, block):
+    """同一节中位于该代码块之前、可作为声明上下文的代码块 (不含 main 和最外层语句)"""
+    if block.section is None:
+        return ()
+    codes = []
+    for other in block.section.blocks:
+        if other.start >= block.start:
+            break
+        if other.language.lower() not in CPP_LANGUAGES:
+            continue
+        code = index.block_code(other)
+        if not MAIN_PATTERN.search(code) and not has_top_level_statements(code):
+            codes.append(code)
+    return tuple(codes)
+
+
+def print_report(results, tex_name, verbose=False, show_fragments=False):
+    """打印错误 (及可选的缺少上下文的代码块)，报错位置为 .tex 的行号"""
+    for result in results:
+        if result.status == 'ok' or (result.status == 'fragment' and not show_fragments):
+            continue
+        icon = '❌' if result.status == 'error' else '🧩'
+        section = ' > '.join(result.block.section.path) if result.block.section else ''
+        first = first_error(result.errors, result.wrap, result.names)
+        message = first['message'] if first else '编译失败'
+        if first and is_context_error(first, result.wrap) and not is_context_error(first, result.wrap, result.names):
+            message += ' (文档中没有其他代码块出现这个名字，疑似拼写错误)'
+        if first and first['line'] is not None:
+            message = f"{tex_name}:{result.tex_line(first)}: {message}"
+        context = f" (含同节前 {result.context} 个代码块)" if result.context else ''
+        print(f"{icon} 第{result.block.line}行 [{result.block.id}] {section}{context}: {message}")
+        if verbose:
+            for error in result.errors:
+                location = f'{tex_name}:{result.tex_line(error)}'
+                if error['column'] is not None:
+                    location += f":{error['column']}"
+                print(f"    {location}: {error['message']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='检查模板中每个C++代码块能否通过编译')
+    parser.add_argument('file', nargs='?', default='Algorithm-template.tex',
+                       help='LaTeX文件 (默认: Algorithm-template.tex)')
+    parser.add_argument('-j', '--jobs', type=int, default=0,
+                       help='并行编译的进程数，0 表示使用全部CPU核心 (默认: 0)')
+    parser.add_argument('--cxx', default=os.environ.get('CXX', DEFAULT_CXX),
+                       help='C++编译器，也可通过环境变量 CXX 指定 (默认: g++)')
+    parser.add_argument('--std', default=DEFAULT_STD,
+                       help=f'C++标准 (默认: {DEFAULT_STD})')
+    parser.add_argument('--flags', default='',
+                       help="额外的编译选项，如 '-Wall -DLOCAL'")
+    parser.add_argument('-s', '--section',
+                       help='只检查标题包含该文字的章节中的代码块')
+    parser.add_argument('--no-cache', action='store_true',
+                       help='忽略缓存，重新编译所有代码块')
+    parser.add_argument('--no-pch', action='store_true',
+                       help='不使用预编译头')
+    parser.add_argument('-v', '--verbose', action='store_true',
+                       help='显示每个失败代码块的全部错误')
+    parser.add_argument('--show-fragments', action='store_true',
+                       help='同时列出因缺少上下文而无法单独编译的代码块')
+    parser.add_argument('--json', help='把检查结果写入JSON文件')
+
+    args = parser.parse_args()
+
+    if not os.path.exists(args.file):
+        print(f"错误: 文件 {args.file} 不存在")
+        sys.exit(1)
+
+    index = load_index(args.file)
+    blocks = index.blocks_by_language(*CPP_LANGUAGES)
+    if args.section:
+        blocks = [block for block in blocks
+                  if block.section and any(args.section in title for title in block.section.path)]
+    if not blocks:
+        print("没有需要检查的C++代码块")
+        return
+
+    try:
+        cache_dir = os.path.join(os.path.dirname(os.path.abspath(args.file)), DEFAULT_CACHE_DIR)
+        checker = BlockChecker(args.cxx, args.std, shlex.split(args.flags), cache_dir,
+                               use_cache=not args.no_cache, use_pch=not args.no_pch)
+    except RuntimeError as e:
+        print(f"错误: {e}")
+        sys.exit(1)
+
+    started = time.perf_counter()
+    if checker.use_pch:
+        seconds = checker.build_pch()
+        if not checker.use_pch:
+            print("⚠️  预编译头生成失败，改为直接包含 bits/stdc++.h")
+        elif seconds:
+            print(f"🔧 已生成预编译头 ({seconds:.2f}s)")
+
+    jobs = args.jobs if args.jobs > 0 else (os.cpu_count() or 1)
+    print(f"🔍 检查 {len(blocks)} 个代码块 ({checker.compiler}, {' '.join(checker.flags)}, {jobs} 进程)...")
+    results = checker.check(index, blocks, jobs)
+
+    tex_name = os.path.basename(args.file)
+    print_report(results, tex_name, args.verbose, args.show_fragments)
+
+    counts = {status: sum(1 for result in results if result.status == status) for status in STATUS_LABELS}
+    cached = sum(1 for result in results if result.cached)
+    with_context = sum(1 for result in results if result.context and result.status == 'ok')
+    summary = ', '.join(f"{STATUS_LABELS[status]} {count}" for status, count in counts.items())
+    if with_context:
+        summary += f", 其中 {with_context} 个借助同节前面的代码块通过"
+    print(f"📊 {summary} (缓存命中 {cached}/{len(results)}, 用时 {time.perf_counter() - started:.2f}s)")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'compiler': checker.compiler, 'flags': checker.flags,
+                       'blocks': [result.to_dict() for result in results]}, f, ensure_ascii=False, indent=2)
+
+    sys.exit(1 if counts['error'] else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -9,7 +9,13 @@ echo "清理LaTeX辅助文件..."
 rm -f *.aux *.log *.out *.toc *.pyg *.w18 compile.log 2>/dev/null
 
 # 删除minted生成的目录
-rm -rf _minted-* 2>/dev/null
+rm -rf _minted-* _prerender *-prerendered.tex 2>/dev/null
+
+# 删除预览生成的包装文档和PDF
+rm -f *-preview-*.tex *-preview-*.pdf 2>/dev/null
+
+# 删除评测、基准测试、打包和 PDF 文字的缓存
+rm -rf .judge_cache .bench_cache .bundle_cache .pdf_cache 2>/dev/null
 
 # 删除Python缓存
 rm -rf __pycache__ 2>/dev/null
@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+基于词法分析的C++代码格式化
+每行只做一次词法扫描 (同时区分模板尖括号与比较运算符)，再做一次输出，
+字符串、字符字面量和注释原样保留
+三目运算符的 ? 和 : 两侧加空格；无法区分的 x = a < b > (c) 仍按模板 (构造临时对象) 处理
+"""
+
+import re
+
+# 词法规则，按顺序尝试；整个扫描器只编译一次
+TOKEN_PATTERN = re.compile(r'''
+    (?P<ws>\s+)
+  | (?P<comment>//.*|/\*.*?\*/|/\*.*)
+  | (?P<raw>(?:u8|u|U|L)?R"(?P<delim>[^()\\\s"]{0,16})\(.*?\)(?P=delim)")
+  | (?P<string>(?:u8|u|U|L)?"(?:\\.|[^"\\])*"?)
+  | (?P<char>(?:u8|u|U|L)?'(?:\\.|[^'\\])*'?)
+  | (?P<number>0[xX][\w']*|(?:\d|\.\d)(?:[eE][+-]|[\w.]|'(?=\w))*)
+  | (?P<ident>[^\W\d]\w*)
+  | (?P<op>>>=|<<=|<=>|->\*|\.\.\.|->|::|\+\+|--|<<|>>|<=|>=|==|!=|&&|\|\||[-+*/%^&|=]=|\.\*
+          |[-+*/%^&|=<>!~?:.,;()\[\]{}])
+  | (?P<other>.)
+''', re.VERBOSE)
+
+# 后面紧跟 ( 时需要加空格的关键字
+CONTROL_KEYWORDS = {'if', 'for', 'while', 'switch'}
+
+# 可以出现在 * 和 & 之前的类型关键字，此时 * 和 & 视为声明符而不是二元运算符
+TYPE_KEYWORDS = {
+    'int', 'long', 'short', 'char', 'bool', 'double', 'float', 'void', 'auto',
+    'unsigned', 'signed', 'const', 'constexpr', 'struct', 'class', 'typename',
+    'static', 'inline', 'volatile', 'mutable', 'size_t', 'i64', 'll', 'ull', 'u64',
+}
+
+# 其余不能作为操作数结尾的关键字 (其后的 - * & 为一元运算符)
+KEYWORDS = TYPE_KEYWORDS | CONTROL_KEYWORDS | {
+    'return', 'case', 'else', 'do', 'new', 'delete', 'throw', 'sizeof', 'operator',
+    'template', 'using', 'namespace', 'typedef', 'default', 'break', 'continue',
+    'goto', 'co_return', 'co_yield', 'co_await', 'public', 'private', 'protected',
+}
+
+# 后面的 < 一定是模板参数列表的名字
+KNOWN_TEMPLATES = {
+    'template', 'vector', 'array', 'pair', 'tuple', 'map', 'set', 'multimap', 'multiset',
+    'unordered_map', 'unordered_set', 'unordered_multimap', 'unordered_multiset',
+    'queue', 'priority_queue', 'stack', 'deque', 'list', 'forward_list', 'bitset',
+    'function', 'numeric_limits', 'greater', 'less', 'greater_equal', 'less_equal',
+    'basic_string', 'complex', 'optional', 'variant', 'span', 'valarray',
+    'static_cast', 'dynamic_cast', 'const_cast', 'reinterpret_cast', 'bit_cast',
+    'make_pair', 'make_tuple', 'get', 'mt19937', 'uniform_int_distribution',
+    'is_same', 'is_same_v', 'enable_if', 'enable_if_t', 'conditional', 'decay_t',
+}
+
+# 非标准模板名在 > 之后允许出现的记号，否则视为比较运算；
+# 紧跟名字 (Foo<T> x) 只在声明中成立，赋值或 return 之后的 a < b > c 是比较
+TEMPLATE_FOLLOWERS = {'(', ')', '::', '{', ';', ',', '>', '>>', '&', '*', '&&', '[', ']', '.', '='}
+
+# 遇到这些记号时，尚未闭合的 < 一律视为比较运算符
+HARD_STOPPERS = {';', '{', '}'}
+# 遇到这些记号时，非标准模板名后的 < 视为比较运算符
+SOFT_STOPPERS = {
+    '&&', '||', '?', '=', '+=', '-=', '*=', '/=', '%=', '^=', '|=', '&=', '<<=', '>>=',
+    '==', '!=', '<=', '>=', '<<', '<=>',
+}
+
+# 只有作为二元运算符才出现的记号 (左侧是操作数时两边各加一个空格)
+BINARY_OPERATORS = SOFT_STOPPERS - {'?'} | {'/', '%', '^', '|', '<', '>', '>>'}
+
+NONE, KEEP, SPACE = 0, 1, 2
+
+
+class Token:
+    __slots__ = ('kind', 'text', 'space', 'role')
+
+    def __init__(self, kind, text, space):
+        self.kind = kind
+        self.text = text
+        # 记号前原有的空白 (注释之前的空白原样保留)
+        self.space = space
+        # template_open / template_close / operator_name / unresolved / ternary
+        self.role = None
+
+
+class LexerState:
+    """跨行的词法状态：块注释和预处理续行"""
+
+    def __init__(self):
+        self.in_block_comment = False
+        self.in_directive = False
+
+
+def is_operand_end(token):
+    """记号能否作为一个操作数的结尾"""
+    if token is None:
+        return False
+    if token.kind in ('number', 'string', 'char', 'raw'):
+        return True
+    if token.kind == 'ident':
+        return token.text not in KEYWORDS
+    return token.text in (')', ']') or token.role == 'template_close'
+
+
+def tokenize(content, state):
+    """把一行代码切分为记号，并在同一遍扫描中配对模板尖括号"""
+    tokens = []
+    pos = 0
+    space = ''
+
+    if state.in_block_comment:
+        end = content.find('*/')
+        if end < 0:
+            return [Token('comment', content, '')]
+        tokens.append(Token('comment', content[:end + 2], ''))
+        state.in_block_comment = False
+        pos = end + 2
+
+    # 候选模板开括号栈: (记号, 括号深度, 是否为已知模板名, 是否在表达式中)
+    candidates = []
+    depth = 0
+    # 刚闭合、仍需根据下一个记号确认的非标准模板: (开括号, 闭括号, 是否在表达式中)
+    pending = None
+    prev = None
+    # 当前语句已出现赋值等运算符或 return，之后不会再是声明
+    expression = False
+    # 尚未配对 : 的三目运算符 ? 个数
+    questions = 0
+
+    for match in TOKEN_PATTERN.finditer(content, pos):
+        kind = match.lastgroup
+        text = match.group()
+        if kind == 'ws':
+            space = text
+            continue
+        token = Token(kind, text, space)
+        space = ''
+
+        if kind == 'comment':
+            if text.startswith('/*') and (len(text) < 4 or not text.endswith('*/')):
+                state.in_block_comment = True
+            tokens.append(token)
+            continue
+
+        if pending is not None:
+            if (pending[2] and kind == 'ident') or (kind != 'ident' and text not in TEMPLATE_FOLLOWERS):
+                pending[0].role = pending[1].role = None
+            pending = None
+
+        if prev is not None and prev.kind == 'ident' and prev.text == 'operator' and kind == 'op':
+            token.role = 'operator_name'
+        elif text == '<' and prev is not None and prev.kind == 'ident' and (
+                prev.text not in KEYWORDS or prev.text == 'template'):
+            candidates.append((token, depth, prev.text in KNOWN_TEMPLATES, expression))
+        elif text in ('>', '>>') and candidates and candidates[-1][1] == depth and (
+                text == '>' or len(candidates) >= 2):
+            if text == '>':
+                closers = [token]
+            else:
+                # 嵌套模板的 >> 拆成两个闭括号
+                closers = [Token('op', '>', token.space), Token('op', '>', '')]
+            for closer in closers:
+                opener, _, known, in_expression = candidates.pop()
+                opener.role, closer.role = 'template_open', 'template_close'
+                pending = None if known else (opener, closer, in_expression)
+            tokens.extend(closers)
+            prev = closers[-1]
+            continue
+        elif text in ('(', '['):
+            depth += 1
+        elif text in (')', ']'):
+            depth -= 1
+            while candidates and candidates[-1][1] > depth:
+                candidates.pop()
+        elif text in HARD_STOPPERS:
+            candidates.clear()
+            expression = False
+            questions = 0
+        elif text == ':' and questions:
+            token.role = 'ternary'
+            questions -= 1
+        elif text in SOFT_STOPPERS or text in ('<', '>', '>>'):
+            candidates = [c for c in candidates if c[2]]
+            expression = expression or text in SOFT_STOPPERS
+            questions += text == '?'
+        elif text == 'return':
+            expression = True
+        elif text == ',':
+            # 逗号分隔的下一个参数或声明符可能又是声明 (默认参数之后)
+            expression = False
+
+        tokens.append(token)
+        prev = token
+
+    # 以逗号结尾且仍未闭合的 < 可能是跨行的模板参数列表，保留原有空格
+    if prev is not None and prev.text == ',':
+        for opener, *_ in candidates:
+            opener.role = 'unresolved'
+
+    return tokens
+
+
+def spacing(token, prev, next_token):
+    """返回记号 (前侧偏好, 后侧偏好)"""
+    text = token.text
+
+    if token.kind != 'op' and token.kind != 'ident':
+        return KEEP, KEEP
+
+    if token.kind == 'ident':
+        if text in CONTROL_KEYWORDS and next_token is not None and next_token.text == '(':
+            return KEEP, SPACE
+        if text == 'else' and prev is not None and prev.text == '}':
+            return SPACE, KEEP
+        return KEEP, KEEP
+
+    if token.role == 'operator_name':
+        return NONE, NONE
+    if token.role == 'unresolved':
+        return KEEP, KEEP
+    if token.role == 'template_open':
+        return NONE, NONE
+    if token.role == 'ternary':
+        return SPACE, SPACE
+    if token.role == 'template_close':
+        if next_token is None:
+            return NONE, KEEP
+        if next_token.kind == 'ident':
+            return NONE, SPACE
+        if next_token.text in ('(', ')', '>', '::', ',', ';', '{', '[', '.', '->'):
+            return NONE, NONE
+        return NONE, KEEP
+
+    operand_before = is_operand_end(prev)
+    if text in ('*', '&', '&&'):
+        # 类型之后或两侧空格不对称 (int *p、Node& x) 时视为声明符，保留原样
+        if prev is not None and (prev.role == 'template_close' or prev.text in TYPE_KEYWORDS):
+            return KEEP, KEEP
+        if not operand_before:
+            return KEEP, NONE
+        if next_token is not None and bool(token.space) != bool(next_token.space):
+            return KEEP, KEEP
+        return SPACE, SPACE
+    if text in ('+', '-'):
+        return (SPACE, SPACE) if operand_before else (KEEP, NONE)
+    if text in ('++', '--'):
+        return (NONE, KEEP) if operand_before else (KEEP, NONE)
+    if text in ('!', '~'):
+        return KEEP, NONE
+    if text in BINARY_OPERATORS or text == '?':
+        return (SPACE, SPACE) if operand_before else (KEEP, KEEP)
+    if text == ',':
+        return NONE, SPACE
+    if text == ';':
+        return NONE, SPACE
+    if text == '(':
+        return KEEP, NONE
+    if text == ')':
+        return NONE, KEEP
+    if text == '{':
+        if prev is not None and (prev.kind in ('ident', 'number') or prev.text == ')'):
+            return SPACE, KEEP
+        return KEEP, KEEP
+    if text in ('.', '->', '.*', '->*'):
+        return NONE, NONE
+    if text == '::':
+        if prev is not None and (prev.kind == 'ident' and prev.text not in KEYWORDS or
+                                 prev.role == 'template_close'):
+            return NONE, NONE
+        return KEEP, NONE
+    return KEEP, KEEP
+
+
+def emit(tokens):
+    """根据相邻记号的空格偏好输出一行"""
+    pieces = []
+    prev = None
+    prev_after = NONE
+    for i, token in enumerate(tokens):
+        next_token = tokens[i + 1] if i + 1 < len(tokens) else None
+        before, after = spacing(token, prev, next_token)
+        if prev is not None:
+            if token.kind == 'comment':
+                pieces.append(token.space)
+            elif before == NONE or prev_after == NONE:
+                pass
+            elif before == SPACE or prev_after == SPACE or token.space:
+                pieces.append(' ')
+        pieces.append(token.text)
+        prev = token
+        prev_after = after
+    return ''.join(pieces).rstrip()
+
+
+def format_line(content, state):
+    """格式化去掉缩进后的一行代码"""
+    if state.in_directive or (content.startswith('#') and not state.in_block_comment):
+        # 预处理指令 (包括 #include <...>) 原样保留
+        state.in_directive = content.endswith('\\')
+        return content
+    return emit(tokenize(content, state))
+
+
+def format_cpp_code(code_block):
+    """基于词法分析格式化C++代码"""
+    lines = code_block.split('\n')
+    formatted_lines = []
+    state = LexerState()
+
+    for line in lines:
+        # 保持原始缩进
+        content = line.strip()
+        if not content:
+            formatted_lines.append('')
+            continue
+        indent = line[:len(line) - len(line.lstrip())]
+        formatted_lines.append(indent + format_line(content, state))
+
+    return '\n'.join(formatted_lines)
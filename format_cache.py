@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+代码块格式化结果的持久化缓存
+以代码块内容和格式化规则版本的哈希为键，未改动的代码块直接从缓存输出
+"""
+
+import os
+import json
+import hashlib
+from collections import OrderedDict
+
+# 缓存文件格式版本，修改存储结构时递增
+CACHE_FORMAT = 1
+
+DEFAULT_CACHE_DIR = '.format_cache'
+DEFAULT_MAX_ENTRIES = 4096
+DEFAULT_MAX_BYTES = 16 * 1024 * 1024
+
+
+def rules_version(*source_files):
+    """根据格式化脚本的源码计算规则版本，规则一改动缓存即自动失效"""
+    digest = hashlib.sha256(f'format-cache-{CACHE_FORMAT}'.encode())
+    for path in source_files:
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def default_cache_path(target_file, tool):
+    """缓存文件放在目标文件同目录的 .format_cache/ 下，每个工具一个文件"""
+    directory = os.path.dirname(os.path.abspath(target_file))
+    return os.path.join(directory, DEFAULT_CACHE_DIR, f'{tool}.json')
+
+
+class FormatCache:
+    """按最近使用顺序淘汰的格式化结果缓存"""
+
+    def __init__(self, path, version, max_entries=DEFAULT_MAX_ENTRIES, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.version = version
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.dirty = False
+        self.load()
+
+    def key(self, code, salt=''):
+        digest = hashlib.sha256(salt.encode('utf-8'))
+        digest.update(b'\0')
+        digest.update(code.encode('utf-8'))
+        return digest.hexdigest()
+
+    def load(self):
+        """读取缓存文件，规则版本不一致或文件损坏时从空缓存开始"""
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            self.dirty = True
+            return
+        if data.get('version') != self.version:
+            self.dirty = True
+            return
+        for key, value in data.get('entries', []):
+            self.entries[key] = value
+            self.size += len(value)
+        self.evict()
+
+    def get(self, code, salt=''):
+        key = self.key(code, salt)
+        value = self.entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, code, formatted, salt=''):
+        key = self.key(code, salt)
+        old = self.entries.pop(key, None)
+        if old is not None:
+            self.size -= len(old)
+        self.entries[key] = formatted
+        self.size += len(formatted)
+        self.dirty = True
+        self.evict()
+
+    def fetch(self, code, format_func, salt=''):
+        """命中时返回缓存结果，否则调用 format_func 并写入缓存"""
+        formatted = self.get(code, salt)
+        if formatted is None:
+            formatted = format_func(code)
+            self.put(code, formatted, salt)
+        return formatted
+
+    def evict(self):
+        """超出条目数或总大小上限时淘汰最久未使用的条目"""
+        while self.entries and (len(self.entries) > self.max_entries or self.size > self.max_bytes):
+            _, value = self.entries.popitem(last=False)
+            self.size -= len(value)
+            self.dirty = True
+
+    def save(self):
+        """原子地写回缓存文件"""
+        if not self.dirty:
+            return
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        data = {'version': self.version, 'entries': list(self.entries.items())}
+        tmp_path = f'{self.path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+        self.dirty = False
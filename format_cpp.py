@@ -4,76 +4,206 @@
 """
 
 import re
-import sys
 import os
+import argparse
+
+from regex_guard import DEFAULT_LINE_BUDGET, LineBudget
+from rule_profiler import RuleProfiler
+
+
+# 运算符规则左侧操作数的捕获组，形如 ([左])op([右]) -> \1 op \2 的规则可以合并
+OPERAND_LEFT = r'([a-zA-Z0-9_\]\)])'
+
+
+class CompiledRule:
+    """预编译的单条规则，行内不含触发字面量时直接跳过"""
+
+    def __init__(self, pattern, replacement, trigger):
+        self.regex = re.compile(pattern)
+        self.replacement = replacement
+        self.trigger = trigger
+
+    def apply(self, content):
+        if self.trigger is not None and self.trigger not in content:
+            return content
+        return self.regex.sub(self.replacement, content)
+
+
+class OperatorRuleGroup:
+    """连续的运算符规则合并为一个交替正则，单次扫描并按命中的分支分派替换
+
+    原规则逐条执行时，每条规则会吃掉右操作数，因此同一运算符连写时
+    (如 a+b+c) 只有第一个会被加空格；不同运算符之间互不影响。这里用零宽
+    的前后断言匹配运算符本身，并按规则记录上一次吃掉的右操作数位置来复现
+    这一行为，保证输出与逐条执行完全一致。
+    """
+
+    def __init__(self, operators):
+        # operators: [(运算符, 运算符正则, 右操作数字符类), ...]
+        alternatives = [f'({op_regex})(?={right})' for _, op_regex, right in operators]
+        left = OPERAND_LEFT[1:-1]
+        self.regex = re.compile(f'(?<={left})(?:' + '|'.join(alternatives) + ')')
+        # 分组编号从 1 开始，与 match.lastindex 对应
+        self.replacements = [None] + [f' {op} ' for op, _, _ in operators]
+        self.trigger_chars = frozenset(''.join(op for op, _, _ in operators))
+
+    def apply(self, content):
+        if self.trigger_chars.isdisjoint(content):
+            return content
+
+        pieces = []
+        pos = 0
+        consumed = {}
+        for match in self.regex.finditer(content):
+            index = match.lastindex
+            start = match.start()
+            # 左操作数已被同一规则上一次匹配作为右操作数吃掉
+            if consumed.get(index) == start - 1:
+                continue
+            pieces.append(content[pos:start])
+            pieces.append(self.replacements[index])
+            pos = match.end()
+            consumed[index] = pos
+
+        if not pieces:
+            return content
+        pieces.append(content[pos:])
+        return ''.join(pieces)
+
+
+def parse_operator_rule(pattern, replacement):
+    r"""识别 ([左])op([右]) -> \1 op \2 形式的运算符规则
+
+    返回 (运算符, 运算符正则, 右操作数字符类)，不符合该形式时返回 None
+    """
+    match = re.fullmatch(r'\\1 (\S+) \\2', replacement)
+    if not match or not pattern.startswith(OPERAND_LEFT) or not pattern.endswith(')'):
+        return None
+
+    op = match.group(1)
+    rest = pattern[len(OPERAND_LEFT):]
+    split = rest.rfind('([')
+    if split <= 0:
+        return None
+    op_regex, right = rest[:split], rest[split + 1:-1]
+
+    try:
+        compiled_op = re.compile(op_regex)
+        compiled_right = re.compile(right)
+    except re.error:
+        return None
+    # 运算符部分必须恰好匹配运算符本身，且不能含捕获组 (会打乱分派编号)
+    if compiled_op.groups or compiled_right.groups or not compiled_op.fullmatch(op):
+        return None
+    if not (right.startswith('[') and right.endswith(']')):
+        return None
+    return op, op_regex, right
+
+
+def compile_rules(rules):
+    """把规则表编译为执行计划，相邻的运算符规则合并为一个 OperatorRuleGroup"""
+    compiled = []
+    operators = []
+
+    def flush():
+        if len(operators) == 1:
+            compiled.append(CompiledRule(*operators[0][0]))
+        elif operators:
+            compiled.append(OperatorRuleGroup([parsed for _, parsed in operators]))
+        operators.clear()
+
+    for pattern, replacement, trigger in rules:
+        operator = parse_operator_rule(pattern, replacement)
+        if operator is not None:
+            operators.append(((pattern, replacement, trigger), operator))
+            continue
+        flush()
+        compiled.append(CompiledRule(pattern, replacement, trigger))
+    flush()
+
+    return compiled
 
 
 class CPPFormatter:
-    def __init__(self):
+    def __init__(self, line_budget=DEFAULT_LINE_BUDGET):
+        # 每行格式化的时间预算，超时的行保持原样
+        self.line_budget = LineBudget(line_budget)
+        # 每条规则为 (正则, 替换, 触发字面量)，行内不含触发字面量时跳过该规则；
+        # 触发字面量为 None 表示总是执行
         self.formatting_rules = [
-            # 移除行尾空格
-            (r'\s+$', ''),
+            # 移除行尾空格 (只从空白串开头匹配，中间的长空白串不会逐个位置重试)
+            (r'(?<!\s)\s++$', '', None),
             
             # ============ 运算符间距修复 (高优先级) ============
             # 比较运算符间距
-            (r'([a-zA-Z0-9_\]\)])>=([a-zA-Z0-9_\[\(])', r'\1 >= \2'),
-            (r'([a-zA-Z0-9_\]\)])<=([a-zA-Z0-9_\[\(])', r'\1 <= \2'),
-            (r'([a-zA-Z0-9_\]\)])==([a-zA-Z0-9_\[\(])', r'\1 == \2'),
-            (r'([a-zA-Z0-9_\]\)])!=([a-zA-Z0-9_\[\(])', r'\1 != \2'),
-            (r'([a-zA-Z0-9_\]\)])>(?![>=])([a-zA-Z0-9_\[\(])', r'\1 > \2'),
-            (r'([a-zA-Z0-9_\]\)])<(?![<=])([a-zA-Z0-9_\[\(])', r'\1 < \2'),
+            (r'([a-zA-Z0-9_\]\)])>=([a-zA-Z0-9_\[\(])', r'\1 >= \2', '>='),
+            (r'([a-zA-Z0-9_\]\)])<=([a-zA-Z0-9_\[\(])', r'\1 <= \2', '<='),
+            (r'([a-zA-Z0-9_\]\)])==([a-zA-Z0-9_\[\(])', r'\1 == \2', '=='),
+            (r'([a-zA-Z0-9_\]\)])!=([a-zA-Z0-9_\[\(])', r'\1 != \2', '!='),
+            (r'([a-zA-Z0-9_\]\)])>(?![>=])([a-zA-Z0-9_\[\(])', r'\1 > \2', '>'),
+            (r'([a-zA-Z0-9_\]\)])<(?![<=])([a-zA-Z0-9_\[\(])', r'\1 < \2', '<'),
             
             # 位移运算符间距
-            (r'([a-zA-Z0-9_\]\)])<<([a-zA-Z0-9_\[\(])', r'\1 << \2'),
-            (r'([a-zA-Z0-9_\]\)])>>([a-zA-Z0-9_\[\(])', r'\1 >> \2'),
+            (r'([a-zA-Z0-9_\]\)])<<([a-zA-Z0-9_\[\(])', r'\1 << \2', '<<'),
+            (r'([a-zA-Z0-9_\]\)])>>([a-zA-Z0-9_\[\(])', r'\1 >> \2', '>>'),
             
             # 逻辑运算符间距
-            (r'([a-zA-Z0-9_\]\)])&&([a-zA-Z0-9_\[\(])', r'\1 && \2'),
-            (r'([a-zA-Z0-9_\]\)])\|\|([a-zA-Z0-9_\[\(])', r'\1 || \2'),
+            (r'([a-zA-Z0-9_\]\)])&&([a-zA-Z0-9_\[\(])', r'\1 && \2', '&&'),
+            (r'([a-zA-Z0-9_\]\)])\|\|([a-zA-Z0-9_\[\(])', r'\1 || \2', '||'),
             
             # 算术运算符间距
-            (r'([a-zA-Z0-9_\]\)])\+([a-zA-Z0-9_\[\(])', r'\1 + \2'),
-            (r'([a-zA-Z0-9_\]\)])-([a-zA-Z0-9_\[\(])', r'\1 - \2'),
-            (r'([a-zA-Z0-9_\]\)])\*([a-zA-Z0-9_\[\(])', r'\1 * \2'),
-            (r'([a-zA-Z0-9_\]\)])/([a-zA-Z0-9_\[\(])', r'\1 / \2'),
-            (r'([a-zA-Z0-9_\]\)])%([a-zA-Z0-9_\[\(])', r'\1 % \2'),
+            (r'([a-zA-Z0-9_\]\)])\+([a-zA-Z0-9_\[\(])', r'\1 + \2', '+'),
+            (r'([a-zA-Z0-9_\]\)])-([a-zA-Z0-9_\[\(])', r'\1 - \2', '-'),
+            (r'([a-zA-Z0-9_\]\)])\*([a-zA-Z0-9_\[\(])', r'\1 * \2', '*'),
+            (r'([a-zA-Z0-9_\]\)])/([a-zA-Z0-9_\[\(])', r'\1 / \2', '/'),
+            (r'([a-zA-Z0-9_\]\)])%([a-zA-Z0-9_\[\(])', r'\1 % \2', '%'),
             
             # 位运算符间距
-            (r'([a-zA-Z0-9_\]\)])&([a-zA-Z0-9_\[\(\-])', r'\1 & \2'),
-            (r'([a-zA-Z0-9_\]\)])\|([a-zA-Z0-9_\[\(])', r'\1 | \2'),
-            (r'([a-zA-Z0-9_\]\)])\^([a-zA-Z0-9_\[\(])', r'\1 ^ \2'),
+            (r'([a-zA-Z0-9_\]\)])&([a-zA-Z0-9_\[\(\-])', r'\1 & \2', '&'),
+            (r'([a-zA-Z0-9_\]\)])\|([a-zA-Z0-9_\[\(])', r'\1 | \2', '|'),
+            (r'([a-zA-Z0-9_\]\)])\^([a-zA-Z0-9_\[\(])', r'\1 ^ \2', '^'),
             
             # 赋值运算符间距
-            (r'([a-zA-Z0-9_\]\)])\+=([a-zA-Z0-9_\[\(])', r'\1 += \2'),
-            (r'([a-zA-Z0-9_\]\)])-=([a-zA-Z0-9_\[\(])', r'\1 -= \2'),
-            (r'([a-zA-Z0-9_\]\)])\*=([a-zA-Z0-9_\[\(])', r'\1 *= \2'),
-            (r'([a-zA-Z0-9_\]\)])/=([a-zA-Z0-9_\[\(])', r'\1 /= \2'),
-            (r'([a-zA-Z0-9_\]\)])%=([a-zA-Z0-9_\[\(])', r'\1 %= \2'),
-            (r'([a-zA-Z0-9_\]\)])\^=([a-zA-Z0-9_\[\(])', r'\1 ^= \2'),
-            (r'([a-zA-Z0-9_\]\)])\|=([a-zA-Z0-9_\[\(])', r'\1 |= \2'),
-            (r'([a-zA-Z0-9_\]\)])&=([a-zA-Z0-9_\[\(])', r'\1 &= \2'),
-            (r'([a-zA-Z0-9_\]\)])=([^=])', r'\1 = \2'),
+            (r'([a-zA-Z0-9_\]\)])\+=([a-zA-Z0-9_\[\(])', r'\1 += \2', '+='),
+            (r'([a-zA-Z0-9_\]\)])-=([a-zA-Z0-9_\[\(])', r'\1 -= \2', '-='),
+            (r'([a-zA-Z0-9_\]\)])\*=([a-zA-Z0-9_\[\(])', r'\1 *= \2', '*='),
+            (r'([a-zA-Z0-9_\]\)])/=([a-zA-Z0-9_\[\(])', r'\1 /= \2', '/='),
+            (r'([a-zA-Z0-9_\]\)])%=([a-zA-Z0-9_\[\(])', r'\1 %= \2', '%='),
+            (r'([a-zA-Z0-9_\]\)])\^=([a-zA-Z0-9_\[\(])', r'\1 ^= \2', '^='),
+            (r'([a-zA-Z0-9_\]\)])\|=([a-zA-Z0-9_\[\(])', r'\1 |= \2', '|='),
+            (r'([a-zA-Z0-9_\]\)])&=([a-zA-Z0-9_\[\(])', r'\1 &= \2', '&='),
+            (r'([a-zA-Z0-9_\]\)])=([^=])', r'\1 = \2', '='),
             
             # ============ 关键字格式化 ============
             # { 前加空格
-            (r'(\w)\{', r'\1 {'),
+            (r'(\w)\{', r'\1 {', '{'),
             # 逗号后加空格
-            (r',(\S)', r', \1'),
+            (r',(\S)', r', \1', ','),
             # 关键字后加空格
-            (r'\b(if|for|while|switch)\(', r'\1 ('),
+            (r'\b(if|for|while|switch)\(', r'\1 (', '('),
             # else 处理
-            (r'}else', '} else'),
-            (r'else{', 'else {'),
+            (r'}else', '} else', '}else'),
+            (r'else{', 'else {', 'else{'),
             # 分号后加空格
-            (r';(\S)', r'; \1'),
+            (r';(\S)', r'; \1', ';'),
             
             # ============ 清理 ============
             # 移除多余空格
-            (r'  +', ' '),
+            (r'  +', ' ', '  '),
         ]
+        self.compiled_rules = compile_rules(self.formatting_rules)
+
+    def apply_rules(self, content):
+        for rule in self.compiled_rules:
+            content = rule.apply(content)
+        return content
 
-    def format_code(self, code):
-        """格式化C++代码"""
+    def format_code(self, code, profiler=None):
+        """格式化C++代码
+
+        传入 profiler (rule_profiler.RuleProfiler) 时按规则表逐条执行并记录统计，
+        输出与合并后的执行计划一致
+        """
         lines = code.split('\n')
         formatted_lines = []
         
@@ -84,8 +214,11 @@ class CPPFormatter:
             
             if content:
                 # 应用格式化规则
-                for pattern, replacement in self.formatting_rules:
-                    content = re.sub(pattern, replacement, content)
+                if profiler is not None:
+                    for pattern, replacement, _ in self.formatting_rules:
+                        content = profiler.sub(pattern, replacement, content)
+                else:
+                    content = self.line_budget.apply(self.apply_rules, content)
             
             # 恢复缩进
             formatted_lines.append(' ' * indent + content if content else '')
@@ -109,18 +242,42 @@ class CPPFormatter:
             print(f"格式化失败 {file_path}: {e}")
 
 
+    def profile_file(self, file_path, profiler):
+        """只统计规则耗时，不写回文件"""
+        with open(file_path, 'r', encoding='utf-8') as f:
+            self.format_code(f.read(), profiler)
+        print(f"已分析: {file_path}")
+
+
 def main():
-    formatter = CPPFormatter()
+    parser = argparse.ArgumentParser(description='独立的C++代码格式化工具')
+    parser.add_argument('files', nargs='+', metavar='文件路径',
+                       help='要格式化的C++文件')
+    parser.add_argument('--profile', action='store_true',
+                       help='统计每条规则的调用次数、命中次数和耗时，不修改文件')
+    parser.add_argument('--profile-json',
+                       help='把规则统计写入JSON文件 (隐含 --profile)')
+    parser.add_argument('--line-budget', type=float, default=DEFAULT_LINE_BUDGET,
+                       help=f'每行格式化的时间上限 (秒)，超时的行保持原样，0 表示不限制 (默认: {DEFAULT_LINE_BUDGET})')
     
-    if len(sys.argv) < 2:
-        print("用法: python format_cpp.py <文件路径...>")
-        sys.exit(1)
+    args = parser.parse_args()
+    formatter = CPPFormatter(args.line_budget)
+    profiler = RuleProfiler() if args.profile or args.profile_json else None
     
-    for file_path in sys.argv[1:]:
-        if os.path.exists(file_path):
-            formatter.format_file(file_path)
-        else:
+    for file_path in args.files:
+        if not os.path.exists(file_path):
             print(f"文件不存在: {file_path}")
+        elif profiler is not None:
+            formatter.profile_file(file_path, profiler)
+        else:
+            formatter.format_file(file_path)
+    
+    formatter.line_budget.report()
+    if profiler is not None:
+        profiler.report()
+        if args.profile_json:
+            profiler.save_json(args.profile_json)
+            print(f"💾 分析结果已写入: {args.profile_json}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,421 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+常驻的C++代码格式化服务
+解释器、模块和正则只在启动时加载一次，编辑器通过 Unix socket 或标准输入输出发送
+每行一个的 JSON 请求 (格式化代码块、行范围、整个文件，或检查是否已格式化)，多个请求并发处理
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import signal
+import socket
+import argparse
+import threading
+import socketserver
+from concurrent.futures import ThreadPoolExecutor
+
+import cpp_lexer
+import format_tex_cpp_v2
+from format_tex_cpp_v2 import FORMAT_MODES, format_block_checked, format_cpp_code
+from format_cache import DEFAULT_CACHE_DIR, FormatCache, default_cache_path, rules_version
+
+MINTED_REGEX = re.compile(format_tex_cpp_v2.MINTED_PATTERN, re.DOTALL)
+MINTED_BEGIN = '\\begin{minted}'
+MINTED_END = '\\end{minted}'
+DEFAULT_SOCKET = os.path.join(DEFAULT_CACHE_DIR, 'format_server.sock')
+# 与 format_tex_cpp_v2.py 共用 .tex 旁边的缓存文件 (键相同)
+CACHE_TOOL = 'format_tex_cpp_v2'
+DEFAULT_WORKERS = 4
+# 新的缓存条目每隔多少秒写入磁盘，进程被强制结束时最多丢失这段时间的结果
+DEFAULT_SAVE_INTERVAL = 30.0
+# 启动时格式化一次，提前编译所有规则用到的正则
+WARMUP_CODE = '''#include<bits/stdc++.h>
+template<typename T>struct Node{vector<pair<int,int>>e;};
+int main(){for(int i=0;i<n;i++)if(a[i]>=b&&c!=d)x+=y<<1;return 0;}'''
+
+
+class RequestError(Exception):
+    """请求参数错误，作为错误响应返回给客户端"""
+
+
+def line_offset(text, line):
+    """第 line 行 (从 1 开始) 起始的字符偏移"""
+    pos = 0
+    for _ in range(line - 1):
+        pos = text.find('\n', pos) + 1
+        if pos == 0:
+            return len(text)
+    return pos
+
+
+def is_shutdown(line):
+    try:
+        request = json.loads(line)
+    except ValueError:
+        return False
+    return isinstance(request, dict) and request.get('method') == 'shutdown'
+
+
+def changed_lines(old_lines, new_lines, first_line, start_line=1, end_line=None):
+    """逐行比较，把 [start_line, end_line] 内连续变化的行合并为一个编辑"""
+    edits = []
+    for number, (old, new) in enumerate(zip(old_lines, new_lines), first_line):
+        if old == new or number < start_line or (end_line is not None and number > end_line):
+            continue
+        if edits and edits[-1]['end_line'] == number - 1:
+            edits[-1]['end_line'] = number
+            edits[-1]['text'] += '\n' + new
+        else:
+            edits.append({'start_line': number, 'end_line': number, 'text': new})
+    return edits
+
+
+class FormatService:
+    """处理格式化请求，与传输方式无关"""
+
+    def __init__(self, mode='regex', cache_path=None):
+        self.mode = mode
+        self.cache = None
+        if cache_path:
+            self.cache = FormatCache(cache_path, rules_version(format_tex_cpp_v2.__file__, cpp_lexer.__file__))
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.requests = 0
+        self.seconds = 0.0
+        # 超过单行时间预算而保持原样的行数
+        self.fallbacks = 0
+        self.methods = {
+            'ping': self.ping,
+            'stats': self.stats,
+            'format_block': self.format_block,
+            'format_range': self.format_range,
+            'format_file': self.format_file,
+            'validate': self.validate,
+        }
+        for mode in FORMAT_MODES:
+            format_cpp_code(WARMUP_CODE, mode)
+
+    def format_code(self, code, mode):
+        """格式化一段C++代码；缓存只在加锁时访问，格式化本身并发执行"""
+        if self.cache is not None:
+            with self.lock:
+                cached = self.cache.get(code, mode)
+            if cached is not None:
+                return cached
+        formatted, budget = format_block_checked(code, mode)
+        with self.lock:
+            self.fallbacks += budget.fallbacks
+            # 有行超时保持原样的代码块不写入缓存 (与 format_tex_cpp_v2.py 共用)
+            if self.cache is not None and not budget.fallbacks:
+                self.cache.put(code, formatted, mode)
+        return formatted
+
+    def blocks(self, text, start=0, end=None):
+        """text[start:end] 中的C++代码块，返回 (代码首行行号, 代码, 匹配)"""
+        end = len(text) if end is None else end
+        line = text.count('\n', 0, start) + 1
+        pos = start
+        for match in MINTED_REGEX.finditer(text, start, end):
+            line += text.count('\n', pos, match.start(2))
+            pos = match.start(2)
+            if match.group(1).lower() in format_tex_cpp_v2.CPP_LANGUAGES:
+                yield line, match.group(2), match
+
+    def string_param(self, params, name):
+        value = params[name]
+        if not isinstance(value, str):
+            raise RequestError(f'参数 {name} 必须是字符串')
+        return value
+
+    def read_text(self, params):
+        if 'text' in params:
+            return self.string_param(params, 'text')
+        if 'path' in params:
+            try:
+                with open(self.string_param(params, 'path'), 'r', encoding='utf-8') as f:
+                    return f.read()
+            except OSError as e:
+                raise RequestError(f"无法读取 {params['path']}: {e}")
+        raise RequestError('缺少参数 text 或 path')
+
+    def request_mode(self, params):
+        mode = params.get('mode', self.mode)
+        if mode not in FORMAT_MODES:
+            raise RequestError(f"未知的格式化模式: {mode}")
+        return mode
+
+    def ping(self, params):
+        return {'pong': True}
+
+    def stats(self, params):
+        result = {'uptime': time.time() - self.started, 'requests': self.requests,
+                  'seconds': self.seconds, 'mode': self.mode, 'line_budget_fallbacks': self.fallbacks}
+        if self.cache is not None:
+            result.update({'cache_hits': self.cache.hits, 'cache_misses': self.cache.misses})
+        return result
+
+    def format_block(self, params):
+        """格式化一段代码: {code, mode?} -> {code, changed}"""
+        if 'code' not in params:
+            raise RequestError('缺少参数 code')
+        code = self.string_param(params, 'code')
+        formatted = self.format_code(code, self.request_mode(params))
+        return {'code': formatted, 'changed': formatted != code}
+
+    def format_range(self, params):
+        """只格式化与 [start_line, end_line] 相交的代码块，返回限定在该范围内的逐行编辑"""
+        text = self.read_text(params)
+        mode = self.request_mode(params)
+        try:
+            start_line = int(params['start_line'])
+            end_line = int(params.get('end_line', start_line))
+        except (KeyError, TypeError, ValueError):
+            raise RequestError('start_line/end_line 必须是整数')
+        if end_line < start_line:
+            raise RequestError('end_line 不能小于 start_line')
+
+        # 只扫描包含该范围的一段文本
+        range_start = line_offset(text, start_line)
+        range_end = line_offset(text, end_line + 1)
+        window_start = max(0, text.rfind(MINTED_BEGIN, 0, range_start))
+        window_end = text.find(MINTED_END, range_end)
+        window_end = len(text) if window_end < 0 else window_end + len(MINTED_END)
+
+        edits = []
+        blocks = 0
+        for first_line, code, _ in self.blocks(text, window_start, window_end):
+            last_line = first_line + code.count('\n')
+            if last_line < start_line or first_line > end_line:
+                continue
+            blocks += 1
+            old_lines = code.split('\n')
+            new_lines = self.format_code(code, mode).split('\n')
+            if len(old_lines) == len(new_lines):
+                edits.extend(changed_lines(old_lines, new_lines, first_line, start_line, end_line))
+            else:
+                # 行数变化时只能整块替换
+                edits.append({'start_line': first_line, 'end_line': last_line, 'text': '\n'.join(new_lines)})
+        return {'edits': edits, 'blocks': blocks}
+
+    def format_file(self, params):
+        """格式化整个文件: {path|text, write?} -> {text, changed, blocks}"""
+        text = self.read_text(params)
+        mode = self.request_mode(params)
+        pieces = []
+        pos = 0
+        blocks = 0
+        for _, code, match in self.blocks(text):
+            blocks += 1
+            pieces.append(text[pos:match.start(2)])
+            pieces.append(self.format_code(code, mode))
+            pos = match.end(2)
+        pieces.append(text[pos:])
+        formatted = ''.join(pieces)
+
+        changed = formatted != text
+        if changed and params.get('write') and 'path' in params:
+            tmp_path = f"{params['path']}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(formatted)
+            os.replace(tmp_path, params['path'])
+        return {'text': formatted, 'changed': changed, 'blocks': blocks}
+
+    def validate(self, params):
+        """检查代码块是否已格式化: -> {formatted, blocks, unformatted: [{start_line, end_line}]}"""
+        text = self.read_text(params)
+        mode = self.request_mode(params)
+        unformatted = []
+        blocks = 0
+        for first_line, code, _ in self.blocks(text):
+            blocks += 1
+            if self.format_code(code, mode) != code:
+                unformatted.append({'start_line': first_line, 'end_line': first_line + code.count('\n')})
+        return {'formatted': not unformatted, 'blocks': blocks, 'unformatted': unformatted}
+
+    def handle(self, request):
+        """处理一个请求，返回响应 dict"""
+        started = time.perf_counter()
+        request_id = request.get('id') if isinstance(request, dict) else None
+        try:
+            if not isinstance(request, dict):
+                raise RequestError('请求必须是 JSON 对象')
+            method = self.methods.get(request.get('method'))
+            if method is None:
+                raise RequestError(f"未知的方法: {request.get('method')}")
+            params = request.get('params') or {}
+            if not isinstance(params, dict):
+                raise RequestError('params 必须是 JSON 对象')
+            response = {'id': request_id, 'ok': True, 'result': method(params)}
+        except RequestError as e:
+            response = {'id': request_id, 'ok': False, 'error': str(e)}
+        except Exception as e:
+            # 未预料的错误也要返回响应，否则 --stdio 下请求没有回应、套接字连接被关闭
+            response = {'id': request_id, 'ok': False, 'error': f'内部错误: {type(e).__name__}: {e}'}
+        elapsed = time.perf_counter() - started
+        with self.lock:
+            self.requests += 1
+            self.seconds += elapsed
+        response['ms'] = elapsed * 1000
+        return response
+
+    def handle_line(self, line):
+        """处理一行 JSON 文本，返回一行 JSON 响应"""
+        try:
+            request = json.loads(line)
+        except ValueError as e:
+            response = {'id': None, 'ok': False, 'error': f'无效的JSON: {e}'}
+        else:
+            response = self.handle(request)
+        return json.dumps(response, ensure_ascii=False) + '\n'
+
+    def save(self):
+        if self.cache is not None:
+            with self.lock:
+                self.cache.save()
+
+    def autosave(self, interval=DEFAULT_SAVE_INTERVAL):
+        """在后台线程中定期保存缓存 (没有新条目时不写文件)，返回用于停止的 Event"""
+        stop = threading.Event()
+
+        def run():
+            while not stop.wait(interval):
+                self.save()
+
+        threading.Thread(target=run, daemon=True).start()
+        return stop
+
+
+class FormatRequestHandler(socketserver.StreamRequestHandler):
+    """一个连接可以依次发送多个请求，每个连接在独立线程中处理"""
+
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            request_line = line.decode('utf-8')
+            if is_shutdown(request_line):
+                self.wfile.write(b'{"ok": true, "result": {"shutdown": true}}\n')
+                threading.Thread(target=self.server.shutdown, daemon=True).start()
+                return
+            self.wfile.write(self.server.service.handle_line(request_line).encode('utf-8'))
+            self.wfile.flush()
+
+
+class FormatServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path, service):
+        self.service = service
+        self.socket_path = socket_path
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        os.makedirs(os.path.dirname(os.path.abspath(socket_path)), exist_ok=True)
+        super().__init__(socket_path, FormatRequestHandler)
+
+    def server_close(self):
+        super().server_close()
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+
+
+def serve_stdio(service, workers=DEFAULT_WORKERS, stdin=None, stdout=None):
+    """从标准输入逐行读取请求，并发处理，响应按完成顺序写出 (用 id 对应)"""
+    stdin = stdin or sys.stdin
+    stdout = stdout or sys.stdout
+    write_lock = threading.Lock()
+
+    def respond(line):
+        response = service.handle_line(line)
+        with write_lock:
+            stdout.write(response)
+            stdout.flush()
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for line in stdin:
+            if not line.strip():
+                continue
+            if is_shutdown(line):
+                break
+            executor.submit(respond, line)
+
+
+def stop_on_sigterm(signum, frame):
+    """SIGTERM 与 Ctrl-C 一样停止服务，finally 中保存缓存并删除 socket"""
+    raise KeyboardInterrupt
+
+
+def call(socket_path, method, **params):
+    """向运行中的服务发送一个请求，返回响应 dict"""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.connect(socket_path)
+        client.sendall((json.dumps({'id': 1, 'method': method, 'params': params}, ensure_ascii=False) + '\n').encode('utf-8'))
+        with client.makefile('rb') as f:
+            return json.loads(f.readline())
+
+
+def main():
+    parser = argparse.ArgumentParser(description='常驻的C++代码格式化服务')
+    parser.add_argument('--socket', default=DEFAULT_SOCKET,
+                       help=f'Unix socket 路径 (默认: {DEFAULT_SOCKET})')
+    parser.add_argument('--stdio', action='store_true',
+                       help='通过标准输入输出通信，代替 Unix socket')
+    parser.add_argument('--mode', choices=FORMAT_MODES, default='regex',
+                       help='默认的格式化模式 (默认: regex)')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                       help=f'--stdio 时并发处理请求的线程数 (默认: {DEFAULT_WORKERS})')
+    parser.add_argument('--tex', default='Algorithm-template.tex',
+                       help='缓存放在该文件同目录的 .format_cache/ 下 (默认: Algorithm-template.tex)')
+    parser.add_argument('--no-cache', action='store_true',
+                       help='不使用格式化缓存')
+    parser.add_argument('--save-interval', type=float, default=DEFAULT_SAVE_INTERVAL,
+                       help=f'每隔多少秒保存一次缓存 (默认: {DEFAULT_SAVE_INTERVAL:g})')
+    parser.add_argument('--call', metavar='METHOD',
+                       help='作为客户端向运行中的服务发送一个请求，如 --call validate --params \'{"path": "a.tex"}\'')
+    parser.add_argument('--params', default='{}',
+                       help='--call 的参数 (JSON)')
+
+    args = parser.parse_args()
+
+    if args.call:
+        try:
+            response = call(args.socket, args.call, **json.loads(args.params))
+        except (OSError, ValueError) as e:
+            print(f"错误: 无法连接格式化服务 {args.socket}: {e}")
+            sys.exit(1)
+        print(json.dumps(response, ensure_ascii=False, indent=2))
+        sys.exit(0 if response.get('ok') else 1)
+
+    if args.save_interval <= 0:
+        print("错误: --save-interval 必须大于 0")
+        sys.exit(1)
+
+    cache_path = None if args.no_cache else default_cache_path(args.tex, CACHE_TOOL)
+    service = FormatService(args.mode, cache_path)
+    autosave = service.autosave(args.save_interval)
+    signal.signal(signal.SIGTERM, stop_on_sigterm)
+
+    try:
+        if args.stdio:
+            serve_stdio(service, args.workers)
+        else:
+            server = FormatServer(args.socket, service)
+            print(f"🚀 格式化服务已启动: {args.socket} (模式: {args.mode})", flush=True)
+            try:
+                server.serve_forever()
+            finally:
+                server.server_close()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        autosave.set()
+        service.save()
+        if not args.stdio:
+            print(f"👋 格式化服务已停止，共处理 {service.requests} 个请求")
+
+
+if __name__ == '__main__':
+    main()
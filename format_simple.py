@@ -4,6 +4,11 @@
 """
 import re
 
+from regex_guard import LineBudget
+
+# 每行格式化的时间预算，超时的行保持原样
+LINE_BUDGET = LineBudget()
+
 def format_cpp_line(line):
     """格式化单行C++代码"""
     # 保持缩进
@@ -64,22 +69,26 @@ def format_cpp_line(line):
         (r';(\S)', r'; \1'),
         
         # 模板简化 - 先处理内部空格，再处理外部空格
-        (r'(\w+)\s*<\s*([^<>,]+)\s*>\s*', r'\1<\2> '),
-        (r'(\w+)\s*<\s*([^<>,]+)\s*,\s*([^<>,]+)\s*>\s*', r'\1<\2, \3> '),
+        # 只从单词开头匹配，参数前的空白用原子组一次吃完，避免长空格串上的回溯
+        (r'(?<!\w)(\w++)\s*+<(?>\s*+(?=[^<>,\s])|\s*(?=\s))([^<>,]++)>\s*+', r'\1<\2> '),
+        (r'(?<!\w)(\w++)\s*+<(?>\s*+(?=[^<>,\s])|\s*(?=\s))([^<>,]++),'
+         r'(?>\s*+(?=[^<>,\s])|\s*(?=\s))([^<>,]++)>\s*+', r'\1<\2, \3> '),
         # 清理模板结尾多余空格（除非后面是字母）
         (r'>\s+(?![a-zA-Z_])', '>'),
         (r'>([a-zA-Z_])', r'> \1'),
         
         # 清理
         (r'\(\s+', '('),
-        (r'\s+\)', ')'),
+        (r'(?<!\s)\s++\)', ')'),
         (r'  +', ' '),
     ]
     
-    for pattern, replacement in replacements:
-        content = re.sub(pattern, replacement, content)
+    def apply_rules(content):
+        for pattern, replacement in replacements:
+            content = re.sub(pattern, replacement, content)
+        return content
     
-    return ' ' * indent + content
+    return ' ' * indent + LINE_BUDGET.apply(apply_rules, content)
 
 def test_format():
     test_cases = [
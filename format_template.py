@@ -12,8 +12,14 @@ import sys
 import os
 from typing import List, Tuple
 
+from regex_guard import LineBudget
+from tex_index import TexIndex
+
 class LatexTemplateFormatter:
     def __init__(self):
+        # 代码块每行格式化的时间预算，超时的行保持原样
+        self.line_budget = LineBudget()
+        
         # 数学符号统一规则
         self.math_symbol_rules = [
             (r'\\le(?!qslant)', r'\\leqslant'),      # \le -> \leqslant
@@ -29,7 +35,7 @@ class LatexTemplateFormatter:
             # 统一缩进为4空格
             (r'^(\s*)([^\s])', lambda m: '    ' * (len(m.group(1)) // 4) + m.group(2)),
             # 移除行尾空格
-            (r'\s+$', ''),
+            (r'(?<!\s)\s++$', ''),
         ]
     
     def format_math_symbols(self, content: str) -> str:
@@ -46,7 +52,7 @@ class LatexTemplateFormatter:
         
         cpp_rules = [
             # 移除行尾空格
-            (r'\s+$', ''),
+            (r'(?<!\s)\s++$', ''),
             # { 前加空格
             (r'(\w)\{', r'\1 {'),
             # 逗号后加空格
@@ -71,34 +77,43 @@ class LatexTemplateFormatter:
             (r'>(\w)', r'> \1'),
             # 括号内侧空格处理
             (r'\(\s+', '('),
-            (r'\s+\)', ')'),
+            (r'(?<!\s)\s++\)', ')'),
             # 分号后空格
             (r';(\S)', r'; \1'),
             # 移除多余空格
             (r'  +', ' '),
             
             # ============ 模板格式化规则 (最后应用以避免被其他规则影响) ============
+            # 模板名只从单词开头匹配；参数前的空白用原子组一次吃完 (参数全是空白时保留最后一个)，
+            # 参数用占有量词，与原先 \s*([^<>]+)\s* 的匹配结果相同，但不会在长空格串上回溯
             # 修复模板角括号间的空格问题 - 简单模板
-            (r'(\w+)\s*<\s*([^<>,]+)\s*>', r'\1<\2>'),
+            (r'(?<!\w)(\w++)\s*+<(?>\s*+(?=[^<>,\s])|\s*(?=\s))([^<>,]++)>', r'\1<\2>'),
             # 修复嵌套模板的空格问题
-            (r'(\w+)\s*<\s*(\w+)\s*<\s*([^<>]+)\s*>\s*>', r'\1<\2<\3>>'),
+            (r'(?<!\w)(\w++)\s*+<\s*+(\w++)\s*+<(?>\s*+(?=[^<>\s])|\s*(?=\s))([^<>]++)>\s*+>', r'\1<\2<\3>>'),
             # 修复三重嵌套模板
-            (r'(\w+)\s*<\s*(\w+)\s*<\s*(\w+)\s*<\s*([^<>]+)\s*>\s*>\s*>', r'\1<\2<\3<\4>>>'),
+            (r'(?<!\w)(\w++)\s*+<\s*+(\w++)\s*+<\s*+(\w++)\s*+<(?>\s*+(?=[^<>\s])|\s*(?=\s))([^<>]++)>\s*+>\s*+>', r'\1<\2<\3<\4>>>'),
             # 修复priority_queue等复杂模板
-            (r'priority_queue\s*<\s*([^,<>]+)\s*,\s*vector\s*<\s*([^<>]+)\s*>\s*,\s*greater\s*<\s*([^<>]+)\s*>\s*>', r'priority_queue<\1, vector<\2>, greater<\3>>'),
+            (r'priority_queue\s*+<(?>\s*+(?=[^<>,\s])|\s*(?=\s))([^<>,]++),'
+             r'\s*+vector\s*+<(?>\s*+(?=[^<>\s])|\s*(?=\s))([^<>]++)>\s*+,'
+             r'\s*+greater\s*+<(?>\s*+(?=[^<>\s])|\s*(?=\s))([^<>]++)>\s*+>', r'priority_queue<\1, vector<\2>, greater<\3>>'),
             # 修复std::vector<bool>等标准库模板
-            (r'std\s*::\s*vector\s*<\s*([^<>]+)\s*>', r'std::vector<\1>'),
-            (r'std\s*::\s*(\w+)\s*<\s*([^<>]+)\s*>', r'std::\1<\2>'),
+            (r'std\s*+::\s*+vector\s*+<(?>\s*+(?=[^<>\s])|\s*(?=\s))([^<>]++)>', r'std::vector<\1>'),
+            (r'std\s*+::\s*+(\w++)\s*+<(?>\s*+(?=[^<>\s])|\s*(?=\s))([^<>]++)>', r'std::\1<\2>'),
             # 修复template声明
-            (r'template\s*<\s*([^<>]+)\s*>', r'template<\1>'),
+            (r'template\s*+<(?>\s*+(?=[^<>\s])|\s*(?=\s))([^<>]++)>', r'template<\1>'),
             # 修复numeric_limits等
-            (r'numeric_limits\s*<\s*([^<>]+)\s*>', r'numeric_limits<\1>'),
+            (r'numeric_limits\s*+<(?>\s*+(?=[^<>\s])|\s*(?=\s))([^<>]++)>', r'numeric_limits<\1>'),
             # 最终清理模板空格
             (r'<\s+', '<'),
-            (r'\s+>', '>'),
+            (r'(?<!\s)\s++>', '>'),
             (r'>\s+>', '>>'),
         ]
         
+        def apply_rules(content):
+            for pattern, replacement in cpp_rules:
+                content = re.sub(pattern, replacement, content)
+            return content
+        
         for line in lines:
             # 保持原始缩进
             indent_match = re.match(r'^(\s*)', line)
@@ -110,12 +125,7 @@ class LatexTemplateFormatter:
                 continue
             
             # 应用C++格式化规则
-            for pattern, replacement in cpp_rules:
-                if callable(replacement):
-                    content = re.sub(pattern, replacement, content)
-                else:
-                    content = re.sub(pattern, replacement, content)
-            
+            content = self.line_budget.apply(apply_rules, content)
             formatted_lines.append(indent + content)
         
         return '\n'.join(formatted_lines)
@@ -143,17 +153,14 @@ class LatexTemplateFormatter:
     
     def extract_and_format_code_blocks(self, content: str) -> str:
         """提取并格式化所有代码块"""
-        def format_minted_block(match):
-            language = match.group(1)
-            code_content = match.group(2)
-            formatted_code = self.format_code_block(code_content, language)
-            return f'\\begin{{minted}}{{{language}}}\n{formatted_code}\n\\end{{minted}}'
+        index = TexIndex.from_text(content)
+
+        def format_minted_block(block):
+            formatted_code = self.format_code_block(index.block_code(block), block.language)
+            return f'\\begin{{minted}}{{{block.language}}}\n{formatted_code}\n\\end{{minted}}'
         
         # 处理minted代码块
-        pattern = r'\\begin\{minted\}\{([^}]+)\}\n(.*?)\n\\end\{minted\}'
-        result = re.sub(pattern, format_minted_block, content, flags=re.DOTALL)
-        
-        return result
+        return index.replace_blocks(format_minted_block)
     
     def add_complexity_comments(self, content: str, time_complexity: str = None, space_complexity: str = None) -> str:
         """为代码块添加复杂度注释"""
@@ -243,8 +250,9 @@ class LatexTemplateFormatter:
             (r'\w\s+<\s+\w', '模板角括号内有多余空格'),
             (r'>\s+>', '模板结束符间有空格'),
             (r'vector\s*<\s*\w+\s*>', 'vector模板格式不正确'),
-            (r'priority_queue\s*<[^>]+>\s*>', 'priority_queue模板格式不正确'),
-            (r'template\s*<\s*[^>]+\s*>', 'template声明格式不正确'),
+            # 扫描到下一个同名模板为止，同一行有多个时不会重复扫描
+            (r'priority_queue\s*+<(?:(?!priority_queue\s*<[^>])[^>])++>\s*+>', 'priority_queue模板格式不正确'),
+            (r'template\s*+<(?:(?!template\s*<[^>])[^>])++>', 'template声明格式不正确'),
             (r'numeric_limits\s*<\s*\w+\s*>', 'numeric_limits模板格式不正确'),
         ]
         
@@ -323,6 +331,7 @@ def main():
     
     if args.command == 'format':
         formatter.format_file(args.input_file, args.output)
+        formatter.line_budget.report()
     
     elif args.command == 'snippet':
         try:
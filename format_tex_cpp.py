@@ -11,6 +11,13 @@ import sys
 import argparse
 from typing import List, Tuple
 
+from format_cache import FormatCache, default_cache_path, rules_version
+from regex_guard import DEFAULT_LINE_BUDGET, LineBudget
+from tex_index import TexIndex
+
+# 每行格式化的时间预算，超时的行保持原样
+LINE_BUDGET = LineBudget()
+
 def format_cpp_code(code_block):
     """专门格式化C++代码"""
     lines = code_block.split('\n')
@@ -27,7 +34,7 @@ def format_cpp_code(code_block):
             continue
         
         # 应用格式化规则
-        content = apply_formatting_rules(content)
+        content = LINE_BUDGET.apply(apply_formatting_rules, content)
         formatted_lines.append(indent + content)
     
     return '\n'.join(formatted_lines)
@@ -84,10 +91,13 @@ def apply_formatting_rules(content):
     
     # ============ 模板格式化 ============
     # 简化模板格式化 - 移除模板内外多余空格
+    # 原写法 (\w+)\s*<\s*([^<>,]+)\s*>\s* 中 \s* 与 [^<>,]+ 都能匹配空格，长空格串上会三次方回溯；
+    # 改为只从单词开头匹配，空白用占有量词和原子组一次吃完 (参数全是空白时保留最后一个)，结果不变
     # 单参数模板
-    content = re.sub(r'(\w+)\s*<\s*([^<>,]+)\s*>\s*', r'\1<\2> ', content)
+    content = re.sub(r'(?<!\w)(\w++)\s*+<(?>\s*+(?=[^<>,\s])|\s*(?=\s))([^<>,]++)>\s*+', r'\1<\2> ', content)
     # 双参数模板  
-    content = re.sub(r'(\w+)\s*<\s*([^<>,]+)\s*,\s*([^<>,]+)\s*>\s*', r'\1<\2, \3> ', content)
+    content = re.sub(r'(?<!\w)(\w++)\s*+<(?>\s*+(?=[^<>,\s])|\s*(?=\s))([^<>,]++),'
+                     r'(?>\s*+(?=[^<>,\s])|\s*(?=\s))([^<>,]++)>\s*+', r'\1<\2, \3> ', content)
     
     # 处理嵌套模板的 >> 
     content = re.sub(r'>\s*>', '>>', content)
@@ -101,32 +111,37 @@ def apply_formatting_rules(content):
     # ============ 清理空格 ============
     # 括号内侧空格
     content = re.sub(r'\(\s+', '(', content)
-    content = re.sub(r'\s+\)', ')', content)
+    content = re.sub(r'(?<!\s)\s++\)', ')', content)
     
     # 多余空格
     content = re.sub(r'  +', ' ', content)
     
     return content
 
-def format_latex_cpp_blocks(content):
-    """格式化LaTeX文件中的C++代码块"""
-    def format_minted_block(match):
-        language = match.group(1)
-        code_content = match.group(2)
+def format_latex_cpp_blocks(content, cache=None):
+    """格式化LaTeX文件中的C++代码块，传入 cache 时未改动的代码块直接取缓存结果"""
+    index = TexIndex.from_text(content)
+
+    def format_minted_block(block):
+        language = block.language
+        code_content = index.block_code(block)
         
         # 只格式化C++相关的代码块
         if language.lower() in ['cpp', 'c++', 'cc', 'cxx', 'c']:
-            formatted_code = format_cpp_code(code_content)
+            formatted_code = cache.get(code_content) if cache is not None else None
+            if formatted_code is None:
+                fallbacks = LINE_BUDGET.fallbacks
+                formatted_code = format_cpp_code(code_content)
+                # 有行超时保持原样的代码块不写入缓存，下次重新格式化
+                if cache is not None and LINE_BUDGET.fallbacks == fallbacks:
+                    cache.put(code_content, formatted_code)
             return f'\\begin{{minted}}{{{language}}}\n{formatted_code}\n\\end{{minted}}'
         else:
             # 其他语言不处理
-            return match.group(0)
+            return None
     
-    # 处理minted代码块
-    pattern = r'\\begin\{minted\}\{([^}]+)\}\n(.*?)\n\\end\{minted\}'
-    result = re.sub(pattern, format_minted_block, content, flags=re.DOTALL)
-    
-    return result
+    # 处理minted代码块 (位置来自 tex_index 的单遍扫描)
+    return index.replace_blocks(format_minted_block)
 
 def validate_template_formatting(content: str) -> List[Tuple[int, str]]:
     """验证模板格式化是否正确"""
@@ -138,8 +153,9 @@ def validate_template_formatting(content: str) -> List[Tuple[int, str]]:
         (r'\w\s+<\s+\w', '模板角括号内有多余空格'),
         (r'>\s+>', '模板结束符间有空格'),
         (r'vector\s*<\s*\w+\s*>', 'vector模板格式不正确'),
-        (r'priority_queue\s*<[^>]+>\s*>', 'priority_queue模板格式不正确'),
-        (r'template\s*<\s*[^>]+\s*>', 'template声明格式不正确'),
+        # 扫描到下一个同名模板为止，同一行有多个时不会重复扫描
+        (r'priority_queue\s*+<(?:(?!priority_queue\s*<[^>])[^>])++>\s*+>', 'priority_queue模板格式不正确'),
+        (r'template\s*+<(?:(?!template\s*<[^>])[^>])++>', 'template声明格式不正确'),
         (r'numeric_limits\s*<\s*\w+\s*>', 'numeric_limits模板格式不正确'),
     ]
     
@@ -208,10 +224,15 @@ def main():
                        help='运行格式化规则测试')
     parser.add_argument('--validate', action='store_true',
                        help='验证文件中的模板格式化问题')
+    parser.add_argument('--no-cache', action='store_true',
+                       help='不使用格式化缓存，重新格式化所有代码块')
     parser.add_argument('--dry-run', action='store_true',
                        help='只预览更改，不实际修改文件')
+    parser.add_argument('--line-budget', type=float, default=DEFAULT_LINE_BUDGET,
+                       help=f'每行格式化的时间上限 (秒)，超时的行保持原样，0 表示不限制 (默认: {DEFAULT_LINE_BUDGET})')
     
     args = parser.parse_args()
+    LINE_BUDGET.seconds = args.line_budget
     
     # 运行测试
     if args.test:
@@ -249,7 +270,18 @@ def main():
             print(f"已创建备份文件: {backup_file}")
         
         # 格式化C++代码块
-        formatted_content = format_latex_cpp_blocks(content)
+        cache = None
+        if not args.no_cache:
+            cache = FormatCache(default_cache_path(args.file, 'format_tex_cpp'), rules_version(__file__))
+        
+        formatted_content = format_latex_cpp_blocks(content, cache)
+        
+        # 有行超时保持原样的代码块没有写入缓存，下次重新格式化；预览模式不改动任何文件
+        LINE_BUDGET.report()
+        if cache is not None:
+            if not args.dry_run:
+                cache.save()
+            print(f"⚡ 缓存命中 {cache.hits}/{cache.hits + cache.misses} 个代码块")
         
         # 预览模式
         if args.dry_run:
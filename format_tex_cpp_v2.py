@@ -9,9 +9,30 @@ import re
 import os
 import sys
 import argparse
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 
-def format_cpp_code(code_block):
-    """专门格式化C++代码"""
+import cpp_lexer
+from format_cache import FormatCache, default_cache_path, rules_version
+from regex_guard import DEFAULT_LINE_BUDGET, LineBudget
+from rule_profiler import RuleProfiler, apply_rule
+from tex_index import TexIndex
+
+# 格式化模式: regex 为逐条正则规则，lexer 为基于词法分析的单遍格式化
+FORMAT_MODES = ('regex', 'lexer')
+
+# regex 模式下每行格式化的时间预算，超时的行保持原样
+LINE_BUDGET = LineBudget()
+
+def format_cpp_code(code_block, mode='regex', profiler=None, budget=None):
+    """专门格式化C++代码，传入 profiler (rule_profiler.RuleProfiler) 时记录每条规则的耗时
+
+    budget 为单行时间预算，默认使用 LINE_BUDGET
+    """
+    budget = LINE_BUDGET if budget is None else budget
+    if mode == 'lexer':
+        return cpp_lexer.format_cpp_code(code_block)
+    
     lines = code_block.split('\n')
     formatted_lines = []
     
@@ -25,17 +46,29 @@ def format_cpp_code(code_block):
             formatted_lines.append('')
             continue
         
-        # 逐步应用格式化规则
-        content = format_operators(content)
-        content = format_keywords(content)
-        content = format_templates(content)
-        content = clean_spacing(content)
-        
+        content = budget.apply(partial(format_line, profiler=profiler), content)
         formatted_lines.append(indent + content)
     
     return '\n'.join(formatted_lines)
 
-def format_operators(content):
+def format_block_checked(code_block, mode='regex', seconds=None):
+    """用单独的预算格式化一个代码块，返回 (结果, 该块的 LineBudget)
+
+    进程池/线程中的超时不会记到父进程的 LINE_BUDGET 上，由调用方合并；
+    有行超时保持原样的代码块不能写入缓存
+    """
+    budget = LineBudget(LINE_BUDGET.seconds if seconds is None else seconds)
+    return format_cpp_code(code_block, mode, budget=budget), budget
+
+def format_line(content, profiler=None):
+    """对去掉缩进的一行逐步应用格式化规则"""
+    content = format_operators(content, profiler)
+    content = format_keywords(content, profiler)
+    content = format_templates(content, profiler)
+    content = clean_spacing(content, profiler)
+    return content
+
+def format_operators(content, profiler=None):
     """格式化运算符间距"""
     # 保护模板中的 < 和 > 
     # 先标记模板
@@ -50,7 +83,7 @@ def format_operators(content):
         return placeholder
     
     # 标记常见的模板模式，更精确的匹配
-    content = re.sub(r'\b\w+\s*<[^<>]*?>', replace_template, content)
+    content = apply_rule(r'\b\w+\s*<[^<>]*?>', replace_template, content, profiler)
     
     # 现在安全地处理运算符
     # 双字符运算符 - 确保两边都有空格
@@ -60,26 +93,26 @@ def format_operators(content):
     for op in operators:
         # 更精确的正则表达式，确保运算符两边都有字符
         pattern = rf'([a-zA-Z0-9_\]\)])\s*{re.escape(op)}\s*([a-zA-Z0-9_\[\(\-])'
-        content = re.sub(pattern, rf'\1 {op} \2', content)
+        content = apply_rule(pattern, rf'\1 {op} \2', content, profiler)
     
     # 单字符运算符 (现在模板已被保护)
-    content = re.sub(r'([a-zA-Z0-9_\]\)])\s*<\s*([a-zA-Z0-9_\[\(])', r'\1 < \2', content)
-    content = re.sub(r'([a-zA-Z0-9_\]\)])\s*>\s*([a-zA-Z0-9_\[\(])', r'\1 > \2', content)
+    content = apply_rule(r'([a-zA-Z0-9_\]\)])\s*<\s*([a-zA-Z0-9_\[\(])', r'\1 < \2', content, profiler)
+    content = apply_rule(r'([a-zA-Z0-9_\]\)])\s*>\s*([a-zA-Z0-9_\[\(])', r'\1 > \2', content, profiler)
     
     # 算术运算符
-    content = re.sub(r'([a-zA-Z0-9_\]\)])\s*\+\s*([a-zA-Z0-9_\[\(])', r'\1 + \2', content)
-    content = re.sub(r'([a-zA-Z0-9_\]\)])\s*-\s*([a-zA-Z0-9_\[\(])', r'\1 - \2', content)
-    content = re.sub(r'([a-zA-Z0-9_\]\)])\s*\*\s*([a-zA-Z0-9_\[\(])', r'\1 * \2', content)
-    content = re.sub(r'([a-zA-Z0-9_\]\)])\s*/\s*([a-zA-Z0-9_\[\(])', r'\1 / \2', content)
-    content = re.sub(r'([a-zA-Z0-9_\]\)])\s*%\s*([a-zA-Z0-9_\[\(])', r'\1 % \2', content)
+    content = apply_rule(r'([a-zA-Z0-9_\]\)])\s*\+\s*([a-zA-Z0-9_\[\(])', r'\1 + \2', content, profiler)
+    content = apply_rule(r'([a-zA-Z0-9_\]\)])\s*-\s*([a-zA-Z0-9_\[\(])', r'\1 - \2', content, profiler)
+    content = apply_rule(r'([a-zA-Z0-9_\]\)])\s*\*\s*([a-zA-Z0-9_\[\(])', r'\1 * \2', content, profiler)
+    content = apply_rule(r'([a-zA-Z0-9_\]\)])\s*/\s*([a-zA-Z0-9_\[\(])', r'\1 / \2', content, profiler)
+    content = apply_rule(r'([a-zA-Z0-9_\]\)])\s*%\s*([a-zA-Z0-9_\[\(])', r'\1 % \2', content, profiler)
     
     # 位运算符
-    content = re.sub(r'([a-zA-Z0-9_\]\)])\s*&\s*([a-zA-Z0-9_\[\(\-])', r'\1 & \2', content)
-    content = re.sub(r'([a-zA-Z0-9_\]\)])\s*\|\s*([a-zA-Z0-9_\[\(])', r'\1 | \2', content)
-    content = re.sub(r'([a-zA-Z0-9_\]\)])\s*\^\s*([a-zA-Z0-9_\[\(])', r'\1 ^ \2', content)
+    content = apply_rule(r'([a-zA-Z0-9_\]\)])\s*&\s*([a-zA-Z0-9_\[\(\-])', r'\1 & \2', content, profiler)
+    content = apply_rule(r'([a-zA-Z0-9_\]\)])\s*\|\s*([a-zA-Z0-9_\[\(])', r'\1 | \2', content, profiler)
+    content = apply_rule(r'([a-zA-Z0-9_\]\)])\s*\^\s*([a-zA-Z0-9_\[\(])', r'\1 ^ \2', content, profiler)
     
     # 赋值运算符
-    content = re.sub(r'([a-zA-Z0-9_\]\)])\s*=\s*([^=])', r'\1 = \2', content)
+    content = apply_rule(r'([a-zA-Z0-9_\]\)])\s*=\s*([^=])', r'\1 = \2', content, profiler)
     
     # 恢复模板
     for placeholder, original in template_placeholders:
@@ -87,81 +120,146 @@ def format_operators(content):
     
     return content
 
-def format_keywords(content):
+def format_keywords(content, profiler=None):
     """格式化关键字"""
     # if, for, while, switch 后加空格
-    content = re.sub(r'\b(if|for|while|switch)\(', r'\1 (', content)
+    content = apply_rule(r'\b(if|for|while|switch)\(', r'\1 (', content, profiler)
     
     # else 前后加空格
-    content = re.sub(r'}else', '} else', content)
-    content = re.sub(r'else{', 'else {', content)
+    content = apply_rule(r'}else', '} else', content, profiler)
+    content = apply_rule(r'else{', 'else {', content, profiler)
     
     # 逗号后加空格
-    content = re.sub(r',(\S)', r', \1', content)
+    content = apply_rule(r',(\S)', r', \1', content, profiler)
     
     # 分号后加空格
-    content = re.sub(r';(\S)', r'; \1', content)
+    content = apply_rule(r';(\S)', r'; \1', content, profiler)
     
     return content
 
-def format_templates(content):
+def format_templates(content, profiler=None):
     """格式化模板"""
+    # 模板规则只从单词开头匹配，参数前的空白用原子组一次吃完 (参数全是空白时保留最后一个)，
+    # 参数用占有量词，避免 \s* 与参数字符类重叠造成的多项式回溯，匹配结果与原写法相同
     # 首先处理简单的单参数模板
-    content = re.sub(r'(\w+)\s*<\s*([^<>,]+)\s*>', r'\1<\2>', content)
+    content = apply_rule(r'(?<!\w)(\w++)\s*+<(?>\s*+(?=[^<>,\s])|\s*(?=\s))([^<>,]++)>', r'\1<\2>', content, profiler)
     
     # 处理双参数模板 map<string, int>
-    content = re.sub(r'(\w+)\s*<\s*([^<>,]+)\s*,\s*([^<>,]+)\s*>', r'\1<\2, \3>', content)
+    content = apply_rule(r'(?<!\w)(\w++)\s*+<(?>\s*+(?=[^<>,\s])|\s*(?=\s))([^<>,]++),'
+                         r'(?>\s*+(?=[^<>,\s])|\s*(?=\s))([^<>,]++)>', r'\1<\2, \3>', content, profiler)
     
     # 处理复杂嵌套模板
     # priority_queue<int, vector<int>, greater<int>>
-    content = re.sub(r'(\w+)\s*<\s*([^<>]+),\s*(\w+)\s*<\s*([^<>]+)\s*>,\s*(\w+)\s*<\s*([^<>]+)\s*>', r'\1<\2, \3<\4>, \5<\6>>', content)
+    # 第一个参数截到最后一个逗号为止；它以该逗号开头时要借用前面的一个空白
+    content = apply_rule(r'(?<!\w)(\w++)\s*+<(?>\s*+(?!,[^<>,]*<)|\s*(?=\s))([^<>]+),\s*+(\w++)\s*+<'
+                         r'(?>\s*+(?=[^<>\s])|\s*(?=\s))([^<>]++)>,\s*+(\w++)\s*+<'
+                         r'(?>\s*+(?=[^<>\s])|\s*(?=\s))([^<>]++)>', r'\1<\2, \3<\4>, \5<\6>>', content, profiler)
     
     # 清理模板结束符间的空格
-    content = re.sub(r'>\s*>', '>>', content)
+    content = apply_rule(r'>\s*>', '>>', content, profiler)
     
     # 处理模板后紧跟变量名的情况 - 添加空格
-    content = re.sub(r'>([a-zA-Z_])', r'> \1', content)
+    content = apply_rule(r'>([a-zA-Z_])', r'> \1', content, profiler)
     
     return content
 
-def clean_spacing(content):
+def clean_spacing(content, profiler=None):
     """清理空格"""
     # 移除括号内侧多余空格
-    content = re.sub(r'\(\s+', '(', content)
-    content = re.sub(r'\s+\)', ')', content)
+    content = apply_rule(r'\(\s+', '(', content, profiler)
+    content = apply_rule(r'(?<!\s)\s++\)', ')', content, profiler)
     
     # 清理模板后的多余空格 (> 后面不应该紧跟空格，除非是变量名)
-    content = re.sub(r'>\s+([^a-zA-Z_])', r'>\1', content)
+    content = apply_rule(r'>\s+([^a-zA-Z_])', r'>\1', content, profiler)
     
     # 移除多余空格，但保留单个空格
-    content = re.sub(r'  +', ' ', content)
+    content = apply_rule(r'  +', ' ', content, profiler)
     
     # 移除行尾空格
     content = content.rstrip()
     
     return content
 
-def format_latex_cpp_blocks(content):
-    """格式化LaTeX文件中的C++代码块"""
-    def format_minted_block(match):
-        language = match.group(1)
-        code_content = match.group(2)
+# minted代码块及需要格式化的语言；本脚本按 tex_index 定位代码块，正则留给 format_server 扫描请求文本
+MINTED_PATTERN = r'\\begin\{minted\}\{([^}]+)\}\n(.*?)\n\\end\{minted\}'
+CPP_LANGUAGES = ['cpp', 'c++', 'cc', 'cxx', 'c']
+
+def format_latex_cpp_blocks(content, mode='regex', cache=None, jobs=1):
+    """格式化LaTeX文件中的C++代码块，传入 cache 时未改动的代码块直接取缓存结果"""
+    if jobs > 1:
+        return format_latex_cpp_blocks_parallel(content, mode, cache, jobs)
+    
+    index = TexIndex.from_text(content)
+
+    def format_minted_block(block):
+        language = block.language
+        code_content = index.block_code(block)
         
         # 只格式化C++相关的代码块
-        if language.lower() in ['cpp', 'c++', 'cc', 'cxx', 'c']:
-            formatted_code = format_cpp_code(code_content)
+        if language.lower() in CPP_LANGUAGES:
+            formatted_code = cache.get(code_content, mode) if cache is not None else None
+            if formatted_code is None:
+                formatted_code, budget = format_block_checked(code_content, mode)
+                LINE_BUDGET.merge(budget)
+                if cache is not None and not budget.fallbacks:
+                    cache.put(code_content, formatted_code, mode)
             return f'\\begin{{minted}}{{{language}}}\n{formatted_code}\n\\end{{minted}}'
         else:
             # 其他语言不处理
-            return match.group(0)
+            return None
     
     # 处理minted代码块
-    pattern = r'\\begin\{minted\}\{([^}]+)\}\n(.*?)\n\\end\{minted\}'
-    result = re.sub(pattern, format_minted_block, content, flags=re.DOTALL)
-    
-    return result
+    return index.replace_blocks(format_minted_block)
+
+def format_latex_cpp_blocks_parallel(content, mode='regex', cache=None, jobs=2):
+    """先提取全部代码块，在进程池中分块格式化，再按原顺序拼回，输出与串行一致"""
+    index = TexIndex.from_text(content)
+    blocks = {block: index.block_code(block) for block in index.blocks_by_language(*CPP_LANGUAGES)}
+    
+    # 相同内容的代码块只格式化一次，命中缓存的不进入进程池
+    formatted = {}
+    pending = []
+    for code_content in blocks.values():
+        if code_content in formatted:
+            continue
+        cached = cache.get(code_content, mode) if cache is not None else None
+        formatted[code_content] = cached
+        if cached is None:
+            pending.append(code_content)
+    
+    if pending:
+        chunksize = max(1, len(pending) // (jobs * 4))
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            # 预算随参数传入子进程，超时统计随结果返回
+            results = executor.map(partial(format_block_checked, mode=mode, seconds=LINE_BUDGET.seconds),
+                                   pending, chunksize=chunksize)
+            for code_content, (formatted_code, budget) in zip(pending, results):
+                formatted[code_content] = formatted_code
+                LINE_BUDGET.merge(budget)
+                if cache is not None and not budget.fallbacks:
+                    cache.put(code_content, formatted_code, mode)
+    
+    def replace(block):
+        if block not in blocks:
+            return None
+        return f'\\begin{{minted}}{{{block.language}}}\n{formatted[blocks[block]]}\n\\end{{minted}}'
+    
+    return index.replace_blocks(replace)
+
+def profile_rules(content, json_path=None):
+    """逐条统计正则规则在全部C++代码块上的调用、命中和耗时，不修改文件"""
+    profiler = RuleProfiler()
+    index = TexIndex.from_text(content)
+    for block in index.blocks_by_language(*CPP_LANGUAGES):
+        format_cpp_code(index.block_code(block), 'regex', profiler)
+    
+    profiler.report()
+    if json_path:
+        profiler.save_json(json_path)
+        print(f"💾 分析结果已写入: {json_path}")
+    return profiler
 
-def test_formatting_rules():
+def test_formatting_rules(mode='regex'):
     """测试格式化规则的正确性"""
     test_cases = [
         # 间距修复测试
@@ -190,7 +288,7 @@ def test_formatting_rules():
     failed_tests = []
     
     for input_code, expected in test_cases:
-        result = format_cpp_code(input_code).strip()
+        result = format_cpp_code(input_code, mode).strip()
         if result != expected:
             failed_tests.append((input_code, expected, result))
     
@@ -216,12 +314,25 @@ def main():
                        help='运行格式化规则测试')
     parser.add_argument('--dry-run', action='store_true',
                        help='只预览更改，不实际修改文件')
+    parser.add_argument('--no-cache', action='store_true',
+                       help='不使用格式化缓存，重新格式化所有代码块')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                       help='并行格式化的进程数，0 表示使用全部CPU核心 (默认: 1)')
+    parser.add_argument('--mode', choices=FORMAT_MODES, default='regex',
+                       help='格式化模式: regex 为正则规则，lexer 为词法分析 (默认: regex)')
+    parser.add_argument('--profile', action='store_true',
+                       help='统计每条正则规则的调用次数、命中次数和耗时，不修改文件')
+    parser.add_argument('--profile-json',
+                       help='把规则统计写入JSON文件 (隐含 --profile)')
+    parser.add_argument('--line-budget', type=float, default=DEFAULT_LINE_BUDGET,
+                       help=f'每行格式化的时间上限 (秒)，超时的行保持原样，0 表示不限制 (默认: {DEFAULT_LINE_BUDGET})')
     
     args = parser.parse_args()
+    LINE_BUDGET.seconds = args.line_budget
     
     # 运行测试
     if args.test:
-        success = test_formatting_rules()
+        success = test_formatting_rules(args.mode)
         sys.exit(0 if success else 1)
     
     if not os.path.exists(args.file):
@@ -233,6 +344,14 @@ def main():
         with open(args.file, 'r', encoding='utf-8') as f:
             content = f.read()
         
+        # 规则性能分析
+        if args.profile or args.profile_json:
+            if args.mode != 'regex':
+                print("⚠️  lexer 模式没有规则表，以下为 regex 模式的规则统计")
+            print(f"🔬 正在分析 {args.file} 上各条格式化规则的耗时...")
+            profile_rules(content, args.profile_json)
+            return
+        
         print(f"正在格式化 {args.file} 中的C++代码块...")
         
         # 创建备份
@@ -243,7 +362,19 @@ def main():
             print(f"已创建备份文件: {backup_file}")
         
         # 格式化C++代码块
-        formatted_content = format_latex_cpp_blocks(content)
+        cache = None
+        if not args.no_cache:
+            cache = FormatCache(default_cache_path(args.file, 'format_tex_cpp_v2'), rules_version(__file__, cpp_lexer.__file__))
+        
+        jobs = args.jobs if args.jobs > 0 else (os.cpu_count() or 1)
+        formatted_content = format_latex_cpp_blocks(content, args.mode, cache, jobs)
+        
+        # 有行超时保持原样的代码块没有写入缓存，下次重新格式化；预览模式不改动任何文件
+        LINE_BUDGET.report()
+        if cache is not None:
+            if not args.dry_run:
+                cache.save()
+            print(f"⚡ 缓存命中 {cache.hits}/{cache.hits + cache.misses} 个代码块")
         
         # 预览模式
         if args.dry_run:
@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多测试点并行评测
+源文件只在改动后编译一次 (按源码、编译器和编译选项缓存可执行文件)，目录中所有 *.in/*.ans
+测试点并发运行；每个测试点限制 CPU 时间、墙钟时间和内存，用 wait4 取得 CPU 用时和峰值内存，
+给出 AC/WA/TLE/MLE/RE 结果、汇总表和 JSON
+"""
+
+import os
+import re
+import sys
+import json
+import glob
+import time
+import shlex
+import signal
+import hashlib
+import argparse
+import tempfile
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_CXX = 'g++'
+DEFAULT_CACHE_DIR = '.judge_cache'
+# 与 run.sh 中的两种编译方式一致
+RELEASE_FLAGS = ['-std=c++20', '-O2']
+ASAN_FLAGS = ['-std=c++20', '-Og', '-g', '-fsanitize=address']
+DEFAULT_TIME_LIMIT = 1.0
+DEFAULT_MEMORY_LIMIT = 256
+ALLOCATION_FAILURE_PATTERN = re.compile(r'std::bad_alloc|Cannot allocate memory|out of memory')
+DURATION_PATTERN = re.compile(r'^(\d+(?:\.\d+)?)\s*(ms|s)?$')
+
+# 在 exec 之前设置资源上限的包装命令：子进程中不运行 Python 代码，线程池中 fork 也是安全的，
+# 且不依赖只在 Linux 上存在的 resource.prlimit；macOS 不支持限制地址空间时忽略 ulimit -v 的错误
+LIMIT_WRAPPER = 'ulimit -S -t {soft} && ulimit -H -t {hard} || exit 126; {memory}exec "$@"'
+# ru_maxrss 在 macOS 上以字节为单位，在 Linux 上以 KB 为单位
+MAXRSS_BYTES = sys.platform == 'darwin'
+
+VERDICT_ICONS = {'AC': '✅', 'OK': '✅', 'WA': '❌', 'TLE': '⏰', 'MLE': '💥', 'RE': '💣', 'CE': '🔧'}
+
+
+def parse_duration(text):
+    """'1s'、'500ms' 或 '1.5' (秒) -> 秒数"""
+    match = DURATION_PATTERN.match(str(text).strip())
+    if not match:
+        raise ValueError(f"无法解析时间: {text}")
+    value = float(match.group(1))
+    return value / 1000 if match.group(2) == 'ms' else value
+
+
+def output_matches(output, answer, eps=None):
+    """忽略行尾空白和末尾空行逐行比较；指定 eps 时按词比较并允许浮点误差"""
+    if eps is None:
+        return [line.rstrip() for line in output.rstrip().split('\n')] == \
+            [line.rstrip() for line in answer.rstrip().split('\n')]
+    tokens, expected = output.split(), answer.split()
+    if len(tokens) != len(expected):
+        return False
+    for token, target in zip(tokens, expected):
+        if token == target:
+            continue
+        try:
+            a, b = float(token), float(target)
+        except ValueError:
+            return False
+        if abs(a - b) > eps * max(1.0, abs(b)):
+            return False
+    return True
+
+
+def first_difference(output, answer):
+    """第一处不同的行，用于 WA 的说明"""
+    output_lines = output.rstrip().split('\n')
+    answer_lines = answer.rstrip().split('\n')
+    for number, (got, expected) in enumerate(zip(output_lines, answer_lines), 1):
+        if got.rstrip() != expected.rstrip():
+            return f'第{number}行: 期望 {expected.strip()[:40]!r}, 得到 {got.strip()[:40]!r}'
+    return f'行数不同: 期望 {len(answer_lines)} 行, 得到 {len(output_lines)} 行'
+
+
+class CaseResult:
+    def __init__(self, name, verdict, cpu=0.0, wall=0.0, memory=0, detail=''):
+        self.name = name
+        self.verdict = verdict
+        self.cpu = cpu
+        self.wall = wall
+        # 峰值常驻内存 (KB)
+        self.memory = memory
+        self.detail = detail
+
+    def to_dict(self):
+        return {'case': self.name, 'verdict': self.verdict, 'cpu_ms': self.cpu * 1000,
+                'wall_ms': self.wall * 1000, 'memory_kb': self.memory, 'detail': self.detail}
+
+
+class Judge:
+    """编译一次，并发运行多个测试点"""
+
+    def __init__(self, source, cxx=DEFAULT_CXX, flags=None, time_limit=DEFAULT_TIME_LIMIT, wall_limit=None,
+                 memory_limit=DEFAULT_MEMORY_LIMIT, eps=None, cache_dir=None):
+        self.source = os.path.abspath(source)
+        self.cxx = cxx
+        self.flags = list(RELEASE_FLAGS if flags is None else flags)
+        self.time_limit = time_limit
+        # 墙钟时间默认留出进程启动和调度的余量
+        self.wall_limit = wall_limit or time_limit * 2 + 1
+        self.memory_limit = memory_limit
+        self.eps = eps
+        self.cache_dir = cache_dir or os.path.join(os.path.dirname(self.source), DEFAULT_CACHE_DIR)
+        self.sanitized = any(flag.startswith('-fsanitize') for flag in self.flags)
+        self.binary = None
+
+    def binary_path(self):
+        """可执行文件按源码、编译器和选项命名，任何一项改变都会重新编译"""
+        digest = hashlib.sha256()
+        with open(self.source, 'rb') as f:
+            digest.update(f.read())
+        digest.update('\0'.join([self.cxx] + self.flags).encode('utf-8'))
+        stem = os.path.splitext(os.path.basename(self.source))[0]
+        return os.path.join(self.cache_dir, f'{stem}-{digest.hexdigest()[:12]}')
+
+    def command(self):
+        """运行程序的命令，Python 脚本 (如数据生成器) 不需要编译"""
+        if self.source.endswith('.py'):
+            return [sys.executable, self.source]
+        return [self.binary]
+
+    def compile(self):
+        """返回 (是否重新编译, 编译错误信息)；已有缓存的可执行文件时直接复用"""
+        if self.source.endswith('.py'):
+            return False, None
+        binary = self.binary_path()
+        self.binary = binary
+        if os.path.exists(binary):
+            return False, None
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = f'{binary}.{os.getpid()}.tmp'
+        result = subprocess.run([self.cxx] + self.flags + ['-o', tmp_path, self.source],
+                                capture_output=True, text=True)
+        if result.returncode != 0:
+            return True, result.stderr
+        os.replace(tmp_path, binary)
+
+        # 同一源文件的旧版本可执行文件不再需要
+        stem = os.path.splitext(os.path.basename(self.source))[0]
+        for path in glob.glob(os.path.join(self.cache_dir, f'{stem}-*')):
+            if path != binary and re.fullmatch(rf'{re.escape(stem)}-[0-9a-f]{{12}}', os.path.basename(path)):
+                os.remove(path)
+        return True, None
+
+    def limited_command(self, command):
+        """用 sh 的 ulimit 在 exec 之前设置 CPU 时间和地址空间上限
+        (测试点在线程池中运行，fork 后执行 Python 代码的 preexec_fn 在多线程下不安全)"""
+        cpu = int(self.time_limit) + 1
+        memory = ''
+        if not self.sanitized:
+            # ASan 需要保留大量虚拟地址空间，只能事后按峰值内存判断
+            memory = f'ulimit -v {self.memory_limit * 2 * 1024} 2>/dev/null; '
+        script = LIMIT_WRAPPER.format(hard=cpu + 1, soft=cpu, memory=memory)
+        return ['/bin/sh', '-c', script, 'sh'] + command
+
+    def run_case(self, input_path, answer_path=None, output_path=None, args=()):
+        """运行一个测试点，输出写入 output_path (默认为临时文件)，args 为命令行参数"""
+        name = os.path.splitext(os.path.basename(input_path))[0]
+        with tempfile.TemporaryFile() if output_path is None else open(output_path, 'w+b') as output, \
+                open(input_path, 'rb') as stdin, tempfile.TemporaryFile() as errors:
+            started = time.perf_counter()
+            command = self.limited_command(self.command() + [str(arg) for arg in args])
+            process = subprocess.Popen(command, stdin=stdin, stdout=output, stderr=errors, start_new_session=True)
+            killed = threading.Event()
+
+            def kill():
+                killed.set()
+                try:
+                    os.killpg(process.pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+
+            timer = threading.Timer(self.wall_limit, kill)
+            timer.start()
+            # 直接用 wait4 回收子进程，同时得到 CPU 时间和峰值内存
+            _, status, usage = os.wait4(process.pid, 0)
+            wall = time.perf_counter() - started
+            timer.cancel()
+            process.returncode = os.waitstatus_to_exitcode(status)
+
+            output.seek(0)
+            produced = output.read().decode('utf-8', errors='replace')
+            errors.seek(0)
+            stderr = errors.read().decode('utf-8', errors='replace')
+
+        cpu = usage.ru_utime + usage.ru_stime
+        memory = usage.ru_maxrss // 1024 if MAXRSS_BYTES else usage.ru_maxrss
+        returncode = process.returncode
+
+        if killed.is_set():
+            return CaseResult(name, 'TLE', cpu, wall, memory, f'超过墙钟时间 {self.wall_limit:g}s')
+        if cpu > self.time_limit or returncode == -signal.SIGXCPU:
+            return CaseResult(name, 'TLE', cpu, wall, memory)
+        if memory > self.memory_limit * 1024 and not self.sanitized:
+            return CaseResult(name, 'MLE', cpu, wall, memory)
+        if returncode != 0:
+            if returncode < 0:
+                detail = f'信号 {signal.Signals(-returncode).name}'
+            else:
+                detail = f'退出码 {returncode}'
+            # 地址空间上限导致的分配失败也算超内存
+            if not self.sanitized and ALLOCATION_FAILURE_PATTERN.search(stderr):
+                return CaseResult(name, 'MLE', cpu, wall, memory, detail)
+            return CaseResult(name, 'RE', cpu, wall, memory, detail)
+        if answer_path is None:
+            return CaseResult(name, 'OK', cpu, wall, memory, '没有 .ans 文件，未比较输出')
+
+        with open(answer_path, 'r', encoding='utf-8', errors='replace') as f:
+            answer = f.read()
+        if output_matches(produced, answer, self.eps):
+            return CaseResult(name, 'AC', cpu, wall, memory)
+        return CaseResult(name, 'WA', cpu, wall, memory, first_difference(produced, answer))
+
+    def run_all(self, cases, jobs=1, output_dir=None):
+        """并发运行全部测试点，结果按测试点顺序返回"""
+        def run(case):
+            input_path, answer_path = case
+            output_path = None
+            if output_dir:
+                name = os.path.splitext(os.path.basename(input_path))[0]
+                output_path = os.path.join(output_dir, f'{name}.out')
+            return self.run_case(input_path, answer_path, output_path)
+
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            return list(executor.map(run, cases))
+
+
+def natural_key(path):
+    """按数字大小排序，使 2.in 排在 10.in 前面"""
+    return [int(part) if part.isdigit() else part for part in re.split(r'(\d+)', os.path.basename(path))]
+
+
+def find_cases(directory, pattern='*.in'):
+    """目录中的 (输入, 答案) 对，没有同名 .ans 时答案为 None"""
+    cases = []
+    for input_path in sorted(glob.glob(os.path.join(directory, pattern)), key=natural_key):
+        answer_path = os.path.splitext(input_path)[0] + '.ans'
+        cases.append((input_path, answer_path if os.path.exists(answer_path) else None))
+    return cases
+
+
+def print_table(results):
+    print(f"{'测试点':<16} {'结果':<5} {'CPU(ms)':>8} {'墙钟(ms)':>9} {'内存(MB)':>9}  说明")
+    for result in results:
+        icon = VERDICT_ICONS.get(result.verdict, '')
+        print(f"{result.name:<16} {icon}{result.verdict:<4} {result.cpu * 1000:>8.0f} {result.wall * 1000:>9.0f} "
+              f"{result.memory / 1024:>9.1f}  {result.detail}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='多测试点并行评测')
+    parser.add_argument('source', nargs='?', default='a.cpp',
+                       help='C++源文件 (默认: a.cpp)')
+    parser.add_argument('-d', '--dir', default='.',
+                       help='测试点目录，运行其中所有 *.in，同名 *.ans 为答案 (默认: 当前目录)')
+    parser.add_argument('-p', '--pattern', default='*.in',
+                       help='输入文件的通配符 (默认: *.in)')
+    parser.add_argument('-t', '--time', default=str(DEFAULT_TIME_LIMIT),
+                       help='CPU时间限制，如 1s、500ms (默认: 1s)')
+    parser.add_argument('--wall', help='墙钟时间限制 (默认: CPU时间限制×2+1s)')
+    parser.add_argument('-m', '--memory', type=int, default=DEFAULT_MEMORY_LIMIT,
+                       help=f'内存限制 (MB, 默认: {DEFAULT_MEMORY_LIMIT})')
+    parser.add_argument('-j', '--jobs', type=int, default=0,
+                       help='并发运行的测试点数，0 表示使用全部CPU核心 (默认: 0)')
+    parser.add_argument('--cxx', default=os.environ.get('CXX', DEFAULT_CXX),
+                       help='C++编译器，也可通过环境变量 CXX 指定 (默认: g++)')
+    parser.add_argument('--asan', action='store_true',
+                       help='与 run.sh 一样用 AddressSanitizer 编译 (不判断超内存)')
+    parser.add_argument('--flags', help="代替默认编译选项，如 '-std=c++17 -O2'")
+    parser.add_argument('--eps', type=float,
+                       help='按词比较输出，浮点数允许的相对/绝对误差')
+    parser.add_argument('--output-dir', help='保存每个测试点的输出')
+    parser.add_argument('--json', help='把评测结果写入JSON文件')
+
+    args = parser.parse_args()
+
+    if not os.path.exists(args.source):
+        print(f"错误: 文件 {args.source} 不存在")
+        sys.exit(1)
+    try:
+        time_limit = parse_duration(args.time)
+        wall_limit = parse_duration(args.wall) if args.wall else None
+    except ValueError as e:
+        print(f"错误: {e}")
+        sys.exit(1)
+
+    cases = find_cases(args.dir, args.pattern)
+    if not cases:
+        print(f"错误: {args.dir} 中没有匹配 {args.pattern} 的测试点")
+        sys.exit(1)
+
+    flags = shlex.split(args.flags) if args.flags else (ASAN_FLAGS if args.asan else RELEASE_FLAGS)
+    judge = Judge(args.source, args.cxx, flags, time_limit, wall_limit, args.memory, args.eps)
+
+    started = time.perf_counter()
+    compiled, error = judge.compile()
+    if error is not None:
+        print("🔧 CE 编译错误:")
+        print(error)
+        sys.exit(1)
+    print(f"🔨 {'已编译' if compiled else '复用已编译的'} {os.path.relpath(judge.binary)} ({' '.join(judge.flags)})")
+
+    jobs = args.jobs if args.jobs > 0 else (os.cpu_count() or 1)
+    results = judge.run_all(cases, jobs, args.output_dir)
+    elapsed = time.perf_counter() - started
+
+    print_table(results)
+    counts = {}
+    for result in results:
+        counts[result.verdict] = counts.get(result.verdict, 0) + 1
+    passed = counts.get('AC', 0) + counts.get('OK', 0)
+    slowest = max(results, key=lambda result: result.cpu)
+    print(f"📊 {' '.join(f'{verdict} {count}' for verdict, count in counts.items())} | "
+          f"通过 {passed}/{len(results)} | 最慢 {slowest.name} {slowest.cpu * 1000:.0f}ms | "
+          f"峰值内存 {max(result.memory for result in results) / 1024:.1f}MB | 总用时 {elapsed:.2f}s ({jobs} 并发)")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'source': args.source, 'flags': judge.flags, 'time_limit': time_limit,
+                       'memory_limit': args.memory, 'cases': [result.to_dict() for result in results]},
+                      f, ensure_ascii=False, indent=2)
+
+    sys.exit(0 if passed == len(results) else 1)
+
+
+if __name__ == '__main__':
+    main()
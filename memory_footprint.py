@@ -0,0 +1,767 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+静态内存占用分析
+解析每个 C++ 代码块中的常量 (const/constexpr/#define)，计算 `1e6`、`M << 2`、`N * 2 + 5`
+这样的常量表达式，按元素类型 (含结构体、pair/array/bitset) 求出全局数组和给定大小的 vector
+占用的内存；可以把几个模板放在一起计算总占用，超过内存限制时给出警告
+"""
+
+import re
+import sys
+import json
+import math
+import argparse
+
+from tex_index import TexIndex
+from tex_preview import resolve_section
+
+DEFAULT_LIMIT_MB = 256
+DEFAULT_TOP = 20
+MB = 1024 * 1024
+
+TOKEN_PATTERN = re.compile(r'''
+    (?P<space>\s+)
+  | (?P<comment>//[^\n]*|/\*.*?\*/)
+  | (?P<preprocessor>^[ \t]*\#(?:[^\n\\]|\\.)*)
+  | (?P<string>"(?:\\.|[^"\\\n])*"|'(?:\\.|[^'\\\n])*')
+  | (?P<number>(?:0[xX][0-9a-fA-F']+|\d[\d']*(?:\.\d*)?(?:[eE][+-]?\d+)?|\.\d+(?:[eE][+-]?\d+)?)[uUlLfF]*)
+  | (?P<ident>[A-Za-z_]\w*)
+  | (?P<op>::|<<|>>|->|\+\+|--|&&|\|\||[<>=!]=|[-+*/%<>=!&|^~?:;,.(){}\[\]])
+  | (?P<other>.)
+''', re.VERBOSE | re.MULTILINE | re.DOTALL)
+DEFINE_PATTERN = re.compile(r'^\s*#\s*define\s+([A-Za-z_]\w*)(?!\()\s+(.+?)\s*$', re.DOTALL)
+
+# 基本类型 -> 字节数 (x86-64, GCC)
+BASE_TYPES = {
+    'bool': 1, 'char': 1, 'int8_t': 1, 'uint8_t': 1,
+    'short': 2, 'int16_t': 2, 'uint16_t': 2,
+    'int': 4, 'unsigned': 4, 'signed': 4, 'float': 4, 'int32_t': 4, 'uint32_t': 4,
+    'long': 8, 'long long': 8, 'double': 8, 'int64_t': 8, 'uint64_t': 8, 'size_t': 8,
+    'long double': 16, '__int128': 16,
+}
+# 模板中直接使用、由比赛代码头部定义的类型别名
+DEFAULT_ALIASES = {
+    'll': 'long long', 'LL': 'long long', 'i64': 'long long',
+    'ull': 'unsigned long long', 'ULL': 'unsigned long long', 'u64': 'unsigned long long',
+    'ld': 'long double', 'i128': '__int128', 'PII': 'pair<int, int>', 'pii': 'pair<int, int>',
+}
+# 容器对象本身的大小 (libstdc++)，元素在堆上
+CONTAINER_SIZES = {
+    'vector': 24, 'string': 32, 'basic_string': 32, 'list': 24, 'deque': 80, 'queue': 80, 'stack': 80,
+    'priority_queue': 32, 'set': 48, 'multiset': 48, 'map': 48, 'multimap': 48,
+    'unordered_set': 56, 'unordered_map': 56, 'unordered_multiset': 56, 'unordered_multimap': 56,
+    'function': 32, 'mt19937': 5000, 'mt19937_64': 2504,
+}
+QUALIFIERS = {'static', 'const', 'constexpr', 'inline', 'volatile', 'mutable', 'thread_local', 'extern',
+              'register', 'struct', 'class', 'typename', 'std'}
+INTEGER_WORDS = {'unsigned', 'signed', 'long', 'short', 'int', 'char'}
+SKIP_STATEMENTS = {'return', 'namespace', 'friend', 'static_assert', 'operator', 'template', 'if', 'else', 'for',
+                   'while', 'do', 'switch', 'case', 'default', 'break', 'continue', 'goto', 'delete', 'throw',
+                   'cout', 'cin', 'cerr', 'printf', 'puts', 'assert'}
+ACCESS_SPECIFIERS = {'public', 'private', 'protected'}
+
+
+class Unresolved(Exception):
+    """表达式中用到了未定义的常量或无法求值的写法"""
+
+
+class Token:
+    __slots__ = ('kind', 'text', 'line')
+
+    def __init__(self, kind, text, line):
+        self.kind = kind
+        self.text = text
+        self.line = line
+
+
+def tokenize(code, first_line=1):
+    tokens = []
+    line = first_line
+    for match in TOKEN_PATTERN.finditer(code):
+        kind, text = match.lastgroup, match.group()
+        if kind not in ('space', 'comment'):
+            tokens.append(Token(kind, text, line))
+        line += text.count('\n')
+    return tokens
+
+
+def parse_number(text):
+    text = text.replace("'", '').rstrip('uUlLfF') if not text.lower().startswith('0x') else text.replace("'", '')
+    if text.lower().startswith('0x'):
+        return int(text.rstrip('uUlL'), 16)
+    if any(c in text for c in '.eE'):
+        return float(text)
+    return int(text, 8) if len(text) > 1 and text.startswith('0') else int(text)
+
+
+class ExpressionEvaluator:
+    """C 常量表达式求值，支持 + - * / % << >> & | ^ ~、括号、类型转换和 __lg/max/min/sqrt"""
+
+    BINARY = {
+        '|': 3, '^': 4, '&': 5, '<<': 8, '>>': 8, '+': 9, '-': 9, '*': 10, '/': 10, '%': 10,
+    }
+    FUNCTIONS = {
+        '__lg': lambda x: int(x).bit_length() - 1,
+        'max': max, 'min': min,
+        'sqrt': math.sqrt, 'log2': math.log2,
+    }
+
+    def __init__(self, tokens, constants):
+        self.tokens = tokens
+        self.pos = 0
+        self.constants = constants
+
+    def evaluate(self):
+        value = self.expression(0)
+        if self.pos != len(self.tokens):
+            raise Unresolved(' '.join(token.text for token in self.tokens))
+        return value
+
+    def peek(self):
+        return self.tokens[self.pos].text if self.pos < len(self.tokens) else None
+
+    def take(self, expected=None):
+        if self.pos >= len(self.tokens) or (expected is not None and self.tokens[self.pos].text != expected):
+            raise Unresolved(' '.join(token.text for token in self.tokens))
+        self.pos += 1
+        return self.tokens[self.pos - 1]
+
+    def expression(self, min_precedence):
+        left = self.unary()
+        while self.peek() in self.BINARY and self.BINARY[self.peek()] > min_precedence:
+            op = self.take().text
+            right = self.expression(self.BINARY[op])
+            left = self.apply(op, left, right)
+        return left
+
+    def apply(self, op, left, right):
+        if op in ('<<', '>>', '&', '|', '^', '%'):
+            left, right = int(left), int(right)
+        if op == '/':
+            if isinstance(left, int) and isinstance(right, int):
+                return left // right if right else 0
+            return left / right
+        return {
+            '+': lambda: left + right, '-': lambda: left - right, '*': lambda: left * right,
+            '%': lambda: left % right if right else 0, '<<': lambda: left << right, '>>': lambda: left >> right,
+            '&': lambda: left & right, '|': lambda: left | right, '^': lambda: left ^ right,
+        }[op]()
+
+    def unary(self):
+        text = self.peek()
+        if text in ('-', '+', '~'):
+            self.take()
+            value = self.unary()
+            return -value if text == '-' else (~int(value) if text == '~' else value)
+        return self.primary()
+
+    def primary(self):
+        token = self.take()
+        if token.kind == 'number':
+            return parse_number(token.text)
+        if token.text == '(':
+            # (int)x 形式的类型转换
+            if self.peek() in BASE_TYPES or self.peek() in INTEGER_WORDS or self.peek() in DEFAULT_ALIASES:
+                start = self.pos
+                while self.peek() not in (')', None) and self.tokens[self.pos].kind == 'ident':
+                    self.pos += 1
+                if self.peek() == ')' and self.pos > start:
+                    self.take(')')
+                    return int(self.unary())
+                self.pos = start
+            value = self.expression(0)
+            self.take(')')
+            return value
+        if token.kind == 'ident':
+            if token.text in self.FUNCTIONS and self.peek() == '(':
+                self.take('(')
+                args = [self.expression(0)]
+                while self.peek() == ',':
+                    self.take(',')
+                    args.append(self.expression(0))
+                self.take(')')
+                return self.FUNCTIONS[token.text](*args)
+            if token.text in self.constants:
+                return self.constants[token.text]
+            raise Unresolved(token.text)
+        raise Unresolved(token.text)
+
+
+def evaluate(tokens, constants):
+    return ExpressionEvaluator(tokens, constants).evaluate()
+
+
+def split_top_level(tokens, separator=',', angles=False):
+    """按最外层的分隔符切分 (不进入括号)；angles 为真时模板参数的尖括号也算括号"""
+    opening = ('(', '[', '{', '<') if angles else ('(', '[', '{')
+    closing = (')', ']', '}', '>') if angles else (')', ']', '}')
+    parts, current, depth = [], [], 0
+    for token in tokens:
+        if token.text in opening:
+            depth += 1
+        elif token.text in closing:
+            depth -= 1
+        elif angles and token.text == '>>':
+            depth -= 2
+        if token.text == separator and depth == 0:
+            parts.append(current)
+            current = []
+        else:
+            current.append(token)
+    parts.append(current)
+    return parts
+
+
+def matching(tokens, start, open_text, close_text):
+    """tokens[start] 为左括号，返回对应右括号的位置"""
+    depth = 0
+    for i in range(start, len(tokens)):
+        if tokens[i].text == open_text:
+            depth += 1
+        elif tokens[i].text == close_text:
+            depth -= 1
+            if depth == 0:
+                return i
+    return len(tokens) - 1
+
+
+def matching_angle(tokens, start):
+    """tokens[start] 为 '<'，返回 (对应 '>' 的位置, 参数列表)；'>>' 算作两个 '>'"""
+    depth = 0
+    for i in range(start, len(tokens)):
+        text = tokens[i].text
+        if text == '<':
+            depth += 1
+        elif text == '>':
+            depth -= 1
+        elif text == '>>':
+            depth -= 2
+        elif text in (';', '{'):
+            break
+        if depth <= 0:
+            args = tokens[start + 1:i]
+            if text == '>>' and depth == 0:
+                # vector<vector<int>> 中前一个 '>' 属于内层
+                args = args + [Token('op', '>', tokens[i].line)]
+            return i, args
+    return None, None
+
+
+class TypeInfo:
+    """类型的大小和对齐；size 为 None 表示无法确定"""
+
+    def __init__(self, size, align, name, unresolved=(), heap=None):
+        self.size = size
+        self.align = align
+        self.name = name
+        self.unresolved = set(unresolved)
+        # vector 等容器的元素类型，用于计算构造时指定大小的堆内存
+        self.heap = heap
+
+
+class Declaration:
+    def __init__(self, name, type_name, line, element_size, count, heap_bytes=0, unresolved=(), align=1):
+        self.name = name
+        self.type_name = type_name
+        self.line = line
+        self.element_size = element_size
+        self.align = align
+        self.count = count
+        self.heap_bytes = heap_bytes
+        self.unresolved = set(unresolved)
+
+    @property
+    def bytes(self):
+        if self.element_size is None or self.count is None:
+            return 0
+        return self.element_size * self.count
+
+    def to_dict(self):
+        return {'name': self.name, 'type': self.type_name, 'line': self.line, 'element_size': self.element_size,
+                'count': self.count, 'bytes': self.bytes, 'heap_bytes': self.heap_bytes,
+                'unresolved': sorted(self.unresolved)}
+
+
+def align_up(value, align):
+    return (value + align - 1) // align * align
+
+
+class FootprintAnalyzer:
+    """分析一段 C++ 代码中全局变量的静态内存"""
+
+    def __init__(self, defines=None):
+        # 命令行给出的常量只在代码中没有定义时使用
+        self.defines = dict(defines or {})
+        self.constants = {}
+        self.aliases = dict(DEFAULT_ALIASES)
+        self.structs = {}
+
+    def constant_table(self):
+        return dict(self.defines, **self.constants)
+
+    def analyze(self, code, first_line=1):
+        """返回全局变量的 Declaration 列表"""
+        tokens = tokenize(code, first_line)
+        return self.parse_scope(tokens, global_scope=True)
+
+    def parse_scope(self, tokens, global_scope):
+        declarations = []
+        statement = []
+        depth = 0
+        i = 0
+        while i < len(tokens):
+            token = tokens[i]
+            if token.kind == 'preprocessor':
+                self.preprocessor(token.text)
+                i += 1
+                continue
+            # for (...; ...; ...) 括号中的分号和 lambda 不拆分语句
+            if token.text in ('(', '['):
+                depth += 1
+            elif token.text in (')', ']'):
+                depth = max(depth - 1, 0)
+            elif depth > 0:
+                if token.text == '{':
+                    end = matching(tokens, i, '{', '}')
+                    statement.extend(tokens[i:end + 1])
+                    i = end + 1
+                    continue
+                statement.append(token)
+                i += 1
+                continue
+            if token.text == ';':
+                declarations.extend(self.statement(statement, global_scope))
+                statement = []
+                i += 1
+                continue
+            if token.text == '{':
+                end = matching(tokens, i, '{', '}')
+                kind = self.brace_kind(statement)
+                if kind == 'struct':
+                    self.define_struct(statement, tokens[i + 1:end])
+                    # 结构体定义后可以直接声明变量: struct Node {...} tr[N];
+                    statement = [Token('ident', self.struct_name(statement), token.line)]
+                elif kind == 'namespace':
+                    declarations.extend(self.parse_scope(tokens[i + 1:end], global_scope))
+                    statement = []
+                elif kind == 'initializer':
+                    statement.extend(tokens[i:end + 1])
+                else:
+                    # 函数体、enum 等：跳过
+                    statement = []
+                    if end + 1 < len(tokens) and tokens[end + 1].text == ';':
+                        end += 1
+                i = end + 1
+                continue
+            if token.text == ':' and len(statement) == 1 and statement[0].text in ACCESS_SPECIFIERS:
+                statement = []
+                i += 1
+                continue
+            statement.append(token)
+            i += 1
+        return declarations
+
+    def brace_kind(self, statement):
+        texts = [token.text for token in statement]
+        if not texts:
+            return 'block'
+        if texts[0] == 'namespace':
+            return 'namespace'
+        if texts[0] == 'template':
+            return 'template'
+        if '=' in texts:
+            return 'initializer'
+        if texts[0] in ('struct', 'class', 'union') and '(' not in texts:
+            return 'struct'
+        if '(' in texts or texts[0] == 'enum':
+            return 'function'
+        # int a[3]{1, 2, 3} 形式的初始化
+        return 'initializer'
+
+    def struct_name(self, statement):
+        for token in statement[1:]:
+            if token.kind == 'ident' and token.text not in ('final', 'alignas'):
+                return token.text
+        return f'<anonymous@{statement[0].line}>'
+
+    def preprocessor(self, text):
+        match = DEFINE_PATTERN.match(text)
+        if not match:
+            return
+        name, value = match.group(1), match.group(2)
+        tokens = tokenize(value)
+        try:
+            self.constants[name] = evaluate(tokens, self.constant_table())
+        except (Unresolved, ZeroDivisionError, ValueError, TypeError, OverflowError):
+            # #define int long long 这样的类型宏
+            if tokens and all(token.kind == 'ident' for token in tokens):
+                words = ' '.join(token.text for token in tokens)
+                if self.resolve_type(tokens, 0)[0].size is not None:
+                    self.aliases[name] = words
+
+    def define_struct(self, statement, body):
+        name = self.struct_name(statement)
+        members = self.parse_scope(body, global_scope=False)
+        offset, align, unresolved = 0, 1, set()
+        for member in members:
+            unresolved |= member.unresolved
+            if member.element_size is None or member.count is None:
+                continue
+            offset = align_up(offset, member.align) + member.bytes
+            align = max(align, member.align)
+        size = align_up(offset, align) if members else 1
+        self.structs[name] = TypeInfo(size, align, name, unresolved)
+
+    def resolve_type(self, tokens, pos):
+        """从 tokens[pos] 开始解析类型，返回 (TypeInfo, 下一个位置)"""
+        words = []
+        while pos < len(tokens) and tokens[pos].text in QUALIFIERS | {'::'}:
+            pos += 1
+        while pos < len(tokens) and tokens[pos].text in INTEGER_WORDS:
+            # #define int long long
+            words.extend(self.aliases.get(tokens[pos].text, tokens[pos].text).split())
+            pos += 1
+            while pos < len(tokens) and tokens[pos].text in QUALIFIERS:
+                pos += 1
+        if words:
+            return self.integer_type(words), pos
+        if pos >= len(tokens) or tokens[pos].kind != 'ident':
+            return TypeInfo(None, 1, '?'), pos
+
+        name = tokens[pos].text
+        pos += 1
+        while pos + 1 < len(tokens) and tokens[pos].text == '::' and tokens[pos + 1].kind == 'ident':
+            name = tokens[pos + 1].text
+            pos += 2
+        args = []
+        if pos < len(tokens) and tokens[pos].text == '<':
+            end, args = matching_angle(tokens, pos)
+            if end is None:
+                return TypeInfo(None, 1, name), pos
+            args = split_top_level(args, angles=True)
+            pos = end + 1
+        info = self.named_type(name, args)
+        while pos < len(tokens) and tokens[pos].text in ('*', '&', '&&', 'const'):
+            if tokens[pos].text == '*':
+                info = TypeInfo(8, 8, info.name + '*')
+            pos += 1
+        return info, pos
+
+    def integer_type(self, words):
+        key = ' '.join(word for word in words if word not in ('unsigned', 'signed'))
+        if not key:
+            key = 'unsigned'
+        if key == 'long int' or key == 'long long int':
+            key = key[:-4]
+        if key == 'short int':
+            key = 'short'
+        size = BASE_TYPES.get(key)
+        return TypeInfo(size, min(size or 1, 16), ' '.join(words))
+
+    def named_type(self, name, args):
+        if name in self.aliases and not args:
+            tokens = tokenize(self.aliases[name])
+            alias = self.aliases.pop(name)
+            try:
+                return self.resolve_type(tokens, 0)[0]
+            finally:
+                self.aliases[name] = alias
+        if name == 'auto':
+            return TypeInfo(None, 1, name)
+        if name in BASE_TYPES:
+            size = BASE_TYPES[name]
+            return TypeInfo(size, min(size, 16), name)
+        if name in self.structs:
+            return self.structs[name]
+        if name in ('pair', 'tuple', 'complex'):
+            members = [self.resolve_type(arg, 0)[0] for arg in args] if name != 'complex' else \
+                [self.resolve_type(args[0], 0)[0]] * 2 if args else []
+            if not members or any(member.size is None for member in members):
+                return TypeInfo(None, 1, name, set().union(*(member.unresolved for member in members)))
+            offset, align = 0, 1
+            for member in members:
+                offset = align_up(offset, member.align) + member.size
+                align = max(align, member.align)
+            return TypeInfo(align_up(offset, align), align, name)
+        if name == 'array' and len(args) == 2:
+            element = self.resolve_type(args[0], 0)[0]
+            try:
+                count = int(evaluate(args[1], self.constant_table()))
+            except Unresolved as e:
+                return TypeInfo(None, element.align, name, element.unresolved | {str(e)})
+            if element.size is None:
+                return TypeInfo(None, element.align, name, element.unresolved)
+            return TypeInfo(element.size * count, element.align, name)
+        if name == 'bitset' and len(args) == 1:
+            try:
+                bits = int(evaluate(args[0], self.constant_table()))
+            except Unresolved as e:
+                return TypeInfo(None, 8, name, {str(e)})
+            return TypeInfo(max(1, (bits + 63) // 64) * 8, 8, name)
+        if name in CONTAINER_SIZES:
+            element = self.resolve_type(args[0], 0)[0] if args else None
+            return TypeInfo(CONTAINER_SIZES[name], 8, name, heap=element)
+        return TypeInfo(None, 1, name, {name})
+
+    def statement(self, tokens, global_scope):
+        """解析一条以分号结尾的语句，返回其中声明的变量"""
+        if not tokens:
+            return []
+        first = tokens[0].text
+        if first in SKIP_STATEMENTS or tokens[0].kind != 'ident':
+            return []
+        if first == 'using' and len(tokens) >= 4 and tokens[2].text == '=':
+            self.aliases[tokens[1].text] = ' '.join(token.text for token in tokens[3:])
+            return []
+        if first == 'typedef' and len(tokens) >= 3:
+            self.aliases[tokens[-1].text] = ' '.join(token.text for token in tokens[1:-1])
+            return []
+        if first in ('using', 'typedef'):
+            return []
+
+        is_static = any(token.text == 'static' for token in tokens[:3])
+        is_const = any(token.text in ('const', 'constexpr') for token in tokens[:3])
+        info, pos = self.resolve_type(tokens, 0)
+        declarations = []
+        for part in split_top_level(tokens[pos:]):
+            declaration = self.declarator(part, info, is_const)
+            if declaration is not None and not (is_static and not global_scope):
+                declarations.append(declaration)
+        return declarations
+
+    def declarator(self, tokens, info, is_const):
+        while tokens and tokens[0].text in ('*', '&'):
+            info = TypeInfo(8, 8, info.name + '*')
+            tokens = tokens[1:]
+        if not tokens or tokens[0].kind != 'ident':
+            return None
+        name = tokens[0].text
+        pos = 1
+        count, unresolved = 1, set(info.unresolved)
+        while pos < len(tokens) and tokens[pos].text == '[':
+            end = matching(tokens, pos, '[', ']')
+            if end == pos + 1:
+                # int dx[] = {-1, 0, 1, 0}: 大小由初值个数决定
+                initializer = tokens[end + 1:]
+                if len(initializer) > 1 and initializer[0].text == '=' and initializer[1].text == '{':
+                    close = matching(initializer, 1, '{', '}')
+                    count *= len([part for part in split_top_level(initializer[2:close]) if part])
+                else:
+                    unresolved.add('[]')
+                pos = end + 1
+                continue
+            try:
+                count *= int(evaluate(tokens[pos + 1:end], self.constant_table()))
+            except Unresolved as e:
+                unresolved.add(str(e))
+            except (ValueError, TypeError, OverflowError):
+                unresolved.add(' '.join(token.text for token in tokens[pos + 1:end]))
+            pos = end + 1
+        if unresolved - info.unresolved:
+            count = None
+
+        rest = tokens[pos:]
+        heap = 0
+        if rest and rest[0].text == '(':
+            if info.heap is None:
+                return None  # 函数声明
+            heap, heap_unresolved = self.container_heap(info, rest[1:matching(rest, 0, '(', ')')])
+            unresolved |= heap_unresolved
+
+        # 有初值的整型常量: const int N = 1e6 + 10; 编译期常量不占内存
+        if is_const and count == 1 and pos == 1 and rest and rest[0].text == '=':
+            try:
+                value = evaluate(rest[1:], self.constant_table())
+                self.constants[name] = value if info.name in ('double', 'float') else int(value)
+                return None
+            except (Unresolved, ZeroDivisionError, ValueError, TypeError, OverflowError):
+                pass
+
+        return Declaration(name, info.name, tokens[0].line, info.size, count, heap, unresolved, info.align)
+
+    def container_heap(self, info, args):
+        """vector<T> v(n) 或 vector<vector<T>> v(n, vector<T>(m)) 的堆内存"""
+        if info.name != 'vector' or info.heap is None:
+            return 0, set()
+        parts = split_top_level(args)
+        try:
+            count = int(evaluate(parts[0], self.constant_table()))
+        except Unresolved as e:
+            return 0, {str(e)}
+        except (ValueError, TypeError, OverflowError, IndexError):
+            return 0, set()
+        element = info.heap
+        inner = 0
+        if len(parts) > 1 and parts[1] and parts[1][0].text == 'vector' and element.heap is not None:
+            close = [i for i, token in enumerate(parts[1]) if token.text == '(']
+            if close:
+                start = close[0]
+                inner, unresolved = self.container_heap(element, parts[1][start + 1:matching(parts[1], start, '(', ')')])
+                if unresolved:
+                    return 0, unresolved
+        if element.size is None:
+            return 0, element.unresolved
+        return count * (element.size + inner), set()
+
+
+class BlockFootprint:
+    def __init__(self, block, declarations):
+        self.block = block
+        self.declarations = declarations
+
+    @property
+    def static_bytes(self):
+        return sum(declaration.bytes for declaration in self.declarations)
+
+    @property
+    def heap_bytes(self):
+        return sum(declaration.heap_bytes for declaration in self.declarations)
+
+    @property
+    def total_bytes(self):
+        return self.static_bytes + self.heap_bytes
+
+    @property
+    def unresolved(self):
+        names = set()
+        for declaration in self.declarations:
+            names |= declaration.unresolved
+        return names
+
+    def to_dict(self):
+        return {'id': self.block.id, 'line': self.block.line,
+                'section': '/'.join(self.block.section.path) if self.block.section else '',
+                'static_bytes': self.static_bytes, 'heap_bytes': self.heap_bytes,
+                'unresolved': sorted(self.unresolved),
+                'declarations': [declaration.to_dict() for declaration in self.declarations]}
+
+
+def analyze_blocks(index, blocks, defines=None):
+    results = []
+    for block in blocks:
+        analyzer = FootprintAnalyzer(defines)
+        declarations = analyzer.analyze(index.block_code(block), block.line + 1)
+        results.append(BlockFootprint(block, declarations))
+    return results
+
+
+def format_size(size):
+    if size >= MB:
+        return f'{size / MB:.1f}MB'
+    if size >= 1024:
+        return f'{size / 1024:.1f}KB'
+    return f'{size}B'
+
+
+def parse_defines(items):
+    defines = {}
+    for item in items:
+        name, _, value = item.partition('=')
+        try:
+            defines[name.strip()] = evaluate(tokenize(value or '1'), defines)
+        except Unresolved:
+            raise ValueError(f"无法计算 -D {item}")
+    return defines
+
+
+def print_block(result, limit):
+    section = ' > '.join(result.block.section.path) if result.block.section else ''
+    warning = ' ⚠️' if result.total_bytes > limit else ''
+    heap = f" + 堆 {format_size(result.heap_bytes)}" if result.heap_bytes else ''
+    unknown = f" + 未知 ({', '.join(sorted(result.unresolved))})" if result.unresolved else ''
+    print(f"  第{result.block.line}行 [{result.block.id}] {section}: {format_size(result.static_bytes)}{heap}"
+          f"{unknown}{warning}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='静态内存占用分析')
+    parser.add_argument('file', nargs='?', default='Algorithm-template.tex',
+                       help='LaTeX文件 (默认: Algorithm-template.tex)')
+    parser.add_argument('-s', '--section', action='append', default=[],
+                       help='计算这些章节中代码块的总占用，可重复指定')
+    parser.add_argument('-b', '--block', action='append', default=[],
+                       help='按代码块 ID (哈希前缀) 选择，可重复指定')
+    parser.add_argument('-D', '--define', action='append', default=[],
+                       help='代码块中没有定义的常量，如 -D N=1e6+10')
+    parser.add_argument('-m', '--limit', type=float, default=DEFAULT_LIMIT_MB,
+                       help=f'内存限制 (MB, 默认: {DEFAULT_LIMIT_MB})')
+    parser.add_argument('--top', type=int, default=DEFAULT_TOP,
+                       help=f'未选择章节时列出占用最大的代码块数 (默认: {DEFAULT_TOP})')
+    parser.add_argument('-v', '--verbose', action='store_true',
+                       help='列出每个数组的大小')
+    parser.add_argument('--json', help='把结果写入JSON文件')
+
+    args = parser.parse_args()
+
+    try:
+        index = TexIndex.load(args.file)
+    except OSError:
+        print(f"错误: 文件 {args.file} 不存在")
+        sys.exit(1)
+    try:
+        defines = parse_defines(args.define)
+        blocks = []
+        for query in args.section:
+            blocks.extend(resolve_section(index, query).all_blocks())
+        for block_id in args.block:
+            block = index.block_by_id(block_id)
+            if block is None:
+                raise ValueError(f"没有 ID 以 {block_id} 开头的代码块")
+            blocks.append(block)
+    except ValueError as e:
+        print(f"错误: {e}")
+        sys.exit(1)
+
+    selected = bool(blocks)
+    cpp_blocks = index.blocks_by_language('cpp', 'c++', 'cc', 'cxx', 'c')
+    blocks = [block for block in (blocks or cpp_blocks) if block in cpp_blocks]
+    results = analyze_blocks(index, blocks, defines)
+    limit = args.limit * MB
+
+    if selected:
+        print(f"🧮 {len(results)} 个代码块:")
+        shown = results
+    else:
+        shown = sorted((result for result in results if result.total_bytes),
+                       key=lambda result: result.total_bytes, reverse=True)[:args.top]
+        print(f"🧮 占用最大的 {len(shown)} 个代码块 (共 {len(results)} 个):")
+    for result in shown:
+        print_block(result, limit)
+        if args.verbose:
+            for declaration in sorted(result.declarations, key=lambda item: item.bytes, reverse=True):
+                if declaration.bytes or declaration.heap_bytes:
+                    dims = f"{declaration.count} × {declaration.element_size}B" if declaration.count != 1 else \
+                        f"{declaration.element_size}B"
+                    print(f"      {declaration.type_name} {declaration.name} (第{declaration.line}行): "
+                          f"{dims} = {format_size(declaration.bytes + declaration.heap_bytes)}")
+
+    unresolved = [result for result in results if result.unresolved]
+    if unresolved:
+        names = sorted(set().union(*(result.unresolved for result in unresolved)))
+        print(f"❓ {len(unresolved)} 个代码块含无法计算的大小 (未计入)，涉及: {', '.join(names[:12])}"
+              f"{' ...' if len(names) > 12 else ''}，可用 -D 指定")
+
+    total = sum(result.total_bytes for result in results)
+    exceeded = False
+    if selected:
+        exceeded = total > limit
+        print(f"📊 合计 {format_size(total)} (静态 {format_size(sum(r.static_bytes for r in results))}, "
+              f"堆 {format_size(sum(r.heap_bytes for r in results))}) / 限制 {args.limit:g}MB")
+        if exceeded:
+            print(f"⚠️  超过内存限制 {args.limit:g}MB")
+    else:
+        over = [result for result in results if result.total_bytes > limit]
+        if over:
+            print(f"⚠️  {len(over)} 个代码块单独超过 {args.limit:g}MB")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'limit_mb': args.limit, 'total_bytes': total,
+                       'blocks': [result.to_dict() for result in results]}, f, ensure_ascii=False, indent=2)
+
+    sys.exit(1 if exceeded else 0)
+
+
+if __name__ == '__main__':
+    main()
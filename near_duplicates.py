@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+近似重复代码检测
+把模板、bitset.txt、Python-Guide.tex (以及其他队伍的模板目录) 中的每个代码块切分为词法单元，
+对连续 k 个单元的 shingle 计算 MinHash 签名，用 LSH 分段分桶找出候选对 (不需要两两比较)，
+再用精确的 Jaccard 相似度确认，按簇输出相似度、可合并的行数和差异
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import difflib
+import hashlib
+import argparse
+from array import array
+
+from tex_index import TexIndex
+from cpp_lexer import TOKEN_PATTERN as CPP_TOKEN_PATTERN
+from format_cache import FormatCache, rules_version, default_cache_path
+
+DEFAULT_INPUTS = ['Algorithm-template.tex', 'bitset.txt', 'Python-Guide.tex']
+DEFAULT_THRESHOLD = 0.6
+DEFAULT_SHINGLE = 5
+DEFAULT_PERMUTATIONS = 128
+DEFAULT_MIN_TOKENS = 30
+DEFAULT_DIFF_LINES = 30
+DEFAULT_SEED = 1
+
+SOURCE_EXTENSIONS = {'.cpp': 'cpp', '.cc': 'cpp', '.cxx': 'cpp', '.h': 'cpp', '.hpp': 'cpp', '.py': 'python'}
+BLOCK_COMMENT_PATTERN = re.compile(r'/\*.*?\*/', re.S)
+PYTHON_COMMENT_PATTERN = re.compile(r'#.*')
+FENCE_PATTERN = re.compile(r'^```(\w*)[^\n]*\n(.*?)^```', re.S | re.M)
+# 纯文本中看起来像代码的行：预处理指令、注释、以 ; { } 结尾或以常见关键字开头
+CODE_LINE_PATTERN = re.compile(r'^\s*(?:#\s*(?:include|define)|//|/\*|[{}])|[;{}]\s*(?://.*)?$'
+                               r'|^\s*(?:for|while|if|else|return|int|void|struct|template|using|typedef)\b')
+
+
+class Fragment:
+    """语料中的一个代码块"""
+
+    def __init__(self, source, name, line, end_line, language, code):
+        self.source = source
+        self.name = name
+        self.line = line
+        self.end_line = end_line
+        self.language = language
+        self.code = code
+        self.tokens = tokenize(code, language)
+        self._shingles = None
+
+    @property
+    def label(self):
+        return f'{self.source}:{self.line}'
+
+    @property
+    def lines(self):
+        return self.code.count('\n') + 1
+
+    def shingles(self, k):
+        """连续 k 个词法单元的集合，每个 shingle 取 8 字节哈希"""
+        if self._shingles is None:
+            self._shingles = {hashlib.blake2b('\0'.join(self.tokens[i:i + k]).encode('utf-8'), digest_size=8).digest()
+                              for i in range(max(1, len(self.tokens) - k + 1))}
+        return self._shingles
+
+    def to_dict(self):
+        return {'source': self.source, 'name': self.name, 'line': self.line, 'end_line': self.end_line,
+                'language': self.language, 'tokens': len(self.tokens)}
+
+
+def tokenize(code, language):
+    """去掉注释和空白后的词法单元序列"""
+    code = BLOCK_COMMENT_PATTERN.sub(' ', code)
+    if language == 'python':
+        code = PYTHON_COMMENT_PATTERN.sub('', code)
+    tokens = []
+    for match in CPP_TOKEN_PATTERN.finditer(code):
+        if match.lastgroup not in ('ws', 'comment'):
+            tokens.append(match.group())
+    return tokens
+
+
+def tex_fragments(path):
+    index = TexIndex.load(path)
+    fragments = []
+    for section in index.sections():
+        for k, block in enumerate(section.blocks, 1):
+            name = '/'.join(section.path) + (f' #{k}' if len(section.blocks) > 1 else '')
+            fragments.append(Fragment(path, name, block.line, block.end_line, block.language.lower(),
+                                      index.block_code(block)))
+    return fragments
+
+
+def text_fragments(path):
+    """纯文本 (如 bitset.txt) 中连续的代码行，中间可以有空行"""
+    with open(path, 'r', encoding='utf-8') as f:
+        lines = f.read().split('\n')
+    fragments, start, last = [], None, None
+
+    def close():
+        if start is not None:
+            code = '\n'.join(lines[start:last + 1])
+            fragments.append(Fragment(path, f'第{len(fragments) + 1}段代码', start + 1, last + 1, 'cpp', code))
+
+    for i, line in enumerate(lines):
+        if not line.strip():
+            continue
+        if CODE_LINE_PATTERN.search(line):
+            if start is None:
+                start = i
+            last = i
+        else:
+            close()
+            start = last = None
+    close()
+    return fragments
+
+
+def markdown_fragments(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        content = f.read()
+    fragments = []
+    for match in FENCE_PATTERN.finditer(content):
+        line = content.count('\n', 0, match.start()) + 1
+        code = match.group(2).rstrip('\n')
+        fragments.append(Fragment(path, f'代码块 {len(fragments) + 1}', line, line + code.count('\n') + 2,
+                                  match.group(1).lower() or 'cpp', code))
+    return fragments
+
+
+def collect_fragments(inputs):
+    """按输入类型提取代码块；目录中的 .cpp/.h/.py 等源文件各作为一个代码块"""
+    fragments = []
+    for path in inputs:
+        if os.path.isdir(path):
+            for directory, _, files in sorted(os.walk(path)):
+                for name in sorted(files):
+                    language = SOURCE_EXTENSIONS.get(os.path.splitext(name)[1].lower())
+                    if language is None:
+                        continue
+                    file_path = os.path.join(directory, name)
+                    with open(file_path, 'r', encoding='utf-8', errors='replace') as f:
+                        code = f.read().rstrip('\n')
+                    fragments.append(Fragment(file_path, name, 1, code.count('\n') + 1, language, code))
+            continue
+        extension = os.path.splitext(path)[1].lower()
+        if extension == '.tex':
+            fragments.extend(tex_fragments(path))
+        elif extension == '.md':
+            fragments.extend(markdown_fragments(path))
+        elif extension in SOURCE_EXTENSIONS:
+            with open(path, 'r', encoding='utf-8', errors='replace') as f:
+                code = f.read().rstrip('\n')
+            fragments.append(Fragment(path, os.path.basename(path), 1, code.count('\n') + 1,
+                                      SOURCE_EXTENSIONS[extension], code))
+        else:
+            fragments.extend(text_fragments(path))
+    return fragments
+
+
+def lsh_parameters(permutations, threshold):
+    """选择 段数 × 每段行数，使相似度低于阈值的误报与高于阈值的漏报 (按相似度积分) 之和最小"""
+    def integrate(function, low, high, steps=100):
+        width = (high - low) / steps
+        return sum(function(low + (i + 0.5) * width) for i in range(steps)) * width
+
+    best = None
+    for bands in range(1, permutations + 1):
+        for rows in range(1, permutations // bands + 1):
+            false_positive = integrate(lambda s: 1 - (1 - s ** rows) ** bands, 0.0, threshold)
+            false_negative = integrate(lambda s: (1 - s ** rows) ** bands, threshold, 1.0)
+            error = false_positive + false_negative
+            if best is None or error < best[0]:
+                best = (error, bands, rows)
+    return best[1], best[2]
+
+
+class MinHasher:
+    """k-shingle 集合的 MinHash 签名，签名按代码内容缓存
+
+    第 i 个哈希函数取 shake_128(种子 + shingle) 输出的第 i 个 32 位整数，
+    一次调用得到一个 shingle 在全部哈希函数下的值，逐位取最小值在 C 层完成
+    """
+
+    def __init__(self, permutations=DEFAULT_PERMUTATIONS, shingle=DEFAULT_SHINGLE, seed=DEFAULT_SEED,
+                 cache=None):
+        self.permutations = permutations
+        self.seed = seed.to_bytes(8, 'little')
+        self.shingle = shingle
+        self.cache = cache
+        self.salt = f'{permutations}:{shingle}:{seed}'
+
+    def signature(self, fragment):
+        key = '\0'.join(fragment.tokens)
+        if self.cache is not None:
+            cached = self.cache.get(key, self.salt)
+            if cached is not None:
+                return list(array('I', bytes.fromhex(cached)))
+        rows = []
+        for shingle in fragment.shingles(self.shingle):
+            rows.append(array('I', hashlib.shake_128(self.seed + shingle).digest(4 * self.permutations)))
+        signature = list(map(min, zip(*rows)))
+        if self.cache is not None:
+            self.cache.put(key, array('I', signature).tobytes().hex(), self.salt)
+        return signature
+
+
+def candidate_pairs(signatures, bands, rows):
+    """LSH：签名按段分桶，至少一段完全相同的两个代码块成为候选对"""
+    pairs = set()
+    for band in range(bands):
+        buckets = {}
+        for i, signature in enumerate(signatures):
+            buckets.setdefault(tuple(signature[band * rows:(band + 1) * rows]), []).append(i)
+        for members in buckets.values():
+            for x in range(len(members)):
+                for y in range(x + 1, len(members)):
+                    pairs.add((members[x], members[y]))
+    return pairs
+
+
+def jaccard(a, b):
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+
+class Cluster:
+    def __init__(self, members, edges):
+        self.members = members
+        self.edges = edges
+        # 与簇内其他代码块相似度之和最大的作为代表
+        totals = {i: 0.0 for i in members}
+        for (x, y), similarity in edges.items():
+            totals[x] += similarity
+            totals[y] += similarity
+        self.representative = max(members, key=lambda i: (totals[i], -i))
+
+    @property
+    def similarities(self):
+        return list(self.edges.values())
+
+
+def find_clusters(fragments, threshold=DEFAULT_THRESHOLD, hasher=None):
+    """返回 (簇列表, 候选对数, (段数, 每段行数))"""
+    hasher = hasher or MinHasher()
+    bands, rows = lsh_parameters(hasher.permutations, threshold)
+    signatures = [hasher.signature(fragment) for fragment in fragments]
+    pairs = candidate_pairs(signatures, bands, rows)
+
+    parent = list(range(len(fragments)))
+
+    def find(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    edges = {}
+    for x, y in sorted(pairs):
+        similarity = jaccard(fragments[x].shingles(hasher.shingle), fragments[y].shingles(hasher.shingle))
+        if similarity >= threshold:
+            edges[(x, y)] = similarity
+            parent[find(x)] = find(y)
+
+    groups = {}
+    for i in range(len(fragments)):
+        groups.setdefault(find(i), []).append(i)
+    clusters = []
+    for members in groups.values():
+        if len(members) > 1:
+            member_set = set(members)
+            clusters.append(Cluster(members, {edge: value for edge, value in edges.items() if edge[0] in member_set}))
+    clusters.sort(key=lambda cluster: (-max(cluster.similarities), cluster.members[0]))
+    return clusters, len(pairs), (bands, rows)
+
+
+def fragment_diff(a, b, limit=DEFAULT_DIFF_LINES):
+    lines = list(difflib.unified_diff(a.code.split('\n'), b.code.split('\n'), a.label, b.label,
+                                      lineterm='', n=1))
+    if limit and len(lines) > limit:
+        lines = lines[:limit] + [f'... (共 {len(lines)} 行差异)']
+    return lines
+
+
+def saved_lines(cluster, fragments):
+    """只保留代表时可以省去的行数"""
+    return sum(fragments[i].lines for i in cluster.members if i != cluster.representative)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='用 MinHash + LSH 查找近似重复的代码块')
+    parser.add_argument('inputs', nargs='*', default=DEFAULT_INPUTS,
+                       help=f'.tex/.md/.txt 文件、源文件或目录 (默认: {" ".join(DEFAULT_INPUTS)})')
+    parser.add_argument('-t', '--threshold', type=float, default=DEFAULT_THRESHOLD,
+                       help=f'Jaccard 相似度阈值 (默认: {DEFAULT_THRESHOLD})')
+    parser.add_argument('-k', '--shingle', type=int, default=DEFAULT_SHINGLE,
+                       help=f'shingle 包含的词法单元数 (默认: {DEFAULT_SHINGLE})')
+    parser.add_argument('--permutations', type=int, default=DEFAULT_PERMUTATIONS,
+                       help=f'MinHash 签名长度 (默认: {DEFAULT_PERMUTATIONS})')
+    parser.add_argument('--min-tokens', type=int, default=DEFAULT_MIN_TOKENS,
+                       help=f'忽略词法单元少于该数的代码块 (默认: {DEFAULT_MIN_TOKENS})')
+    parser.add_argument('--diff-lines', type=int, default=DEFAULT_DIFF_LINES,
+                       help=f'每对代码块最多显示的差异行数，0 表示不显示 (默认: {DEFAULT_DIFF_LINES})')
+    parser.add_argument('--no-cache', action='store_true',
+                       help='不使用签名缓存')
+    parser.add_argument('--json', help='把结果写入JSON文件')
+
+    args = parser.parse_args()
+
+    if not 0 < args.threshold <= 1:
+        print("错误: 相似度阈值应在 (0, 1] 之间")
+        sys.exit(1)
+    for path in args.inputs:
+        if not os.path.exists(path):
+            print(f"错误: 文件 {path} 不存在")
+            sys.exit(1)
+
+    started = time.perf_counter()
+    fragments = [fragment for fragment in collect_fragments(args.inputs) if len(fragment.tokens) >= args.min_tokens]
+    cache = None
+    if not args.no_cache:
+        cache = FormatCache(default_cache_path(args.inputs[0], 'minhash'), rules_version(__file__))
+    hasher = MinHasher(args.permutations, args.shingle, cache=cache)
+    clusters, candidates, (bands, rows) = find_clusters(fragments, args.threshold, hasher)
+    if cache is not None:
+        cache.save()
+    elapsed = time.perf_counter() - started
+
+    print(f"🔍 {len(args.inputs)} 个输入，{len(fragments)} 个代码块；LSH {bands} 段 × {rows} 行，"
+          f"候选 {candidates} 对 (共 {len(fragments) * (len(fragments) - 1) // 2} 对)，用时 {elapsed:.2f}s")
+    if not clusters:
+        print(f"✅ 没有相似度 ≥ {args.threshold} 的代码块")
+
+    for number, cluster in enumerate(clusters, 1):
+        similarities = cluster.similarities
+        print(f"\n📦 簇 {number}: {len(cluster.members)} 个代码块，相似度 "
+              f"{min(similarities):.2f}-{max(similarities):.2f}，只保留一份可省 {saved_lines(cluster, fragments)} 行")
+        for i in cluster.members:
+            fragment = fragments[i]
+            mark = '*' if i == cluster.representative else ' '
+            print(f"  {mark} {fragment.label}  {fragment.name}  ({fragment.lines} 行)")
+        if args.diff_lines:
+            representative = fragments[cluster.representative]
+            for i in cluster.members:
+                if i != cluster.representative:
+                    for line in fragment_diff(representative, fragments[i], args.diff_lines):
+                        print(f"    {line}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({
+                'threshold': args.threshold, 'bands': bands, 'rows': rows, 'candidates': candidates,
+                'blocks': len(fragments),
+                'clusters': [{
+                    'representative': fragments[cluster.representative].to_dict(),
+                    'members': [fragments[i].to_dict() for i in cluster.members],
+                    'pairs': [{'a': fragments[x].label, 'b': fragments[y].label, 'similarity': round(value, 4)}
+                              for (x, y), value in sorted(cluster.edges.items())],
+                    'saved_lines': saved_lines(cluster, fragments),
+                } for cluster in clusters],
+            }, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,953 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+参考 PDF 的文本提取与检索
+纯 Python 实现，不依赖第三方库：按 xref 定位对象，只在需要时解压 FlateDecode 内容流，
+用 ToUnicode CMap 或字体编码把字形还原为文字 (含中文)。逐页并行提取，
+结果按 PDF 内容的哈希缓存，之后只在缓存的页面文本上建立检索索引，返回 文件、页码和片段
+"""
+
+import os
+import re
+import sys
+import json
+import mmap
+import time
+import zlib
+import hashlib
+import unicodedata
+import base64
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+from tex_search import tokenize, write_search_index, SearchIndex, open_search_index, print_hits
+from tex_search import TOKEN_PATTERN as TOKEN_PATTERN_TEXT
+
+DEFAULT_PDFS = ['Nemesis.pdf', 'SSerxhs 的 ICPC 模板.pdf']
+DEFAULT_CACHE_DIR = '.pdf_cache'
+# 提取结果格式版本，修改提取逻辑时递增
+EXTRACT_VERSION = 1
+
+WHITESPACE = b'\x00\t\n\x0c\r '
+WHITESPACE_PATTERN = re.compile(rb'(?:[\x00\t\n\x0c\r ]+|%[^\r\n]*)*')
+REF_PATTERN = re.compile(rb'(\d+)[\x00\t\n\x0c\r ]+(\d+)[\x00\t\n\x0c\r ]+R(?![^\x00\t\n\x0c\r ()<>\[\]{}/%])')
+OBJECT_HEADER_PATTERN = re.compile(rb'[\x00\t\n\x0c\r ]*(\d+)[\x00\t\n\x0c\r ]+(\d+)[\x00\t\n\x0c\r ]+obj')
+TOKEN_PATTERN = re.compile(rb'''
+    (?P<number>[+-]?(?:\d+\.?\d*|\.\d+))
+  | (?P<string>\((?:[^()\\]|\\.|\((?:[^()\\]|\\.)*\))*\))
+  | (?P<hex><[0-9A-Fa-f\x00\t\n\x0c\r ]*>)
+  | (?P<name>/[^\x00\t\n\x0c\r ()<>\[\]{}/%]*)
+  | (?P<keyword>[^\x00\t\n\x0c\r ()<>\[\]{}/%]+)
+''', re.S | re.X)
+NAME_ESCAPE_PATTERN = re.compile(rb'#([0-9A-Fa-f]{2})')
+LITERAL_ESCAPE_PATTERN = re.compile(rb'\\([0-7]{1,3}|\r\n|[\s\S])')
+LITERAL_ESCAPES = {b'n': b'\n', b'r': b'\r', b't': b'\t', b'b': b'\b', b'f': b'\f',
+                   b'\n': b'', b'\r': b'', b'\r\n': b''}
+STARTXREF_PATTERN = re.compile(rb'startxref[\x00\t\n\x0c\r ]+(\d+)')
+XREF_SUBSECTION_PATTERN = re.compile(rb'(\d+)[ \t]+(\d+)')
+CONTENT_TOKEN_PATTERN = re.compile(rb'''
+    (?:[\x00\t\n\x0c\r ]+|%[^\r\n]*)*
+    (?:
+        (?P<number>[+-]?(?:\d+\.?\d*|\.\d+))
+      | (?P<string>\((?:[^()\\]|\\.|\((?:[^()\\]|\\.)*\))*\))
+      | (?P<hex><[0-9A-Fa-f\x00\t\n\x0c\r ]*>)
+      | (?P<name>/[^\x00\t\n\x0c\r ()<>\[\]{}/%]*)
+      | (?P<open>\[|<<)
+      | (?P<close>\]|>>)
+      | (?P<keyword>[^\x00\t\n\x0c\r ()<>\[\]{}/%]+)
+    )
+''', re.S | re.X)
+INLINE_IMAGE_END_PATTERN = re.compile(rb'[\x00\t\n\x0c\r ]EI(?=[\x00\t\n\x0c\r ]|$)')
+
+
+class Name(str):
+    """PDF 名字对象 /Name，与字符串 (bytes) 区分"""
+
+
+class Keyword(str):
+    """内容流中的操作符或 obj/stream 等关键字"""
+
+
+class Ref:
+    __slots__ = ('num', 'gen')
+
+    def __init__(self, num, gen):
+        self.num = num
+        self.gen = gen
+
+    def __repr__(self):
+        return f'{self.num} {self.gen} R'
+
+
+class Stream:
+    """流对象，原始数据只记录位置，需要时才解码"""
+
+    def __init__(self, attrs, data, start, length):
+        self.attrs = attrs
+        self.data = data
+        self.start = start
+        self.length = length
+
+    def raw(self):
+        return bytes(self.data[self.start:self.start + self.length])
+
+    def decode(self, document=None):
+        content = self.raw()
+        resolve = document.resolve if document is not None else (lambda obj: obj)
+        filters = resolve(self.attrs.get('Filter'))
+        params = resolve(self.attrs.get('DecodeParms'))
+        if not isinstance(filters, list):
+            filters = [] if filters is None else [filters]
+        if not isinstance(params, list):
+            params = [params] * len(filters)
+        for name, param in zip(filters, params):
+            content = apply_filter(resolve(name), content, resolve(param) or {})
+        return content
+
+
+def unescape_literal(content):
+    def replace(match):
+        escape = match.group(1)
+        if escape in LITERAL_ESCAPES:
+            return LITERAL_ESCAPES[escape]
+        if escape[:1].isdigit():
+            return bytes([int(escape, 8) & 0xFF])
+        return escape
+    return LITERAL_ESCAPE_PATTERN.sub(replace, content)
+
+
+def decode_name(token):
+    name = token[1:]
+    if b'#' in name:
+        name = NAME_ESCAPE_PATTERN.sub(lambda m: bytes([int(m.group(1), 16)]), name)
+    return Name(name.decode('utf-8', 'replace'))
+
+
+def parse_object(data, pos, refs=True):
+    """从 pos 开始读取一个对象，返回 (对象, 结束位置)；refs 为 False 时不识别间接引用 (内容流中没有)"""
+    pos = WHITESPACE_PATTERN.match(data, pos).end()
+    head = data[pos:pos + 2]
+    if head == b'<<':
+        attrs = {}
+        pos += 2
+        while True:
+            pos = WHITESPACE_PATTERN.match(data, pos).end()
+            if data[pos:pos + 2] == b'>>':
+                return attrs, pos + 2
+            key, pos = parse_object(data, pos, refs)
+            if not isinstance(key, Name):
+                raise ValueError(f"字典的键不是名字 (位置 {pos})")
+            attrs[key], pos = parse_object(data, pos, refs)
+    if head[:1] == b'[':
+        items = []
+        pos += 1
+        while True:
+            pos = WHITESPACE_PATTERN.match(data, pos).end()
+            if data[pos:pos + 1] == b']':
+                return items, pos + 1
+            if pos >= len(data):
+                raise ValueError("数组没有结束")
+            item, pos = parse_object(data, pos, refs)
+            items.append(item)
+    if refs:
+        match = REF_PATTERN.match(data, pos)
+        if match:
+            return Ref(int(match.group(1)), int(match.group(2))), match.end()
+
+    match = TOKEN_PATTERN.match(data, pos)
+    if match is None:
+        raise ValueError(f"无法解析的内容 {bytes(data[pos:pos + 20])!r} (位置 {pos})")
+    kind, token = match.lastgroup, match.group()
+    if kind == 'number':
+        value = float(token) if b'.' in token else int(token)
+    elif kind == 'string':
+        value = unescape_literal(token[1:-1])
+    elif kind == 'hex':
+        digits = bytes(token[1:-1]).translate(None, WHITESPACE)
+        value = bytes.fromhex((digits + b'0' * (len(digits) % 2)).decode('ascii'))
+    elif kind == 'name':
+        value = decode_name(token)
+    else:
+        word = token.decode('latin-1')
+        value = {'true': True, 'false': False, 'null': None}.get(word, Keyword(word))
+    return value, match.end()
+
+
+def iter_operations(data):
+    """逐个产生内容流中的 (操作符, 操作数列表)；整个流用一个正则顺序扫描，数组和字典用栈组装"""
+    pos, end = 0, len(data)
+    while pos < end:
+        stack = [[]]
+        for match in CONTENT_TOKEN_PATTERN.finditer(data, pos):
+            kind = match.lastgroup
+            token = match.group(kind)
+            if kind == 'number':
+                stack[-1].append(float(token) if b'.' in token else int(token))
+            elif kind == 'hex':
+                digits = token[1:-1].translate(None, WHITESPACE)
+                stack[-1].append(bytes.fromhex((digits + b'0' * (len(digits) % 2)).decode('ascii')))
+            elif kind == 'string':
+                content = token[1:-1]
+                stack[-1].append(unescape_literal(content) if b'\\' in content else content)
+            elif kind == 'name':
+                stack[-1].append(decode_name(token))
+            elif kind == 'open':
+                stack.append([token])
+            elif kind == 'close':
+                if len(stack) > 1:
+                    items = stack.pop()
+                    opener = items.pop(0)
+                    stack[-1].append(dict(zip(items[::2], items[1::2])) if opener == b'<<' else items)
+            else:
+                word = token.decode('latin-1')
+                if word in ('true', 'false', 'null'):
+                    stack[-1].append({'true': True, 'false': False, 'null': None}[word])
+                    continue
+                operands = stack[0]
+                stack = [[]]
+                if word == 'ID':
+                    # 内嵌图像的二进制数据，跳到 EI 之后继续扫描
+                    image_end = INLINE_IMAGE_END_PATTERN.search(data, match.end())
+                    pos = image_end.end() if image_end else end
+                    break
+                yield Keyword(word), operands
+        else:
+            return
+
+
+def png_unpredict(content, columns, colors=1, bits=8):
+    """PNG 预测器 (Predictor >= 10)，xref 流常用"""
+    pixel = max(1, colors * bits // 8)
+    row_length = (columns * colors * bits + 7) // 8
+    previous = bytearray(row_length)
+    output = bytearray()
+    for start in range(0, len(content), row_length + 1):
+        kind = content[start]
+        row = bytearray(content[start + 1:start + 1 + row_length])
+        for i in range(len(row)):
+            left = row[i - pixel] if i >= pixel else 0
+            up = previous[i]
+            if kind == 1:
+                row[i] = (row[i] + left) & 0xFF
+            elif kind == 2:
+                row[i] = (row[i] + up) & 0xFF
+            elif kind == 3:
+                row[i] = (row[i] + (left + up) // 2) & 0xFF
+            elif kind == 4:
+                upper_left = previous[i - pixel] if i >= pixel else 0
+                estimate = left + up - upper_left
+                a, b, c = abs(estimate - left), abs(estimate - up), abs(estimate - upper_left)
+                row[i] = (row[i] + (left if a <= b and a <= c else up if b <= c else upper_left)) & 0xFF
+        output += row
+        previous = row
+    return bytes(output)
+
+
+def apply_filter(name, content, params):
+    if name in ('FlateDecode', 'Fl'):
+        try:
+            content = zlib.decompress(content)
+        except zlib.error:
+            # 部分生成器写出的流缺少校验和
+            content = zlib.decompressobj().decompress(content)
+        predictor = params.get('Predictor', 1)
+        if predictor >= 10:
+            return png_unpredict(content, params.get('Columns', 1), params.get('Colors', 1),
+                                 params.get('BitsPerComponent', 8))
+        if predictor != 1:
+            raise ValueError(f"不支持的预测器 {predictor}")
+        return content
+    if name in ('ASCIIHexDecode', 'AHx'):
+        digits = content.split(b'>', 1)[0].translate(None, WHITESPACE)
+        return bytes.fromhex((digits + b'0' * (len(digits) % 2)).decode('ascii'))
+    if name in ('ASCII85Decode', 'A85'):
+        return base64.a85decode(content.strip().removesuffix(b'~>'), adobe=False)
+    raise ValueError(f"不支持的过滤器 {name}")
+
+
+class Document:
+    """以 mmap 打开 PDF，按 xref 在需要时读取对象，对象流解压后缓存"""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'rb')
+        try:
+            self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self.file.close()
+            raise ValueError(f"{path} 是空文件")
+        self.xref = {}
+        self.trailer = {}
+        self.objects = {}
+        self.object_streams = {}
+        self.read_xref()
+
+    def close(self):
+        self.data.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def read_xref(self):
+        tail = self.data[max(0, len(self.data) - 2048):]
+        matches = list(STARTXREF_PATTERN.finditer(tail))
+        if not matches:
+            raise ValueError(f"{self.path} 没有 startxref，不是有效的 PDF")
+        offset, visited = int(matches[-1].group(1)), set()
+        # 从最新的 xref 开始，沿 /Prev 向前，较新的条目优先
+        while offset is not None and offset not in visited:
+            visited.add(offset)
+            pos = WHITESPACE_PATTERN.match(self.data, offset).end()
+            if self.data[pos:pos + 4] == b'xref':
+                trailer = self.read_xref_table(pos + 4)
+                if 'XRefStm' in trailer:
+                    self.read_xref_stream(trailer['XRefStm'])
+            else:
+                trailer = self.read_xref_stream(offset)
+            for key, value in trailer.items():
+                self.trailer.setdefault(key, value)
+            offset = trailer.get('Prev')
+
+    def read_xref_table(self, pos):
+        while True:
+            pos = WHITESPACE_PATTERN.match(self.data, pos).end()
+            if self.data[pos:pos + 7] == b'trailer':
+                trailer, _ = parse_object(self.data, pos + 7)
+                return trailer
+            match = XREF_SUBSECTION_PATTERN.match(self.data, pos)
+            if match is None:
+                raise ValueError(f"xref 表格式错误 (位置 {pos})")
+            first, count = int(match.group(1)), int(match.group(2))
+            pos = WHITESPACE_PATTERN.match(self.data, match.end()).end()
+            for i in range(count):
+                entry = self.data[pos:pos + 20]
+                if entry[17:18] == b'n':
+                    self.xref.setdefault(first + i, ('offset', int(entry[:10])))
+                elif entry[17:18] == b'f':
+                    self.xref.setdefault(first + i, ('free', 0))
+                pos += 20
+
+    def read_xref_stream(self, offset):
+        stream = self.read_object_at(offset)
+        if not isinstance(stream, Stream):
+            raise ValueError(f"{self.path}: 位置 {offset} 处不是 xref 流")
+        attrs = stream.attrs
+        widths = attrs['W']
+        index = attrs.get('Index', [0, attrs['Size']])
+        content = stream.decode()
+        pos = 0
+        for first, count in zip(index[::2], index[1::2]):
+            for num in range(first, first + count):
+                fields = []
+                for width in widths:
+                    fields.append(int.from_bytes(content[pos:pos + width], 'big') if width else None)
+                    pos += width
+                kind = 1 if fields[0] is None else fields[0]
+                if kind == 1:
+                    self.xref.setdefault(num, ('offset', fields[1]))
+                elif kind == 2:
+                    self.xref.setdefault(num, ('compressed', fields[1], fields[2]))
+                else:
+                    self.xref.setdefault(num, ('free', 0))
+        return attrs
+
+    def read_object_at(self, offset):
+        match = OBJECT_HEADER_PATTERN.match(self.data, offset)
+        if match is None:
+            raise ValueError(f"{self.path}: 位置 {offset} 处没有对象")
+        value, pos = parse_object(self.data, match.end())
+        if isinstance(value, dict):
+            after = WHITESPACE_PATTERN.match(self.data, pos).end()
+            if self.data[after:after + 6] == b'stream':
+                start = after + 6
+                if self.data[start:start + 2] == b'\r\n':
+                    start += 2
+                elif self.data[start:start + 1] in (b'\n', b'\r'):
+                    start += 1
+                length = value.get('Length')
+                if isinstance(length, Ref):
+                    length = self.get(length.num)
+                if not isinstance(length, int) or self.data[start + length:start + length + 20].find(b'endstream') < 0:
+                    # /Length 不可信时找 endstream
+                    length = self.data.find(b'endstream', start) - start
+                    while length > 0 and self.data[start + length - 1] in WHITESPACE:
+                        length -= 1
+                return Stream(value, self.data, start, length)
+        return value
+
+    def get(self, num):
+        if num in self.objects:
+            return self.objects[num]
+        entry = self.xref.get(num)
+        value = None
+        if entry is not None and entry[0] == 'offset':
+            value = self.read_object_at(entry[1])
+        elif entry is not None and entry[0] == 'compressed':
+            value = self.read_compressed(entry[1], entry[2])
+        self.objects[num] = value
+        return value
+
+    def read_compressed(self, stream_num, index):
+        if stream_num not in self.object_streams:
+            stream = self.get(stream_num)
+            content = stream.decode(self)
+            count, first = self.resolve(stream.attrs['N']), self.resolve(stream.attrs['First'])
+            numbers = [int(token) for token in content[:first].split()[:2 * count]]
+            self.object_streams[stream_num] = (content, first, numbers[1::2])
+        content, first, offsets = self.object_streams[stream_num]
+        value, _ = parse_object(content, first + offsets[index])
+        return value
+
+    def resolve(self, obj):
+        while isinstance(obj, Ref):
+            obj = self.get(obj.num)
+        return obj
+
+    def pages(self):
+        """按顺序返回页面字典，继承的 Resources 写入每页"""
+        pages = []
+
+        def walk(node, resources, visited):
+            node = self.resolve(node)
+            if not isinstance(node, dict) or id(node) in visited:
+                return
+            visited.add(id(node))
+            resources = node.get('Resources', resources)
+            if 'Kids' in node:
+                for kid in self.resolve(node['Kids']):
+                    walk(kid, resources, visited)
+            else:
+                page = dict(node)
+                page['Resources'] = resources
+                pages.append(page)
+
+        root = self.resolve(self.trailer['Root'])
+        walk(root['Pages'], None, set())
+        return pages
+
+
+# 常用字形名 -> Unicode，其余按 uniXXXX、uXXXX 或单个字符的名字处理
+GLYPH_NAMES = {
+    'space': ' ', 'exclam': '!', 'quotedbl': '"', 'numbersign': '#', 'dollar': '$', 'percent': '%',
+    'ampersand': '&', 'quoteright': '’', 'quotesingle': "'", 'parenleft': '(', 'parenright': ')',
+    'asterisk': '*', 'plus': '+', 'comma': ',', 'hyphen': '-', 'period': '.', 'slash': '/',
+    'zero': '0', 'one': '1', 'two': '2', 'three': '3', 'four': '4', 'five': '5', 'six': '6',
+    'seven': '7', 'eight': '8', 'nine': '9', 'colon': ':', 'semicolon': ';', 'less': '<', 'equal': '=',
+    'greater': '>', 'question': '?', 'at': '@', 'bracketleft': '[', 'backslash': '\\', 'bracketright': ']',
+    'asciicircum': '^', 'circumflex': '^', 'underscore': '_', 'quoteleft': '‘', 'grave': '`',
+    'braceleft': '{', 'bar': '|', 'braceright': '}', 'asciitilde': '~', 'tilde': '~',
+    'endash': '–', 'emdash': '—', 'quotedblleft': '“', 'quotedblright': '”',
+    'bullet': '•', 'ellipsis': '…', 'fi': 'fi', 'fl': 'fl', 'ff': 'ff', 'ffi': 'ffi', 'ffl': 'ffl',
+    'dotlessi': 'ı', 'minus': '−', 'multiply': '×', 'divide': '÷',
+    'periodcentered': '·', 'plusminus': '±', 'degree': '°', 'section': '§',
+    'arrowright': '→', 'arrowleft': '←', 'lessequal': '≤', 'greaterequal': '≥',
+    'notequal': '≠', 'infinity': '∞', 'element': '∈', 'summation': '∑',
+    'product': '∏', 'radical': '√', 'approxequal': '≈',
+}
+GLYPH_UNICODE_PATTERN = re.compile(r'^(?:uni([0-9A-F]{4})|u([0-9A-F]{4,6}))$')
+BUILTIN_ENCODING_PATTERN = re.compile(rb'dup[ \t]+(\d+)[ \t]*/([^\s/]+)[ \t]+put')
+BASE_ENCODINGS = {'WinAnsiEncoding': 'cp1252', 'MacRomanEncoding': 'mac_roman', 'StandardEncoding': 'latin-1'}
+
+
+def glyph_to_unicode(name):
+    name = name.split('.', 1)[0]
+    if '_' in name:
+        return ''.join(glyph_to_unicode(part) for part in name.split('_'))
+    if name in GLYPH_NAMES:
+        return GLYPH_NAMES[name]
+    match = GLYPH_UNICODE_PATTERN.match(name)
+    if match:
+        return chr(int(match.group(1) or match.group(2), 16))
+    return name if len(name) == 1 else ''
+
+
+def utf16_text(data):
+    return data.decode('utf-16-be', 'replace') if len(data) % 2 == 0 else data.decode('latin-1')
+
+
+def parse_cmap(content):
+    """解析 ToUnicode CMap，返回 (编码字节长度集合, 编码 -> 文字)"""
+    lengths, mapping = set(), {}
+    for operator, operands in iter_operations(content):
+        if operator == 'endcodespacerange':
+            lengths.update(len(low) for low in operands[::2] if isinstance(low, bytes))
+        elif operator == 'endbfchar':
+            for source, target in zip(operands[::2], operands[1::2]):
+                if isinstance(source, bytes) and isinstance(target, bytes):
+                    mapping[source] = utf16_text(target)
+        elif operator == 'endbfrange':
+            for low, high, target in zip(operands[::3], operands[1::3], operands[2::3]):
+                if not isinstance(low, bytes) or not isinstance(high, bytes):
+                    continue
+                start, end = int.from_bytes(low, 'big'), int.from_bytes(high, 'big')
+                for offset in range(min(end - start + 1, 0x10000)):
+                    code = (start + offset).to_bytes(len(low), 'big')
+                    if isinstance(target, list):
+                        if offset < len(target):
+                            mapping[code] = utf16_text(target[offset])
+                    elif isinstance(target, bytes) and target:
+                        # 范围内只有最后一个字节递增
+                        last = target[-1] + offset
+                        mapping[code] = utf16_text(target[:-1] + bytes([last & 0xFF])) if last < 256 else \
+                            utf16_text((int.from_bytes(target, 'big') + offset).to_bytes(len(target), 'big'))
+    return lengths, mapping
+
+
+class Font:
+    """把显示字符串切分为编码并转为文字，同时给出每个编码的字宽 (千分之一字号)"""
+
+    def __init__(self, document, attrs):
+        resolve = document.resolve
+        self.composite = attrs.get('Subtype') == 'Type0'
+        self.code_length = 2 if self.composite else 1
+        self.mapping = {}
+        self.widths = {}
+        self.default_width = 500
+
+        cmap = resolve(attrs.get('ToUnicode'))
+        if isinstance(cmap, Stream):
+            try:
+                lengths, self.mapping = parse_cmap(cmap.decode(document))
+                if self.composite and len(lengths) == 1:
+                    self.code_length = lengths.pop()
+            except (ValueError, zlib.error):
+                self.mapping = {}
+
+        if self.composite:
+            descendant = resolve(resolve(attrs.get('DescendantFonts', [{}]))[0])
+            self.default_width = resolve(descendant.get('DW', 1000))
+            widths = resolve(descendant.get('W', []))
+            i = 0
+            while i < len(widths):
+                first = resolve(widths[i])
+                item = resolve(widths[i + 1]) if i + 1 < len(widths) else None
+                if isinstance(item, list):
+                    for k, width in enumerate(item):
+                        self.widths[first + k] = resolve(width)
+                    i += 2
+                else:
+                    for code in range(first, item + 1):
+                        self.widths[code] = resolve(widths[i + 2])
+                    i += 3
+            encoding = resolve(attrs.get('Encoding'))
+            self.unicode_codes = isinstance(encoding, str) and ('UCS2' in encoding or 'UTF16' in encoding)
+            return
+
+        first = resolve(attrs.get('FirstChar', 0))
+        for k, width in enumerate(resolve(attrs.get('Widths', [])) or []):
+            self.widths[first + k] = resolve(width)
+        descriptor = resolve(attrs.get('FontDescriptor')) or {}
+        self.default_width = resolve(descriptor.get('MissingWidth', 0)) or 500
+        self.encoding = self.simple_encoding(document, attrs, descriptor)
+
+    @staticmethod
+    def simple_encoding(document, attrs, descriptor):
+        """单字节字体的 编码 -> 文字：Differences 优先，其次基础编码，最后用嵌入字体自带的编码"""
+        resolve = document.resolve
+        encoding = resolve(attrs.get('Encoding'))
+        base, differences = None, []
+        if isinstance(encoding, str):
+            base = encoding
+        elif isinstance(encoding, dict):
+            base = resolve(encoding.get('BaseEncoding'))
+            differences = resolve(encoding.get('Differences', []))
+
+        table = {}
+        if base in BASE_ENCODINGS:
+            for code in range(32, 256):
+                table[code] = bytes([code]).decode(BASE_ENCODINGS[base], 'replace')
+        else:
+            font_file = resolve(descriptor.get('FontFile'))
+            if isinstance(font_file, Stream):
+                try:
+                    content = font_file.decode(document)
+                    length = resolve(font_file.attrs.get('Length1', len(content)))
+                    for match in BUILTIN_ENCODING_PATTERN.finditer(content[:length]):
+                        table[int(match.group(1))] = glyph_to_unicode(match.group(2).decode('latin-1'))
+                except (ValueError, zlib.error):
+                    pass
+            if not table and base is not None:
+                table = {code: chr(code) for code in range(32, 127)}
+
+        code = 0
+        for item in differences:
+            item = resolve(item)
+            if isinstance(item, int):
+                code = item
+            else:
+                table[code] = glyph_to_unicode(item)
+                code += 1
+        return table
+
+    def decode(self, data):
+        """返回 [(文字, 字宽, 是否为单字节空格)]"""
+        glyphs = []
+        step = self.code_length
+        for i in range(0, len(data) - step + 1, step):
+            code = data[i:i + step]
+            number = int.from_bytes(code, 'big')
+            if code in self.mapping:
+                text = self.mapping[code]
+            elif self.composite:
+                text = chr(number) if self.unicode_codes and number >= 32 else ''
+            else:
+                text = self.encoding.get(number, '')
+            glyphs.append((text, self.widths.get(number, self.default_width), step == 1 and number == 32))
+        return glyphs
+
+
+def multiply(a, b):
+    """3x3 仿射矩阵 [a b c d e f] 相乘"""
+    return [a[0] * b[0] + a[1] * b[2], a[0] * b[1] + a[1] * b[3],
+            a[2] * b[0] + a[3] * b[2], a[2] * b[1] + a[3] * b[3],
+            a[4] * b[0] + a[5] * b[2] + b[4], a[4] * b[1] + a[5] * b[3] + b[5]]
+
+
+IDENTITY = [1.0, 0.0, 0.0, 1.0, 0.0, 0.0]
+
+
+class PageText:
+    """解释内容流中的文本操作，按文字在页面上的位置插入换行和空格"""
+
+    # 纵向位移超过字号的该比例时换行，横向空隙超过该比例时加空格
+    LINE_GAP = 0.5
+    WORD_GAP = 0.15
+    MAX_FORM_DEPTH = 5
+
+    def __init__(self, document, fonts):
+        self.document = document
+        self.fonts = fonts
+        self.parts = []
+        self.last = None
+
+    def font(self, resources, name):
+        attrs_ref = (self.document.resolve(resources.get('Font')) or {}).get(name)
+        key = attrs_ref.num if isinstance(attrs_ref, Ref) else id(attrs_ref)
+        if key not in self.fonts:
+            attrs = self.document.resolve(attrs_ref)
+            self.fonts[key] = Font(self.document, attrs) if isinstance(attrs, dict) else None
+        return self.fonts[key]
+
+    def emit(self, text, x, y, advance, size):
+        """在 (x, y) 处输出文字，advance 为文字的水平宽度"""
+        if self.last is not None:
+            last_x, last_y, last_size = self.last
+            if abs(y - last_y) > self.LINE_GAP * max(size, last_size):
+                self.parts.append('\n')
+            elif x - last_x > self.WORD_GAP * max(size, last_size) and self.parts and \
+                    not self.parts[-1].endswith((' ', '\n')) and not text.startswith(' '):
+                self.parts.append(' ')
+        self.parts.append(text)
+        self.last = (x + advance, y, size)
+
+    def run(self, content, resources, ctm=IDENTITY, depth=0):
+        resolve = self.document.resolve
+        resources = resolve(resources) or {}
+        stack = []
+        font, size = None, 0.0
+        char_spacing = word_spacing = rise = 0.0
+        scale, leading = 1.0, 0.0
+        matrix = line = IDENTITY
+
+        def show(data):
+            nonlocal matrix
+            if font is None or not isinstance(data, bytes):
+                return
+            for text, width, is_space in font.decode(data):
+                advance = (width / 1000 * size + char_spacing + (word_spacing if is_space else 0.0)) * scale
+                if text:
+                    # 文本空间到页面坐标
+                    device = multiply(matrix, ctm)
+                    self.emit(text, device[4] + rise * device[2], device[5] + rise * device[3],
+                              abs(advance * device[0]), size * (abs(device[3]) or abs(device[2]) or 1.0))
+                matrix = [matrix[0], matrix[1], matrix[2], matrix[3],
+                          matrix[4] + advance * matrix[0], matrix[5] + advance * matrix[1]]
+
+        for operator, operands in iter_operations(content):
+            try:
+                if operator == 'q':
+                    stack.append(ctm)
+                elif operator == 'Q':
+                    ctm = stack.pop() if stack else ctm
+                elif operator == 'cm' and len(operands) == 6:
+                    ctm = multiply([float(value) for value in operands], ctm)
+                elif operator == 'BT':
+                    matrix = line = IDENTITY
+                elif operator == 'Tf' and len(operands) == 2:
+                    font, size = self.font(resources, operands[0]), float(operands[1])
+                elif operator == 'Tc':
+                    char_spacing = float(operands[0])
+                elif operator == 'Tw':
+                    word_spacing = float(operands[0])
+                elif operator == 'Tz':
+                    scale = float(operands[0]) / 100
+                elif operator == 'TL':
+                    leading = float(operands[0])
+                elif operator == 'Ts':
+                    rise = float(operands[0])
+                elif operator in ('Td', 'TD'):
+                    tx, ty = float(operands[0]), float(operands[1])
+                    if operator == 'TD':
+                        leading = -ty
+                    matrix = line = multiply([1.0, 0.0, 0.0, 1.0, tx, ty], line)
+                elif operator == 'Tm' and len(operands) == 6:
+                    matrix = line = [float(value) for value in operands]
+                elif operator == 'T*':
+                    matrix = line = multiply([1.0, 0.0, 0.0, 1.0, 0.0, -leading], line)
+                elif operator == 'Tj':
+                    show(operands[0])
+                elif operator in ("'", '"'):
+                    if operator == '"':
+                        word_spacing, char_spacing = float(operands[0]), float(operands[1])
+                    matrix = line = multiply([1.0, 0.0, 0.0, 1.0, 0.0, -leading], line)
+                    show(operands[-1])
+                elif operator == 'TJ':
+                    for item in operands[0]:
+                        if isinstance(item, (int, float)):
+                            shift = -item / 1000 * size * scale
+                            matrix = [matrix[0], matrix[1], matrix[2], matrix[3],
+                                      matrix[4] + shift * matrix[0], matrix[5] + shift * matrix[1]]
+                        else:
+                            show(item)
+                elif operator == 'Do' and depth < self.MAX_FORM_DEPTH:
+                    xobject = resolve((resolve(resources.get('XObject')) or {}).get(operands[0]))
+                    if isinstance(xobject, Stream) and xobject.attrs.get('Subtype') == 'Form':
+                        form_matrix = [float(value) for value in resolve(xobject.attrs.get('Matrix', IDENTITY))]
+                        self.run(xobject.decode(self.document), xobject.attrs.get('Resources', resources),
+                                 multiply(form_matrix, ctm), depth + 1)
+            except (IndexError, TypeError, ValueError):
+                # 个别操作数不合法时跳过该操作
+                continue
+
+    def text(self):
+        # 兼容字符 (数学斜体字母、连字、全角符号) 统一为普通字符，便于检索
+        return unicodedata.normalize('NFKC', ''.join(self.parts)).replace('\u2010', '-').replace('\u2212', '-')
+
+
+def page_text(document, page, fonts):
+    """一页的文字；fonts 为同一文档内共享的字体缓存"""
+    contents = document.resolve(page.get('Contents'))
+    if not isinstance(contents, list):
+        contents = [] if contents is None else [contents]
+    streams = [document.resolve(item) for item in contents]
+    content = b'\n'.join(stream.decode(document) for stream in streams if isinstance(stream, Stream))
+    extractor = PageText(document, fonts)
+    extractor.run(content, page.get('Resources'))
+    return extractor.text()
+
+
+# 子进程各自打开一次文档，之后只传递页码
+_worker_document = None
+_worker_pages = None
+_worker_fonts = None
+
+
+def _init_worker(path):
+    global _worker_document, _worker_pages, _worker_fonts
+    _worker_document = Document(path)
+    _worker_pages = _worker_document.pages()
+    _worker_fonts = {}
+
+
+def _extract_pages(indices):
+    return [page_text(_worker_document, _worker_pages[i], _worker_fonts) for i in indices]
+
+
+def extract_text(path, jobs=0):
+    """逐页提取文字，jobs 为进程数，0 表示使用全部CPU核心"""
+    jobs = jobs if jobs > 0 else (os.cpu_count() or 1)
+    with Document(path) as document:
+        pages = document.pages()
+        if jobs == 1 or len(pages) < 2:
+            fonts = {}
+            return [page_text(document, page, fonts) for page in pages]
+
+    # 按页交错分组，使各进程的工作量接近
+    groups = [list(range(k, len(pages), jobs * 4)) for k in range(min(jobs * 4, len(pages)))]
+    texts = [''] * len(pages)
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(path,)) as executor:
+        for indices, results in zip(groups, executor.map(_extract_pages, groups)):
+            for i, text in zip(indices, results):
+                texts[i] = text
+    return texts
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_pages(path, cache_dir=DEFAULT_CACHE_DIR, jobs=0, use_cache=True):
+    """返回 (PDF 哈希, 每页文字, 是否来自缓存)；缓存以内容哈希命名，文件改名或移动后仍然有效"""
+    digest = file_hash(path)
+    cache_path = os.path.join(cache_dir, f'{digest[:16]}.json')
+    if use_cache and os.path.exists(cache_path):
+        try:
+            with open(cache_path, 'r', encoding='utf-8') as f:
+                cached = json.load(f)
+            if cached.get('version') == EXTRACT_VERSION and cached.get('sha256') == digest:
+                return digest, cached['pages'], True
+        except (OSError, ValueError):
+            pass
+
+    pages = extract_text(path, jobs)
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = f'{cache_path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'version': EXTRACT_VERSION, 'file': os.path.basename(path), 'sha256': digest,
+                   'pages': pages}, f, ensure_ascii=False)
+    os.replace(tmp_path, cache_path)
+    return digest, pages, False
+
+
+def build_pdf_index(index_path, documents, previous=None):
+    """documents 为 [(文件名, 哈希, 每页文字)]；文字未变的页面复用 previous 中的分词结果"""
+    cached = {}
+    if previous is not None:
+        cached = {doc['hash']: i for i, doc in enumerate(previous.docs)}
+
+    docs, doc_terms = [], []
+    for name, _, pages in documents:
+        for number, text in enumerate(pages, 1):
+            digest = hashlib.sha1(text.encode('utf-8')).hexdigest()
+            if digest in cached:
+                weights = previous.doc_terms(cached[digest])
+            else:
+                weights = {}
+                for term in tokenize(text):
+                    weights[term] = weights.get(term, 0.0) + 1.0
+            doc_terms.append(weights)
+            docs.append({'kind': 'page', 'title': name, 'path': [], 'file': name, 'line': number,
+                         'end_line': number, 'hash': digest, 'length': sum(weights.values())})
+    meta = {
+        'pdfs': {name: digest for name, digest, _ in documents}, 'docs': docs,
+        'average_length': sum(doc['length'] for doc in docs) / len(docs) if docs else 0.0,
+    }
+    write_search_index(index_path, meta, doc_terms)
+
+
+def open_pdf_index(documents, cache_dir=DEFAULT_CACHE_DIR, rebuild=False):
+    """打开与当前 PDF 集合一致的检索索引，不一致时重建"""
+    index_path = os.path.join(cache_dir, 'pages.search')
+    expected = {name: digest for name, digest, _ in documents}
+    previous = None
+    if os.path.exists(index_path):
+        try:
+            previous = SearchIndex(index_path)
+        except (OSError, ValueError):
+            previous = None
+    if previous is not None and not rebuild and previous.meta.get('pdfs') == expected:
+        return previous
+    try:
+        build_pdf_index(index_path, documents, None if rebuild else previous)
+    finally:
+        if previous is not None:
+            previous.close()
+    return SearchIndex(index_path)
+
+
+def page_snippet(text, query, width=40):
+    """页面中第一个命中的查询词前后各 width 个字符"""
+    lowered = text.lower()
+    pieces = sorted(TOKEN_PATTERN_TEXT.findall(query.lower()), key=len, reverse=True)
+    for piece in pieces:
+        position = lowered.find(piece)
+        if position >= 0:
+            start, end = max(0, position - width), min(len(text), position + len(piece) + width)
+            snippet = ' '.join(text[start:end].split())
+            return ('...' if start > 0 else '') + snippet + ('...' if end < len(text) else '')
+    return ''
+
+
+def main():
+    parser = argparse.ArgumentParser(description='提取参考 PDF 的文字并检索')
+    parser.add_argument('query', nargs='*', help='查询词，如 半平面交、Ear Clipping')
+    parser.add_argument('--pdf', action='append',
+                       help=f'要检索的 PDF，可重复指定 (默认: {", ".join(DEFAULT_PDFS)})')
+    parser.add_argument('-n', '--limit', type=int, default=10,
+                       help='最多显示的结果数 (默认: 10)')
+    parser.add_argument('-j', '--jobs', type=int, default=0,
+                       help='提取文字的进程数，0 表示使用全部CPU核心 (默认: 0)')
+    parser.add_argument('--page', type=int,
+                       help='输出第一个 PDF 指定页的文字')
+    parser.add_argument('--with-tex', action='store_true',
+                       help='同时检索 Algorithm-template.tex')
+    parser.add_argument('--rebuild', action='store_true',
+                       help='忽略缓存，重新提取并建立索引')
+    parser.add_argument('--json', action='store_true',
+                       help='以JSON格式输出结果')
+
+    args = parser.parse_args()
+
+    paths = args.pdf or [path for path in DEFAULT_PDFS if os.path.exists(path)]
+    if not paths:
+        print("错误: 没有找到要检索的 PDF")
+        sys.exit(1)
+
+    documents = []
+    for path in paths:
+        if not os.path.exists(path):
+            print(f"错误: 文件 {path} 不存在")
+            sys.exit(1)
+        started = time.perf_counter()
+        try:
+            digest, pages, cached = load_pages(path, jobs=args.jobs, use_cache=not args.rebuild)
+        except (ValueError, KeyError, zlib.error) as e:
+            print(f"错误: 无法解析 {path}: {e}")
+            sys.exit(1)
+        if not cached and not args.json:
+            print(f"📄 {path}: 提取 {len(pages)} 页，{sum(len(text) for text in pages)} 个字符 "
+                  f"({time.perf_counter() - started:.2f}s)")
+        documents.append((os.path.basename(path), digest, pages))
+
+    if args.page is not None:
+        pages = documents[0][2]
+        if not 1 <= args.page <= len(pages):
+            print(f"错误: {paths[0]} 只有 {len(pages)} 页")
+            sys.exit(1)
+        print(pages[args.page - 1])
+        return
+    if not args.query:
+        if not args.json:
+            for name, _, pages in documents:
+                print(f"📊 {name}: {len(pages)} 页")
+        return
+
+    query = ' '.join(args.query)
+    started = time.perf_counter()
+    with open_pdf_index(documents, rebuild=args.rebuild) as search_index:
+        hits = search_index.search(query, args.limit)
+    elapsed = time.perf_counter() - started
+    texts = {name: pages for name, _, pages in documents}
+
+    if args.json:
+        print(json.dumps({'query': query, 'ms': round(elapsed * 1000, 3), 'hits': [
+            {'file': hit.doc['file'], 'page': hit.doc['line'], 'score': round(hit.score, 4),
+             'snippet': page_snippet(texts[hit.doc['file']][hit.doc['line'] - 1], query)} for hit in hits
+        ]}, ensure_ascii=False, indent=2))
+        return
+
+    print(f"🔍 \"{query}\": {len(hits)} 个结果 ({elapsed * 1000:.1f} ms)")
+    for rank, hit in enumerate(hits, 1):
+        name, number = hit.doc['file'], hit.doc['line']
+        print(f"{rank:3d}. {name} 第 {number} 页  ({hit.score:.2f})")
+        snippet = page_snippet(texts[name][number - 1], query)
+        if snippet:
+            print(f"       {snippet}")
+
+    if args.with_tex and os.path.exists('Algorithm-template.tex'):
+        started = time.perf_counter()
+        with open_search_index('Algorithm-template.tex')[0] as search_index:
+            hits = search_index.search(query, args.limit)
+        print_hits(hits, query, time.perf_counter() - started, 'Algorithm-template.tex')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+minted代码块预渲染
+在进程池中用 Pygments 高亮全部代码块，结果按内容哈希缓存为 .tex 片段，
+并生成一个不依赖 minted 的文档 (用 fvextra 的 Verbatim 输入这些片段)，
+编译时不再需要 -shell-escape，也不再为每个代码块启动 Pygments 子进程
+"""
+
+import os
+import re
+import sys
+import hashlib
+import argparse
+import textwrap
+from concurrent.futures import ProcessPoolExecutor
+
+import pygments
+from pygments import highlight
+from pygments.formatters import LatexFormatter
+from pygments.lexers import get_lexer_by_name
+from pygments.util import ClassNotFound
+
+from tex_index import read_braced, write_if_changed
+
+# 片段格式版本，修改生成的 LaTeX 代码时递增，旧片段随之失效
+PRERENDER_VERSION = 1
+
+DEFAULT_CACHE_DIR = '_prerender'
+DEFAULT_STYLE = 'default'
+
+# 由预渲染阶段处理、不传给 Verbatim 的 minted 选项
+PRERENDER_OPTIONS = {'style', 'autogobble', 'bgcolor', 'encoding', 'outencoding',
+                     'python3', 'stripnl', 'stripall'}
+# minted 自己实现、fvextra 没有对应选项的选项，预渲染时忽略
+IGNORED_OPTIONS = {'breakbytoken', 'breakbytokenanywhere'}
+
+SETMINTED_PATTERN = re.compile(r'\\setminted(?:\[([^\]]*)\])?\{')
+NEWMINTED_PATTERN = re.compile(r'\\newminted(?:\[([^\]]*)\])?\{([^}]+)\}\{')
+MINTED_PYTHON_PATTERN = re.compile(r'^[ \t]*\\renewcommand\{\\MintedPython\}\{[^}]*\}[^\n]*\n?', re.MULTILINE)
+HOOK_PATTERN = re.compile(r'\\((?:Before|After)(?:Begin|End)Environment)\{([^}]+)\}')
+TCB_LIBRARY_PATTERN = re.compile(r'\\tcbuselibrary\{([^}]*)\}')
+USEPACKAGE_MINTED_PATTERN = re.compile(r'\\usepackage(?:\[[^\]]*\])?\{minted\}')
+
+# 代替 minted 的宏包与环境：minted 2 的 bgcolor 实现，以及承接原 minted 环境钩子的 prerendered 环境
+PRERENDER_PREAMBLE = r'''% 以下由 prerender_minted.py 生成，代替 minted
+\usepackage{xcolor}
+\usepackage{fvextra}
+\newsavebox{\prerenderedbgbox}
+\newenvironment{prerenderedbg}[1]{%
+  \setlength{\fboxsep}{-\fboxrule}%
+  \def\prerenderedbgcolor{#1}%
+  \noindent\begin{lrbox}{\prerenderedbgbox}%
+  \begin{minipage}{\dimexpr\linewidth-2\fboxsep\relax}}%
+ {\end{minipage}\end{lrbox}%
+  \colorbox{\prerenderedbgcolor}{\usebox{\prerenderedbgbox}}}
+\newenvironment{prerendered}{}{}
+'''
+
+
+def split_options(text):
+    """把 key=value 列表按顶层逗号拆开 (花括号内的逗号不拆)，无值的键视为 true"""
+    options = {}
+    depth = 0
+    current = []
+    for char in text + ',':
+        if char == '{':
+            depth += 1
+        elif char == '}':
+            depth -= 1
+        if char == ',' and depth == 0:
+            item = ''.join(current).strip()
+            current = []
+            if not item:
+                continue
+            key, _, value = item.partition('=')
+            options[key.strip()] = value.strip() if _ else 'true'
+        else:
+            current.append(char)
+    return options
+
+
+def style_prefix(style):
+    """Pygments 宏前缀，与 minted 一样按样式区分，如 PYGvs、PYGcolorful"""
+    return 'PYG' + re.sub(r'[^A-Za-z]', '', style)
+
+
+class MintedConfig:
+    """文档导言区中的 minted 配置"""
+
+    def __init__(self):
+        self.global_options = {}
+        self.language_options = {}
+        # 环境名 -> (语言, 选项)
+        self.environments = {}
+        # 需要从导言区删除的配置命令的位置
+        self.spans = []
+
+    @classmethod
+    def parse(cls, preamble):
+        config = cls()
+        for match in SETMINTED_PATTERN.finditer(preamble):
+            body = read_braced(preamble, match.end())
+            options = split_options(body)
+            if match.group(1):
+                config.language_options.setdefault(match.group(1).strip(), {}).update(options)
+            else:
+                config.global_options.update(options)
+            config.spans.append((match.start(), match.end() + len(body) + 1))
+
+        for match in NEWMINTED_PATTERN.finditer(preamble):
+            language = match.group(2).strip()
+            body = read_braced(preamble, match.end())
+            name = (match.group(1) or f'{language}code').strip()
+            config.environments[name] = (language, split_options(body))
+            config.spans.append((match.start(), match.end() + len(body) + 1))
+        return config
+
+    def options_for(self, language, environment='minted', inline=None):
+        """按 全局 -> 语言 -> 环境 -> 代码块 的顺序合并选项"""
+        options = dict(self.global_options)
+        options.update(self.language_options.get(language, {}))
+        if environment in self.environments:
+            options.update(self.environments[environment][1])
+        if inline:
+            options.update(split_options(inline))
+        return options
+
+    def block_pattern(self):
+        """匹配 minted 环境及 \\newminted 定义的环境"""
+        names = '|'.join(re.escape(name) for name in sorted(self.environments, key=len, reverse=True))
+        custom = rf'|\\begin\{{(?P<env>{names})(?P<star>\*)?\}}(?(star)\{{(?P<env_options>[^}}]*)\}})\n(?P<env_code>.*?)\n\\end\{{(?P=env)\*?\}}' if names else ''
+        return re.compile(
+            r'\\begin\{minted\}(?:\[(?P<options>[^\]]*)\])?\{(?P<language>[^}]+)\}\n(?P<code>.*?)\n\\end\{minted\}'
+            + custom, re.DOTALL)
+
+
+def verbatim_options(options):
+    """把 minted 选项转换为 fvextra Verbatim 的选项"""
+    result = [r'commandchars=\\\{\}']
+    for key, value in options.items():
+        if key in PRERENDER_OPTIONS or key in IGNORED_OPTIONS:
+            continue
+        if key == 'linenos':
+            result.append('numbers=left' if value == 'true' else 'numbers=none')
+        else:
+            result.append(f'{key}={value}')
+    return ','.join(result)
+
+
+def render_fragment(task):
+    """高亮一个代码块，返回完整的 .tex 片段"""
+    language, options, code = task
+    style = options.get('style', DEFAULT_STYLE)
+    if options.get('autogobble') == 'true':
+        code = textwrap.dedent(code)
+
+    try:
+        lexer = get_lexer_by_name(language)
+    except ClassNotFound:
+        lexer = get_lexer_by_name('text')
+    formatter = LatexFormatter(style=style, commandprefix=style_prefix(style))
+    highlighted = highlight(code, lexer, formatter)
+    highlighted = highlighted.replace(r'\begin{Verbatim}[commandchars=\\\{\}]',
+                                      f'\\begin{{Verbatim}}[{verbatim_options(options)}]', 1)
+
+    bgcolor = options.get('bgcolor')
+    if bgcolor:
+        highlighted = f'\\begin{{prerenderedbg}}{{{bgcolor}}}\n{highlighted.rstrip()}\n\\end{{prerenderedbg}}\n'
+    return highlighted
+
+
+def fragment_key(task):
+    language, options, code = task
+    digest = hashlib.sha256(f'prerender-{PRERENDER_VERSION}-{pygments.__version__}'.encode())
+    digest.update(repr((language, sorted(options.items()))).encode('utf-8'))
+    digest.update(b'\0')
+    digest.update(code.encode('utf-8'))
+    return digest.hexdigest()
+
+
+def style_definitions(styles):
+    """各样式的 Pygments 宏定义"""
+    return ''.join(LatexFormatter(style=style, commandprefix=style_prefix(style)).get_style_defs() + '\n'
+                   for style in sorted(styles))
+
+
+def rewrite_preamble(preamble, config, styles):
+    """去掉 minted 相关配置，换成 fvextra 和样式宏定义"""
+    pieces = []
+    pos = 0
+    for start, end in sorted(config.spans):
+        pieces.append(preamble[pos:start])
+        pos = end
+    pieces.append(preamble[pos:])
+    preamble = ''.join(pieces)
+
+    preamble = MINTED_PYTHON_PATTERN.sub('', preamble)
+
+    def drop_minted_library(match):
+        libraries = [name.strip() for name in match.group(1).split(',') if name.strip() != 'minted']
+        return f'\\tcbuselibrary{{{", ".join(libraries)}}}' if libraries else ''
+    preamble = TCB_LIBRARY_PATTERN.sub(drop_minted_library, preamble)
+
+    # 原来挂在 minted 环境上的钩子改挂到 prerendered 环境
+    environments = {'minted'} | set(config.environments)
+    preamble = HOOK_PATTERN.sub(
+        lambda match: f'\\{match.group(1)}{{prerendered}}' if match.group(2) in environments else match.group(0),
+        preamble)
+
+    replacement = PRERENDER_PREAMBLE + style_definitions(styles)
+    return USEPACKAGE_MINTED_PATTERN.sub(lambda match: replacement, preamble, count=1)
+
+
+def default_output_path(tex_file):
+    stem, ext = os.path.splitext(tex_file)
+    return f'{stem}-prerendered{ext}'
+
+
+class PrerenderResult:
+    def __init__(self, output, blocks, rendered, reused):
+        self.output = output
+        self.blocks = blocks
+        self.rendered = rendered
+        self.reused = reused
+
+
+def prerender_document(tex_file, output=None, cache_dir=None, jobs=1):
+    """生成预渲染文档，返回 PrerenderResult"""
+    output = output or default_output_path(tex_file)
+    directory = os.path.dirname(os.path.abspath(output))
+    cache_dir = cache_dir or os.path.join(directory, DEFAULT_CACHE_DIR)
+    os.makedirs(cache_dir, exist_ok=True)
+
+    with open(tex_file, 'r', encoding='utf-8') as f:
+        content = f.read()
+    split = content.find('\\begin{document}')
+    if split < 0:
+        split = 0
+    preamble, body = content[:split], content[split:]
+
+    config = MintedConfig.parse(preamble)
+    matches = list(config.block_pattern().finditer(body))
+
+    tasks = []
+    for match in matches:
+        if match.group('language'):
+            language = match.group('language').strip()
+            options = config.options_for(language, 'minted', match.group('options'))
+            code = match.group('code')
+        else:
+            language = config.environments[match.group('env')][0]
+            options = config.options_for(language, match.group('env'), match.group('env_options'))
+            code = match.group('env_code')
+        tasks.append((language, options, code))
+
+    keys = [fragment_key(task) for task in tasks]
+    pending = {}
+    for key, task in zip(keys, tasks):
+        if key not in pending and not os.path.exists(os.path.join(cache_dir, f'{key}.tex')):
+            pending[key] = task
+
+    if pending:
+        if jobs > 1:
+            chunksize = max(1, len(pending) // (jobs * 4))
+            with ProcessPoolExecutor(max_workers=jobs) as executor:
+                fragments = list(executor.map(render_fragment, pending.values(), chunksize=chunksize))
+        else:
+            fragments = [render_fragment(task) for task in pending.values()]
+        for key, fragment in zip(pending, fragments):
+            write_if_changed(os.path.join(cache_dir, f'{key}.tex'), fragment)
+
+    # 片段路径相对于输出文档所在目录
+    relative_dir = os.path.relpath(cache_dir, directory).replace(os.sep, '/')
+    pieces = []
+    pos = 0
+    for match, key in zip(matches, keys):
+        pieces.append(body[pos:match.start()])
+        pieces.append(f'\\begin{{prerendered}}\\input{{{relative_dir}/{key}.tex}}\\end{{prerendered}}')
+        pos = match.end()
+    pieces.append(body[pos:])
+
+    styles = {options.get('style', DEFAULT_STYLE) for _, options, _ in tasks}
+    write_if_changed(output, rewrite_preamble(preamble, config, styles) + ''.join(pieces))
+    return PrerenderResult(output, len(tasks), len(pending), len(tasks) - len(pending))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='minted代码块预渲染')
+    parser.add_argument('file', nargs='?', default='Algorithm-template.tex',
+                       help='LaTeX文件 (默认: Algorithm-template.tex)')
+    parser.add_argument('-o', '--output',
+                       help='输出文件 (默认: <文件名>-prerendered.tex)')
+    parser.add_argument('--cache-dir',
+                       help=f'片段缓存目录 (默认: 输出文件同目录的 {DEFAULT_CACHE_DIR}/)')
+    parser.add_argument('-j', '--jobs', type=int, default=0,
+                       help='并行高亮的进程数，0 表示使用全部CPU核心 (默认: 0)')
+
+    args = parser.parse_args()
+
+    if not os.path.exists(args.file):
+        print(f"错误: 文件 {args.file} 不存在")
+        sys.exit(1)
+
+    jobs = args.jobs if args.jobs > 0 else (os.cpu_count() or 1)
+    result = prerender_document(args.file, args.output, args.cache_dir, jobs)
+    print(f"🎨 {result.blocks} 个代码块: 新渲染 {result.rendered} 个, 复用缓存 {result.reused} 个")
+    print(f"✅ 已生成: {result.output} (编译时无需 -shell-escape)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+正则规则的回溯检查与单行时间预算
+从各个格式化脚本的源码中找出全部正则规则，在构造的对抗输入 (长空格串、逗号列表、
+未闭合的模板等) 上按行长翻倍测量耗时，拟合增长指数，找出超线性回溯的规则；
+LineBudget 给每行格式化设置时间上限，超时的行保持原样
+"""
+
+import re
+import os
+import ast
+import sys
+import json
+import math
+import time
+import argparse
+import platform
+
+# 格式化规则用占有量词 (\s*+) 和原子组 ((?>...)) 保证线性时间，re 从 Python 3.11 起才支持；
+# 各个格式化脚本都先导入本模块，在编译规则之前给出明确的错误
+MIN_PYTHON = (3, 11)
+if sys.version_info < MIN_PYTHON:
+    print(f"错误: 格式化脚本需要 Python {'.'.join(map(str, MIN_PYTHON))} 或更高版本 "
+          f"(当前为 {platform.python_version()})，规则中的占有量词和原子组需要新版 re 模块")
+    sys.exit(1)
+
+FORMATTER_FILES = ['format_cpp.py', 'format_simple.py', 'format_tex_cpp.py', 'format_tex_cpp_v2.py',
+                   'format_template.py', 'cpp_lexer.py']
+
+# 测量增长时使用的行长，单次调用超过 PROBE_CAP 秒后不再增大
+GROWTH_SIZES = (250, 500, 1000, 2000, 4000)
+PROBE_CAP = 0.05
+# 耗时 ∝ 行长^k，k 超过该值视为超线性
+SUPERLINEAR_EXPONENT = 1.5
+# 每行格式化的默认时间预算 (秒)
+DEFAULT_LINE_BUDGET = 0.5
+
+# 变量名以这些后缀结尾的 [(正则, 替换), ...] 列表视为规则表
+RULE_TABLE_SUFFIXES = ('rules', 'replacements', 'patterns')
+# re 模块中第一个参数为正则的函数，及其 flags 参数的位置
+REGEX_FUNCTIONS = {'compile': 1, 'match': 2, 'fullmatch': 2, 'search': 2, 'finditer': 2, 'findall': 2,
+                   'split': 3, 'sub': 4, 'subn': 4}
+
+
+def _repeat(unit, n, prefix='', suffix=''):
+    return prefix + unit * max(1, (n - len(prefix) - len(suffix)) // len(unit)) + suffix
+
+
+# 对抗输入：名称 -> 生成长度约为 n 的单行，word 为模板名 (见 head_word)
+ADVERSARIAL_LINES = {
+    '模板内空格': lambda n, word: _repeat(' ', n, word + '<', 'b'),
+    '词间空格': lambda n, word: _repeat(' ', n, 'x', 'y'),
+    '左括号后空格': lambda n, word: _repeat(' ', n, '(', 'x'),
+    '右尖括号后空格': lambda n, word: _repeat(' ', n, '>', '+'),
+    '长标识符': lambda n, word: _repeat('a', n, '', '<'),
+    '逗号列表': lambda n, word: _repeat(', 1', n, word + '<b'),
+    '空格逗号': lambda n, word: _repeat(' ,', n, 'f('),
+    '常量数组': lambda n, word: _repeat('1, ', n, 'constexpr int a[] = {', '};'),
+    '对齐表格': lambda n, word: _repeat('{1,    2},    ', n, 'int t[][2] = {', '};'),
+    '未闭合模板': lambda n, word: _repeat(word + ' < ', n),
+    '嵌套模板': lambda n, word: _repeat(word + '<b<', n),
+    '运算符': lambda n, word: _repeat('a  +  ', n),
+}
+
+
+def head_word(pattern):
+    """规则开头的字面量 (如 numeric_limits\\s*<)，对抗输入用它作模板名，使匹配能走到容易回溯的部分"""
+    match = re.match(r'(?:[\w:]|\\s\*)+', pattern)
+    head = match.group().replace('\\s*', '') if match else ''
+    return head if head[-1:].isalnum() or head.endswith('_') else head + 'a'
+
+
+class Rule:
+    """源码中的一条正则规则"""
+
+    def __init__(self, path, line, pattern, flags=0):
+        self.path = path
+        self.line = line
+        self.pattern = pattern
+        self.flags = flags
+
+    @property
+    def label(self):
+        return f'{os.path.basename(self.path)}:{self.line}'
+
+    def compile(self):
+        return re.compile(self.pattern, self.flags)
+
+
+def extract_rules(path):
+    """用 ast 找出源文件中的正则：re.* 和 apply_rule 的第一个参数、规则表中的正则
+
+    f-string 中的插值按一个字面量字符处理；同一正则只保留第一次出现
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        tree = ast.parse(f.read(), path)
+
+    constants = {}
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and len(node.targets) == 1 and isinstance(node.targets[0], ast.Name):
+            if isinstance(node.value, ast.Constant) and isinstance(node.value.value, str):
+                constants[node.targets[0].id] = node.value.value
+
+    def literal(node):
+        if isinstance(node, ast.Constant) and isinstance(node.value, str):
+            return node.value
+        if isinstance(node, ast.Name):
+            return constants.get(node.id)
+        if isinstance(node, ast.JoinedStr):
+            return ''.join(part.value if isinstance(part, ast.Constant) else '=' for part in node.values)
+        return None
+
+    def flag_value(node):
+        if isinstance(node, ast.Attribute) and isinstance(node.value, ast.Name) and node.value.id == 're':
+            return getattr(re, node.attr, 0)
+        if isinstance(node, ast.BinOp) and isinstance(node.op, ast.BitOr):
+            return flag_value(node.left) | flag_value(node.right)
+        return 0
+
+    def target_name(target):
+        if isinstance(target, ast.Name):
+            return target.id
+        if isinstance(target, ast.Attribute):
+            return target.attr
+        return ''
+
+    found = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Call) and node.args:
+            func = node.func
+            position = None
+            if isinstance(func, ast.Attribute) and isinstance(func.value, ast.Name) and func.value.id == 're':
+                position = REGEX_FUNCTIONS.get(func.attr)
+            elif isinstance(func, ast.Name) and func.id == 'apply_rule':
+                position = 4
+            if position is None:
+                continue
+            pattern = literal(node.args[0])
+            if pattern is None:
+                continue
+            flags = flag_value(node.args[position]) if len(node.args) > position else 0
+            for keyword in node.keywords:
+                if keyword.arg == 'flags':
+                    flags = flag_value(keyword.value)
+            found.append(Rule(path, node.lineno, pattern, flags))
+        elif isinstance(node, ast.Assign) and isinstance(node.value, ast.List):
+            if not any(target_name(target).endswith(RULE_TABLE_SUFFIXES) for target in node.targets):
+                continue
+            for element in node.value.elts:
+                if isinstance(element, ast.Tuple) and element.elts:
+                    pattern = literal(element.elts[0])
+                    if pattern is not None:
+                        found.append(Rule(path, element.lineno, pattern))
+        elif isinstance(node, ast.Assign) and len(node.targets) == 1 and isinstance(node.targets[0], ast.Name):
+            # 先赋给局部变量再使用的正则，如 pattern = rf'...{op}...'
+            if 'pattern' in node.targets[0].id and isinstance(node.value, ast.JoinedStr):
+                found.append(Rule(path, node.lineno, literal(node.value)))
+
+    rules, seen = [], set()
+    for rule in sorted(found, key=lambda rule: rule.line):
+        if (rule.pattern, rule.flags) not in seen:
+            seen.add((rule.pattern, rule.flags))
+            rules.append(rule)
+    return rules
+
+
+def time_call(function, argument, minimum=0.0005, repeat=2):
+    """重复调用到总时间不少于 minimum 秒，取 repeat 轮中最快一轮的单次平均耗时"""
+    best = None
+    for _ in range(repeat):
+        calls = 0
+        started = time.perf_counter()
+        while True:
+            function(argument)
+            calls += 1
+            elapsed = time.perf_counter() - started
+            if elapsed >= minimum:
+                break
+        best = elapsed / calls if best is None else min(best, elapsed / calls)
+        if elapsed > PROBE_CAP:
+            break
+    return best
+
+
+def growth_exponent(function, generator, sizes=GROWTH_SIZES, cap=PROBE_CAP):
+    """按行长增大测量耗时，用对数坐标下的最小二乘拟合 耗时 ∝ 行长^k
+
+    generator(n) 生成长度约为 n 的输入；返回 (k, 最大行长, 该行长的单次耗时)，
+    某个行长的单次耗时超过 cap 后不再增大
+    """
+    points = []
+    for n in sizes:
+        line = generator(n)
+        seconds = time_call(function, line)
+        points.append((math.log(len(line)), math.log(max(seconds, 1e-9)), len(line), seconds))
+        if seconds > cap:
+            break
+    if len(points) < 2:
+        # 最小的行长就已超时
+        return float('inf'), points[0][2], points[0][3]
+    mean_x = sum(point[0] for point in points) / len(points)
+    mean_y = sum(point[1] for point in points) / len(points)
+    slope = (sum((point[0] - mean_x) * (point[1] - mean_y) for point in points)
+             / sum((point[0] - mean_x) ** 2 for point in points))
+    return slope, points[-1][2], points[-1][3]
+
+
+class RuleReport:
+    def __init__(self, rule, exponent, generator, length, seconds):
+        self.rule = rule
+        self.exponent = exponent
+        self.generator = generator
+        self.length = length
+        self.seconds = seconds
+
+    @property
+    def superlinear(self):
+        return self.exponent > SUPERLINEAR_EXPONENT
+
+    def to_dict(self):
+        return {'rule': self.rule.label, 'pattern': self.rule.pattern, 'exponent': round(self.exponent, 2),
+                'input': self.generator, 'length': self.length, 'ms': self.seconds * 1000}
+
+
+def check_rule(rule, generators=None, sizes=GROWTH_SIZES):
+    """在每种对抗输入上测量规则的增长指数，返回最差的一项"""
+    regex = rule.compile()
+    word = head_word(rule.pattern)
+
+    def run(line):
+        regex.subn('', line)
+
+    worst = None
+    for name, generator in (generators or ADVERSARIAL_LINES).items():
+        exponent, length, seconds = growth_exponent(run, lambda n: generator(n, word), sizes)
+        if worst is None or exponent > worst.exponent:
+            worst = RuleReport(rule, exponent, name, length, seconds)
+    return worst
+
+
+class LineBudget:
+    """每行格式化的时间预算，超过预算的行保持原样
+
+    Python 的 re 在匹配过程中不能被打断，因此预算在一行的全部规则执行完后检查；
+    规则本身保证线性 (见 check_rule)，单行耗时不会无限增长
+    """
+
+    def __init__(self, seconds=DEFAULT_LINE_BUDGET):
+        # seconds 不大于 0 表示不限制
+        self.seconds = seconds
+        self.fallbacks = 0
+        self.slowest = 0.0
+
+    def apply(self, function, content):
+        if self.seconds <= 0:
+            return function(content)
+        started = time.perf_counter()
+        result = function(content)
+        elapsed = time.perf_counter() - started
+        if elapsed > self.seconds:
+            self.fallbacks += 1
+            self.slowest = max(self.slowest, elapsed)
+            return content
+        return result
+
+    def merge(self, other):
+        """合并另一个预算 (如子进程中格式化一个代码块时) 的超时统计"""
+        self.fallbacks += other.fallbacks
+        self.slowest = max(self.slowest, other.slowest)
+
+    def report(self):
+        """有行超时时输出提示，返回是否超时过"""
+        if self.fallbacks:
+            print(f"⚠️ {self.fallbacks} 行格式化超过 {self.seconds}s 的预算 (最慢 {self.slowest:.2f}s)，保持原样")
+        return self.fallbacks > 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='检查格式化脚本中的正则规则是否会超线性回溯')
+    parser.add_argument('files', nargs='*', default=FORMATTER_FILES,
+                       help=f'要检查的Python源文件 (默认: {" ".join(FORMATTER_FILES)})')
+    parser.add_argument('-v', '--verbose', action='store_true',
+                       help='列出每条规则的增长指数')
+    parser.add_argument('--max-length', type=int, default=GROWTH_SIZES[-1],
+                       help=f'测量使用的最大行长 (默认: {GROWTH_SIZES[-1]})')
+    parser.add_argument('--json', help='把结果写入JSON文件')
+
+    args = parser.parse_args()
+
+    for path in args.files:
+        if not os.path.exists(path):
+            print(f"错误: 文件 {path} 不存在")
+            sys.exit(1)
+    sizes = [n for n in GROWTH_SIZES if n < args.max_length] + [args.max_length]
+
+    rules = [rule for path in args.files for rule in extract_rules(path)]
+    print(f"🔍 检查 {len(args.files)} 个文件中的 {len(rules)} 条正则规则 "
+          f"({len(ADVERSARIAL_LINES)} 种对抗输入，行长 {sizes[0]}-{sizes[-1]})...")
+    started = time.perf_counter()
+    reports = [check_rule(rule, sizes=sizes) for rule in rules]
+    elapsed = time.perf_counter() - started
+
+    for report in reports:
+        if report.superlinear or args.verbose:
+            mark = '❌' if report.superlinear else '✅'
+            print(f"{mark} {report.rule.label:<26} k={report.exponent:.2f}  "
+                  f"{report.generator} {report.length} 字符 {report.seconds * 1000:.2f}ms")
+            print(f"    {report.rule.pattern}")
+
+    superlinear = [report for report in reports if report.superlinear]
+    if superlinear:
+        print(f"❌ {len(superlinear)} 条规则的耗时随行长超线性增长 (k > {SUPERLINEAR_EXPONENT})，用时 {elapsed:.1f}s")
+    else:
+        print(f"✅ 全部规则的耗时随行长线性增长，用时 {elapsed:.1f}s")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'rules': [report.to_dict() for report in reports]}, f, ensure_ascii=False, indent=2)
+        print(f"💾 结果已写入: {args.json}")
+
+    sys.exit(1 if superlinear else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+正则格式化规则的逐条性能分析
+记录每条规则的调用次数、命中次数、总耗时和最慢的输入行
+"""
+
+import re
+import json
+import time
+import heapq
+
+
+class RuleStats:
+    def __init__(self, name, order):
+        self.name = name
+        self.order = order
+        self.calls = 0
+        # 至少替换了一处的调用次数
+        self.hits = 0
+        # 替换总数
+        self.matches = 0
+        self.seconds = 0.0
+        # 小根堆，保留耗时最长的若干输入行 (耗时, 行)
+        self.slowest = []
+
+    def to_dict(self):
+        return {
+            'rule': self.name,
+            'calls': self.calls,
+            'hits': self.hits,
+            'matches': self.matches,
+            'seconds': self.seconds,
+            'slowest': [{'ms': seconds * 1000, 'line': line}
+                        for seconds, line in sorted(self.slowest, reverse=True)],
+        }
+
+
+class RuleProfiler:
+    """替代 re.sub 执行规则并累计统计"""
+
+    def __init__(self, slowest=3):
+        self.keep = slowest
+        self.stats = {}
+
+    def sub(self, pattern, replacement, content, name=None, flags=0):
+        name = name or pattern
+        # 编译在计时之外完成，首次调用不计入编译开销
+        regex = re.compile(pattern, flags)
+        started = time.perf_counter()
+        result, count = regex.subn(replacement, content)
+        elapsed = time.perf_counter() - started
+
+        stats = self.stats.get(name)
+        if stats is None:
+            stats = self.stats[name] = RuleStats(name, len(self.stats))
+        stats.calls += 1
+        stats.matches += count
+        stats.hits += count > 0
+        stats.seconds += elapsed
+        if len(stats.slowest) < self.keep:
+            heapq.heappush(stats.slowest, (elapsed, content))
+        elif elapsed > stats.slowest[0][0]:
+            heapq.heapreplace(stats.slowest, (elapsed, content))
+        return result
+
+    def ranked(self):
+        """按总耗时从高到低排列"""
+        return sorted(self.stats.values(), key=lambda stats: stats.seconds, reverse=True)
+
+    def report(self, limit=None, show_slowest=5):
+        ranked = self.ranked()
+        total = sum(stats.seconds for stats in ranked) or 1.0
+
+        print(f"{'#':>3} {'调用':>8} {'命中':>8} {'替换':>8} {'总耗时(ms)':>11} {'占比':>7} {'平均(µs)':>9}  规则")
+        for rank, stats in enumerate(ranked[:limit], 1):
+            average = stats.seconds / stats.calls * 1e6 if stats.calls else 0.0
+            print(f"{rank:>3} {stats.calls:>8} {stats.hits:>8} {stats.matches:>8} "
+                  f"{stats.seconds * 1000:>11.2f} {stats.seconds / total:>7.1%} {average:>9.2f}  {stats.name}")
+
+        never = [stats for stats in self.stats.values() if stats.hits == 0]
+        if never:
+            print(f"\n💤 从未命中的规则 ({len(never)} 条):")
+            for stats in sorted(never, key=lambda stats: stats.order):
+                print(f"  {stats.name}")
+
+        if show_slowest:
+            print("\n🐢 最耗时规则的最慢输入行:")
+            for stats in ranked[:show_slowest]:
+                print(f"  {stats.name}")
+                for seconds, line in sorted(stats.slowest, reverse=True):
+                    print(f"    {seconds * 1e6:>8.1f}µs  {line}")
+
+    def to_dict(self):
+        return {'rules': [stats.to_dict() for stats in self.ranked()]}
+
+    def save_json(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+
+
+def apply_rule(pattern, replacement, content, profiler=None, flags=0):
+    """执行一条替换规则；传入 profiler 时同时记录统计"""
+    if profiler is None:
+        return re.sub(pattern, replacement, content, flags=flags)
+    return profiler.sub(pattern, replacement, content, flags=flags)
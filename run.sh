@@ -1,6 +1,7 @@
 #!/bin/bash
 # 用法: ./run.sh [源文件] [超时时间]
 # 例子: ./run.sh a.cpp 5s
+# 多个测试点 (*.in/*.ans) 请用: python3 judge.py a.cpp -d tests
 set -euo pipefail
 # 参数与默认值
 src=${1:-a.cpp}
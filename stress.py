@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+对拍
+用数据生成器产生随机数据，在所有CPU核心上并行比较暴力解法和模板解法的输出；
+发现第一组不一致的数据后停止，并用更小的生成器规模重新生成，把数据缩小到最小规模，
+最后给出吞吐量 (组/秒)。编译和运行方式与 run.sh/judge.py 相同 (C++20，每组数据限时)
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from judge import Judge, output_matches, first_difference, parse_duration, RELEASE_FLAGS, ASAN_FLAGS
+
+DEFAULT_COUNT = 1000
+DEFAULT_SIZE = 10
+DEFAULT_SHRINK_TRIES = 200
+DEFAULT_SAVE_PREFIX = 'stress_fail'
+
+
+class Failure:
+    """一组不一致的数据"""
+
+    def __init__(self, seed, size, data, expected, actual, reason):
+        self.seed = seed
+        self.size = size
+        self.data = data
+        self.expected = expected
+        self.actual = actual
+        self.reason = reason
+
+    def to_dict(self):
+        return {'seed': self.seed, 'size': self.size, 'input': self.data, 'expected': self.expected,
+                'actual': self.actual, 'reason': self.reason}
+
+
+class StressTester:
+    """生成器以 `生成器 种子 规模` 的形式调用，把数据写到标准输出"""
+
+    def __init__(self, generator, brute, solution, time_limit=1.0, flags=None, jobs=0, eps=None):
+        flags = list(RELEASE_FLAGS if flags is None else flags)
+        self.programs = {
+            'generator': Judge(generator, flags=flags, time_limit=time_limit),
+            'brute': Judge(brute, flags=flags, time_limit=time_limit),
+            'solution': Judge(solution, flags=flags, time_limit=time_limit),
+        }
+        self.jobs = jobs if jobs > 0 else (os.cpu_count() or 1)
+        self.eps = eps
+        self.workdir = None
+
+    def compile(self):
+        """编译三个程序，返回第一个编译错误 (名称, 信息)，全部成功时返回 None"""
+        for name, judge in self.programs.items():
+            _, error = judge.compile()
+            if error is not None:
+                return name, error
+        return None
+
+    def run_one(self, seed, size, worker):
+        """生成并比较一组数据，一致时返回 None"""
+        paths = {name: os.path.join(self.workdir, f'{worker}.{name}') for name in self.programs}
+        result = self.programs['generator'].run_case(os.devnull, output_path=paths['generator'], args=(seed, size))
+        if result.verdict != 'OK':
+            raise RuntimeError(f"生成器在种子 {seed} 上 {result.verdict} {result.detail}")
+
+        outputs = {}
+        for name in ('brute', 'solution'):
+            result = self.programs[name].run_case(paths['generator'], output_path=paths[name])
+            with open(paths[name], 'r', encoding='utf-8', errors='replace') as f:
+                outputs[name] = f.read()
+            if result.verdict != 'OK':
+                outputs[name + '_error'] = f'{name} {result.verdict} {result.detail}'.strip()
+
+        with open(paths['generator'], 'r', encoding='utf-8', errors='replace') as f:
+            data = f.read()
+        if 'brute_error' in outputs:
+            return Failure(seed, size, data, outputs['brute'], outputs['solution'], outputs['brute_error'])
+        if 'solution_error' in outputs:
+            return Failure(seed, size, data, outputs['brute'], outputs['solution'], outputs['solution_error'])
+        if not output_matches(outputs['solution'], outputs['brute'], self.eps):
+            return Failure(seed, size, data, outputs['brute'], outputs['solution'],
+                           first_difference(outputs['solution'], outputs['brute']))
+        return None
+
+    def search(self, seeds, size):
+        """并行运行一组种子，遇到不一致即停止；返回 (种子最小的不一致数据, 已运行组数)"""
+        seeds = iter(seeds)
+        lock = threading.Lock()
+        stop = threading.Event()
+        failures = []
+        count = [0]
+
+        def work(worker):
+            while not stop.is_set():
+                with lock:
+                    seed = next(seeds, None)
+                if seed is None:
+                    return
+                try:
+                    failure = self.run_one(seed, size, worker)
+                except Exception:
+                    stop.set()
+                    raise
+                with lock:
+                    count[0] += 1
+                    if failure is not None:
+                        failures.append(failure)
+                        stop.set()
+
+        with ThreadPoolExecutor(max_workers=self.jobs) as executor:
+            for future in [executor.submit(work, worker) for worker in range(self.jobs)]:
+                future.result()
+        return min(failures, key=lambda failure: failure.seed, default=None), count[0]
+
+    def shrink(self, failure, tries=DEFAULT_SHRINK_TRIES):
+        """从规模 1 开始逐步增大，返回最小规模上找到的不一致数据"""
+        for size in range(1, failure.size):
+            smaller, _ = self.search(range(tries), size)
+            if smaller is not None:
+                return smaller
+        return failure
+
+    def run(self, count=DEFAULT_COUNT, size=DEFAULT_SIZE, seed=1, shrink_tries=DEFAULT_SHRINK_TRIES):
+        """返回 (不一致数据或 None, 缩小前的不一致数据, 运行组数, 用时)"""
+        with tempfile.TemporaryDirectory() as workdir:
+            self.workdir = workdir
+            started = time.perf_counter()
+            failure, done = self.search(range(seed, seed + count), size)
+            elapsed = time.perf_counter() - started
+            original = failure
+            if failure is not None and shrink_tries > 0:
+                failure = self.shrink(failure, shrink_tries)
+            self.workdir = None
+        return failure, original, done, elapsed
+
+
+def save_failure(failure, prefix):
+    """保存为 .in/.ans，可直接用 ./run.sh 或 judge.py 复现"""
+    with open(prefix + '.in', 'w', encoding='utf-8') as f:
+        f.write(failure.data)
+    with open(prefix + '.ans', 'w', encoding='utf-8') as f:
+        f.write(failure.expected)
+
+
+def print_failure(failure, limit=20):
+    def preview(text):
+        lines = text.rstrip('\n').split('\n')
+        shown = '\n'.join('    ' + line for line in lines[:limit])
+        return shown + (f'\n    ... (共 {len(lines)} 行)' if len(lines) > limit else '')
+
+    print(f"❌ 种子 {failure.seed}，规模 {failure.size}: {failure.reason}")
+    print("  输入:")
+    print(preview(failure.data))
+    print("  暴力输出:")
+    print(preview(failure.expected))
+    print("  模板输出:")
+    print(preview(failure.actual))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='对拍：并行比较暴力解法与模板解法')
+    parser.add_argument('generator', help='数据生成器 (.cpp 或 .py)，以 `生成器 种子 规模` 调用')
+    parser.add_argument('brute', help='暴力解法')
+    parser.add_argument('solution', help='模板解法')
+    parser.add_argument('-n', '--count', type=int, default=DEFAULT_COUNT,
+                       help=f'最多运行的数据组数 (默认: {DEFAULT_COUNT})')
+    parser.add_argument('-s', '--size', type=int, default=DEFAULT_SIZE,
+                       help=f'传给生成器的规模参数 (默认: {DEFAULT_SIZE})')
+    parser.add_argument('--seed', type=int, default=1,
+                       help='起始种子 (默认: 1)')
+    parser.add_argument('-t', '--time', default='1s',
+                       help='每个程序每组数据的时间限制，如 1s、500ms (默认: 1s)')
+    parser.add_argument('-j', '--jobs', type=int, default=0,
+                       help='并行数，0 表示使用全部CPU核心 (默认: 0)')
+    parser.add_argument('--asan', action='store_true',
+                       help='与 run.sh 一样用 AddressSanitizer 编译')
+    parser.add_argument('--eps', type=float,
+                       help='按词比较输出，浮点数允许的误差')
+    parser.add_argument('--shrink-tries', type=int, default=DEFAULT_SHRINK_TRIES,
+                       help=f'缩小数据时每个规模尝试的种子数，0 表示不缩小 (默认: {DEFAULT_SHRINK_TRIES})')
+    parser.add_argument('--save', default=DEFAULT_SAVE_PREFIX,
+                       help=f'不一致数据保存为 <前缀>.in/.ans (默认: {DEFAULT_SAVE_PREFIX})')
+    parser.add_argument('--json', help='把结果和吞吐量写入JSON文件')
+
+    args = parser.parse_args()
+
+    for path in (args.generator, args.brute, args.solution):
+        if not os.path.exists(path):
+            print(f"错误: 文件 {path} 不存在")
+            sys.exit(1)
+    try:
+        time_limit = parse_duration(args.time)
+    except ValueError as e:
+        print(f"错误: {e}")
+        sys.exit(1)
+
+    tester = StressTester(args.generator, args.brute, args.solution, time_limit,
+                          ASAN_FLAGS if args.asan else RELEASE_FLAGS, args.jobs, args.eps)
+    error = tester.compile()
+    if error is not None:
+        print(f"🔧 CE {error[0]} 编译错误:")
+        print(error[1])
+        sys.exit(1)
+
+    print(f"🔄 对拍 {args.count} 组，规模 {args.size}，{tester.jobs} 并行...")
+    try:
+        failure, original, done, elapsed = tester.run(args.count, args.size, args.seed, args.shrink_tries)
+    except RuntimeError as e:
+        print(f"错误: {e}")
+        sys.exit(1)
+
+    throughput = done / elapsed if elapsed > 0 else 0.0
+    print(f"📊 运行 {done} 组，用时 {elapsed:.2f}s，吞吐量 {throughput:.1f} 组/秒")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'cases': done, 'seconds': elapsed, 'throughput': throughput, 'jobs': tester.jobs,
+                       'size': args.size, 'failure': failure.to_dict() if failure else None,
+                       'original_failure': original.to_dict() if original else None},
+                      f, ensure_ascii=False, indent=2)
+
+    if failure is None:
+        print("✅ 全部一致")
+        return
+    if failure is not original:
+        print(f"🔍 已从规模 {original.size} (种子 {original.seed}) 缩小到规模 {failure.size}")
+    print_failure(failure)
+    save_failure(failure, args.save)
+    print(f"💾 已保存到 {args.save}.in / {args.save}.ans")
+    sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+import os
+import sys
+import json
+import shutil
+import tempfile
+import subprocess
+
+from bench_formatters import compare_with_baseline, print_table, run_benchmark, synthetic_corpus
+
+DOCUMENT = ('\\section{测试}\n'
+            '\\begin{minted}{cpp}\n'
+            'int main(){int a=1;return a;}\n'
+            '\\end{minted}\n'
+            '\\begin{minted}{cpp}\n'
+            'for(int i=0;i<n;i++)\n    s+=a[i];\n'
+            '\\end{minted}\n')
+
+
+def test_measurement():
+    print("测试测量和比较...")
+    blocks = ['int a;', 'int b;\nint c;']
+    corpus = synthetic_corpus(blocks, 3)
+    assert sorted(corpus) == sorted(blocks * 3)
+    assert synthetic_corpus(blocks, 3) == corpus
+
+    result = run_benchmark(lambda code: code.upper(), corpus, repeat=2)
+    assert result['blocks'] == 6 and result['lines'] == 9
+    assert result['lines_per_sec'] > 0 and result['peak_kb'] >= 0
+    assert 0 <= result['p50_ms'] <= result['p90_ms'] <= result['p99_ms']
+
+    results = {'fast@real': result, 'slow@real': dict(result, lines_per_sec=result['lines_per_sec'] / 2)}
+    print_table(results)
+    baseline = {'results': {'fast@real': result, 'slow@real': result, 'gone@real': result}}
+    regressions = compare_with_baseline(results, baseline, 0.2)
+    assert [key for key, *_ in regressions] == ['slow@real']
+    assert abs(regressions[0][3] - 0.5) < 1e-9
+
+
+def test_report():
+    print("测试命令行报告...")
+    root = os.path.dirname(os.path.abspath(__file__))
+    directory = tempfile.mkdtemp()
+    try:
+        tex_path = os.path.join(directory, 'doc.tex')
+        with open(tex_path, 'w', encoding='utf-8') as f:
+            f.write(DOCUMENT)
+        json_path = os.path.join(directory, 'bench.json')
+        command = [sys.executable, os.path.join(root, 'bench_formatters.py'), tex_path,
+                   '--only', 'format_simple', '--scales', '1,3', '--repeat', '1']
+
+        result = subprocess.run(command + ['--save-baseline', json_path], capture_output=True, text=True)
+        assert result.returncode == 0, result.stdout + result.stderr
+        with open(json_path, 'r', encoding='utf-8') as f:
+            report = json.load(f)
+        assert sorted(report['results']) == ['format_simple.format_cpp_line@3x', 'format_simple.format_cpp_line@real']
+        assert report['results']['format_simple.format_cpp_line@3x']['blocks'] == 6
+
+        # 基线吞吐量放大后当前结果视为回归
+        for entry in report['results'].values():
+            entry['lines_per_sec'] *= 1000
+        with open(json_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f)
+        result = subprocess.run(command + ['--baseline', json_path], capture_output=True, text=True)
+        assert result.returncode == 1 and '性能回归' in result.stdout
+
+        result = subprocess.run(command[:-4] + ['--scales', '0'], capture_output=True, text=True)
+        assert result.returncode == 1 and '错误' in result.stdout
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    test_measurement()
+    test_report()
+    print("🎉 所有测试通过!")
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+import os
+import shutil
+import tempfile
+
+from bench_templates import (Driver, TemplateBenchmark, compare_with_baseline, edited_blocks, find_drivers,
+                             summarize, HEADER_NAME)
+
+DOCUMENT = r'''\section{前缀和}
+\begin{minted}{cpp}
+long long s[N];
+void build(int n)
+{
+    for (int i = 1; i <= n; i++) s[i] = s[i - 1] + i;
+}
+int unused_variant;
+\end{minted}
+\begin{minted}{cpp}
+long long query(int l, int r) { return s[r] - s[l - 1]; }
+\end{minted}
+'''
+
+DRIVER = '''// 前缀和
+// @sizes 100 1000
+const int N = 100010;
+// @block 前缀和:1-5
+// @block 前缀和#2
+int n;
+void setup(int size, mt19937 &rng) { n = size; }
+unsigned long long run()
+{
+    build(n);
+    return query(1, n);
+}
+'''
+
+
+def write(path, content):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(content)
+
+
+def make_project(directory):
+    tex_file = os.path.join(directory, 'doc.tex')
+    bench_dir = os.path.join(directory, 'bench')
+    os.makedirs(bench_dir)
+    write(tex_file, DOCUMENT)
+    shutil.copy(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bench', HEADER_NAME), bench_dir)
+    write(os.path.join(bench_dir, 'prefix.cpp'), DRIVER)
+    return tex_file, bench_dir
+
+
+def test_statistics():
+    print("🧪 中位数与四分位距...")
+    stats = summarize([5, 1, 3, 2, 4])
+    assert stats['median_ns'] == 3 and stats['q1_ns'] == 2 and stats['q3_ns'] == 4 and stats['iqr_ns'] == 2
+
+    print("🧪 与基线比较...")
+    baseline = {'results': {'a': {'sizes': {'10': {'median_ns': 100, 'iqr_ns': 5}}}}}
+    slower = {'a': {'sizes': {'10': {'median_ns': 150, 'iqr_ns': 5}}}}
+    noisy = {'a': {'sizes': {'10': {'median_ns': 150, 'iqr_ns': 60}}}}
+    same = {'a': {'sizes': {'10': {'median_ns': 105, 'iqr_ns': 5}}}}
+    assert [item[:2] for item in compare_with_baseline(slower, baseline, 0.2)] == [('a', '10')]
+    assert compare_with_baseline(noisy, baseline, 0.2) == []
+    assert compare_with_baseline(same, baseline, 0.2) == []
+    print("🎉 统计测试通过!")
+
+
+def test_template_benchmark():
+    if shutil.which('g++') is None:
+        print("⚠️  未找到 g++，跳过模板基准测试")
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        tex_file, bench_dir = make_project(directory)
+        bench = TemplateBenchmark(tex_file, bench_dir, os.path.join(directory, 'cache'), warmup=1, repeat=3)
+
+        print("🧪 引用代码块生成驱动源码...")
+        driver, = find_drivers(bench_dir)
+        assert driver.sizes == [100, 1000]
+        source, blocks = driver.expand(bench.index, bench.header)
+        assert 'unused_variant' not in source and 'long long query' in source
+        assert f'#line 3 "{bench.index.path}"' in source
+        assert [block['line'] for block in blocks] == [2, 10]
+
+        print("🧪 编译并计时...")
+        result = bench.run(driver)
+        assert list(result['sizes']) == ['100', '1000']
+        assert all(stats['runs'] == 3 and stats['median_ns'] > 0 for stats in result['sizes'].values())
+
+        print("🧪 代码块修改后能发现...")
+        write(tex_file, DOCUMENT.replace('s[i - 1] + i', 's[i - 1] + i * 2'))
+        edited = TemplateBenchmark(tex_file, bench_dir, os.path.join(directory, 'cache'), warmup=1, repeat=1)
+        new_result = edited.run(Driver(driver.path), [100])
+        assert new_result['source'] != result['source']
+        assert edited_blocks(new_result, result) == ['前缀和:1-5']
+        assert edited_blocks(result, result) == []
+        print("🎉 模板基准测试通过!")
+
+
+if __name__ == '__main__':
+    test_statistics()
+    test_template_benchmark()
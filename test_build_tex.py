@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+import os
+import sys
+import stat
+import tempfile
+import subprocess
+
+from build_tex import TexBuilder
+
+# 模拟 xelatex: 目录 (.toc) 由上一次的 .toc 决定页码，第一次编译没有目录，
+# 因此冷编译需要三次才能使 .aux 稳定；正文含 \error 时失败，含 \unstable 时 .aux 每次都变，
+# 含 \slow 时每次编译耗时数秒
+STUB_ENGINE = r'''#!/usr/bin/env python3
+import os, re, sys, time
+tex = sys.argv[-1]
+stem = os.path.splitext(tex)[0]
+for arg in sys.argv[1:-1]:
+    if arg.startswith('-jobname='):
+        stem = arg[len('-jobname='):]
+with open(tex) as f:
+    source = f.read()
+with open('passes.txt', 'a') as f:
+    f.write(' '.join(sys.argv[1:]) + '\n')
+if '\\error' in source:
+    sys.exit(1)
+if '\\slow' in source:
+    time.sleep(5)
+
+def read(path):
+    return open(path).read() if os.path.exists(path) else ''
+
+titles = re.findall(r'\\section\{([^}]*)\}', source)
+old_toc = read(stem + '.toc')
+pages = 1 + len(old_toc.splitlines())
+aux = f'pages={pages}\n'
+if '\\unstable' in source:
+    aux += read(stem + '.aux')
+open(stem + '.aux', 'w').write(aux)
+open(stem + '.toc', 'w').write(''.join(f'{t} {pages}\n' for t in titles))
+open(stem + '.pdf', 'w').write(source + aux)
+with open(stem + '.fls', 'w') as f:
+    f.write(f'PWD {os.getcwd()}\nINPUT {tex}\nINPUT chapter.tex\nINPUT /usr/share/texmf/ctexart.cls\n'
+            f'INPUT {stem}.aux\nOUTPUT {stem}.pdf\n')
+'''
+
+
+def make_project(directory):
+    engine = os.path.join(directory, 'xelatex-stub')
+    with open(engine, 'w') as f:
+        f.write(STUB_ENGINE)
+    os.chmod(engine, os.stat(engine).st_mode | stat.S_IEXEC)
+
+    tex_file = os.path.join(directory, 'doc.tex')
+    write(tex_file, '\\section{数据结构}\n\\section{图论}\n正文\n')
+    write(os.path.join(directory, 'chapter.tex'), '章节\n')
+    return engine, tex_file
+
+
+def write(path, text):
+    with open(path, 'w') as f:
+        f.write(text)
+
+
+def count_passes(directory):
+    path = os.path.join(directory, 'passes.txt')
+    if not os.path.exists(path):
+        return 0
+    with open(path) as f:
+        return len(f.readlines())
+
+
+def test_incremental_build():
+    with tempfile.TemporaryDirectory() as directory:
+        engine, tex_file = make_project(directory)
+        builder = TexBuilder(tex_file, engine=engine)
+
+        print("🧪 冷编译直到辅助文件稳定...")
+        result = builder.build()
+        assert result.status == 'built' and result.converged
+        assert len(result.passes) == 3 and count_passes(directory) == 3
+        assert result.passes[-1].changed == []
+        assert '-shell-escape' in open(os.path.join(directory, 'passes.txt')).readline()
+
+        print("🧪 无改动时跳过...")
+        result = builder.build()
+        assert result.status == 'skipped' and count_passes(directory) == 3
+
+        print("🧪 只改正文时一次即可...")
+        write(tex_file, '\\section{数据结构}\n\\section{图论}\n新的正文\n')
+        result = builder.build()
+        assert result.status == 'built' and len(result.passes) == 1
+
+        print("🧪 .fls 记录的子文件改动也会触发编译...")
+        write(os.path.join(directory, 'chapter.tex'), '修改后的章节\n')
+        assert builder.stale_reason() == 'chapter.tex 已修改'
+        assert builder.build().status == 'built'
+
+        print("🧪 新增章节需要重新生成目录...")
+        write(tex_file, '\\section{数据结构}\n\\section{图论}\n\\section{字符串}\n新的正文\n')
+        result = builder.build()
+        assert result.converged and len(result.passes) == 3
+        assert result.passes[0].changed == ['.toc']
+        print("🎉 增量编译测试通过!")
+
+
+def test_pass_limit_and_failure():
+    with tempfile.TemporaryDirectory() as directory:
+        engine, tex_file = make_project(directory)
+        builder = TexBuilder(tex_file, engine=engine, max_passes=4)
+
+        print("🧪 辅助文件持续变化时在上限处停止...")
+        write(tex_file, '\\section{数据结构}\n\\unstable\n')
+        result = builder.build()
+        assert result.status == 'built' and not result.converged
+        assert len(result.passes) == 4
+
+        print("🧪 编译失败后不记录状态...")
+        write(tex_file, '\\section{数据结构}\n\\error\n')
+        result = builder.build()
+        assert result.status == 'failed' and not result.ok
+        assert len(result.passes) == 1
+        assert builder.stale_reason() == '没有编译记录'
+
+        print("🧪 清理后为冷编译...")
+        write(tex_file, '\\section{数据结构}\n')
+        builder.clean()
+        assert not os.path.exists(builder.output_path('.aux'))
+        assert len(builder.build().passes) == 3
+        print("🎉 编译上限和失败处理测试通过!")
+
+
+def test_lazy_prerender_import():
+    print("测试不预渲染时不导入 pygments...")
+    code = 'import sys, build_tex, watch_tex, tex_preview, bundle; print("pygments" in sys.modules)'
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__)))
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == 'False'
+
+
+if __name__ == '__main__':
+    test_incremental_build()
+    test_pass_limit_and_failure()
+    test_lazy_prerender_import()
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+import os
+import shutil
+import subprocess
+import tempfile
+
+from bundle import Bundler, NameIndex, bundle_file
+
+DOCUMENT = ('\\section{数据结构}\n'
+            '\\subsection{树状数组}\n'
+            '\\begin{minted}{cpp}\n'
+            '#include <bits/stdc++.h>\n'
+            'using namespace std;\n'
+            '#define lowbit(x) ((x) & -(x))\n'
+            'int tr[N], n;\n'
+            'void add(int x, int v) { for (; x <= n; x += lowbit(x)) tr[x] += v; }\n'
+            'int ask(int x) { int s = 0; for (; x; x -= lowbit(x)) s += tr[x]; return s; }\n'
+            '\\end{minted}\n'
+            '\\subsection{并查集}\n'
+            '\\begin{minted}{cpp}\n'
+            '#include <vector>\n'
+            '#define lowbit(x) ((x)  &  -(x))\n'
+            'int p[N];\n'
+            'int find(int x) { return p[x] == x ? x : p[x] = find(p[x]); }\n'
+            '\\end{minted}\n'
+            '\\begin{minted}{cpp}\n'
+            '#define lowbit(x) (x & -x)\n'
+            '\\end{minted}\n'
+            '\\section{图论}\n'
+            '\\subsection{并查集}\n'
+            '\\begin{minted}{cpp}\n'
+            'int fa[N];\n'
+            'int get(int x) { return fa[x] == x ? x : fa[x] = get(fa[x]); }\n'
+            '// 初始化\n'
+            'for (int i = 1; i <= n; i++) fa[i] = i;\n'
+            '\\end{minted}\n')
+
+SOLUTION = ('#include <bits/stdc++.h>\n'
+            'using namespace std;\n'
+            'const int N = 100;\n'
+            '// @use ds/fenwick\n'
+            '// @use 数据结构/并查集\n'
+            '// @use 树状数组\n'
+            'int main() { n = 5; add(2, 3); for (int i = 1; i <= 5; i++) p[i] = i; '
+            'printf("%d %d\\n", ask(4), find(3)); }\n')
+
+def test_bundle():
+    directory = tempfile.mkdtemp()
+    try:
+        tex_path = os.path.join(directory, 'doc.tex')
+        aliases_path = os.path.join(directory, 'aliases.txt')
+        names_path = os.path.join(directory, 'doc.names.json')
+        cache_dir = os.path.join(directory, 'cache')
+        with open(tex_path, 'w', encoding='utf-8') as f:
+            f.write(DOCUMENT)
+        with open(aliases_path, 'w', encoding='utf-8') as f:
+            f.write('# 注释\nds/fenwick = 树状数组\nds/dsu = 数据结构/并查集\n')
+
+        print("测试名称解析...")
+        names = NameIndex.load(tex_path, aliases_path, names_path)
+        assert names.resolve('ds/fenwick')[0]['path'] == ['数据结构', '树状数组']
+        assert names.resolve('数据结构/并查集#2')[1]['line'] == 18
+        section, block, start, end = names.resolve('树状数组:4-5')
+        assert names.code(block, start, end).startswith('int tr[N]')
+        # 只写章节标题时去掉结尾的用法示例
+        assert names.resolve('图论/并查集')[2:] == (1, 2)
+        assert names.resolve('树状数组')[2:] == (None, None)
+        for ref in ('并查集', '线段树', '树状数组#2'):
+            try:
+                names.resolve(ref)
+                assert False, ref
+            except ValueError:
+                pass
+        # 缓存命中时不再解析 .tex
+        assert NameIndex.load(tex_path, aliases_path, names_path).names == names.names
+
+        print("测试打包...")
+        source_path = os.path.join(directory, 'a.cpp')
+        output_path = os.path.join(directory, 'a_submit.cpp')
+        with open(source_path, 'w', encoding='utf-8') as f:
+            f.write(SOLUTION)
+        refs, cached, changed, problems = bundle_file(source_path, output_path, names, cache_dir)
+        assert len(refs) == 3 and not cached and changed and problems == []
+        with open(output_path, 'r', encoding='utf-8') as f:
+            text = f.read()
+        lines = text.split('\n')
+        assert lines[:2] == ['#include <bits/stdc++.h>', 'using namespace std;']
+        # 头文件、using namespace、等价的宏定义和重复引用都只保留一份
+        assert text.count('#include') == 1 and text.count('using namespace') == 1
+        assert text.count('#define lowbit') == 1 and text.count('int tr[N]') == 1
+        assert '// @use' not in text
+
+        refs, cached, changed, problems = bundle_file(source_path, output_path, names, cache_dir)
+        assert cached and not changed and problems == []
+        assert len(os.listdir(cache_dir)) == 2
+
+        if shutil.which('g++') is None:
+            print("⚠️ 未找到 g++，跳过编译测试")
+        else:
+            binary = os.path.join(directory, 'a')
+            subprocess.run(['g++', '-std=c++20', '-o', binary, output_path], check=True)
+            assert subprocess.run([binary], capture_output=True, text=True).stdout == '3 3\n'
+
+        print("测试重复定义和最外层语句...")
+        with open(source_path, 'w', encoding='utf-8') as f:
+            f.write('int n;\n// @use 树状数组\n// @use 图论/并查集:1-4\nint main() {}\n')
+        for _ in range(2):
+            refs, cached, changed, problems = bundle_file(source_path, output_path, names, cache_dir)
+            assert len(problems) == 2, problems
+            assert problems[0].startswith('数据结构/树状数组 (第7行): n 重复定义')
+            assert 'a.cpp:1' in problems[0]
+            assert problems[1].startswith('图论/并查集 (第27行): 最外层语句 `for')
+        assert cached and len(os.listdir(cache_dir)) == 2
+
+        print("测试宏定义冲突...")
+        with open(source_path, 'w', encoding='utf-8') as f:
+            f.write(SOLUTION + '// @use ds/dsu#2\n')
+        try:
+            bundle_file(source_path, output_path, names, cache_dir)
+            assert False
+        except ValueError as e:
+            assert 'lowbit' in str(e)
+    finally:
+        shutil.rmtree(directory)
+
+def test_template_aliases():
+    print("测试模板别名...")
+    names = NameIndex.load('Algorithm-template.tex', 'bundle_aliases.txt')
+    bundler = Bundler(names)
+    for alias in names.aliases:
+        section, block, start, end = names.resolve(alias)
+        assert names.code(block, start, end).strip()
+        # 每个别名单独引用时不应有重复定义
+        source = f'// @use {alias}\n'
+        _, problems = bundler.bundle(source, bundler.references(source))
+        assert not problems, (alias, problems)
+    assert names.resolve('主席树')[2:] == names.resolve('ds/persistent-segtree')[2:] == (1, 27)
+
+if __name__ == '__main__':
+    test_bundle()
+    test_template_aliases()
+    print("🎉 所有测试通过!")
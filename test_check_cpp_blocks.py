@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+import os
+import shutil
+import tempfile
+
+from tex_index import TexIndex
+from check_cpp_blocks import (BlockChecker, classify, context_names, first_error, has_top_level_statements,
+                              is_typo, missing_bounds, parse_errors, wrap_block)
+
+DOCUMENT = r'''\section{杂项}
+\begin{minted}{cpp}
+int gcd(int a, int b) { return b ? gcd(b, a % b) : a; }
+\end{minted}
+\begin{minted}{cpp}
+for (int i = 1; i <= n; i++)
+    ans += w[i];
+\end{minted}
+\begin{minted}{cpp}
+int f(int x)
+{
+    return x +;
+}
+\end{minted}
+\begin{minted}{cpp}
+int main()
+{
+    printf("%d\n", 1);
+}
+\end{minted}
+\section{树状数组}
+\begin{minted}{cpp}
+const int N = 100010;
+int tr[N], n;
+\end{minted}
+\begin{minted}{cpp}
+void add(int x, int v)
+{
+    for (; x <= n; x += x & -x)
+        tr[x] += v;
+}
+\end{minted}
+\begin{minted}{cpp}
+int ask(int x)
+{
+    itn s = 0;
+    for (; x; x -= x & -x)
+        s += tr[x];
+    return s;
+}
+\end{minted}
+\begin{minted}{cpp}
+vector<array<int, 2>> e(n);
+int first() { return e[0][1] + ans + w[1]; }
+\end{minted}
+\section{其他}
+\begin{minted}{cpp}
+#define int long long
+int a[N];
+int get(int x) { return a[x]; }
+--------------------
+a[0] = get(1);
+sort(a, a + 2);
+\end{minted}
+\begin{minted}{cpp}
+int cnt[maxn];
+void clear() { memset(cnt, 0, sizeof cnt); }
+\end{minted}
+'''
+
+
+def test_wrap_and_classify():
+    print("🧪 包装代码块...")
+    assert wrap_block('int main() {}')[1] is None
+    assert wrap_block('int f() { return 1; }')[1] == 'main'
+    source, wrap = wrap_block('for (;;) break;')
+    assert wrap == 'statements' and source.endswith('for (;;) break;\n}\n')
+    # 函数体内的语句不算最外层语句
+    assert not has_top_level_statements('void f()\n{\n    for (;;) {}\n    if (x) return;\n}')
+    assert not has_top_level_statements('const char *s = "for";')
+    assert has_top_level_statements('int x;\nwhile (x--) {}')
+    # 函数定义留在最外层，后面的语句移进 main 并保持行号
+    source, wrap = wrap_block('int f() { return 1; }\n-----\nx = f();\ng(x);')
+    assert wrap == 'statements' and 'signed main() {\n#line 3 "block.cpp"\nx = f();\n#line 4 "block.cpp"\ng(x);\n}' in source
+    assert '-----' not in source
+    # 没有定义的数组大小常量预先声明
+    assert missing_bounds('int tr[N << 2], w[M];\nconst int M = 5;') == ['N']
+    assert 'const int N = ' in wrap_block('int tr[N];')[0]
+
+    print("🧪 解析错误并分类...")
+    errors = parse_errors("block.cpp: In function 'int main()':\n"
+                          "block.cpp:3:5: error: 'n' was not declared in this scope\n"
+                          "/usr/include/c++/12/bits/stl_algobase.h:259:15: error: no match for 'operator<'\n"
+                          "cc1plus: error: attribute 'target' argument ' bmi' is unknown\n")
+    assert [error['line'] for error in errors] == [3, None, None]
+    assert errors[1]['message'].startswith('/usr/include/c++/12/bits/stl_algobase.h: ')
+    assert classify(0, []) == 'ok'
+    assert classify(1, errors[:1]) == 'fragment'
+    assert classify(1, errors[1:]) == 'error'
+    # 缺少上下文的错误不能掩盖代码本身的错误
+    assert classify(1, errors) == 'error'
+    assert first_error(errors)['line'] is None and first_error(errors[:1])['line'] == 3
+    # 未声明的类型引起的连带错误
+    cascade = [{'line': 1, 'column': 8, 'message': "'PII' was not declared in this scope"},
+               {'line': 1, 'column': 11, 'message': 'template argument 1 is invalid'}]
+    assert classify(1, cascade) == 'fragment' and classify(1, cascade[1:]) == 'error'
+    # 未声明的名字在其他代码块中都没有出现，只可能是写错了
+    assert classify(1, errors[:1], names={'n'}) == 'fragment'
+    assert classify(1, errors[:1], names={'m'}) == 'error'
+    # 编译器猜测的拼写只差一处且出现在代码块中时才算写错了
+    assert is_typo('itn', 'int') and is_typo('Change', 'change') and not is_typo('pw', 'w')
+    typo = [{'line': 2, 'column': 5, 'message': "'itn' was not declared in this scope; did you mean 'int'?"},
+            {'line': 3, 'column': 5, 'message': "'pw' was not declared in this scope; did you mean 'w'?"},
+            {'line': 3, 'column': 9, 'message': "'cnt' was not declared in this scope"}]
+    assert context_names('int cnt[maxn];\nitn s = 0;\nw = pw[cnt[1]];', typo) == {'pw', 'cnt'}
+    # 片段中的 break/return 只有包进 main 后才出错
+    wrapper_errors = [{'line': 1, 'column': 1, 'message': 'break statement not within loop or switch'}]
+    assert classify(1, wrapper_errors, 'statements') == 'fragment'
+    assert classify(1, wrapper_errors, 'main') == 'error'
+    print("🎉 包装与分类测试通过!")
+
+
+def test_check_blocks():
+    if shutil.which('g++') is None:
+        print("⚠️  未找到 g++，跳过编译检查测试")
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        tex_file = os.path.join(directory, 'doc.tex')
+        with open(tex_file, 'w', encoding='utf-8') as f:
+            f.write(DOCUMENT)
+        index = TexIndex.build(tex_file)
+        cache_dir = os.path.join(directory, 'cache')
+
+        print("🧪 使用预编译头并行检查...")
+        checker = BlockChecker(cache_dir=cache_dir)
+        checker.build_pch()
+        assert checker.use_pch and os.path.exists(checker.pch_header + '.gch')
+        results = checker.check(index, index.blocks, jobs=2)
+        assert [result.status for result in results] == ['ok', 'fragment', 'error', 'ok', 'ok', 'ok', 'error', 'fragment',
+                                                          'ok', 'fragment']
+        assert [result.wrap for result in results][:4] == ['main', 'statements', 'main', None]
+        # #define int long long 的代码块用 signed main 包装，语句移进 main 后可以通过
+        assert results[8].wrap == 'statements'
+
+        print("🧪 以同一节前面的代码块为上下文编译...")
+        assert [result.context for result in results] == [0, 0, 0, 0, 0, 1, 0, 0, 0, 0]
+        # itn 的报错不再被 tr 未声明掩盖
+        assert "'itn' was not declared" in first_error(results[6].errors)['message']
+
+        print("🧪 报错映射回 .tex 行号...")
+        error = results[2].errors[0]
+        assert results[2].tex_line(error) == 12 and error['column'] == 15
+        assert results[2].to_dict()['errors'][0]['tex_line'] == 12
+
+        print("🧪 第二次检查全部命中缓存...")
+        checker = BlockChecker(cache_dir=cache_dir)
+        assert checker.build_pch() == 0.0
+        results = checker.check(index, index.blocks, jobs=2)
+        assert all(result.cached for result in results)
+        assert [result.status for result in results] == ['ok', 'fragment', 'error', 'ok', 'ok', 'ok', 'error', 'fragment',
+                                                          'ok', 'fragment']
+
+        print("🧪 编译选项不同则重新检查...")
+        checker = BlockChecker(flags=['-DLOCAL'], cache_dir=cache_dir, use_pch=False)
+        results = checker.check(index, index.blocks[:1])
+        assert not results[0].cached and results[0].status == 'ok'
+        print("🎉 编译检查测试通过!")
+
+
+if __name__ == '__main__':
+    test_wrap_and_classify()
+    test_check_blocks()
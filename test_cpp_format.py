@@ -1,5 +1,9 @@
 #!/usr/bin/env python3
+import re
+import random
+
 from format_cpp import CPPFormatter
+from rule_profiler import RuleProfiler
 
 def test_format():
     formatter = CPPFormatter()
@@ -35,5 +39,66 @@ def test_format():
     else:
         print(f"❌ {failed} 个测试失败")
 
+def apply_rules_sequentially(formatter, code):
+    """逐条 re.sub 执行规则表，作为编译后规则引擎的参照实现"""
+    lines = []
+    for line in code.split('\n'):
+        indent = len(line) - len(line.lstrip())
+        content = line.strip()
+        if content:
+            for pattern, replacement, _ in formatter.formatting_rules:
+                content = re.sub(pattern, replacement, content)
+        lines.append(' ' * indent + content if content else '')
+    return '\n'.join(lines)
+
+def test_compiled_rules_match_sequential():
+    formatter = CPPFormatter()
+
+    with open('Algorithm-template.tex', 'r', encoding='utf-8') as f:
+        samples = f.read().split('\n')
+
+    # 随机拼接运算符和操作数，覆盖连写运算符等边界情况
+    tokens = list('ab1_])([ ') + ['>=', '<=', '==', '!=', '>', '<', '<<', '>>', '&&', '||',
+                                  '+', '-', '*', '/', '%', '&', '|', '^', '+=', '-=', '&=',
+                                  '=', '{', '}', ',', ';', 'else', 'if(', '}else', 'else{']
+    rng = random.Random(2024)
+    for _ in range(20000):
+        samples.append(''.join(rng.choice(tokens) for _ in range(rng.randint(1, 12))))
+
+    print("测试编译后的规则引擎与逐条执行一致...")
+    failed = 0
+    for sample in samples:
+        expected = apply_rules_sequentially(formatter, sample)
+        result = formatter.format_code(sample)
+        if result != expected:
+            print(f"❌ 失败: '{sample}' -> '{result}', 期望: '{expected}'")
+            failed += 1
+
+    if failed == 0:
+        print(f"🎉 {len(samples)} 个样例输出完全一致!")
+    assert failed == 0
+
+def test_profile_mode():
+    """--profile 模式输出不变，且逐条记录了每条规则的统计"""
+    formatter = CPPFormatter()
+    code = "for(int i=0;i<n;i++){\n    ans+=a[i]*b[i];\n}else{"
+    profiler = RuleProfiler()
+
+    print("测试规则性能分析模式...")
+    assert formatter.format_code(code, profiler) == formatter.format_code(code)
+    assert len(profiler.stats) == len(formatter.formatting_rules)
+
+    stats = profiler.stats[r'([a-zA-Z0-9_\]\)])\+=([a-zA-Z0-9_\[\(])']
+    assert stats.calls == 3 and stats.hits == 1 and stats.matches == 1
+    assert profiler.stats[r'\b(if|for|while|switch)\('].hits == 1
+    assert all(stats.calls == 3 for stats in profiler.stats.values())
+
+    data = profiler.to_dict()
+    assert [rule['rule'] for rule in data['rules']] == [stats.name for stats in profiler.ranked()]
+    assert all(len(rule['slowest']) <= 3 for rule in data['rules'])
+    print("🎉 性能分析统计正确!")
+
 if __name__ == '__main__':
-    test_format()
\ No newline at end of file
+    test_format()
+    test_compiled_rules_match_sequential()
+    test_profile_mode()
\ No newline at end of file
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+import re
+
+import cpp_lexer
+import format_tex_cpp_v2
+
+def test_lexer_mode_rules():
+    assert format_tex_cpp_v2.test_formatting_rules('lexer')
+
+def test_literals_untouched():
+    test_cases = [
+        ('printf("%d+%d\\n",a,b);', 'printf("%d+%d\\n", a, b);'),
+        ("if(c=='-') f=-1;", "if (c == '-') f = -1;"),
+        ('x=y;// a+b,c', 'x = y;// a+b,c'),
+        ('x=1e-9+0x1f;', 'x = 1e-9 + 0x1f;'),
+        ('auto s=R"(a<b>c)";', 'auto s = R"(a<b>c)";'),
+        ('#include <bits/stdc++.h>', '#include <bits/stdc++.h>'),
+        ('/* a+b\nc+d */x=y;', '/* a+b\nc+d */x = y;'),
+    ]
+
+    print("测试字面量和注释不被改写...")
+    failed = 0
+    for input_str, expected in test_cases:
+        result = cpp_lexer.format_cpp_code(input_str)
+        if result != expected:
+            print(f"❌ 失败: '{input_str}' -> '{result}', 期望: '{expected}'")
+            failed += 1
+        else:
+            print(f"✅ 通过: '{input_str}' -> '{result}'")
+    assert failed == 0
+
+def test_ternary_and_comparisons():
+    test_cases = [
+        ('x=a<b?a:b;', 'x = a < b ? a : b;'),
+        ('x=a?b?c:d:e;', 'x = a ? b ? c : d : e;'),
+        ('cout<<(a?1:2);', 'cout << (a ? 1 : 2);'),
+        # 不是三目运算符的 : 保持原样
+        ('case 1:x=a?b:c;', 'case 1:x = a ? b : c;'),
+        ('for(auto x:v)', 'for (auto x:v)'),
+        # 赋值或 return 之后的比较链不是模板
+        ('x = a < b > c;', 'x = a < b > c;'),
+        ('return a<b>c;', 'return a < b > c;'),
+        ('Foo<int> x;', 'Foo<int> x;'),
+        ('void f(int a=1,Foo<T> b);', 'void f(int a = 1, Foo<T> b);'),
+        ('x=cond?Foo<T>(1):y;', 'x = cond ? Foo<T>(1) : y;'),
+    ]
+
+    print("测试三目运算符和比较链...")
+    for input_str, expected in test_cases:
+        result = cpp_lexer.format_cpp_code(input_str)
+        assert result == expected, f"'{input_str}' -> '{result}', 期望: '{expected}'"
+        assert cpp_lexer.format_cpp_code(result) == result
+
+def test_idempotent_on_template():
+    with open('Algorithm-template.tex', 'r', encoding='utf-8') as f:
+        content = f.read()
+    blocks = re.findall(r'\\begin\{minted\}\{cpp\}\n(.*?)\n\\end\{minted\}', content, re.DOTALL)
+
+    print("测试重复格式化结果不变...")
+    for block in blocks:
+        once = cpp_lexer.format_cpp_code(block)
+        assert cpp_lexer.format_cpp_code(once) == once
+
+if __name__ == '__main__':
+    test_lexer_mode_rules()
+    test_literals_untouched()
+    test_ternary_and_comparisons()
+    test_idempotent_on_template()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+import os
+import sys
+import shutil
+import tempfile
+import subprocess
+
+from format_cache import FormatCache, default_cache_path, rules_version
+
+DOCUMENT = ('\\section{测试}\n'
+            '\\begin{minted}{cpp}\n'
+            'int main(){int a=1;return a;}\n'
+            '\\end{minted}\n')
+
+
+def test_eviction():
+    directory = tempfile.mkdtemp()
+    try:
+        path = os.path.join(directory, 'cache.json')
+
+        print("测试按条目数淘汰...")
+        cache = FormatCache(path, 'v1', max_entries=3)
+        for code in ('a', 'b', 'c'):
+            cache.put(code, code.upper())
+        # 读取 a 后 b 成为最久未使用的条目
+        assert cache.get('a') == 'A'
+        cache.put('d', 'D')
+        assert len(cache.entries) == 3
+        assert cache.get('b') is None
+        assert [cache.get(code) for code in ('a', 'c', 'd')] == ['A', 'C', 'D']
+        assert (cache.hits, cache.misses) == (4, 1)
+
+        print("测试按总大小淘汰...")
+        cache = FormatCache(os.path.join(directory, 'size.json'), 'v1', max_bytes=10)
+        cache.put('a', 'x' * 4)
+        cache.put('b', 'y' * 4)
+        assert cache.size == 8
+        cache.get('a')
+        cache.put('c', 'z' * 4)
+        assert cache.get('b') is None and cache.get('a') == 'xxxx' and cache.size == 8
+        # 覆盖已有条目时按新值计算大小
+        cache.put('a', 'x')
+        assert cache.size == 5 and len(cache.entries) == 2
+        # 单个条目超过上限时不保留
+        cache.put('d', 'w' * 11)
+        assert cache.get('d') is None and cache.size <= 10
+
+        print("测试 fetch 只在未命中时格式化...")
+        calls = []
+        cache = FormatCache(os.path.join(directory, 'fetch.json'), 'v1')
+        for _ in range(2):
+            assert cache.fetch('int a;', lambda code: calls.append(code) or code.upper()) == 'INT A;'
+        assert calls == ['int a;']
+        # 不同 salt (如格式化模式) 分别缓存
+        assert cache.get('int a;', salt='lexer') is None
+    finally:
+        shutil.rmtree(directory)
+    print("🎉 淘汰测试通过!")
+
+
+def test_persistence():
+    directory = tempfile.mkdtemp()
+    try:
+        path = os.path.join(directory, 'sub', 'cache.json')
+
+        print("测试保存和读取...")
+        cache = FormatCache(path, 'v1', max_entries=2)
+        cache.save()
+        assert not os.path.exists(path)
+        for code in ('a', 'b', 'c'):
+            cache.put(code, code * 2)
+        cache.get('b')
+        cache.save()
+        assert not cache.dirty and os.path.exists(path)
+        assert not [name for name in os.listdir(os.path.dirname(path)) if name.endswith('.tmp')]
+
+        loaded = FormatCache(path, 'v1', max_entries=2)
+        assert list(loaded.entries.items()) == [(cache.key('c'), 'cc'), (cache.key('b'), 'bb')]
+        assert loaded.size == 4 and not loaded.dirty
+        # 读取时按更小的上限淘汰最久未使用的条目
+        smaller = FormatCache(path, 'v1', max_entries=1)
+        assert list(smaller.entries.values()) == ['bb'] and smaller.dirty
+
+        print("测试规则版本改变后失效...")
+        changed = FormatCache(path, 'v2')
+        assert not changed.entries and changed.dirty
+        changed.save()
+        assert not FormatCache(path, 'v1').entries
+
+        print("测试损坏的缓存文件...")
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('{')
+        assert not FormatCache(path, 'v2').entries
+
+        script = os.path.join(directory, 'rules.py')
+        with open(script, 'w', encoding='utf-8') as f:
+            f.write('RULES = 1\n')
+        version = rules_version(script)
+        assert rules_version(script) == version
+        with open(script, 'a', encoding='utf-8') as f:
+            f.write('RULES = 2\n')
+        assert rules_version(script) != version
+    finally:
+        shutil.rmtree(directory)
+    print("🎉 持久化测试通过!")
+
+
+def test_dry_run_keeps_cache():
+    print("测试预览模式不写缓存...")
+    root = os.path.dirname(os.path.abspath(__file__))
+    directory = tempfile.mkdtemp()
+    try:
+        tex_path = os.path.join(directory, 'doc.tex')
+        with open(tex_path, 'w', encoding='utf-8') as f:
+            f.write(DOCUMENT)
+        for tool in ('format_tex_cpp', 'format_tex_cpp_v2'):
+            cache_path = default_cache_path(tex_path, tool)
+            result = subprocess.run([sys.executable, os.path.join(root, f'{tool}.py'), tex_path, '--dry-run'],
+                                    capture_output=True, text=True)
+            assert result.returncode == 0, result.stdout + result.stderr
+            assert not os.path.exists(cache_path), tool
+            with open(tex_path, 'r', encoding='utf-8') as f:
+                assert f.read() == DOCUMENT
+
+            result = subprocess.run([sys.executable, os.path.join(root, f'{tool}.py'), tex_path],
+                                    capture_output=True, text=True)
+            assert result.returncode == 0, result.stdout + result.stderr
+            assert os.path.exists(cache_path), tool
+            with open(tex_path, 'w', encoding='utf-8') as f:
+                f.write(DOCUMENT)
+    finally:
+        shutil.rmtree(directory)
+    print("🎉 预览模式测试通过!")
+
+
+if __name__ == '__main__':
+    test_eviction()
+    test_persistence()
+    test_dry_run_keeps_cache()
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+import os
+import shutil
+import tempfile
+
+import format_tex_cpp_v2
+from format_cache import FormatCache, rules_version
+
+BLOCKS = [
+    'int main(){int a=1,b=2;if(a<b)a+=b;return a;}',
+    'for(int i=0;i<n;i++){\n    s+=a[i]*b[i];\n}',
+    'vector< int >v;\nmap<int,int>cnt;\nint l=0,r=n-1;while(l<r){int mid=l+r>>1;}',
+    'string s="a+b";char c=\'=\';// a+b\nint x=y<<1;',
+]
+
+
+def make_document():
+    """多个代码块，其中有重复的代码块和不需要格式化的其他语言代码块"""
+    parts = ['\\section{测试}\n']
+    for i, code in enumerate(BLOCKS + BLOCKS[:2] + BLOCKS[::-1]):
+        parts.append(f'第{i}段说明文字\n\\begin{{minted}}{{{"cpp" if i % 2 else "c++"}}}\n{code}\n\\end{{minted}}\n')
+        if i == 3:
+            parts.append('\\begin{minted}{python}\nx=1+2\n\\end{minted}\n')
+    return ''.join(parts)
+
+
+def test_parallel_matches_serial():
+    content = make_document()
+    directory = tempfile.mkdtemp()
+    try:
+        version = rules_version(format_tex_cpp_v2.__file__)
+        for mode in format_tex_cpp_v2.FORMAT_MODES:
+            print(f"测试 {mode} 模式下并行与串行输出一致...")
+            expected = format_tex_cpp_v2.format_latex_cpp_blocks(content, mode, None, 1)
+            assert expected != content and 'x=1+2' in expected
+
+            outputs = {'jobs=2': format_tex_cpp_v2.format_latex_cpp_blocks(content, mode, None, 2)}
+            for jobs in (1, 2):
+                cache = FormatCache(os.path.join(directory, f'{mode}-{jobs}.json'), version)
+                # 第一次全部未命中，第二次全部命中
+                outputs[f'jobs={jobs} 冷缓存'] = format_tex_cpp_v2.format_latex_cpp_blocks(content, mode, cache, jobs)
+                cache.save()
+                cache = FormatCache(cache.path, version)
+                outputs[f'jobs={jobs} 热缓存'] = format_tex_cpp_v2.format_latex_cpp_blocks(content, mode, cache, jobs)
+                assert cache.misses == 0 and cache.hits > 0
+            # 串行结果写入的缓存供并行读取，反之亦然
+            cache = FormatCache(os.path.join(directory, f'{mode}-1.json'), version)
+            outputs['jobs=2 读串行缓存'] = format_tex_cpp_v2.format_latex_cpp_blocks(content, mode, cache, 2)
+            cache = FormatCache(os.path.join(directory, f'{mode}-2.json'), version)
+            outputs['jobs=1 读并行缓存'] = format_tex_cpp_v2.format_latex_cpp_blocks(content, mode, cache, 1)
+
+            for name, output in outputs.items():
+                assert output == expected, f'{mode} {name}'
+    finally:
+        shutil.rmtree(directory)
+    print("🎉 并行格式化测试通过!")
+
+
+if __name__ == '__main__':
+    test_parallel_matches_serial()
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+import io
+import os
+import sys
+import json
+import time
+import signal
+import tempfile
+import threading
+import subprocess
+
+from format_server import FormatServer, FormatService, call, serve_stdio
+from format_tex_cpp_v2 import format_cpp_code
+from format_cache import default_cache_path
+
+DOCUMENT = r'''\section{树状数组}
+\begin{minted}{cpp}
+int lowbit(int x){return x&-x;}
+int query(int x) {
+    int res = 0;
+    for(;x;x-=lowbit(x))res+=tr[x];
+    return res;
+}
+\end{minted}
+\begin{minted}{python}
+a=b+c
+\end{minted}
+\begin{minted}{cpp}
+int a = b + c;
+\end{minted}
+'''
+
+
+def test_format_requests():
+    service = FormatService()
+
+    print("🧪 格式化单个代码块...")
+    response = service.handle({'id': 7, 'method': 'format_block', 'params': {'code': 'int a=b+c;'}})
+    assert response['id'] == 7 and response['ok']
+    assert response['result'] == {'code': 'int a = b + c;', 'changed': True}
+
+    print("🧪 行范围格式化只返回范围内的改动...")
+    result = service.handle({'method': 'format_range',
+                             'params': {'text': DOCUMENT, 'start_line': 6, 'end_line': 7}})['result']
+    assert result['blocks'] == 1
+    assert result['edits'] == [{'start_line': 6, 'end_line': 6,
+                                'text': format_cpp_code('    for(;x;x-=lowbit(x))res+=tr[x];')}]
+    result = service.handle({'method': 'format_range',
+                             'params': {'text': DOCUMENT, 'start_line': 11, 'end_line': 14}})['result']
+    assert result == {'edits': [], 'blocks': 1}
+
+    print("🧪 检查与格式化整个文件...")
+    result = service.handle({'method': 'validate', 'params': {'text': DOCUMENT}})['result']
+    assert not result['formatted'] and result['blocks'] == 2
+    assert result['unformatted'] == [{'start_line': 3, 'end_line': 8}]
+    formatted = service.handle({'method': 'format_file', 'params': {'text': DOCUMENT}})['result']['text']
+    assert 'a=b+c' in formatted and 'return x & -x;' in formatted
+    assert service.handle({'method': 'validate', 'params': {'text': formatted}})['result']['formatted']
+
+    print("🧪 错误请求返回错误响应...")
+    for line in ['not json', '[1]', '{"method": "format"}',
+                 '{"method": "format_range", "params": {"text": "", "start_line": "x"}}',
+                 '{"id": 1, "method": "format_block", "params": {"code": 123}}',
+                 '{"method": "validate", "params": {"text": ["x"]}}',
+                 '{"method": "ping", "params": [1]}']:
+        response = json.loads(service.handle_line(line))
+        assert not response['ok'] and response['error']
+
+    print("🧪 处理请求时的意外异常也返回错误响应...")
+    service.methods['crash'] = lambda params: 1 / 0
+    response = service.handle({'id': 3, 'method': 'crash'})
+    assert response['id'] == 3 and not response['ok'] and 'ZeroDivisionError' in response['error']
+    print("🎉 格式化请求测试通过!")
+
+
+def test_socket_and_stdio():
+    with tempfile.TemporaryDirectory() as directory:
+        socket_path = os.path.join(directory, 'format.sock')
+        tex_file = os.path.join(directory, 'doc.tex')
+        with open(tex_file, 'w', encoding='utf-8') as f:
+            f.write(DOCUMENT)
+
+        server = FormatServer(socket_path, FormatService())
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            print("🧪 多个客户端并发请求...")
+            results = [None] * 8
+
+            def client(i):
+                results[i] = call(socket_path, 'format_block', code=f'int a{i}=b;')
+
+            clients = [threading.Thread(target=client, args=(i,)) for i in range(len(results))]
+            for item in clients:
+                item.start()
+            for item in clients:
+                item.join()
+            assert [response['result']['code'] for response in results] == [f'int a{i} = b;' for i in range(8)]
+
+            print("🧪 参数类型错误不影响连接...")
+            response = call(socket_path, 'format_block', code=123)
+            assert not response['ok'] and 'code' in response['error']
+
+            print("🧪 按路径格式化并写回文件...")
+            assert call(socket_path, 'format_file', path=tex_file, write=True)['result']['changed']
+            assert call(socket_path, 'validate', path=tex_file)['result']['formatted']
+            assert call(socket_path, 'stats')['result']['requests'] == 11
+        finally:
+            call(socket_path, 'shutdown')
+            thread.join()
+            server.server_close()
+        assert not os.path.exists(socket_path)
+
+    print("🧪 标准输入输出模式...")
+    requests = ''.join(json.dumps({'id': i, 'method': 'format_block', 'params': {'code': f'x={i};'}}) + '\n'
+                       for i in range(5))
+    requests += '{"id": 5, "method": "format_block", "params": {"code": 123}}\n'
+    stdout = io.StringIO()
+    serve_stdio(FormatService(), stdin=io.StringIO(requests + '{"method": "shutdown"}\n'), stdout=stdout)
+    responses = {response['id']: response for response in map(json.loads, stdout.getvalue().splitlines())}
+    assert {i: responses[i]['result']['code'] for i in range(5)} == {i: f'x = {i};' for i in range(5)}
+    # 错误的请求同样有响应
+    assert not responses[5]['ok'] and responses[5]['error']
+    print("🎉 服务通信测试通过!")
+
+
+def wait_for(condition, seconds=10.0):
+    deadline = time.monotonic() + seconds
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.05)
+
+
+def test_cache_persistence():
+    root = os.path.dirname(os.path.abspath(__file__))
+    with tempfile.TemporaryDirectory() as directory:
+        tex_file = os.path.join(directory, 'doc.tex')
+        with open(tex_file, 'w', encoding='utf-8') as f:
+            f.write(DOCUMENT)
+        cache_path = default_cache_path(tex_file, 'format_tex_cpp_v2')
+
+        print("🧪 运行期间定期保存缓存...")
+        service = FormatService(cache_path=cache_path)
+        stop = service.autosave(0.05)
+        try:
+            service.handle({'method': 'format_block', 'params': {'code': 'int a=b;'}})
+            wait_for(lambda: os.path.exists(cache_path))
+        finally:
+            stop.set()
+        os.remove(cache_path)
+
+        print("🧪 SIGTERM 时保存缓存并删除 socket...")
+        socket_path = os.path.join(directory, 'format.sock')
+        # 在其他目录启动，缓存仍放在 .tex 旁边
+        server = subprocess.Popen([sys.executable, os.path.join(root, 'format_server.py'), '--socket', socket_path,
+                                   '--tex', tex_file, '--save-interval', '3600'],
+                                  cwd=root, stdout=subprocess.PIPE, text=True)
+        try:
+            wait_for(lambda: os.path.exists(socket_path))
+            assert call(socket_path, 'format_file', path=tex_file)['result']['changed']
+            server.send_signal(signal.SIGTERM)
+            output, _ = server.communicate(timeout=10)
+        finally:
+            if server.poll() is None:
+                server.kill()
+        assert server.returncode == 0 and '已停止' in output
+        assert os.path.exists(cache_path) and not os.path.exists(socket_path)
+    print("🎉 缓存保存测试通过!")
+
+
+if __name__ == '__main__':
+    test_format_requests()
+    test_socket_and_stdio()
+    test_cache_persistence()
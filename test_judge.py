@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+import os
+import sys
+import time
+import shutil
+import tempfile
+
+from judge import Judge, find_cases, output_matches, parse_duration
+
+SOURCE = r'''#include <bits/stdc++.h>
+using namespace std;
+int main()
+{
+    long long n;
+    cin >> n;
+    if (n == 1) { volatile long long s = 0; for (;;) s++; }
+    if (n == 2) { vector<char> v(300 << 20, 1); cout << (int)v[n] << "\n"; return 0; }
+    if (n == 3) { int *p = nullptr; cout << *p << "\n"; }
+    if (n == 4) this_thread::sleep_for(chrono::milliseconds(1500));
+    cout << n * 2 << "\n";
+}
+'''
+
+
+def write(path, content):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(content)
+
+
+def test_helpers():
+    print("🧪 解析时间限制...")
+    assert parse_duration('1s') == 1.0 and parse_duration('500ms') == 0.5 and parse_duration('1.5') == 1.5
+
+    print("🧪 比较输出...")
+    assert output_matches('1 2  \n3\n\n', '1 2\n3')
+    assert not output_matches('1 2\n3', '1\n2 3')
+    assert output_matches('0.3333333\n', '0.333333333', eps=1e-6)
+    assert not output_matches('0.34', '0.333333333', eps=1e-6)
+    print("🎉 辅助函数测试通过!")
+
+
+def test_limits_before_exec():
+    print("🧪 子进程启动时资源上限已经生效...")
+    with tempfile.TemporaryDirectory() as directory:
+        script = os.path.join(directory, 'limits.py')
+        write(script, 'import resource\n'
+                      'print(*resource.getrlimit(resource.RLIMIT_CPU), *resource.getrlimit(resource.RLIMIT_AS))\n')
+        write(os.path.join(directory, '1.in'), '')
+        output = os.path.join(directory, '1.out')
+        result = Judge(script, time_limit=1.0, memory_limit=512).run_case(os.path.join(directory, '1.in'),
+                                                                          output_path=output)
+        assert result.verdict == 'OK', result.detail
+        with open(output, 'r', encoding='utf-8') as f:
+            soft, hard, memory, _ = map(int, f.read().split())
+        assert (soft, hard) == (2, 3)
+        # macOS 不限制地址空间
+        assert memory == 512 * 2 * 1024 * 1024 or sys.platform == 'darwin'
+        # 峰值内存以 KB 计，Python 解释器不会超过 1GB
+        assert 0 < result.memory < 1024 * 1024
+
+
+def test_judge_verdicts():
+    if shutil.which('g++') is None:
+        print("⚠️  未找到 g++，跳过评测测试")
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        source = os.path.join(directory, 'a.cpp')
+        write(source, SOURCE)
+        tests = os.path.join(directory, 'tests')
+        os.makedirs(tests)
+        for name, value, answer in [('1', 5, '10'), ('2', 7, '15'), ('3', 1, '2'), ('4', 2, '1'),
+                                    ('5', 3, '6'), ('10', 4, '8')]:
+            write(os.path.join(tests, f'{name}.in'), f'{value}\n')
+            write(os.path.join(tests, f'{name}.ans'), f'{answer}\n')
+        write(os.path.join(tests, 'extra.in'), '6\n')
+
+        print("🧪 编译一次并缓存可执行文件...")
+        judge = Judge(source, time_limit=0.5, wall_limit=1.0, memory_limit=64)
+        assert judge.compile() == (True, None)
+        assert judge.compile() == (False, None)
+
+        print("🧪 并发运行全部测试点...")
+        cases = find_cases(tests)
+        assert [os.path.basename(case[0]) for case in cases] == ['1.in', '2.in', '3.in', '4.in', '5.in', '10.in',
+                                                                 'extra.in']
+        assert cases[-1][1] is None
+        started = time.perf_counter()
+        results = judge.run_all(cases, jobs=len(cases))
+        elapsed = time.perf_counter() - started
+        assert [result.verdict for result in results] == ['AC', 'WA', 'TLE', 'MLE', 'RE', 'TLE', 'OK']
+        assert results[1].detail.startswith('第1行')
+        assert results[5].detail.startswith('超过墙钟时间')
+        assert results[0].memory > 0 and results[0].cpu < 0.5
+        # 并发运行时总用时接近最慢的测试点
+        assert elapsed < 3
+
+        print("🧪 源码改变后重新编译并清理旧文件...")
+        old_binary = judge.binary
+        write(source, SOURCE + '\n')
+        assert judge.compile() == (True, None)
+        assert not os.path.exists(old_binary) and os.path.exists(judge.binary)
+
+        print("🧪 编译错误...")
+        write(source, 'int main() { return x; }\n')
+        compiled, error = judge.compile()
+        assert compiled and 'x' in error
+        print("🎉 评测测试通过!")
+
+
+if __name__ == '__main__':
+    test_helpers()
+    test_limits_before_exec()
+    test_judge_verdicts()
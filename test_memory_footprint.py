@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+import os
+import tempfile
+
+from tex_index import TexIndex
+from memory_footprint import FootprintAnalyzer, analyze_blocks, evaluate, tokenize, Unresolved
+
+DOCUMENT = r'''\section{建图}
+\begin{minted}{cpp}
+const int N = 1e6 + 10, M = N * 2 + 5, K = M << 2;
+int h[N], e[K], ne[K], idx;
+bool st[N];
+\end{minted}
+\section{线段树}
+\begin{minted}{cpp}
+struct Node
+{
+    int l, r;
+    long long sum;
+} tr[N << 2];
+\end{minted}
+'''
+
+
+def declarations(code, defines=None):
+    return {declaration.name: declaration for declaration in FootprintAnalyzer(defines).analyze(code)}
+
+
+def test_evaluate():
+    print("🧪 常量表达式求值...")
+    constants = {'N': 100010, 'M': 17}
+    for text, value in [('1e6', 1e6), ('M << 2', 68), ('N * 2 + 5', 200025), ('(1 << 20) + 5', 1048581),
+                        ('2 * __lg(N) * N', 3200320), ('7 / 2', 3), ('1\'000\'000LL', 1000000),
+                        ('(int)1e5 + 10', 100010), ('max(N, 5)', 100010)]:
+        assert evaluate(tokenize(text), constants) == value, text
+    try:
+        evaluate(tokenize('X + 1'), constants)
+        assert False
+    except Unresolved as e:
+        assert str(e) == 'X'
+    print("🎉 表达式求值测试通过!")
+
+
+def test_declarations():
+    print("🧪 全局数组与常量...")
+    result = declarations('const int N = 1e5 + 10, M = N << 1;\n#define LOG 17\n'
+                          'int h[N], ne[M], f[N][LOG], n;\nlong long s[N];\nint dx[] = {-1, 0, 1, 0};\n')
+    assert 'N' not in result and 'M' not in result
+    assert result['h'].bytes == 100010 * 4 and result['ne'].bytes == 200020 * 4
+    assert result['f'].bytes == 100010 * 17 * 4 and result['s'].bytes == 100010 * 8
+    assert result['dx'].bytes == 16 and result['n'].bytes == 4
+
+    print("🧪 结构体对齐与标准库类型...")
+    result = declarations('struct Node { int l, r; char c; long long sum; } tr[10];\n'
+                          'struct LCT { struct Point { int s[2], fa; } p[5]; int top; static int cnt;\n'
+                          '    void pushup(int u) { p[u].fa = 0; } } lct;\n'
+                          'pair<int, long long> pr[4];\narray<int, 3> ar[2];\narray<pair<int, int>, 3> q[2];\nbitset<100> bs[3];\n'
+                          'vector<int> g[10];\nvector<long long> v(1000);\n'
+                          'vector<vector<int>> grid(10, vector<int>(20));\n')
+    assert result['tr'].element_size == 24 and result['tr'].bytes == 240
+    assert result['lct'].bytes == 5 * 12 + 4
+    assert result['pr'].bytes == 64 and result['ar'].bytes == 24 and result['q'].bytes == 48 and result['bs'].bytes == 48
+    assert result['g'].bytes == 240 and result['g'].heap_bytes == 0
+    assert result['v'].heap_bytes == 8000
+    assert result['grid'].heap_bytes == 10 * (24 + 80)
+
+    print("🧪 类型宏、别名与函数...")
+    result = declarations('#define int long long\nusing u64 = unsigned long long;\ntypedef pair<int, int> PII;\n'
+                          'int a[10];\nu64 b[10];\nPII c[10];\nint query(int l, int r);\n'
+                          'int solve()\n{\n    int local[1000];\n    return 0;\n}\n'
+                          'for (int i = 1; i <= n; i++) ans += w[i];\n')
+    assert result['a'].bytes == 80 and result['b'].bytes == 80 and result['c'].bytes == 160
+    assert set(result) == {'a', 'b', 'c'}
+
+    print("🧪 未定义的常量...")
+    result = declarations('int tr[N], n;')
+    assert result['tr'].unresolved == {'N'} and result['tr'].bytes == 0
+    result = declarations('int tr[N], n;', {'N': 1000})
+    assert result['tr'].bytes == 4000
+    print("🎉 声明解析测试通过!")
+
+
+def test_blocks():
+    with tempfile.TemporaryDirectory() as directory:
+        tex_file = os.path.join(directory, 'doc.tex')
+        with open(tex_file, 'w', encoding='utf-8') as f:
+            f.write(DOCUMENT)
+        index = TexIndex.build(tex_file)
+
+        print("🧪 按代码块统计并合计...")
+        graph, tree = analyze_blocks(index, index.blocks)
+        n, m = 1000010, 2000025
+        assert graph.static_bytes == n * 4 + m * 4 * 4 * 2 + 4 + n
+        assert graph.declarations[0].line == 4
+        assert tree.unresolved == {'N'} and tree.static_bytes == 0
+
+        graph, tree = analyze_blocks(index, index.blocks, {'N': 1000})
+        assert tree.static_bytes == 4000 * 16 and not tree.unresolved
+        # 代码块自己的定义优先于命令行
+        assert graph.static_bytes == n * 4 + m * 4 * 4 * 2 + 4 + n
+        print("🎉 代码块统计测试通过!")
+
+
+if __name__ == '__main__':
+    test_evaluate()
+    test_declarations()
+    test_blocks()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+import os
+import shutil
+import tempfile
+
+from format_cache import FormatCache
+from near_duplicates import MinHasher, collect_fragments, find_clusters, jaccard, lsh_parameters, text_fragments
+
+FENWICK = '''int tr[N], n;
+void add(int x, int v)
+{
+    for (; x <= n; x += x & -x)
+        tr[x] += v;
+}
+int ask(int x)
+{
+    int s = 0;
+    for (; x; x -= x & -x)
+        s += tr[x];
+    return s;
+}'''
+
+# 只改了变量名和注释，词法单元序列大部分相同
+FENWICK_VARIANT = FENWICK.replace('int s = 0;', 'int s = 0; // 前缀和').replace('tr[x] += v;', 'tr[x] += v * 2;')
+
+DSU = '''int p[N];
+int find(int x)
+{
+    return p[x] == x ? x : p[x] = find(p[x]);
+}
+void merge(int a, int b)
+{
+    p[find(a)] = find(b);
+}
+bool same(int a, int b)
+{
+    return find(a) == find(b);
+}'''
+
+
+def minted(code):
+    return '\\begin{minted}{cpp}\n' + code + '\n\\end{minted}\n'
+
+def test_lsh_parameters():
+    print("测试 LSH 参数...")
+    bands, rows = lsh_parameters(128, 0.6)
+    assert bands * rows <= 128
+    # 阈值处的候选概率 (1 - (1 - s^r)^b) 应接近 1/2
+    assert 0.2 < 1 - (1 - 0.6 ** rows) ** bands < 0.8
+    assert lsh_parameters(128, 0.9)[1] > rows
+
+def test_clusters():
+    directory = tempfile.mkdtemp()
+    try:
+        tex_path = os.path.join(directory, 'doc.tex')
+        text_path = os.path.join(directory, 'notes.txt')
+        with open(tex_path, 'w', encoding='utf-8') as f:
+            f.write('\\section{数据结构}\n\\subsection{树状数组}\n' + minted(FENWICK) +
+                    '\\subsection{并查集}\n' + minted(DSU))
+        with open(text_path, 'w', encoding='utf-8') as f:
+            f.write('树状数组的另一种写法：\n\n' + FENWICK_VARIANT + '\n\n说明文字。\n')
+
+        print("测试代码块提取...")
+        fragments = text_fragments(text_path)
+        assert len(fragments) == 1 and fragments[0].line == 3
+        fragments = collect_fragments([tex_path, text_path])
+        assert [fragment.name for fragment in fragments] == ['数据结构/树状数组', '数据结构/并查集', '第1段代码']
+        # 注释不影响词法单元
+        assert '前缀和' not in ' '.join(fragments[2].tokens)
+
+        print("测试近似重复检测...")
+        cache = FormatCache(os.path.join(directory, 'minhash.json'), 'test')
+        hasher = MinHasher(cache=cache)
+        clusters, candidates, _ = find_clusters(fragments, 0.6, hasher)
+        assert len(clusters) == 1 and sorted(clusters[0].members) == [0, 2]
+        assert candidates < 3
+        similarity = jaccard(fragments[0].shingles(5), fragments[2].shingles(5))
+        assert clusters[0].similarities == [similarity] and 0.6 <= similarity < 1
+        assert jaccard(fragments[0].shingles(5), fragments[1].shingles(5)) < 0.2
+
+        print("测试签名缓存...")
+        signatures = [hasher.signature(fragment) for fragment in fragments]
+        cache.save()
+        cached = MinHasher(cache=FormatCache(os.path.join(directory, 'minhash.json'), 'test'))
+        assert [cached.signature(fragment) for fragment in fragments] == signatures
+        assert MinHasher().signature(fragments[0]) == signatures[0]
+        assert MinHasher(seed=2).signature(fragments[0]) != signatures[0]
+    finally:
+        shutil.rmtree(directory)
+
+def test_template():
+    if not os.path.exists('Algorithm-template.tex'):
+        print("⚠️ 未找到 Algorithm-template.tex，跳过")
+        return
+    print("测试模板中的重复代码块...")
+    fragments = [fragment for fragment in collect_fragments(['Algorithm-template.tex']) if len(fragment.tokens) >= 30]
+    clusters, _, _ = find_clusters(fragments, 0.9)
+    assert any(max(cluster.similarities) == 1.0 for cluster in clusters)
+
+if __name__ == '__main__':
+    test_lsh_parameters()
+    test_clusters()
+    test_template()
+    print("🎉 所有测试通过!")
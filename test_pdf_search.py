@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+import os
+import zlib
+import shutil
+import tempfile
+
+from pdf_search import Document, extract_text, load_pages, open_pdf_index, page_snippet, parse_cmap
+
+CMAP = b'''/CIDInit /ProcSet findresource begin
+begincmap
+1 begincodespacerange <0000> <FFFF> endcodespacerange
+2 beginbfchar
+<0001> <4E16>
+<0002> <754C>
+endbfchar
+1 beginbfrange
+<0010> <0019> <0030>
+endbfrange
+1 beginbfrange
+<0020> <0021> [<0048> <0069>]
+endbfrange
+endcmap
+end'''
+
+# 第一行 "Hi 世界" (TJ 中的间距产生空格)，第二行 "2024"；第二页用单字节 Helvetica 输出 "Tree (a)"
+PAGE1 = b'BT /F1 12 Tf 72 700 Td [<00200021> -400 <00010002>] TJ 0 -20 Td <0012001000120014> Tj ET'
+PAGE2 = b'BT /F2 10 Tf 1 0 0 1 72 700 Tm (Tree \\(a\\)) Tj ET'
+
+
+def build_pdf():
+    """手工拼出一个最小的 PDF：Type0 字体 + ToUnicode，FlateDecode 内容流，传统 xref 表"""
+    streams = {6: zlib.compress(PAGE1), 7: CMAP, 9: zlib.compress(PAGE2)}
+    objects = {
+        1: b'<< /Type /Catalog /Pages 2 0 R >>',
+        2: b'<< /Type /Pages /Kids [3 0 R 8 0 R] /Count 2 /Resources << /Font << /F1 4 0 R /F2 10 0 R >> >> >>',
+        3: b'<< /Type /Page /Parent 2 0 R /Contents 6 0 R >>',
+        4: b'<< /Type /Font /Subtype /Type0 /BaseFont /Test /Encoding /Identity-H '
+           b'/DescendantFonts [5 0 R] /ToUnicode 7 0 R >>',
+        5: b'<< /Type /Font /Subtype /CIDFontType0 /BaseFont /Test /DW 1000 /W [32 [600 300]] >>',
+        8: b'<< /Type /Page /Parent 2 0 R /Contents [9 0 R] >>',
+        10: b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>',
+    }
+    data = bytearray(b'%PDF-1.4\n')
+    offsets = {}
+    for num in range(1, 11):
+        offsets[num] = len(data)
+        if num in streams:
+            filters = b' /Filter /FlateDecode' if num != 7 else b''
+            data += b'%d 0 obj\n<< /Length %d%s >>\nstream\n' % (num, len(streams[num]), filters)
+            data += streams[num] + b'\nendstream\nendobj\n'
+        else:
+            data += b'%d 0 obj\n%s\nendobj\n' % (num, objects[num])
+    xref = len(data)
+    data += b'xref\n0 11\n0000000000 65535 f \n'
+    for num in range(1, 11):
+        data += b'%010d 00000 n \n' % offsets[num]
+    data += b'trailer\n<< /Size 11 /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % xref
+    return bytes(data)
+
+def test_cmap():
+    print("测试 ToUnicode CMap...")
+    lengths, mapping = parse_cmap(CMAP)
+    assert lengths == {2}
+    assert mapping[b'\x00\x01'] == '世' and mapping[b'\x00\x13'] == '3'
+    assert mapping[b'\x00\x21'] == 'i'
+
+def test_extract_and_search():
+    directory = tempfile.mkdtemp()
+    try:
+        path = os.path.join(directory, 'test.pdf')
+        cache_dir = os.path.join(directory, 'cache')
+        with open(path, 'wb') as f:
+            f.write(build_pdf())
+
+        print("测试文字提取...")
+        with Document(path) as document:
+            assert len(document.pages()) == 2
+        pages = extract_text(path, jobs=1)
+        assert pages == ['Hi 世界\n2024', 'Tree (a)']
+        # 多进程提取的结果与单进程一致
+        assert extract_text(path, jobs=2) == pages
+
+        print("测试缓存...")
+        digest, cached_pages, cached = load_pages(path, cache_dir, jobs=1)
+        assert not cached and cached_pages == pages
+        # 缓存按内容哈希命名，改名后仍然命中
+        renamed = os.path.join(directory, 'renamed.pdf')
+        shutil.copy(path, renamed)
+        assert load_pages(renamed, cache_dir) == (digest, pages, True)
+
+        print("测试检索...")
+        with open_pdf_index([('test.pdf', digest, pages)], cache_dir) as search_index:
+            hits = search_index.search('世界')
+            assert [(hit.doc['file'], hit.doc['line']) for hit in hits] == [('test.pdf', 1)]
+            assert search_index.search('tree')[0].doc['line'] == 2
+        assert page_snippet(pages[0], '世界', width=3) == 'Hi 世界 20...'
+    finally:
+        shutil.rmtree(directory)
+
+def test_reference_pdf():
+    if not os.path.exists('Nemesis.pdf'):
+        print("⚠️ 未找到 Nemesis.pdf，跳过")
+        return
+    print("测试参考 PDF...")
+    _, pages, _ = load_pages('Nemesis.pdf')
+    assert len(pages) == 26
+    assert 'Nemesis' in pages[0] and '半平面交' in pages[1]
+
+if __name__ == '__main__':
+    test_cmap()
+    test_extract_and_search()
+    test_reference_pdf()
+    print("🎉 所有测试通过!")
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+import os
+import glob
+import tempfile
+
+from prerender_minted import MintedConfig, prerender_document
+from build_tex import TexBuilder, PRERENDERED_ENGINE_ARGS
+from test_build_tex import make_project, write
+
+DOCUMENT = r'''\documentclass{ctexart}
+\usepackage{minted}
+\renewcommand{\MintedPython}{/opt/homebrew/bin/python3}
+\usepackage{tcolorbox}
+\tcbuselibrary{minted, skins, breakable}
+\setminted{style=vs, linenos=true, autogobble=true, bgcolor=codebg}
+\setminted[cpp]{breakbytoken=true, tabsize=4}
+\newminted[cppcode]{cpp}{style=colorful, linenos=false}
+\BeforeBeginEnvironment{minted}{\vspace{-4pt}}
+\begin{document}
+\section{数据结构}
+\begin{minted}{cpp}
+    int a[10];
+    int main() {}
+\end{minted}
+\begin{cppcode}
+int b;
+\end{cppcode}
+\begin{minted}[linenos=false]{python}
+print(1)
+\end{minted}
+\end{document}
+'''
+
+
+def test_prerender_document():
+    with tempfile.TemporaryDirectory() as directory:
+        tex_file = os.path.join(directory, 'doc.tex')
+        write(tex_file, DOCUMENT)
+
+        print("🧪 解析导言区的 minted 配置...")
+        config = MintedConfig.parse(DOCUMENT.split('\\begin{document}')[0])
+        assert config.options_for('cpp')['tabsize'] == '4'
+        assert config.options_for('cpp', 'cppcode')['style'] == 'colorful'
+        assert config.options_for('python', inline='linenos=false')['linenos'] == 'false'
+
+        print("🧪 生成预渲染文档...")
+        result = prerender_document(tex_file)
+        assert (result.blocks, result.rendered, result.reused) == (3, 3, 0)
+        with open(result.output, encoding='utf-8') as f:
+            output = f.read()
+        assert '\\begin{minted}' not in output and '\\begin{cppcode}' not in output
+        assert '\\setminted' not in output and 'MintedPython' not in output
+        assert '\\tcbuselibrary{skins, breakable}' in output
+        assert '\\BeforeBeginEnvironment{prerendered}' in output
+        assert output.count('\\input{_prerender/') == 3
+        assert '\\def\\PYGvs@reset' in output and '\\def\\PYGcolorful@reset' in output
+
+        fragments = {}
+        for path in glob.glob(os.path.join(directory, '_prerender', '*.tex')):
+            with open(path, encoding='utf-8') as f:
+                fragments[path] = f.read()
+        cpp = next(text for text in fragments.values() if 'main' in text)
+        # autogobble 去掉公共缩进，linenos 转为 numbers=left，bgcolor 包一层背景
+        assert 'numbers=left' in cpp and 'tabsize=4' in cpp and 'breakbytoken' not in cpp
+        assert '\n\\PYGvs{k+kt}{int}' in cpp
+        assert cpp.startswith('\\begin{prerenderedbg}{codebg}')
+
+        print("🧪 再次生成时全部复用缓存...")
+        result = prerender_document(tex_file)
+        assert (result.rendered, result.reused) == (0, 3)
+
+        print("🧪 只改一个代码块时只重新渲染一个...")
+        write(tex_file, DOCUMENT.replace('int b;', 'int c;'))
+        result = prerender_document(tex_file)
+        assert (result.rendered, result.reused) == (1, 2)
+        print("🎉 预渲染测试通过!")
+
+
+def test_build_prerendered():
+    with tempfile.TemporaryDirectory() as directory:
+        engine, tex_file = make_project(directory)
+        write(tex_file, '\\section{数据结构}\n\\begin{minted}{cpp}\nint a;\n\\end{minted}\n')
+
+        print("🧪 预渲染后不带 -shell-escape 编译，输出仍以原文件命名...")
+        result = prerender_document(tex_file)
+        builder = TexBuilder(result.output, engine=engine, engine_args=PRERENDERED_ENGINE_ARGS, jobname='doc')
+        assert builder.build().ok
+        with open(os.path.join(directory, 'passes.txt')) as f:
+            command = f.readline()
+        assert '-shell-escape' not in command and '-jobname=doc' in command
+        assert builder.pdf_path == os.path.join(directory, 'doc.pdf')
+        print("🎉 预渲染编译测试通过!")
+
+
+if __name__ == '__main__':
+    test_prerender_document()
+    test_build_prerendered()
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+import os
+import re
+import sys
+import time
+import shutil
+import tempfile
+import subprocess
+
+from regex_guard import ADVERSARIAL_LINES, FORMATTER_FILES, LineBudget, Rule, check_rule, extract_rules
+
+SOURCE = '''import re
+spacing_rules = [
+    (r'\\s*,\\s*', ', '),
+    (r'(\\w)\\{', r'\\1 {'),
+]
+def format_line(content, name):
+    content = re.sub(r'\\s+$', '', content)
+    content = apply_rule(r'\\)\\s*\\{', ') {', content, None)
+    pattern = f'{name}\\\\s*\\\\('
+    return re.search(r'^#include', content, re.MULTILINE)
+'''
+
+# 改写前 format_tex_cpp.py 中的模板规则：参数两侧的 \\s* 与 [^<>,]+ 可以任意分配空格，三次方回溯
+OLD_TEMPLATE = r'(\w+)\s*<\s*([^<>,]+)\s*>'
+NEW_TEMPLATE = r'(?<!\w)(\w++)\s*<(?>\s*+(?=[^<>,\s])|\s*(?=\s))([^<>,]++)\s*>'
+
+SAMPLES = ['vector< int >', 'vector<int>', 'std::vector <  pair  >', 'a<  >', 'set < long long > s;',
+           'x < y && y > z', 'f(a<b, c>d)', 'map<int, int>', 'v<\t>']
+
+
+def test_extract_rules():
+    directory = tempfile.mkdtemp()
+    try:
+        path = os.path.join(directory, 'sample.py')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(SOURCE)
+        print("测试规则提取...")
+        rules = extract_rules(path)
+        patterns = [rule.pattern for rule in rules]
+        assert r'\s*,\s*' in patterns and r'(\w)\{' in patterns
+        assert r'\s+$' in patterns and r'\)\s*\{' in patterns
+        # f-string 的插值按一个字符处理
+        assert any(pattern.endswith(r'\s*\(') for pattern in patterns)
+        assert [rule.flags for rule in rules if rule.pattern == '^#include'] == [re.MULTILINE]
+        assert rules[0].label == 'sample.py:3'
+    finally:
+        shutil.rmtree(directory)
+
+    print("测试格式化脚本中的规则...")
+    for path in FORMATTER_FILES:
+        if not os.path.exists(path):
+            print(f"⚠️ 未找到 {path}，跳过")
+            continue
+        assert extract_rules(path), path
+
+def test_growth():
+    print("测试超线性规则检测...")
+    generators = {name: ADVERSARIAL_LINES[name] for name in ('模板内空格', '未闭合模板')}
+    assert check_rule(Rule('old.py', 1, OLD_TEMPLATE), generators).superlinear
+    assert not check_rule(Rule('new.py', 1, NEW_TEMPLATE), generators).superlinear
+
+    print("测试改写后的规则与原规则等价...")
+    for line in SAMPLES:
+        assert re.sub(NEW_TEMPLATE, r'\1<\2>', line) == re.sub(OLD_TEMPLATE, r'\1<\2>', line), line
+
+def test_line_budget():
+    print("测试单行时间预算...")
+    def slow(content):
+        time.sleep(0.02)
+        return content.upper()
+
+    budget = LineBudget(0.001)
+    assert budget.apply(slow, 'a < b') == 'a < b'
+    assert budget.apply(str.upper, 'ok') == 'OK'
+    assert budget.fallbacks == 1 and budget.slowest >= 0.02
+    assert budget.report()
+    unlimited = LineBudget(0)
+    assert unlimited.apply(slow, 'a < b') == 'A < B' and not unlimited.report()
+
+def test_formatters():
+    if not os.path.exists('format_tex_cpp.py'):
+        print("⚠️ 未找到 format_tex_cpp.py，跳过")
+        return
+    from format_simple import format_cpp_line
+    from format_tex_cpp import format_cpp_code
+
+    print("测试长对抗行...")
+    for name in ('模板内空格', '未闭合模板', '空格逗号'):
+        line = ADVERSARIAL_LINES[name](100000, 'vector')
+        started = time.perf_counter()
+        format_cpp_code(line)
+        format_cpp_line(line)
+        assert time.perf_counter() - started < 5, name
+    assert format_cpp_code('vector<  int  > a;').startswith('vector<int')
+
+def test_parallel_budget():
+    if not os.path.exists('format_tex_cpp_v2.py'):
+        print("⚠️ 未找到 format_tex_cpp_v2.py，跳过")
+        return
+    import format_tex_cpp_v2
+    from format_cache import FormatCache
+
+    print("测试多进程格式化的超时统计与缓存...")
+    document = ''.join(f'\\begin{{minted}}{{cpp}}\nint a{i}=b+c;\n\\end{{minted}}\n' for i in range(4))
+    directory = tempfile.mkdtemp()
+    saved = format_tex_cpp_v2.LINE_BUDGET
+    try:
+        for jobs in (1, 2):
+            format_tex_cpp_v2.LINE_BUDGET = LineBudget(1e-9)
+            cache = FormatCache(os.path.join(directory, f'cache{jobs}.json'), 'test')
+            assert format_tex_cpp_v2.format_latex_cpp_blocks(document, cache=cache, jobs=jobs) == document
+            # 子进程中的超时也计入父进程，保持原样的代码块不写入缓存
+            assert format_tex_cpp_v2.LINE_BUDGET.fallbacks == 4, jobs
+            assert all(cache.get(f'int a{i}=b+c;', 'regex') is None for i in range(4))
+    finally:
+        format_tex_cpp_v2.LINE_BUDGET = saved
+        shutil.rmtree(directory)
+
+def test_budget_cache():
+    if not os.path.exists('format_tex_cpp.py'):
+        print("⚠️ 未找到 format_tex_cpp.py，跳过")
+        return
+    import format_tex_cpp
+    from format_cache import FormatCache
+
+    print("测试超时的代码块不写入缓存，其余照常缓存...")
+    document = ''.join(f'\\begin{{minted}}{{cpp}}\n{code}\n\\end{{minted}}\n'
+                       for code in ('int a=b+c;', 'slow=1;', 'int d=e*f;'))
+    rules = format_tex_cpp.apply_formatting_rules
+
+    def slow_rules(content):
+        if content.startswith('slow'):
+            time.sleep(0.05)
+        return rules(content)
+
+    directory = tempfile.mkdtemp()
+    saved = format_tex_cpp.LINE_BUDGET
+    try:
+        format_tex_cpp.LINE_BUDGET = LineBudget(0.01)
+        format_tex_cpp.apply_formatting_rules = slow_rules
+        cache = FormatCache(os.path.join(directory, 'cache.json'), 'test')
+        formatted = format_tex_cpp.format_latex_cpp_blocks(document, cache)
+        assert 'slow=1;' in formatted and 'int a = b + c;' in formatted
+        assert format_tex_cpp.LINE_BUDGET.fallbacks == 1
+        assert cache.get('slow=1;') is None
+        assert cache.get('int a=b+c;') == 'int a = b + c;' and cache.get('int d=e*f;') is not None
+    finally:
+        format_tex_cpp.LINE_BUDGET = saved
+        format_tex_cpp.apply_formatting_rules = rules
+        shutil.rmtree(directory)
+
+def test_python_version_check():
+    print("测试旧版本 Python 给出明确错误...")
+    code = 'import sys; sys.version_info = (3, 10, 0); import format_simple'
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__)))
+    assert result.returncode == 1 and 'Python 3.11' in result.stdout, result.stdout + result.stderr
+    assert 'Traceback' not in result.stderr
+
+if __name__ == '__main__':
+    test_extract_rules()
+    test_growth()
+    test_line_budget()
+    test_formatters()
+    test_parallel_budget()
+    test_budget_cache()
+    test_python_version_check()
+    print("🎉 所有测试通过!")
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+import os
+import json
+import shutil
+import tempfile
+
+from stress import StressTester, save_failure
+
+GENERATOR = '''import sys
+import random
+seed, size = map(int, sys.argv[1:])
+random.seed(seed)
+print(size)
+print(*[random.randint(1, 100) for _ in range(size)])
+'''
+
+BRUTE = '''n = int(input())
+print(sum(map(int, input().split())))
+'''
+
+# 规模不小于 4 时少加最后一个数
+SOLUTION = r'''#include <bits/stdc++.h>
+using namespace std;
+int main()
+{
+    int n;
+    cin >> n;
+    long long s = 0;
+    for (int i = 0; i < n; i++) {
+        int x;
+        cin >> x;
+        if (n < 4 || i + 1 < n) s += x;
+    }
+    cout << s << "\n";
+}
+'''
+
+
+def write(path, content):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(content)
+
+
+def make_programs(directory, solution=SOLUTION):
+    paths = [os.path.join(directory, name) for name in ('gen.py', 'brute.py', 'a.cpp')]
+    for path, content in zip(paths, (GENERATOR, BRUTE, solution)):
+        write(path, content)
+    return paths
+
+
+def test_stress_and_shrink():
+    if shutil.which('g++') is None:
+        print("⚠️  未找到 g++，跳过对拍测试")
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        print("🧪 发现不一致并缩小到最小规模...")
+        tester = StressTester(*make_programs(directory), jobs=2)
+        assert tester.compile() is None
+        failure, original, done, elapsed = tester.run(count=50, size=8, shrink_tries=5)
+        assert original.size == 8 and original.seed == 1
+        assert failure.size == 4 and failure.data.startswith('4\n')
+        assert 1 <= done <= 50 and elapsed > 0
+        values = list(map(int, failure.data.split()[1:]))
+        assert failure.expected.strip() == str(sum(values))
+        assert failure.actual.strip() == str(sum(values[:-1]))
+
+        print("🧪 保存为可复现的 .in/.ans...")
+        prefix = os.path.join(directory, 'fail')
+        save_failure(failure, prefix)
+        with open(prefix + '.ans', encoding='utf-8') as f:
+            assert f.read() == failure.expected
+        assert json.dumps(failure.to_dict())
+
+        print("🧪 没有错误时运行全部数据...")
+        failure, original, done, _ = tester.run(count=20, size=3)
+        assert failure is None and original is None and done == 20
+
+        print("🧪 模板解法运行错误也算不一致...")
+        tester = StressTester(*make_programs(directory, 'int main() { return 3; }\n'), jobs=2)
+        assert tester.compile() is None
+        failure, _, _, _ = tester.run(count=10, size=2, shrink_tries=0)
+        assert failure.seed == 1 and failure.reason == 'solution RE 退出码 3'
+        print("🎉 对拍测试通过!")
+
+
+if __name__ == '__main__':
+    test_stress_and_shrink()
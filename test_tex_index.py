@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+import re
+import os
+import shutil
+import tempfile
+
+from tex_index import TexIndex
+
+def test_blocks_match_minted_regex():
+    index = TexIndex.build('Algorithm-template.tex')
+    with open('Algorithm-template.tex', 'r', encoding='utf-8') as f:
+        content = f.read()
+    matches = list(re.finditer(r'\\begin\{minted\}\{([^}]+)\}\n(.*?)\n\\end\{minted\}', content, re.DOTALL))
+
+    print("测试索引中的代码块与正则提取一致...")
+    assert len(matches) == len(index.blocks)
+    for match, block in zip(matches, index.blocks):
+        assert block.language == match.group(1)
+        assert index.block_code(block) == match.group(2)
+        assert content.count('\n', 0, match.start()) + 1 == block.line
+
+    print("测试按索引替换代码块与正则替换一致...")
+    index = TexIndex.from_text(content)
+    expected = re.sub(r'\\begin\{minted\}\{([^}]+)\}\n(.*?)\n\\end\{minted\}',
+                      lambda match: match.group(2).upper() if match.group(1) == 'cpp' else match.group(0),
+                      content, flags=re.DOTALL)
+    assert index.replace_blocks(lambda block: index.block_code(block).upper()
+                                if block.language == 'cpp' else None) == expected
+
+def test_cache_revalidation():
+    directory = tempfile.mkdtemp()
+    try:
+        tex_path = os.path.join(directory, 'doc.tex')
+        cache_path = os.path.join(directory, 'doc.json')
+        with open(tex_path, 'w', encoding='utf-8') as f:
+            f.write('\\section{数据结构}\n\\subsection{ST表}\n% 时间复杂度：$O(1)$\n'
+                    '\\begin{minted}{cpp}\nint a;\n\\end{minted}\n')
+
+        index = TexIndex.load(tex_path, cache_path)
+        assert [node.title for node in index.sections()] == ['数据结构', 'ST表']
+        assert index.find('ST')[0].annotations[0]['kind'] == 'time'
+
+        cached = TexIndex.load(tex_path, cache_path)
+        assert cached.block_code(cached.blocks[0]) == 'int a;'
+        assert cached.blocks[0].section.path == ['数据结构', 'ST表']
+
+        # 文件改动后大小变化，缓存自动失效
+        with open(tex_path, 'a', encoding='utf-8') as f:
+            f.write('\\subsection{线段树}\n')
+        assert len(list(TexIndex.load(tex_path, cache_path).sections())) == 3
+    finally:
+        shutil.rmtree(directory)
+
+if __name__ == '__main__':
+    test_blocks_match_minted_regex()
+    test_cache_revalidation()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+import os
+import tempfile
+
+from tex_index import TexIndex
+from tex_preview import PreviewDocument, parse_line_range, resolve_section
+from build_tex import TexBuilder
+from test_build_tex import make_project, write
+
+DOCUMENT = r'''\documentclass{ctexart}
+\usepackage{minted}
+\begin{document}\small
+\makecover
+\tableofcontents
+\newpage
+\section{数据结构}
+\subsection{ST表}
+静态区间最值
+\subsection{线段树}
+\subsubsection{线段树上二分}
+\begin{minted}{cpp}
+int query(int u) {
+    return u;
+}
+\end{minted}
+\section{图论}
+\subsection{最短路}
+\subsubsection{模板}
+dijkstra
+\subsection{二分图}
+\subsubsection{模板}
+匈牙利
+\end{document}
+'''
+
+
+def test_preview_document():
+    with tempfile.TemporaryDirectory() as directory:
+        tex_file = os.path.join(directory, 'doc.tex')
+        write(tex_file, DOCUMENT)
+        index = TexIndex.build(tex_file)
+
+        print("🧪 按标题选择章节...")
+        node = resolve_section(index, '线段树')
+        assert node.path == ['数据结构', '线段树']
+        assert resolve_section(index, '二分图/模板').line == 22
+        for query in ['模板', '不存在']:
+            try:
+                resolve_section(index, query)
+                assert False, query
+            except ValueError:
+                pass
+
+        preview = PreviewDocument(index, [node])
+        text = preview.render()
+        assert text.startswith('\\documentclass{ctexart}\n\\usepackage{minted}\n\\begin{document}\\small\n')
+        assert '\\makecover' in text and '\\tableofcontents' in text
+        assert '\\subsection{线段树}' in text and 'int query' in text
+        assert 'ST表' not in text and '图论' not in text
+        # 编号与完整文档一致: 线段树为 1.2
+        assert '\\setcounter{section}{1}\n\\setcounter{subsection}{1}\n\\subsection{线段树}' in text
+        assert text.endswith('    return u;\n}\n\\end{minted}\n\\end{document}\n')
+
+        print("🧪 去掉封面和目录...")
+        text = PreviewDocument(index, [node], cover=False, toc=False).render()
+        assert '\\makecover' not in text and '\\tableofcontents' not in text
+
+        print("🧪 按行号选择时不截断代码块...")
+        assert parse_line_range('13-14') == (13, 14) and parse_line_range('20') == (20, 20)
+        text = PreviewDocument(index, line_ranges=[(13, 14), (20, 20)]).render()
+        assert '\\begin{minted}{cpp}\nint query(int u) {\n    return u;\n}\n\\end{minted}\n' in text
+        assert 'dijkstra' in text and '线段树上二分' not in text
+        assert '\\setcounter{subsubsection}{1}\n\\begin{minted}' in text
+
+        print("🧪 重叠的选择只输出一次...")
+        text = PreviewDocument(index, [resolve_section(index, '数据结构'), node]).render()
+        assert text.count('int query') == 1
+        print("🎉 预览文档测试通过!")
+
+
+def test_preview_build():
+    with tempfile.TemporaryDirectory() as directory:
+        engine, tex_file = make_project(directory)
+        write(tex_file, DOCUMENT)
+
+        print("🧪 同一选择生成同名的包装文档，文档修改后可增量编译...")
+        index = TexIndex.build(tex_file)
+        output = PreviewDocument(index, [resolve_section(index, '最短路')]).write()
+        builder = TexBuilder(output, engine=engine)
+        assert builder.build().ok
+        assert builder.build().status == 'skipped'
+
+        # 改动其他章节不影响预览内容
+        write(tex_file, DOCUMENT.replace('匈牙利', 'KM'))
+        index = TexIndex.build(tex_file)
+        assert PreviewDocument(index, [resolve_section(index, '最短路')]).write() == output
+        assert builder.build().status == 'skipped'
+
+        write(tex_file, DOCUMENT.replace('dijkstra', 'spfa'))
+        index = TexIndex.build(tex_file)
+        assert PreviewDocument(index, [resolve_section(index, '最短路')]).write() == output
+        result = builder.build()
+        assert result.status == 'built' and len(result.passes) == 1
+        print("🎉 预览编译测试通过!")
+
+
+if __name__ == '__main__':
+    test_preview_document()
+    test_preview_build()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+import os
+import shutil
+import tempfile
+
+from tex_index import TexIndex
+from tex_search import tokenize, complexity_terms, open_search_index, SearchIndex
+
+DOCUMENT = ('\\section{数据结构}\n'
+            '\\subsection{树状数组}\n'
+            '% 时间复杂度：$O(n \\log n)$\n'
+            '单点修改，前缀查询。\n'
+            '\\begin{minted}{cpp}\n'
+            'int lowbit(int x) { return x & -x; }\n'
+            '\\end{minted}\n'
+            '\\subsection{ST表}\n'
+            '\\begin{minted}{cpp}\n'
+            'int query(int l, int r) { int k = __lg(r - l + 1); return k; }\n'
+            '\\end{minted}\n')
+
+def test_tokenize():
+    print("测试分词...")
+    terms = tokenize('树状数组 add_edge __lg')
+    assert '树状' in terms and '数组' in terms and '树' in terms
+    assert 'add_edge' in terms and 'edge' in terms
+    assert '__lg' in terms and 'lg' not in terms
+    assert complexity_terms('预处理$O(n \\log n)$，查询$O(1)$') == ['o(nlogn)', 'o(1)']
+    assert complexity_terms('O(n log n)') == ['o(nlogn)']
+
+def test_search_and_incremental_rebuild():
+    directory = tempfile.mkdtemp()
+    try:
+        tex_path = os.path.join(directory, 'doc.tex')
+        index_path = os.path.join(directory, 'doc.search')
+        with open(tex_path, 'w', encoding='utf-8') as f:
+            f.write(DOCUMENT)
+
+        print("测试检索...")
+        search_index, stats = open_search_index(tex_path, index_path)
+        assert stats == (0, 5)
+        with search_index:
+            hits = search_index.search('树状数组')
+            assert hits[0].doc['kind'] == 'section' and hits[0].doc['line'] == 2
+            hits = search_index.search('__lg', kind='code')
+            assert [hit.doc['line'] for hit in hits] == [9]
+            hits = search_index.search('O(n log n)')
+            assert hits[0].doc['title'] == '树状数组'
+            assert search_index.search('动态规划') == []
+
+        # 未改动时直接打开
+        search_index, stats = open_search_index(tex_path, index_path)
+        search_index.close()
+        assert stats is None
+
+        print("测试增量重建...")
+        with open(tex_path, 'w', encoding='utf-8') as f:
+            f.write(DOCUMENT.replace('__lg', 'std::__lg').replace('return k;', 'return k + lowbit(k);'))
+        search_index, stats = open_search_index(tex_path, index_path)
+        with search_index:
+            # 只有 ST表 的代码块变化
+            assert stats == (4, 1)
+            assert [hit.doc['line'] for hit in search_index.search('lowbit', kind='code')] == [5, 9]
+            assert search_index.search('std', kind='code')[0].doc['line'] == 9
+    finally:
+        shutil.rmtree(directory)
+
+def test_template_search():
+    print("测试在模板中检索...")
+    search_index, _ = open_search_index('Algorithm-template.tex')
+    index = TexIndex.load('Algorithm-template.tex')
+    with search_index:
+        assert isinstance(search_index, SearchIndex)
+        assert '树状数组' in search_index.search('树状数组上二分')[0].doc['title']
+        hits = search_index.search('__lg', limit=1000, kind='code')
+        assert hits
+        for hit in hits:
+            block = index.block_at_line(hit.doc['line'])
+            assert '__lg' in index.block_code(block)
+
+if __name__ == '__main__':
+    test_tokenize()
+    test_search_and_incremental_rebuild()
+    test_template_search()
+    print("🎉 所有测试通过!")
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+from tex_to_markdown import LaTeXToMarkdownConverter
+
+
+def test_clean_latex_artifacts():
+    converter = LaTeXToMarkdownConverter()
+    test_cases = [
+        # 已知命令连同参数一起移除，未知命令原样保留
+        ("前\\textbf{加粗}后", "前后"),
+        ("\\vspace[2pt]文字", "文字"),
+        ("\\item 第一项", "\\item 第一项"),
+        ("$\\sum a_i$", "$\\sum a_i$"),
+        # 只匹配完整的命令名
+        ("\\smallskip 文字", "\\smallskip 文字"),
+        # 环境标记与分隔注释块
+        ("\\begin{itemize}\n内容\n\\end{itemize}", "\n内容\n"),
+        ("%=====数据结构=====%\n正文", "\n正文"),
+        # 反斜杠残留
+        ("第一行\\\\\n第二行", "第一行\n第二行"),
+        ("a\\ b", "a b"),
+        # 页面控制命令不留下孤立的反斜杠
+        ("\\pagestyle{fancy}\n\\setcounter{page}{1}\n正文", "\n\n正文"),
+        # 孤立花括号、注释行和多余空行
+        ("a\n  {  \nb\n}\nc", "a\n\nb\n\nc"),
+        ("a\n% 注释\n\n\n\nb", "a\n\nb"),
+    ]
+
+    print("🧪 测试LaTeX残留清理...")
+    failed = 0
+    for source, expected in test_cases:
+        result = converter.clean_latex_artifacts(source)
+        if result != expected:
+            print(f"❌ 失败: {source!r} -> {result!r}, 期望: {expected!r}")
+            failed += 1
+
+    if failed == 0:
+        print("🎉 所有测试通过!")
+    assert failed == 0
+
+
+def test_fix_cpp_template_spacing():
+    converter = LaTeXToMarkdownConverter()
+    test_cases = [
+        ("vector < int > v;", "vector<int> v;"),
+        ("map < string , int > mp;", "map<string, int> mp;"),
+        ("map < array<int, 2>, int > pre;", "map<array<int, 2>, int> pre;"),
+        ("priority_queue < int, vector < int >, greater < int > > q;",
+         "priority_queue<int, vector<int>, greater<int>> q;"),
+        ("template < typename T >", "template<typename T>"),
+        ("vector<vector<int>> g;", "vector<vector<int>> g;"),
+        # 不在容器名单中的名字和比较运算不受影响
+        ("if (a < b && c > d)", "if (a < b && c > d)"),
+        ("return a<b?a:b;", "return a<b ? a : b;"),
+    ]
+
+    print("🧪 测试模板间距修复...")
+    failed = 0
+    for source, expected in test_cases:
+        result = converter.fix_cpp_template_spacing(source)
+        if result != expected:
+            print(f"❌ 失败: {source!r} -> {result!r}, 期望: {expected!r}")
+            failed += 1
+
+    if failed == 0:
+        print("🎉 所有测试通过!")
+    assert failed == 0
+
+
+def test_restore_protected_blocks():
+    converter = LaTeXToMarkdownConverter()
+    source = ''.join(f"第{i}段\n\\begin{{minted}}{{cpp}}\nint x{i};\n\\end{{minted}}\n" for i in range(12))
+    content = converter.convert_minted_blocks(source)
+    assert '__PROTECTED_CODE_BLOCK_11__' in content
+
+    print("🧪 测试代码块恢复...")
+    restored = converter.restore_protected_blocks(content)
+    expected = ''.join(f"第{i}段\n```cpp\nint x{i};\n```\n" for i in range(12))
+    assert restored == expected
+    print("🎉 代码块按原位置恢复!")
+
+
+if __name__ == '__main__':
+    test_clean_latex_artifacts()
+    test_fix_cpp_template_spacing()
+    test_restore_protected_blocks()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+import os
+import math
+import random
+import shutil
+import tempfile
+
+from bench_templates import HEADER_NAME, find_drivers
+from verify_complexity import (ComplexityResult, ComplexityVerifier, excess_exponent, expected_order, fit_models,
+                               parse_term)
+
+DOCUMENT = r'''\section{冒泡排序}
+% 时间复杂度：$O(n)$
+\begin{minted}{cpp}
+int a[N], n;
+void bubble()
+{
+    for (int i = 1; i <= n; i++)
+        for (int j = 1; j < n; j++)
+            if (a[j] > a[j + 1]) swap(a[j], a[j + 1]);
+}
+\end{minted}
+'''
+
+DRIVER = '''// @sizes 500 4000
+const int N = 5010;
+// @block 冒泡排序
+void setup(int size, mt19937 &rng)
+{
+    n = size;
+    for (int i = 1; i <= n; i++) a[i] = rng();
+}
+unsigned long long run()
+{
+    bubble();
+    return a[1];
+}
+'''
+
+
+def test_parse_complexity():
+    print("🧪 解析复杂度表达式...")
+    assert parse_term(r'n \log n') == (1, 1)
+    assert parse_term(r'\log ^ 2 n') == (0, 2)
+    assert parse_term(r'n\sqrt{n}') == (1.5, 0)
+    assert parse_term(r'n ^ 2 + m') == (2, 0)
+    assert parse_term(r'|T| + \sum |s_i|') == (1, 0)
+    assert parse_term(r'\text{两树节点数之和}') is None
+
+    print("🧪 由标注推出驱动的总复杂度...")
+    assert expected_order(r'预处理$O(n \log n)$，查询$O(1)$') == (1, 1)
+    assert expected_order(r'修改$O(\log n)$，查询$O(\log n)$') == (1, 1)
+    assert expected_order(r'预处理$O(m)$，匹配$O(n+m)$') == (1, 0)
+    assert expected_order('没有公式') is None
+    print("🎉 复杂度解析测试通过!")
+
+
+def test_fit_models():
+    print("🧪 拟合增长模型...")
+    sizes = [1000 * 2 ** k for k in range(6)]
+    for name, func in [('n', lambda n: n), ('n log n', lambda n: n * math.log(n)),
+                       ('n²', lambda n: n * n), ('n√n', lambda n: n ** 1.5)]:
+        residuals = fit_models({str(n): func(n) * 1e-9 for n in sizes})
+        assert min(residuals, key=residuals.get) == name
+
+    timings = {str(n): n * n * 1e-9 for n in sizes}
+    assert ComplexityResult('a', 'O(n^2)', 'a.cpp', 'n²', [timings]).status() == 'ok'
+    assert ComplexityResult('a', 'O(n)', 'a.cpp', 'n', [timings]).status() == 'mismatch'
+    assert ComplexityResult('a', None, None, None, [timings]).status() == 'unannotated'
+    assert ComplexityResult('a', None, None, None, [{'10': 1.0}]).status() == 'insufficient'
+
+    print("🧪 计时噪声不改变结论...")
+    rng = random.Random(1)
+    noisy = [{str(n): n * math.log(n) * 1e-9 * rng.uniform(1, 1.3) for n in sizes} for _ in range(5)]
+    for timings in noisy:
+        slope, margin = excess_exponent(timings, 'n log n')
+        assert abs(slope) - margin < 0.25
+        # n log n 与 n log² n 在这个范围内分不开，不报告不一致
+        assert ComplexityResult('a', 'O(n log^2 n)', 'a.cpp', 'n log² n', [timings]).status() == 'ok'
+        assert ComplexityResult('a', 'O(n)', 'a.cpp', 'n²', [timings]).status() == 'mismatch'
+    # 多轮取同一规模的最小值
+    result = ComplexityResult('a', 'O(n log n)', 'a.cpp', 'n log n', noisy)
+    assert result.timings['1000'] == min(timings['1000'] for timings in noisy)
+
+    print("🧪 点估计超出容差但置信区间较宽时为疑似不一致...")
+    # 期望 n log n，实测多出约 n^0.33 且带有噪声 (与 st_table 的实测结果相似)
+    wobble = [1.0, 1.5, 1.0, 1.6, 1.0, 1.5]
+    timings = {str(n): n * math.log(n) * n ** 0.33 * 1e-9 * w for n, w in zip(sizes, wobble)}
+    slope, margin = excess_exponent(timings, 'n log n')
+    assert abs(slope) - margin <= 0.25 < abs(slope)
+    assert ComplexityResult('a', 'O(n log n)', 'a.cpp', 'n log n', [timings]).status() == 'suspect'
+    # 最优模型的次数不同时即使点估计在容差内也提示
+    timings = {str(n): n ** 1.5 * 1e-9 for n in sizes}
+    result = ComplexityResult('a', 'O(n log n)', 'a.cpp', 'n log n', [timings])
+    assert result.best == 'n√n' and result.status(tolerance=0.5) == 'suspect'
+
+    print("🧪 各轮结论不一致时视为不稳定...")
+    quadratic = {str(n): n * n * 1e-9 for n in sizes}
+    result = ComplexityResult('a', 'O(n)', 'a.cpp', 'n', [{str(n): n * 1e-9 for n in sizes}, quadratic])
+    assert result.status() == 'unstable' and not result.stable()
+    assert ComplexityResult('a', 'O(n)', 'a.cpp', 'n', [quadratic, quadratic]).stable()
+    print("🎉 模型拟合测试通过!")
+
+
+def test_verify_driver():
+    if shutil.which('g++') is None:
+        print("⚠️  未找到 g++，跳过复杂度验证测试")
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        tex_file = os.path.join(directory, 'doc.tex')
+        bench_dir = os.path.join(directory, 'bench')
+        cache_dir = os.path.join(directory, 'cache')
+        os.makedirs(bench_dir)
+        with open(tex_file, 'w', encoding='utf-8') as f:
+            f.write(DOCUMENT)
+        with open(os.path.join(bench_dir, 'bubble.cpp'), 'w', encoding='utf-8') as f:
+            f.write(DRIVER)
+        shutil.copy(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bench', HEADER_NAME), bench_dir)
+
+        print("🧪 标注 O(n) 的平方算法被发现...")
+        verifier = ComplexityVerifier(tex_file, bench_dir, cache_dir, repeat=3)
+        result, = verifier.verify_all(find_drivers(bench_dir), jobs=2)
+        assert result.stated == '$O(n)$' and result.expected == 'n'
+        assert list(result.timings) == ['500', '1000', '2000', '4000'] and len(result.rounds) == 2
+        assert result.best == 'n²' and result.status() == 'mismatch'
+        assert not result.cached
+
+        print("🧪 代码块未改动时使用缓存...")
+        verifier = ComplexityVerifier(tex_file, bench_dir, cache_dir, repeat=3)
+        result, = verifier.verify_all(find_drivers(bench_dir))
+        assert result.cached and result.best == 'n²'
+        print("🎉 复杂度验证测试通过!")
+
+
+if __name__ == '__main__':
+    test_parse_complexity()
+    test_fit_models()
+    test_verify_driver()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+import os
+import json
+import time
+import tempfile
+
+from watch_tex import TexWatcher
+from test_build_tex import make_project, write, count_passes
+
+DOCUMENT = r'''\section{数据结构}
+\subsection{树状数组}
+单点修改，区间查询
+\begin{minted}{cpp}
+int lowbit(int x){return x&-x;}
+\end{minted}
+\section{图论}
+最短路
+'''
+
+
+def stages(job):
+    return {stage.name: stage.status for stage in job.stages}
+
+
+def run_step(watcher, now):
+    watcher.step(now)
+    if watcher.worker is not None:
+        watcher.worker.join()
+    return watcher.history[-1] if watcher.history else None
+
+
+def test_watch_stages():
+    with tempfile.TemporaryDirectory() as directory:
+        engine, tex_file = make_project(directory)
+        write(tex_file, DOCUMENT)
+        status_path = os.path.join(directory, 'status.json')
+        watcher = TexWatcher(tex_file, engine, debounce=1.0, status_path=status_path)
+
+        print("🧪 启动时格式化、转换并编译...")
+        watcher.pending.add(tex_file)
+        job = run_step(watcher, 100.0)
+        assert stages(job) == {'format': 'done', 'markdown': 'done', 'build': 'done'}
+        with open(tex_file, encoding='utf-8') as f:
+            assert 'return x & -x;' in f.read()
+        with open(os.path.join(directory, 'doc.md'), encoding='utf-8') as f:
+            assert '# 数据结构' in f.read()
+        assert count_passes(directory) == 3
+
+        print("🧪 格式化写回的内容不会再次触发任务...")
+        run_step(watcher, 101.0)
+        assert watcher.job_count == 1
+
+        print("🧪 防抖期间只排队...")
+        with open(tex_file, encoding='utf-8') as f:
+            content = f.read()
+        write(tex_file, content.replace('最短路', '最短路与最小生成树'))
+        watcher.step(200.0)
+        with open(status_path, encoding='utf-8') as f:
+            status = json.load(f)
+        assert status['state'] == 'waiting' and status['queue'] == ['doc.tex']
+        assert watcher.job_count == 1
+
+        print("🧪 只改正文时跳过格式化...")
+        job = run_step(watcher, 201.5)
+        assert job.changes.sections == ['图论'] and job.changes.blocks == []
+        assert stages(job) == {'format': 'skipped', 'markdown': 'done', 'build': 'done'}
+
+        print("🧪 只改 \\input 的文件时只编译...")
+        write(os.path.join(directory, 'chapter.tex'), '新的章节\n')
+        watcher.step(300.0)
+        job = run_step(watcher, 301.5)
+        assert job.changes.files == ['chapter.tex'] and job.changes.sections == []
+        assert stages(job) == {'format': 'skipped', 'markdown': 'skipped', 'build': 'done'}
+
+        with open(status_path, encoding='utf-8') as f:
+            status = json.load(f)
+        assert status['state'] == 'idle' and len(status['history']) == 3
+        assert status['history'][0]['stages'][0]['stage'] == 'format'
+        assert 'chapter.tex' in status['watched']
+        print("🎉 监视步骤测试通过!")
+
+
+def test_cancel_running_build():
+    with tempfile.TemporaryDirectory() as directory:
+        engine, tex_file = make_project(directory)
+        write(tex_file, DOCUMENT.replace('最短路', '\\slow'))
+        watcher = TexWatcher(tex_file, engine, stages=['build'], debounce=1.0,
+                             status_path=os.path.join(directory, 'status.json'))
+
+        print("🧪 编译过程中再次保存会取消编译...")
+        started = time.perf_counter()
+        watcher.pending.add(tex_file)
+        watcher.step(100.0)
+        while count_passes(directory) == 0:
+            time.sleep(0.05)
+        write(tex_file, DOCUMENT)
+        watcher.step(101.0)
+        watcher.worker.join()
+        job = watcher.history[-1]
+        assert job.status == 'cancelled' and stages(job) == {'build': 'cancelled'}
+        assert time.perf_counter() - started < 4
+
+        print("🧪 取消后的改动并入下一次任务...")
+        job = run_step(watcher, 102.5)
+        assert job.status == 'done' and job.number == 2
+        assert '图论' in job.changes.sections
+        print("🎉 取消编译测试通过!")
+
+
+def test_crlf_file():
+    with tempfile.TemporaryDirectory() as directory:
+        engine, tex_file = make_project(directory)
+        with open(tex_file, 'wb') as f:
+            f.write(DOCUMENT.replace('\n', '\r\n').encode('utf-8'))
+        watcher = TexWatcher(tex_file, engine, stages=['format'], debounce=1.0,
+                             status_path=os.path.join(directory, 'status.json'))
+
+        print("🧪 CRLF 文件也能格式化并保留换行...")
+        watcher.pending.add(tex_file)
+        job = run_step(watcher, 100.0)
+        assert job.status == 'done' and stages(job) == {'format': 'done'}
+        with open(tex_file, 'rb') as f:
+            data = f.read()
+        assert b'return x & -x;' in data and data.count(b'\r\n') == data.count(b'\n')
+
+        print("🧪 写回的内容不会再次触发任务...")
+        run_step(watcher, 101.0)
+        assert watcher.job_count == 1
+        print("🎉 CRLF 测试通过!")
+
+
+if __name__ == '__main__':
+    test_watch_stages()
+    test_cancel_running_build()
+    test_crlf_file()
@@ -0,0 +1,398 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Algorithm-template.tex 的结构索引
+一次扫描把文档解析为 章节 -> 模板 -> 代码块 的树，记录行号、字节偏移、
+语言和内容哈希，并缓存到磁盘 (按 mtime 和文件大小校验)，供各个脚本直接查询
+"""
+
+import os
+import re
+import sys
+import json
+import hashlib
+import argparse
+
+# 索引文件格式版本，修改解析逻辑或存储结构时递增
+INDEX_VERSION = 1
+
+DEFAULT_INDEX_DIR = '.tex_index'
+
+HEADING_LEVELS = {'section': 1, 'subsection': 2, 'subsubsection': 3}
+HEADING_PATTERN = re.compile(r'\\(section|subsection|subsubsection)\*?\{')
+MINTED_BEGIN_PATTERN = re.compile(r'\\begin\{minted\}\{([^}]+)\}$')
+MINTED_END = '\\end{minted}'
+# % 时间复杂度：... 或 \textbf{时间复杂度：}...
+COMPLEXITY_PATTERN = re.compile(r'(?:^%\s*|\\textbf\{)(时间复杂度|空间复杂度)\s*[：:]\s*\}?\s*(.*)')
+COMPLEXITY_KINDS = {'时间复杂度': 'time', '空间复杂度': 'space'}
+
+
+def write_if_changed(path, content, newline=None):
+    """内容不变时不写文件，保持 mtime 以免触发重新编译；newline 同 open()"""
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8', newline=newline) as f:
+            if f.read() == content:
+                return False
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8', newline=newline) as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+    return True
+
+
+def block_hash(code):
+    return hashlib.sha256(code.encode('utf-8')).hexdigest()
+
+
+def read_braced(text, start):
+    """从 start (左花括号之后) 读取到匹配的右花括号，返回括号内的内容"""
+    depth = 1
+    for i in range(start, len(text)):
+        if text[i] == '{':
+            depth += 1
+        elif text[i] == '}':
+            depth -= 1
+            if depth == 0:
+                return text[start:i]
+    return text[start:]
+
+
+class Section:
+    """文档中的一个标题节点，level 0 为整篇文档"""
+
+    def __init__(self, level, title, line, start, parent=None):
+        self.level = level
+        self.title = title
+        self.line = line
+        self.end_line = line
+        self.start = start
+        self.end = start
+        self.parent = parent
+        self.children = []
+        self.blocks = []
+        self.annotations = []
+
+    @property
+    def path(self):
+        titles = []
+        node = self
+        while node is not None and node.level > 0:
+            titles.append(node.title)
+            node = node.parent
+        return list(reversed(titles))
+
+    def walk(self):
+        """先序遍历自身及所有子节点"""
+        yield self
+        for child in self.children:
+            yield from child.walk()
+
+    def all_blocks(self):
+        """该节点下 (含子节点) 的全部代码块，按文档顺序"""
+        blocks = list(self.blocks)
+        for child in self.children:
+            blocks.extend(child.all_blocks())
+        blocks.sort(key=lambda block: block.start)
+        return blocks
+
+    def to_dict(self):
+        return {
+            'level': self.level, 'title': self.title,
+            'line': self.line, 'end_line': self.end_line,
+            'start': self.start, 'end': self.end,
+            'annotations': self.annotations,
+            'blocks': [block.to_dict() for block in self.blocks],
+            'children': [child.to_dict() for child in self.children],
+        }
+
+    @classmethod
+    def from_dict(cls, data, parent=None):
+        node = cls(data['level'], data['title'], data['line'], data['start'], parent)
+        node.end_line = data['end_line']
+        node.end = data['end']
+        node.annotations = data['annotations']
+        node.blocks = [CodeBlock.from_dict(item, node) for item in data['blocks']]
+        node.children = [cls.from_dict(item, node) for item in data['children']]
+        return node
+
+
+class CodeBlock:
+    """一个 minted 代码块
+
+    line/end_line 为 \\begin{minted} 与 \\end{minted} 所在行 (从 1 开始)，
+    start/end 为整个环境的字节偏移，code_start/code_end 为代码内容的字节偏移
+    """
+
+    def __init__(self, language, line, end_line, start, end, code_start, code_end, hash, section=None):
+        self.language = language
+        self.line = line
+        self.end_line = end_line
+        self.start = start
+        self.end = end
+        self.code_start = code_start
+        self.code_end = code_end
+        self.hash = hash
+        self.section = section
+
+    @property
+    def id(self):
+        return self.hash[:12]
+
+    def to_dict(self):
+        return {
+            'language': self.language, 'line': self.line, 'end_line': self.end_line,
+            'start': self.start, 'end': self.end,
+            'code_start': self.code_start, 'code_end': self.code_end, 'hash': self.hash,
+        }
+
+    @classmethod
+    def from_dict(cls, data, section=None):
+        return cls(section=section, **data)
+
+
+def parse(data):
+    """单遍解析 .tex 的字节内容，返回文档根节点"""
+    root = Section(0, '', 1, 0)
+    stack = [root]
+    offset = 0
+    block = None
+
+    for line_no, raw in enumerate(data.splitlines(keepends=True), 1):
+        line = raw.decode('utf-8').rstrip('\r\n')
+        line_start = offset
+        offset += len(raw)
+
+        if block is not None:
+            # 代码块内部只查找结束标记
+            if line == MINTED_END:
+                language, begin_line, start, code_start = block
+                code_end = max(code_start, line_start - 1)
+                code = data[code_start:code_end].decode('utf-8')
+                stack[-1].blocks.append(CodeBlock(
+                    language, begin_line, line_no, start, line_start + len(MINTED_END),
+                    code_start, code_end, block_hash(code), stack[-1]))
+                block = None
+            continue
+
+        stripped = line.strip()
+        match = MINTED_BEGIN_PATTERN.search(line)
+        if match:
+            begin = line_start + len(line[:match.start()].encode('utf-8'))
+            block = (match.group(1), line_no, begin, offset)
+            continue
+
+        match = HEADING_PATTERN.match(stripped)
+        if match:
+            level = HEADING_LEVELS[match.group(1)]
+            while stack[-1].level >= level:
+                closed = stack.pop()
+                closed.end, closed.end_line = line_start, line_no - 1
+            title = read_braced(stripped, match.end()).strip()
+            node = Section(level, title, line_no, line_start, stack[-1])
+            stack[-1].children.append(node)
+            stack.append(node)
+            continue
+
+        match = COMPLEXITY_PATTERN.search(stripped)
+        if match:
+            stack[-1].annotations.append({
+                'kind': COMPLEXITY_KINDS[match.group(1)],
+                'text': match.group(2).strip(),
+                'line': line_no,
+            })
+
+    total_lines = data.count(b'\n') + (0 if data.endswith(b'\n') or not data else 1)
+    for node in stack:
+        node.end, node.end_line = len(data), total_lines
+    return root
+
+
+class TexIndex:
+    """.tex 文件的结构索引及查询接口"""
+
+    def __init__(self, path, root, mtime_ns, size):
+        self.path = path
+        self.root = root
+        self.mtime_ns = mtime_ns
+        self.size = size
+        self.blocks = root.all_blocks()
+        self._data = None
+
+    @classmethod
+    def build(cls, path):
+        with open(path, 'rb') as f:
+            data = f.read()
+        stat = os.stat(path)
+        index = cls(path, parse(data), stat.st_mtime_ns, stat.st_size)
+        index._data = data
+        return index
+
+    @classmethod
+    def from_text(cls, text, path=None):
+        """索引内存中的文本 (如格式化脚本读入的内容)，不读写缓存"""
+        data = text.encode('utf-8')
+        index = cls(path, parse(data), None, len(data))
+        index._data = data
+        return index
+
+    @classmethod
+    def load(cls, path, cache_path=None, use_cache=True):
+        """读取索引，缓存文件与 .tex 的 mtime 和大小一致时直接复用，否则重新解析并写回"""
+        if cache_path is None:
+            cache_path = default_index_path(path)
+        stat = os.stat(path)
+
+        if use_cache and os.path.exists(cache_path):
+            try:
+                with open(cache_path, 'r', encoding='utf-8') as f:
+                    cached = json.load(f)
+                if (cached.get('version') == INDEX_VERSION and
+                        cached.get('mtime_ns') == stat.st_mtime_ns and cached.get('size') == stat.st_size):
+                    return cls(path, Section.from_dict(cached['root']), stat.st_mtime_ns, stat.st_size)
+            except (OSError, ValueError, KeyError, TypeError):
+                pass
+
+        index = cls.build(path)
+        if use_cache:
+            index.save(cache_path)
+        return index
+
+    def save(self, cache_path):
+        """原子地写入索引缓存文件"""
+        os.makedirs(os.path.dirname(cache_path) or '.', exist_ok=True)
+        data = {
+            'version': INDEX_VERSION, 'mtime_ns': self.mtime_ns, 'size': self.size,
+            'root': self.root.to_dict(),
+        }
+        tmp_path = f'{cache_path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, cache_path)
+
+    def data(self):
+        """文件的原始字节内容 (按需读取)"""
+        if self._data is None:
+            with open(self.path, 'rb') as f:
+                self._data = f.read()
+        return self._data
+
+    def text(self):
+        return self.data().decode('utf-8')
+
+    def block_code(self, block):
+        """代码块内容 (不含 \\begin/\\end 行)"""
+        return self.data()[block.code_start:block.code_end].decode('utf-8')
+
+    def sections(self, level=None):
+        """按文档顺序遍历标题节点，level 为 1/2/3 时只返回对应层级"""
+        for node in self.root.walk():
+            if node.level > 0 and (level is None or node.level == level):
+                yield node
+
+    def find(self, title, exact=False):
+        """按标题查找节点，默认为子串匹配"""
+        return [node for node in self.sections()
+                if (node.title == title if exact else title in node.title)]
+
+    def section_at_line(self, line):
+        """包含给定行号的最深一层标题节点"""
+        node = self.root
+        while True:
+            for child in node.children:
+                if child.line <= line <= child.end_line:
+                    node = child
+                    break
+            else:
+                return node
+
+    def block_at_line(self, line):
+        for block in self.blocks:
+            if block.line <= line <= block.end_line:
+                return block
+        return None
+
+    def blocks_by_language(self, *languages):
+        languages = {language.lower() for language in languages}
+        return [block for block in self.blocks if block.language.lower() in languages]
+
+    def block_by_id(self, block_id):
+        for block in self.blocks:
+            if block.hash.startswith(block_id):
+                return block
+        return None
+
+    def replace_blocks(self, replace):
+        """把每个代码块环境 (\\begin 到 \\end{minted}) 替换为 replace(block) 的返回值，返回新的文本
+
+        replace 返回 None 的代码块保持原样
+        """
+        data = self.data()
+        pieces = []
+        pos = 0
+        for block in self.blocks:
+            replacement = replace(block)
+            if replacement is None:
+                continue
+            pieces.append(data[pos:block.start])
+            pieces.append(replacement.encode('utf-8'))
+            pos = block.end
+        pieces.append(data[pos:])
+        return b''.join(pieces).decode('utf-8')
+
+
+def default_index_path(tex_path):
+    """索引文件放在 .tex 同目录的 .tex_index/ 下"""
+    directory = os.path.dirname(os.path.abspath(tex_path))
+    name = os.path.splitext(os.path.basename(tex_path))[0]
+    return os.path.join(directory, DEFAULT_INDEX_DIR, f'{name}.json')
+
+
+def load_index(path='Algorithm-template.tex', use_cache=True):
+    return TexIndex.load(path, use_cache=use_cache)
+
+
+def print_outline(index, max_level=3):
+    """打印文档目录及每个节点下的代码块数量"""
+    for node in index.sections():
+        if node.level > max_level:
+            continue
+        count = len(node.all_blocks())
+        indent = '  ' * (node.level - 1)
+        print(f"{indent}{node.title}  (第{node.line}-{node.end_line}行, {count}个代码块)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='LaTeX模板结构索引')
+    parser.add_argument('file', nargs='?', default='Algorithm-template.tex',
+                       help='LaTeX文件 (默认: Algorithm-template.tex)')
+    parser.add_argument('--level', type=int, default=2, choices=[1, 2, 3],
+                       help='目录显示到第几级标题 (默认: 2)')
+    parser.add_argument('--line', type=int,
+                       help='查询某一行所在的章节和代码块')
+    parser.add_argument('--rebuild', action='store_true',
+                       help='忽略缓存，重新解析')
+
+    args = parser.parse_args()
+
+    if not os.path.exists(args.file):
+        print(f"错误: 文件 {args.file} 不存在")
+        sys.exit(1)
+
+    index = TexIndex.load(args.file, use_cache=not args.rebuild)
+    if args.rebuild:
+        index.save(default_index_path(args.file))
+
+    if args.line:
+        node = index.section_at_line(args.line)
+        print(f"第{args.line}行位于: {' > '.join(node.path) or '(导言区)'}")
+        block = index.block_at_line(args.line)
+        if block:
+            print(f"代码块 {block.id} ({block.language}, 第{block.line}-{block.end_line}行)")
+        return
+
+    print_outline(index, args.level)
+    print(f"📊 共 {len(list(index.sections()))} 个标题, {len(index.blocks)} 个代码块")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+按章节预览编译
+用原文档的导言区加上选中的章节 (按标题或行号范围) 生成一个包装文档，只编译这一部分，
+可去掉封面和目录；同一选择总是生成同名的包装文档，配合 build_tex.py 的增量编译复用辅助文件
+"""
+
+import os
+import re
+import sys
+import json
+import shutil
+import hashlib
+import argparse
+
+from tex_index import load_index, write_if_changed
+from build_tex import DEFAULT_ENGINE, DEFAULT_MAX_PASSES, prepare_builder, print_report
+
+HEADING_COUNTERS = {1: 'section', 2: 'subsection', 3: 'subsubsection'}
+BEGIN_DOCUMENT = b'\\begin{document}'
+END_DOCUMENT = b'\\end{document}'
+# 封面和目录命令所在的行
+COVER_PATTERN = re.compile(r'^\s*\\(?:makecover|maketitle)\b')
+TOC_PATTERN = re.compile(r'^\s*\\(?:tableofcontents|listoffigures|listoftables)\b')
+LINE_RANGE_PATTERN = re.compile(r'^(\d+)(?:\s*[-:,]\s*(\d+))?$')
+
+
+def line_offsets(data):
+    """每一行起始的字节偏移，offsets[i] 为第 i+1 行"""
+    offsets = [0]
+    pos = data.find(b'\n')
+    while pos >= 0:
+        offsets.append(pos + 1)
+        pos = data.find(b'\n', pos + 1)
+    return offsets
+
+
+def parse_line_range(text):
+    """'120-180' 或单独的 '120'"""
+    match = LINE_RANGE_PATTERN.match(text.strip())
+    if not match:
+        raise ValueError(f"无法解析行号范围: {text}")
+    first = int(match.group(1))
+    last = int(match.group(2) or first)
+    if first < 1 or last < first:
+        raise ValueError(f"无效的行号范围: {text}")
+    return first, last
+
+
+def resolve_section(index, query):
+    """按标题查找唯一的章节；可用 '数据结构/线段树' 形式的路径消除歧义"""
+    if '/' in query:
+        parts = [part.strip() for part in query.split('/') if part.strip()]
+        candidates = [node for node in index.sections() if node.path[-len(parts):] == parts]
+    else:
+        candidates = index.find(query, exact=True) or index.find(query)
+
+    if not candidates:
+        raise ValueError(f"没有找到标题包含 '{query}' 的章节")
+    if len(candidates) > 1:
+        choices = '\n'.join(f"  {'/'.join(node.path)} (第{node.line}行)" for node in candidates[:10])
+        raise ValueError(f"'{query}' 匹配到 {len(candidates)} 个章节，请用完整标题或路径指定:\n{choices}")
+    return candidates[0]
+
+
+def heading_numbers(node):
+    """节点及其祖先在同级标题中的序号，如 [1, 5] 表示 1.5"""
+    numbers = []
+    while node.parent is not None:
+        siblings = [child for child in node.parent.children if child.level == node.level]
+        numbers.append((node.level, siblings.index(node) + 1))
+        node = node.parent
+    return list(reversed(numbers))
+
+
+def section_counters(node, at_heading):
+    """设置计数器，使预览中的章节编号与完整文档一致"""
+    lines = []
+    for level, number in heading_numbers(node):
+        if at_heading and level == node.level:
+            # 紧接着的 \section 等命令会再加一
+            number -= 1
+        lines.append(f'\\setcounter{{{HEADING_COUNTERS[level]}}}{{{number}}}')
+    return lines
+
+
+class PreviewDocument:
+    """一次预览选中的文档片段"""
+
+    def __init__(self, index, sections=(), line_ranges=(), cover=True, toc=True):
+        self.index = index
+        self.sections = list(sections)
+        self.line_ranges = list(line_ranges)
+        self.cover = cover
+        self.toc = toc
+
+        data = index.data()
+        self.offsets = line_offsets(data)
+        begin = data.find(BEGIN_DOCUMENT)
+        if begin < 0:
+            raise ValueError(f"{index.path} 中没有 \\begin{{document}}")
+        # 正文从 \begin{document} 的下一行开始，到 \end{document} 所在行之前结束
+        line_end = data.find(b'\n', begin)
+        self.body_start = len(data) if line_end < 0 else line_end + 1
+        end = data.rfind(END_DOCUMENT)
+        self.body_end = data.rfind(b'\n', 0, end) + 1 if end > self.body_start else len(data)
+
+    def line_of(self, offset):
+        """字节偏移所在的行号"""
+        low, high = 0, len(self.offsets) - 1
+        while low < high:
+            mid = (low + high + 1) // 2
+            if self.offsets[mid] <= offset:
+                low = mid
+            else:
+                high = mid - 1
+        return low + 1
+
+    def line_span(self, first, last):
+        """行号范围对应的字节区间，不截断代码块"""
+        first_block = self.index.block_at_line(first)
+        last_block = self.index.block_at_line(last)
+        if first_block:
+            first = first_block.line
+        if last_block:
+            last = last_block.end_line
+        start = self.offsets[min(first, len(self.offsets)) - 1]
+        end = self.offsets[last] if last < len(self.offsets) else len(self.index.data())
+        return start, end
+
+    def chunks(self):
+        """选中部分的字节区间，按文档顺序排列并合并重叠部分"""
+        spans = [(node.start, node.end) for node in self.sections]
+        spans.extend(self.line_span(first, last) for first, last in self.line_ranges)
+
+        merged = []
+        for start, end in sorted(spans):
+            start, end = max(start, self.body_start), min(end, self.body_end)
+            if start >= end:
+                continue
+            if merged and start <= merged[-1][1]:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+            else:
+                merged.append((start, end))
+        return merged
+
+    def front_matter(self):
+        """\\begin{document} 到第一个标题之间的内容 (封面、目录、页码设置)"""
+        data = self.index.data()
+        children = self.index.root.children
+        end = children[0].start if children else self.body_end
+        lines = data[self.body_start:end].decode('utf-8').splitlines(keepends=True)
+        return ''.join(line for line in lines
+                       if (self.cover or not COVER_PATTERN.match(line))
+                       and (self.toc or not TOC_PATTERN.match(line)))
+
+    def render(self):
+        data = self.index.data()
+        pieces = [data[:self.body_start].decode('utf-8'), self.front_matter()]
+        for start, end in self.chunks():
+            node = self.index.section_at_line(self.line_of(start))
+            if node.level > 0:
+                at_heading = node.start == start
+                pieces.append(f'% 预览: 原文第{self.line_of(start)}-{self.line_of(end - 1)}行\n')
+                pieces.extend(line + '\n' for line in section_counters(node, at_heading))
+            pieces.append(data[start:end].decode('utf-8'))
+        pieces.append('\\end{document}\n')
+        return ''.join(pieces)
+
+    def key(self):
+        """选择方式的摘要：同一选择在文档修改后仍得到同名的包装文档"""
+        spec = {
+            'sections': ['/'.join(node.path) for node in self.sections],
+            'lines': self.line_ranges,
+            'cover': self.cover,
+            'toc': self.toc,
+        }
+        return hashlib.sha256(json.dumps(spec, ensure_ascii=False, sort_keys=True).encode('utf-8')).hexdigest()[:10]
+
+    def default_output_path(self):
+        stem, ext = os.path.splitext(self.index.path)
+        return f'{stem}-preview-{self.key()}{ext}'
+
+    def write(self, output=None):
+        """写出包装文档，内容不变时不改动文件"""
+        output = output or self.default_output_path()
+        write_if_changed(output, self.render())
+        return output
+
+
+def main():
+    parser = argparse.ArgumentParser(description='按章节预览编译')
+    parser.add_argument('file', nargs='?', default='Algorithm-template.tex',
+                       help='LaTeX文件 (默认: Algorithm-template.tex)')
+    parser.add_argument('-s', '--section', action='append', default=[],
+                       help="按标题选择章节，可重复；歧义时用路径如 '数据结构/线段树'")
+    parser.add_argument('-l', '--lines', action='append', default=[],
+                       help='按行号范围选择，如 900-1200，可重复')
+    parser.add_argument('--no-cover', action='store_true', help='去掉封面')
+    parser.add_argument('--no-toc', action='store_true', help='去掉目录')
+    parser.add_argument('--bare', action='store_true', help='同时去掉封面和目录')
+    parser.add_argument('-o', '--output', help='包装文档路径 (默认: <文件名>-preview-<摘要>.tex)')
+    parser.add_argument('--no-build', action='store_true', help='只生成包装文档，不编译')
+    parser.add_argument('--engine', default=os.environ.get('XELATEX', DEFAULT_ENGINE),
+                       help='编译引擎，也可通过环境变量 XELATEX 指定 (默认: xelatex)')
+    parser.add_argument('--max-passes', type=int, default=DEFAULT_MAX_PASSES,
+                       help=f'最多编译次数 (默认: {DEFAULT_MAX_PASSES})')
+    parser.add_argument('--force', action='store_true', help='即使没有改动也重新编译')
+    parser.add_argument('--prerender', action='store_true', help='预渲染代码块后编译，不需要 -shell-escape')
+    parser.add_argument('-j', '--jobs', type=int, default=0,
+                       help='预渲染的并行进程数，0 表示使用全部CPU核心 (默认: 0)')
+
+    args = parser.parse_args()
+
+    if not os.path.exists(args.file):
+        print(f"错误: 文件 {args.file} 不存在")
+        sys.exit(1)
+    if not args.section and not args.lines:
+        print("错误: 请用 --section 或 --lines 选择要预览的内容")
+        sys.exit(1)
+
+    index = load_index(args.file)
+    try:
+        sections = [resolve_section(index, query) for query in args.section]
+        line_ranges = [parse_line_range(text) for text in args.lines]
+        preview = PreviewDocument(index, sections, line_ranges,
+                                  cover=not (args.no_cover or args.bare), toc=not (args.no_toc or args.bare))
+    except ValueError as e:
+        print(f"错误: {e}")
+        sys.exit(1)
+
+    output = preview.write(args.output)
+    selected = sum(preview.line_of(end - 1) - preview.line_of(start) + 1 for start, end in preview.chunks())
+    print(f"📄 预览文档: {output} (选中 {selected} 行, 原文 {len(preview.offsets)} 行)")
+    for node in sections:
+        print(f"   {' > '.join(node.path)} (第{node.line}-{node.end_line}行)")
+    if args.no_build:
+        return
+
+    engine = shutil.which(args.engine)
+    if engine is None:
+        print(f"错误: {args.engine} 未找到！请确保已安装LaTeX发行版。")
+        sys.exit(1)
+    builder = prepare_builder(output, engine, max_passes=args.max_passes,
+                              prerender=args.prerender, jobs=args.jobs)
+    result = builder.build(force=args.force)
+    print_report(result, builder)
+    sys.exit(0 if result.ok else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,464 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+模板全文检索
+在 tex_index 的章节树上建立倒排索引：标题、正文、复杂度注释和代码块中的
+中英文词 (中文按单字和相邻二字切分)、C++ 标识符 (如 __lg)、复杂度 (如 O(nlogn))。
+索引以紧凑的二进制文件存放在 .tex_index/ 下，查询时通过 mmap 二分查找词表，
+.tex 改动后只对内容变化的章节和代码块重新分词
+"""
+
+import os
+import re
+import sys
+import json
+import math
+import mmap
+import time
+import struct
+import hashlib
+import argparse
+from array import array
+
+from tex_index import TexIndex, DEFAULT_INDEX_DIR
+
+# 索引文件格式版本，修改分词规则或存储结构时递增
+SEARCH_VERSION = 1
+MAGIC = b'TEXSRCH\0'
+# 魔数、版本、10 个段偏移：元数据、词偏移表、词表、词的倒排起点、倒排文档号、倒排权重、
+# 正排起点、正排词号、正排权重、文件结尾
+HEADER = struct.Struct('<8sI10Q')
+
+# 各字段中一次出现的权重
+FIELD_WEIGHTS = {'title': 5.0, 'path': 1.5, 'annotation': 3.0, 'text': 1.0, 'code': 1.0}
+KIND_NAMES = {'section': '章节', 'code': '代码'}
+
+# BM25 参数
+BM25_K1 = 1.2
+BM25_B = 0.75
+# 查询串整体出现在标题中时的加权
+TITLE_MATCH_BOOST = 2.0
+
+TOKEN_PATTERN = re.compile(r'[\u3400-\u9fff]+|[A-Za-z_][A-Za-z0-9_]*')
+COMPLEXITY_TERM_PATTERN = re.compile(r'O\(((?:[^()]|\([^()]*\))*)\)')
+COMPLEXITY_NOISE_PATTERN = re.compile(r'[\s\\{}$]|left|right')
+LATEX_ENVIRONMENT_PATTERN = re.compile(r'\\(?:begin|end)\{[^}]*\}')
+LATEX_COMMAND_PATTERN = re.compile(r'\\[A-Za-z]+\*?')
+
+
+def default_search_path(tex_path):
+    """与结构索引放在同一个 .tex_index/ 目录下"""
+    directory = os.path.dirname(os.path.abspath(tex_path))
+    name = os.path.splitext(os.path.basename(tex_path))[0]
+    return os.path.join(directory, DEFAULT_INDEX_DIR, f'{name}.search')
+
+
+def complexity_terms(text):
+    """把 $O(n \\log n)$ 之类的复杂度归一化为 o(nlogn)"""
+    terms = []
+    for match in COMPLEXITY_TERM_PATTERN.finditer(text):
+        inner = COMPLEXITY_NOISE_PATTERN.sub('', match.group(1)).lower()
+        if inner:
+            terms.append(f'o({inner})')
+    return terms
+
+
+def tokenize(text):
+    """切分出检索词：中文单字和二字组，英文词和标识符 (小写)，含下划线的标识符额外拆出各部分"""
+    terms = []
+    for match in TOKEN_PATTERN.finditer(text):
+        word = match.group()
+        if word[0] >= '\u3400':
+            terms.extend(word)
+            terms.extend(word[i:i + 2] for i in range(len(word) - 1))
+            continue
+        word = word.lower()
+        terms.append(word)
+        parts = [part for part in word.split('_') if part]
+        if len(parts) > 1:
+            terms.extend(parts)
+    return terms
+
+
+def strip_latex(text):
+    return LATEX_COMMAND_PATTERN.sub(' ', LATEX_ENVIRONMENT_PATTERN.sub(' ', text))
+
+
+class Document:
+    """一个检索单位：章节自身的正文 (不含子章节和代码块)，或一个代码块"""
+
+    def __init__(self, kind, title, path, line, end_line, fields, block_id=''):
+        self.kind = kind
+        self.title = title
+        self.path = path
+        self.line = line
+        self.end_line = end_line
+        self.fields = fields
+        self.block_id = block_id
+        digest = hashlib.sha1(kind.encode('utf-8'))
+        for name in sorted(fields):
+            digest.update(f'\0{name}\0{fields[name]}'.encode('utf-8'))
+        self.hash = digest.hexdigest()
+
+    def terms(self):
+        """词 -> 按字段加权的词频"""
+        weights = {}
+        for name, text in self.fields.items():
+            weight = FIELD_WEIGHTS[name]
+            tokens = tokenize(text)
+            if name == 'annotation':
+                tokens += complexity_terms(text)
+            for term in tokens:
+                weights[term] = weights.get(term, 0.0) + weight
+        return weights
+
+
+def collect_documents(index):
+    """按文档顺序列出全部章节和代码块"""
+    data = index.data()
+    documents = []
+    for section in index.sections():
+        end = section.children[0].start if section.children else section.end
+        # 跳过标题行，标题单独作为 title 字段
+        newline = data.find(b'\n', section.start, end)
+        body = end if newline < 0 else newline + 1
+        pieces = []
+        for block in section.blocks:
+            pieces.append(data[body:block.start])
+            body = block.end
+        pieces.append(data[body:end])
+        text = strip_latex(b''.join(pieces).decode('utf-8'))
+        end_line = section.children[0].line - 1 if section.children else section.end_line
+        documents.append(Document('section', section.title, section.path, section.line, end_line, {
+            'title': section.title,
+            'path': ' '.join(section.path[:-1]),
+            'annotation': ' '.join(item['text'] for item in section.annotations),
+            'text': text,
+        }))
+
+        for k, block in enumerate(section.blocks, 1):
+            title = section.title + (f' #{k}' if len(section.blocks) > 1 else '')
+            documents.append(Document('code', title, section.path, block.line, block.end_line, {
+                'path': ' '.join(section.path),
+                'code': index.block_code(block),
+            }, block.id))
+    return documents
+
+
+def to_little_endian(values):
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values.tobytes()
+
+
+def write_search_index(path, meta, doc_terms):
+    """写入索引文件；doc_terms[i] 为第 i 个文档的 词 -> 权重"""
+    terms = sorted({term for weights in doc_terms for term in weights}, key=lambda term: term.encode('utf-8'))
+    term_ids = {term: i for i, term in enumerate(terms)}
+
+    term_offsets, blob = array('I', [0]), bytearray()
+    for term in terms:
+        blob += term.encode('utf-8')
+        term_offsets.append(len(blob))
+
+    postings = [[] for _ in terms]
+    forward_offsets, forward_terms, forward_weights = array('I', [0]), array('I'), array('f')
+    for doc, weights in enumerate(doc_terms):
+        for term_id, weight in sorted((term_ids[term], weight) for term, weight in weights.items()):
+            postings[term_id].append((doc, weight))
+            forward_terms.append(term_id)
+            forward_weights.append(weight)
+        forward_offsets.append(len(forward_terms))
+
+    term_postings, posting_docs, posting_weights = array('I', [0]), array('I'), array('f')
+    for items in postings:
+        for doc, weight in items:
+            posting_docs.append(doc)
+            posting_weights.append(weight)
+        term_postings.append(len(posting_docs))
+
+    meta = dict(meta, version=SEARCH_VERSION, terms=len(terms))
+    sections = [json.dumps(meta, ensure_ascii=False).encode('utf-8'),
+                to_little_endian(term_offsets), bytes(blob), to_little_endian(term_postings),
+                to_little_endian(posting_docs), to_little_endian(posting_weights),
+                to_little_endian(forward_offsets), to_little_endian(forward_terms),
+                to_little_endian(forward_weights)]
+    offsets = []
+    position = HEADER.size
+    for section in sections:
+        # 每段按 4 字节对齐
+        position += -position % 4
+        offsets.append(position)
+        position += len(section)
+    offsets.append(position)
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, SEARCH_VERSION, *offsets))
+        for offset, section in zip(offsets, sections):
+            f.write(b'\0' * (offset - f.tell()))
+            f.write(section)
+    os.replace(tmp_path, path)
+
+
+class Hit:
+    def __init__(self, doc, score, matched):
+        self.doc = doc
+        self.score = score
+        self.matched = matched
+
+    def to_dict(self):
+        return dict(self.doc, score=round(self.score, 4), matched=self.matched)
+
+
+class SearchIndex:
+    """只读地 mmap 索引文件，按需读取词表和倒排表"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            if self.mm.size() < HEADER.size:
+                raise ValueError(f"索引文件 {path} 不完整")
+            magic, version, *offsets = HEADER.unpack_from(self.mm, 0)
+            if magic != MAGIC or version != SEARCH_VERSION:
+                raise ValueError(f"索引文件 {path} 格式不匹配")
+            (self.meta_at, self.term_offsets_at, self.blob_at, self.term_postings_at, self.posting_docs_at,
+             self.posting_weights_at, self.forward_offsets_at, self.forward_terms_at,
+             self.forward_weights_at, end) = offsets
+            if end != self.mm.size():
+                raise ValueError(f"索引文件 {path} 不完整")
+            self.meta = json.loads(self.mm[self.meta_at:self.term_offsets_at].rstrip(b'\0'))
+        except Exception:
+            self.mm.close()
+            raise
+        self.docs = self.meta['docs']
+        self.term_count = self.meta['terms']
+
+    def close(self):
+        self.mm.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def is_current(self, tex_path):
+        stat = os.stat(tex_path)
+        return self.meta.get('mtime_ns') == stat.st_mtime_ns and self.meta.get('size') == stat.st_size
+
+    def _uint(self, base, i):
+        return struct.unpack_from('<I', self.mm, base + 4 * i)[0]
+
+    def term(self, term_id):
+        start = self._uint(self.term_offsets_at, term_id)
+        end = self._uint(self.term_offsets_at, term_id + 1)
+        return self.mm[self.blob_at + start:self.blob_at + end].decode('utf-8')
+
+    def term_id(self, term):
+        """在按 UTF-8 字节排序的词表上二分查找，不存在时返回 None"""
+        key = term.encode('utf-8')
+        lo, hi = 0, self.term_count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            start, end = struct.unpack_from('<II', self.mm, self.term_offsets_at + 4 * mid)
+            probe = self.mm[self.blob_at + start:self.blob_at + end]
+            if probe < key:
+                lo = mid + 1
+            elif probe > key:
+                hi = mid
+            else:
+                return mid
+        return None
+
+    def postings(self, term):
+        """包含该词的 [(文档号, 权重)]"""
+        term_id = self.term_id(term)
+        if term_id is None:
+            return []
+        start, end = struct.unpack_from('<II', self.mm, self.term_postings_at + 4 * term_id)
+        count = end - start
+        docs = struct.unpack_from(f'<{count}I', self.mm, self.posting_docs_at + 4 * start)
+        weights = struct.unpack_from(f'<{count}f', self.mm, self.posting_weights_at + 4 * start)
+        return list(zip(docs, weights))
+
+    def doc_terms(self, doc):
+        """文档的 词 -> 权重，增量重建时复用"""
+        start, end = struct.unpack_from('<II', self.mm, self.forward_offsets_at + 4 * doc)
+        count = end - start
+        term_ids = struct.unpack_from(f'<{count}I', self.mm, self.forward_terms_at + 4 * start)
+        weights = struct.unpack_from(f'<{count}f', self.mm, self.forward_weights_at + 4 * start)
+        return {self.term(term_id): weight for term_id, weight in zip(term_ids, weights)}
+
+    def search(self, query, limit=10, kind=None):
+        """BM25 排序，按命中的查询词比例降权，查询串整体出现在标题中时加权"""
+        terms = list(dict.fromkeys(tokenize(query) + complexity_terms(query)))
+        if not terms:
+            return []
+        total = len(self.docs)
+        average = self.meta['average_length'] or 1.0
+        scores, matched = {}, {}
+        for term in terms:
+            postings = self.postings(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (total - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc, weight in postings:
+                if kind is not None and self.docs[doc]['kind'] != kind:
+                    continue
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.docs[doc]['length'] / average)
+                scores[doc] = scores.get(doc, 0.0) + idf * weight * (BM25_K1 + 1) / (weight + norm)
+                matched.setdefault(doc, []).append(term)
+
+        needle = query.strip().lower()
+        hits = []
+        for doc, score in scores.items():
+            score *= (len(matched[doc]) / len(terms)) ** 2
+            if needle and needle in self.docs[doc]['title'].lower():
+                score *= TITLE_MATCH_BOOST
+            hits.append(Hit(self.docs[doc], score, matched[doc]))
+        hits.sort(key=lambda hit: (-hit.score, hit.doc['line']))
+        return hits[:limit]
+
+
+def build_search_index(tex_path, index_path=None, previous=None):
+    """重建索引文件，内容未变的文档直接复用 previous 中的分词结果；返回 (复用数, 重新分词数)"""
+    if index_path is None:
+        index_path = default_search_path(tex_path)
+    index = TexIndex.load(tex_path)
+    documents = collect_documents(index)
+
+    cached = {}
+    if previous is not None:
+        cached = {doc['hash']: i for i, doc in enumerate(previous.docs)}
+
+    doc_terms, reused = [], 0
+    for document in documents:
+        if document.hash in cached:
+            doc_terms.append(previous.doc_terms(cached[document.hash]))
+            reused += 1
+        else:
+            doc_terms.append(document.terms())
+
+    docs = []
+    for document, weights in zip(documents, doc_terms):
+        docs.append({
+            'kind': document.kind, 'title': document.title, 'path': document.path,
+            'line': document.line, 'end_line': document.end_line, 'block_id': document.block_id,
+            'hash': document.hash, 'length': round(sum(weights.values()), 2),
+        })
+    meta = {
+        'source': os.path.basename(tex_path), 'mtime_ns': index.mtime_ns, 'size': index.size, 'docs': docs,
+        'average_length': sum(doc['length'] for doc in docs) / len(docs) if docs else 0.0,
+    }
+    write_search_index(index_path, meta, doc_terms)
+    return reused, len(documents) - reused
+
+
+def open_search_index(tex_path, index_path=None, rebuild=False):
+    """打开最新的索引，过期时增量重建；返回 (SearchIndex, (复用数, 重新分词数) 或 None)"""
+    if index_path is None:
+        index_path = default_search_path(tex_path)
+    previous = None
+    if os.path.exists(index_path):
+        try:
+            previous = SearchIndex(index_path)
+        except (OSError, ValueError):
+            previous = None
+    if previous is not None and not rebuild and previous.is_current(tex_path):
+        return previous, None
+
+    try:
+        stats = build_search_index(tex_path, index_path, None if rebuild else previous)
+    finally:
+        if previous is not None:
+            previous.close()
+    return SearchIndex(index_path), stats
+
+
+def snippet(lines, hit, query):
+    """文档范围内命中查询词最多的一行，返回 (行号, 内容)"""
+    pieces = [piece.lower() for piece in TOKEN_PATTERN.findall(query)]
+    best = None
+    for line_no in range(hit.doc['line'], min(hit.doc['end_line'], len(lines)) + 1):
+        text = lines[line_no - 1].lower()
+        count = sum(piece in text for piece in pieces)
+        if count and (best is None or count > best[0]):
+            best = (count, line_no)
+    if best is None:
+        return None
+    return best[1], lines[best[1] - 1].strip()
+
+
+def print_hits(hits, query, elapsed, tex_path=None):
+    print(f"🔍 \"{query}\": {len(hits)} 个结果 ({elapsed * 1000:.1f} ms)")
+    lines = None
+    if tex_path is not None and hits:
+        with open(tex_path, 'r', encoding='utf-8') as f:
+            lines = f.read().split('\n')
+    for rank, hit in enumerate(hits, 1):
+        doc = hit.doc
+        location = ' > '.join(doc['path'][:-1] + [doc['title']])
+        print(f"{rank:3d}. [{KIND_NAMES[doc['kind']]}] {location}  "
+              f"第 {doc['line']}-{doc['end_line']} 行  ({hit.score:.2f})")
+        found = snippet(lines, hit, query) if lines is not None else None
+        if found is not None:
+            text = found[1] if len(found[1]) <= 100 else found[1][:97] + '...'
+            print(f"       {found[0]}: {text}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='在模板的章节和代码块中检索')
+    parser.add_argument('query', nargs='*', help='查询词，如 树状数组上二分、__lg、O(n log n)')
+    parser.add_argument('-f', '--file', default='Algorithm-template.tex',
+                       help='要检索的 .tex 文件 (默认: Algorithm-template.tex)')
+    parser.add_argument('-n', '--limit', type=int, default=10,
+                       help='最多显示的结果数 (默认: 10)')
+    kinds = parser.add_mutually_exclusive_group()
+    kinds.add_argument('--code', action='store_const', const='code', dest='kind',
+                      help='只检索代码块')
+    kinds.add_argument('--sections', action='store_const', const='section', dest='kind',
+                      help='只检索章节正文')
+    parser.add_argument('--rebuild', action='store_true',
+                       help='忽略已有索引，完整重建')
+    parser.add_argument('--no-snippet', action='store_true',
+                       help='不显示命中的代码行')
+    parser.add_argument('--json', action='store_true',
+                       help='以JSON格式输出结果')
+
+    args = parser.parse_args()
+
+    if not os.path.exists(args.file):
+        print(f"错误: 文件 {args.file} 不存在")
+        sys.exit(1)
+
+    started = time.perf_counter()
+    search_index, stats = open_search_index(args.file, rebuild=args.rebuild)
+    if stats is not None and not args.json:
+        print(f"📇 已更新索引: 复用 {stats[0]} 个文档，重新分词 {stats[1]} 个 "
+              f"({(time.perf_counter() - started) * 1000:.0f} ms)")
+    if not args.query:
+        if not args.json:
+            print(f"📊 {len(search_index.docs)} 个文档，{search_index.term_count} 个词，"
+                  f"索引 {os.path.getsize(search_index.path) / 1024:.0f} KB")
+        search_index.close()
+        return
+
+    query = ' '.join(args.query)
+    started = time.perf_counter()
+    with search_index:
+        hits = search_index.search(query, args.limit, args.kind)
+    elapsed = time.perf_counter() - started
+
+    if args.json:
+        print(json.dumps({'query': query, 'ms': round(elapsed * 1000, 3),
+                          'hits': [hit.to_dict() for hit in hits]}, ensure_ascii=False, indent=2))
+        return
+    print_hits(hits, query, elapsed, None if args.no_snippet else args.file)
+
+
+if __name__ == '__main__':
+    main()
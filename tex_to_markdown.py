@@ -10,6 +10,48 @@ import os
 import sys
 import argparse
 
+from tex_index import TexIndex
+
+# 清理时连同一个参数一起移除的LaTeX命令
+KNOWN_LATEX_COMMANDS = [
+    'textbf', 'textit', 'texttt', 'emph', 'underline',
+    'large', 'Large', 'LARGE', 'huge', 'Huge',
+    'small', 'footnotesize', 'scriptsize', 'tiny',
+    'centering', 'raggedright', 'raggedleft',
+    'vspace', 'hspace', 'vfill', 'hfill',
+    'label', 'ref', 'cite', 'footnote',
+    'maketitle', 'tableofcontents',
+    'newpage', 'clearpage', 'pagebreak',
+    'noindent', 'indent', 'pagestyle',
+]
+
+# 清理阶段的词法规则，一次扫描识别分隔注释块、环境标记、命令和反斜杠残留
+ARTIFACT_PATTERN = re.compile(r'''
+    (?P<banner>%=+[^=]*=+%)
+  | (?P<environment>\\(?:begin|end)\{[^}]+\})
+  | (?P<command>\\[a-zA-Z]+)
+  | (?P<linebreak>\\\\)
+  | (?P<control_space>\\\s)
+  | (?P<backslash>\\$)
+''', re.VERBOSE)
+ARGUMENT_PATTERN = re.compile(r'\{[^}]*\}|\[[^\]]*\]')
+
+PLACEHOLDER_PATTERN = re.compile(r'__PROTECTED_CODE_BLOCK_(\d+)__')
+
+# 导出代码块时统一模板参数间距的名字
+TEMPLATE_CONTAINERS = {
+    'vector', 'array', 'pair', 'map', 'set', 'queue', 'stack', 'priority_queue',
+    'deque', 'list', 'forward_list', 'bitset', 'multimap', 'multiset',
+    'unordered_map', 'unordered_set', 'unordered_multimap', 'unordered_multiset',
+    'tuple', 'greater', 'less', 'template', 'function', 'numeric_limits',
+}
+
+# 容器名 < 参数 >，参数中允许一层嵌套的 <...>
+TEMPLATE_SPACING_PATTERN = re.compile(
+    r'\b(' + '|'.join(sorted(TEMPLATE_CONTAINERS, key=len, reverse=True)) + r')'
+    r'\s*<\s*((?:[^<>;\n]|<[^<>;\n]*>)*?)\s*>')
+TERNARY_PATTERN = re.compile(r'(\w+|\)|])\s*\?\s*([^:]+?)\s*:\s*([^;]+)')
+
 class LaTeXToMarkdownConverter:
     def __init__(self):
         self.conversion_rules = [
@@ -41,14 +83,30 @@ class LaTeXToMarkdownConverter:
             # 清理多余空行
             (r'\n\n\n+', '\n\n'),
         ]
+        
+        # 清理阶段按记号类型分派的处理函数，对应 ARTIFACT_PATTERN 中的分组
+        self.artifact_handlers = {
+            'banner': self.drop_artifact,
+            'environment': self.drop_artifact,
+            'command': self.handle_command,
+            'linebreak': self.drop_artifact,
+            'control_space': self.replace_control_space,
+            'backslash': self.drop_artifact,
+        }
+        
+        # 需要移除的命令 -> 跳过其参数的函数
+        self.command_handlers = {cmd: self.skip_argument for cmd in KNOWN_LATEX_COMMANDS}
+        self.command_handlers['setcounter'] = self.skip_two_arguments
     
     def convert_minted_blocks(self, content):
         """转换minted代码块为markdown代码块，保护代码块不被后续处理影响"""
         self.protected_blocks = []
         
-        def replace_minted(match):
-            language = match.group(1)
-            code_content = match.group(2)
+        index = TexIndex.from_text(content)
+
+        def replace_minted(block):
+            language = block.language
+            code_content = index.block_code(block)
             
             # 清理代码内容但保持原有的花括号
             code_lines = code_content.split('\n')
@@ -69,63 +127,49 @@ class LaTeXToMarkdownConverter:
             self.protected_blocks.append(markdown_block)
             return placeholder
         
-        # 匹配minted代码块
-        pattern = r'\\begin\{minted\}\{([^}]+)\}\n(.*?)\n\\end\{minted\}'
-        result = re.sub(pattern, replace_minted, content, flags=re.DOTALL)
-        
-        return result
+        # 代码块位置来自 tex_index 的单遍扫描
+        return index.replace_blocks(replace_minted)
     
     def restore_protected_blocks(self, content):
-        """恢复被保护的代码块并修复C++模板语法格式"""
-        if hasattr(self, 'protected_blocks'):
-            for i, block in enumerate(self.protected_blocks):
-                # 修复C++模板语法中的空格问题
-                block = self.fix_cpp_template_spacing(block)
-                placeholder = f'__PROTECTED_CODE_BLOCK_{i}__'
-                content = content.replace(placeholder, block)
-        return content
+        """恢复被保护的代码块并修复C++模板语法格式
+
+        一次扫描找出所有占位符的位置，按位置把正文片段和代码块拼接为结果
+        """
+        if not getattr(self, 'protected_blocks', None):
+            return content
+        
+        pieces = []
+        pos = 0
+        for match in PLACEHOLDER_PATTERN.finditer(content):
+            index = int(match.group(1))
+            if index >= len(self.protected_blocks):
+                continue
+            pieces.append(content[pos:match.start()])
+            # 修复C++模板语法中的空格问题
+            pieces.append(self.fix_cpp_template_spacing(self.protected_blocks[index]))
+            pos = match.end()
+        pieces.append(content[pos:])
+        return ''.join(pieces)
     
     def fix_cpp_template_spacing(self, content):
-        """修复C++模板语法中的空格问题"""
-        # 修复模板参数中的多余空格
-        # vector < T> -> vector<T>
-        content = re.sub(r'vector\s*<\s*([^>]+?)\s*>', r'vector<\1>', content)
-        # array < type, size > -> array<type, size>
-        content = re.sub(r'array\s*<\s*([^,>]+?)\s*,\s*([^>]+?)\s*>', r'array<\1, \2>', content)
-        # pair < T1, T2 > -> pair<T1, T2>
-        content = re.sub(r'pair\s*<\s*([^,>]+?)\s*,\s*([^>]+?)\s*>', r'pair<\1, \2>', content)
-        # map < T1, T2 > -> map<T1, T2>
-        content = re.sub(r'map\s*<\s*([^,>]+?)\s*,\s*([^>]+?)\s*>', r'map<\1, \2>', content)
-        # set < T > -> set<T>
-        content = re.sub(r'set\s*<\s*([^>]+?)\s*>', r'set<\1>', content)
-        # queue < T > -> queue<T>
-        content = re.sub(r'queue\s*<\s*([^>]+?)\s*>', r'queue<\1>', content)
-        # stack < T > -> stack<T>
-        content = re.sub(r'stack\s*<\s*([^>]+?)\s*>', r'stack<\1>', content)
-        # priority_queue < T > -> priority_queue<T>
-        content = re.sub(r'priority_queue\s*<\s*([^>]+?)\s*>', r'priority_queue<\1>', content)
-        # 处理更复杂的模板，如 priority_queue < T, vector<T>, greater<T> >
-        content = re.sub(r'priority_queue\s*<\s*([^,>]+?)\s*,\s*([^,>]+?)\s*,\s*([^>]+?)\s*>', r'priority_queue<\1, \2, \3>', content)
-        # 通用模板修复: template < typename T > -> template<typename T>
-        content = re.sub(r'template\s*<\s*([^>]+?)\s*>', r'template<\1>', content)
-        # 函数模板: function < return_type(args) > -> function<return_type(args)>
-        content = re.sub(r'function\s*<\s*([^>]+?)\s*>', r'function<\1>', content)
-        # numeric_limits < T > -> numeric_limits<T>
-        content = re.sub(r'numeric_limits\s*<\s*([^>]+?)\s*>', r'numeric_limits<\1>', content)
-        # 其他常见的STL容器
-        content = re.sub(r'unordered_map\s*<\s*([^,>]+?)\s*,\s*([^>]+?)\s*>', r'unordered_map<\1, \2>', content)
-        content = re.sub(r'unordered_set\s*<\s*([^>]+?)\s*>', r'unordered_set<\1>', content)
-        content = re.sub(r'multimap\s*<\s*([^,>]+?)\s*,\s*([^>]+?)\s*>', r'multimap<\1, \2>', content)
-        content = re.sub(r'multiset\s*<\s*([^>]+?)\s*>', r'multiset<\1>', content)
-        content = re.sub(r'deque\s*<\s*([^>]+?)\s*>', r'deque<\1>', content)
-        content = re.sub(r'list\s*<\s*([^>]+?)\s*>', r'list<\1>', content)
-        content = re.sub(r'forward_list\s*<\s*([^>]+?)\s*>', r'forward_list<\1>', content)
+        """修复C++模板语法中的空格问题
+
+        TEMPLATE_CONTAINERS 中的名字后的模板参数统一为 name<T1, T2> 形式
+        (vector < T > -> vector<T>, map < array<int, 2>, int > -> map<array<int, 2>, int>)，
+        嵌套的参数列表递归处理
+        """
+        content = TEMPLATE_SPACING_PATTERN.sub(self.fix_template_arguments, content)
         
         # 修复三目运算符的格式: expr?val1:val2 -> expr ? val1 : val2
-        content = re.sub(r'(\w+|\)|])\s*\?\s*([^:]+?)\s*:\s*([^;]+)', r'\1 ? \2 : \3', content)
+        content = TERNARY_PATTERN.sub(r'\1 ? \2 : \3', content)
         
         return content
     
+    def fix_template_arguments(self, match):
+        arguments = TEMPLATE_SPACING_PATTERN.sub(self.fix_template_arguments, match.group(2))
+        arguments = re.sub(r'\s*,\s*', ', ', arguments)
+        return f'{match.group(1)}<{arguments}>'
+    
     def process_chinese_content(self, content):
         """处理中文内容，保持格式"""
         # 处理算法说明文本
@@ -138,58 +182,55 @@ class LaTeXToMarkdownConverter:
         return content
     
     def clean_latex_artifacts(self, content):
-        """清理LaTeX残留标记，但保护代码块"""
-        # 移除LaTeX配置块
-        content = re.sub(r'%=+[^=]*=+%', '', content)
-        
-        # 只移除特定的LaTeX命令，而不是所有带花括号的内容
-        known_latex_commands = [
-            'textbf', 'textit', 'texttt', 'emph', 'underline',
-            'large', 'Large', 'LARGE', 'huge', 'Huge',
-            'small', 'footnotesize', 'scriptsize', 'tiny',
-            'centering', 'raggedright', 'raggedleft',
-            'vspace', 'hspace', 'vfill', 'hfill',
-            'label', 'ref', 'cite', 'footnote',
-            'maketitle', 'tableofcontents',
-            'newpage', 'clearpage', 'pagebreak',
-            'noindent', 'indent'
-        ]
-        
-        # 移除特定的LaTeX命令
-        for cmd in known_latex_commands:
-            content = re.sub(rf'\\{cmd}\{{[^}}]*\}}', '', content)
-            content = re.sub(rf'\\{cmd}\[[^\]]*\]', '', content)
-            content = re.sub(rf'\\{cmd}', '', content)
-        
-        # 移除LaTeX环境标记（但不移除环境内容）
-        content = re.sub(r'\\begin\{[^}]+\}', '', content)
-        content = re.sub(r'\\end\{[^}]+\}', '', content)
-        
-        # 移除单独成行的花括号
-        content = re.sub(r'^\s*\{\s*$', '', content, flags=re.MULTILINE)
-        content = re.sub(r'^\s*\}\s*$', '', content, flags=re.MULTILINE)
-        
-        # 清理多余的反斜杠（但不影响代码中的转义字符）
-        content = re.sub(r'\\\\', '', content)
-        # 只移除孤立的反斜杠，不移除可能在代码中的反斜杠
-        content = re.sub(r'\\\s', ' ', content)
-        content = re.sub(r'\\$', '', content, flags=re.MULTILINE)
-        
-        # 移除页面控制命令残留
-        content = re.sub(r'newpage', '', content)
-        content = re.sub(r'clearpage', '', content)
-        content = re.sub(r'pagestyle\{[^}]+\}', '', content)
-        content = re.sub(r'setcounter\{[^}]+\}\{[^}]+\}', '', content)
+        """清理LaTeX残留标记，但保护代码块
+
+        对全文只做一次词法扫描，按记号类型分派到 artifact_handlers，
+        结果写入同一个输出缓冲区；随后逐行清理空白、孤立花括号和注释行
+        """
+        pieces = []
+        pos = 0
+        while True:
+            match = ARTIFACT_PATTERN.search(content, pos)
+            if match is None:
+                break
+            pieces.append(content[pos:match.start()])
+            text, pos = self.artifact_handlers[match.lastgroup](content, match)
+            pieces.append(text)
+        pieces.append(content[pos:])
         
-        # 清理行首行尾空格
-        lines = content.split('\n')
-        cleaned_lines = [line.strip() for line in lines]
-        content = '\n'.join(cleaned_lines)
+        # 清理行首行尾空格，移除单独成行的花括号和注释行
+        lines = []
+        for line in ''.join(pieces).split('\n'):
+            line = line.strip()
+            if line in ('{', '}') or line.startswith('%'):
+                line = ''
+            lines.append(line)
         
         # 清理多余空行
-        content = re.sub(r'\n{3,}', '\n\n', content)
-        
-        return content
+        return re.sub(r'\n{3,}', '\n\n', '\n'.join(lines))
+    
+    def drop_artifact(self, content, match):
+        """整个记号直接移除"""
+        return '', match.end()
+    
+    def replace_control_space(self, content, match):
+        """孤立的反斜杠加空白 (含行尾的反斜杠换行) 替换为一个空格"""
+        return ' ', match.end()
+    
+    def handle_command(self, content, match):
+        """已知命令连同其参数一起移除，其余命令原样保留"""
+        handler = self.command_handlers.get(match.group()[1:])
+        if handler is None:
+            return match.group(), match.end()
+        return '', handler(content, match.end())
+    
+    def skip_argument(self, content, pos):
+        """跳过紧跟的一个 {...} 或 [...] 参数 (到第一个闭括号为止)，返回参数之后的位置"""
+        match = ARGUMENT_PATTERN.match(content, pos)
+        return match.end() if match else pos
+    
+    def skip_two_arguments(self, content, pos):
+        return self.skip_argument(content, self.skip_argument(content, pos))
     
     def add_markdown_frontmatter(self, content):
         """添加Markdown前言"""
@@ -240,21 +281,15 @@ class LaTeXToMarkdownConverter:
         print("🈯 处理中文内容...")
         content = self.process_chinese_content(content)
         
-        # 5. 清理LaTeX残留
+        # 5. 清理LaTeX残留 (同时移除注释行和多余空行)
         print("🧹 清理LaTeX残留...")
         content = self.clean_latex_artifacts(content)
         
-        # 6. 移除注释行
-        content = re.sub(r'^%.*$', '', content, flags=re.MULTILINE)
-        
-        # 7. 清理多余空行
-        content = re.sub(r'\n{3,}', '\n\n', content)
-        
-        # 8. 添加Markdown前言
+        # 6. 添加Markdown前言
         print("📄 添加Markdown格式...")
         content = self.add_markdown_frontmatter(content)
         
-        # 9. 恢复被保护的代码块
+        # 7. 恢复被保护的代码块
         print("🔒 恢复受保护的代码块...")
         content = self.restore_protected_blocks(content)
         
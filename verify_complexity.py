@@ -0,0 +1,393 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+时间复杂度实测验证
+用 bench/ 中的基准测试驱动在按倍数增长的规模上计时，拟合 n、n log n、n log² n、n√n、n²
+几种模型，与模板中 `时间复杂度：` 标注推出的总复杂度比较，报告增长趋势不一致的模板；
+驱动并行编译、逐个计时，多轮测量结论一致的结果按代码块内容缓存
+"""
+
+import os
+import re
+import sys
+import json
+import math
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+from format_cache import FormatCache, rules_version
+from tex_preview import resolve_section
+from bench_templates import (TemplateBenchmark, BLOCK_PATTERN, DEFAULT_CACHE_DIR, DEFAULT_SEED, compiler_version,
+                             find_drivers, run_driver)
+
+# 模型名 -> (n 的指数, log n 的指数)
+MODELS = {
+    'n': (1, 0),
+    'n log n': (1, 1),
+    'n log² n': (1, 2),
+    'n√n': (1.5, 0),
+    'n²': (2, 0),
+}
+DEFAULT_FACTOR = 2
+DEFAULT_REPEAT = 5
+# 独立测量的轮数，各轮结论不一致的结果视为不稳定，不写入缓存
+DEFAULT_ROUNDS = 2
+# 实测增长指数超出期望模型的容差：常见规模下 n、n log n、n log² n 的局部指数只差约 0.1，
+# n√n 比 n log n 大约 0.4，因此只有相差一个量级的标注错误才会被报告
+DEFAULT_TOLERANCE = 0.25
+# 95% 置信区间的 t 分位数，按自由度
+T_QUANTILES = {1: 12.71, 2: 4.30, 3: 3.18, 4: 2.78, 5: 2.57, 6: 2.45, 7: 2.36, 8: 2.31, 9: 2.26, 10: 2.23}
+
+COMPLEXITY_OVERRIDE_PATTERN = re.compile(r'^[ \t]*//[ \t]*@complexity[ \t]+(.+?)[ \t]*$', re.MULTILINE)
+MATH_PATTERN = re.compile(r'\$([^$]*)\$')
+BIG_O_PATTERN = re.compile(r'^\s*O\s*\((.*)\)\s*$')
+# 复杂度表达式中的因子，匹配顺序即优先级
+FACTOR_PATTERNS = [
+    (re.compile(r'\\?log\s*\^\s*\{?(\d)\}?\s*\{?[a-zA-Z]\}?'), lambda m: (0, int(m.group(1)))),
+    (re.compile(r'\\?log\s*²\s*[a-zA-Z]'), lambda m: (0, 2)),
+    (re.compile(r'\\?log\s*\{?[a-zA-Z]\}?'), lambda m: (0, 1)),
+    (re.compile(r'(?:\\sqrt\s*\{\s*[a-zA-Z]\s*\}|√\s*[a-zA-Z])'), lambda m: (0.5, 0)),
+    (re.compile(r'\|[^|]+\|'), lambda m: (1, 0)),
+    (re.compile(r'[a-zA-Z]\s*(?:\^\s*\{?(\d)\}?|(²))'), lambda m: (int(m.group(1) or 2), 0)),
+    (re.compile(r'[a-zA-Z](?:_\{?\w\}?)?'), lambda m: (1, 0)),
+    (re.compile(r'\d+'), lambda m: (0, 0)),
+    (re.compile(r'\\sum|\\times|\\cdot|\*|\\[,;!]|\s+'), lambda m: (0, 0)),
+]
+
+
+def parse_term(expr):
+    """'n \\log^2 n' -> (1, 2)；和式取增长最快的一项，无法识别时返回 None"""
+    expr = expr.replace('\\left', '').replace('\\right', '')
+    if expr.count('(') != expr.count(')'):
+        return None
+    best = None
+    for part in re.split(r'\+', expr.replace('(', '').replace(')', '')):
+        a = b = 0
+        pos = 0
+        part = part.strip()
+        if not part:
+            return None
+        while pos < len(part):
+            for pattern, order in FACTOR_PATTERNS:
+                match = pattern.match(part, pos)
+                if match and match.end() > pos:
+                    da, db = order(match)
+                    a, b = a + da, b + db
+                    pos = match.end()
+                    break
+            else:
+                return None
+        best = max(best, (a, b)) if best is not None else (a, b)
+    return best
+
+
+def stated_terms(text):
+    """标注文字中的每个 $O(...)$ -> [(前面的说明, (n 指数, log 指数))]"""
+    terms = []
+    last = 0
+    for match in MATH_PATTERN.finditer(text):
+        big_o = BIG_O_PATTERN.match(match.group(1))
+        label = re.split(r'[，,；;。]', text[last:match.start()])[-1].strip()
+        last = match.end()
+        if big_o:
+            terms.append((label, parse_term(big_o.group(1))))
+    return terms
+
+
+def expected_order(text):
+    """驱动对规模 n 的数据做 n 次操作：单次 O(1)/O(log n) 的操作乘以 n，其余项视为总代价"""
+    orders = []
+    for _, order in stated_terms(text):
+        if order is None:
+            return None
+        a, b = order
+        orders.append((a + 1, b) if a == 0 else (a, b))
+    return max(orders) if orders else None
+
+
+def model_name(order):
+    for name, model in MODELS.items():
+        if model == order:
+            return name
+    return None
+
+
+def geometric_sizes(low, high, factor=DEFAULT_FACTOR):
+    sizes = []
+    size = low
+    while size <= high:
+        sizes.append(int(size))
+        size *= factor
+    return sizes
+
+
+def fit_models(timings):
+    """在对数空间拟合 t = c·f(n)，返回 {模型名: 残差均方根}"""
+    residuals = {}
+    points = [(int(size), seconds) for size, seconds in timings.items() if seconds > 0]
+    for name, (a, b) in MODELS.items():
+        logs = [math.log(seconds) - (a * math.log(size) + b * math.log(math.log(size)))
+                for size, seconds in points]
+        mean = sum(logs) / len(logs)
+        residuals[name] = math.sqrt(sum((value - mean) ** 2 for value in logs) / len(logs))
+    return residuals
+
+
+def growth_exponent(timings):
+    """log t 对 log n 的斜率"""
+    points = [(math.log(int(size)), math.log(seconds)) for size, seconds in timings.items() if seconds > 0]
+    mean_x = sum(x for x, _ in points) / len(points)
+    mean_y = sum(y for _, y in points) / len(points)
+    denominator = sum((x - mean_x) ** 2 for x, _ in points)
+    return sum((x - mean_x) * (y - mean_y) for x, y in points) / denominator if denominator else 0.0
+
+
+def excess_exponent(timings, model):
+    """log(t / f(n)) 对 log n 回归，返回 (斜率, 95% 置信区间半宽)；与模型一致时斜率接近 0"""
+    a, b = MODELS[model]
+    points = [(math.log(int(size)), math.log(seconds) - a * math.log(int(size)) - b * math.log(math.log(int(size))))
+              for size, seconds in timings.items() if seconds > 0]
+    if len(points) < 3:
+        return 0.0, math.inf
+    mean_x = sum(x for x, _ in points) / len(points)
+    mean_y = sum(y for _, y in points) / len(points)
+    sxx = sum((x - mean_x) ** 2 for x, _ in points)
+    slope = sum((x - mean_x) * (y - mean_y) for x, y in points) / sxx
+    residual = sum((y - mean_y - slope * (x - mean_x)) ** 2 for x, y in points)
+    df = len(points) - 2
+    return slope, T_QUANTILES.get(df, 1.96) * math.sqrt(residual / df / sxx)
+
+
+def merge_rounds(rounds):
+    """多轮测量中同一规模取最小值"""
+    return {size: min(timings[size] for timings in rounds) for size in rounds[0]} if rounds else {}
+
+
+class ComplexityResult:
+    def __init__(self, name, stated, source, expected, rounds, cached=False):
+        self.name = name
+        # 标注原文与来源 (.tex 的章节或驱动中的 @complexity)
+        self.stated = stated
+        self.source = source
+        self.expected = expected
+        # 每轮测量的 {规模: 秒}
+        self.rounds = rounds
+        self.timings = merge_rounds(rounds)
+        self.cached = cached
+        self.residuals = fit_models(self.timings) if len(self.timings) >= 3 else {}
+        self.best = min(self.residuals, key=self.residuals.get) if self.residuals else None
+        self.exponent = growth_exponent(self.timings) if len(self.timings) >= 2 else 0.0
+        self.excess, self.margin = excess_exponent(self.timings, expected) if expected else (0.0, math.inf)
+
+    def verdict(self, timings, tolerance=DEFAULT_TOLERANCE):
+        """超出期望模型的增长指数，其置信区间整体落在 ±tolerance 之外才算不一致；
+        点估计超出 ±tolerance，或最优模型的多项式次数与期望不同时为疑似不一致"""
+        slope, margin = excess_exponent(timings, self.expected)
+        if abs(slope) - margin > tolerance:
+            return 'mismatch'
+        residuals = fit_models(timings)
+        best = min(residuals, key=residuals.get)
+        # n、n log n、n log² n 在常见规模下分不开，只比较多项式部分
+        if abs(slope) > tolerance or MODELS[best][0] != MODELS[self.expected][0]:
+            return 'suspect'
+        return 'ok'
+
+    def status(self, tolerance=DEFAULT_TOLERANCE):
+        if self.best is None:
+            return 'insufficient'
+        if self.stated is None:
+            return 'unannotated'
+        if self.expected is None:
+            return 'unsupported'
+        verdicts = {self.verdict(timings, tolerance) for timings in self.rounds}
+        if 'ok' in verdicts and 'mismatch' in verdicts:
+            return 'unstable'
+        return self.verdict(self.timings, tolerance)
+
+    def stable(self, tolerance=DEFAULT_TOLERANCE):
+        """各轮测量的结论是否一致；无法与标注比较时比较各轮的最优模型"""
+        if self.expected is None or self.stated is None:
+            fits = [fit_models(timings) for timings in self.rounds if len(timings) >= 3]
+            return len({min(residuals, key=residuals.get) for residuals in fits}) <= 1
+        return self.status(tolerance) != 'unstable'
+
+    def to_dict(self, tolerance=DEFAULT_TOLERANCE):
+        return {'name': self.name, 'stated': self.stated, 'source': self.source, 'expected': self.expected,
+                'best': self.best, 'exponent': self.exponent, 'excess': self.excess,
+                'margin': None if math.isinf(self.margin) else self.margin, 'residuals': self.residuals,
+                'timings': self.timings, 'rounds': self.rounds, 'status': self.status(tolerance),
+                'cached': self.cached}
+
+
+class ComplexityVerifier:
+    def __init__(self, tex_file, bench_dir='bench', cache_dir=DEFAULT_CACHE_DIR, cxx='g++', seed=DEFAULT_SEED,
+                 repeat=DEFAULT_REPEAT, factor=DEFAULT_FACTOR, use_cache=True, rounds=DEFAULT_ROUNDS):
+        self.bench = TemplateBenchmark(tex_file, bench_dir, cache_dir, cxx, seed, warmup=1, repeat=repeat)
+        self.factor = factor
+        self.rounds = rounds
+        self.salt = json.dumps([compiler_version(cxx), seed, repeat, rounds])
+        self.cache = FormatCache(os.path.join(cache_dir, 'complexity.json'), rules_version(__file__)) \
+            if use_cache else None
+
+    def stated_complexity(self, driver):
+        """驱动中的 @complexity 优先，否则取第一个引用章节的时间复杂度标注"""
+        match = COMPLEXITY_OVERRIDE_PATTERN.search(driver.text)
+        if match:
+            text = match.group(1)
+            big_o = BIG_O_PATTERN.match(text)
+            return text, f'{driver.name}.cpp', parse_term(big_o.group(1) if big_o else text)
+        match = BLOCK_PATTERN.search(driver.text)
+        section = resolve_section(self.bench.index, match.group(1).strip())
+        for annotation in section.annotations:
+            if annotation['kind'] == 'time':
+                return annotation['text'], f"{'/'.join(section.path)} (第{annotation['line']}行)", \
+                    expected_order(annotation['text'])
+        return None, None, None
+
+    def cache_key(self, driver, sizes=None):
+        """返回 (规模, 展开后的驱动源码, 缓存盐)"""
+        sizes = sizes or geometric_sizes(min(driver.sizes), max(driver.sizes), self.factor)
+        source, _ = driver.expand(self.bench.index, self.bench.header)
+        return sizes, source, self.salt + json.dumps(sizes)
+
+    def cached_rounds(self, driver, sizes=None):
+        if self.cache is None:
+            return None
+        _, source, salt = self.cache_key(driver, sizes)
+        cached = self.cache.get(source, salt)
+        return json.loads(cached) if cached is not None else None
+
+    def measure(self, driver, sizes):
+        """每轮依次测量全部规模，各规模取 repeat 次计时的最小值 (噪声只会让计时变长)"""
+        binary, _, _ = self.bench.prepare(driver)
+        rounds = []
+        for _ in range(self.rounds):
+            timings = {}
+            for size in sizes:
+                times = run_driver(binary, size, self.bench.seed, self.bench.warmup, self.bench.repeat)
+                timings[str(size)] = min(times) / 1e9
+            rounds.append(timings)
+        return rounds
+
+    def verify(self, driver, sizes=None, tolerance=DEFAULT_TOLERANCE):
+        stated, source, order = self.stated_complexity(driver)
+        expected = model_name(order) if order is not None else None
+        rounds = self.cached_rounds(driver, sizes)
+        if rounds is not None:
+            return ComplexityResult(driver.name, stated, source, expected, rounds, True)
+
+        sizes, code, salt = self.cache_key(driver, sizes)
+        result = ComplexityResult(driver.name, stated, source, expected, self.measure(driver, sizes))
+        # 各轮结论不一致的结果不缓存，下次重新测量
+        if self.cache is not None and result.stable(tolerance):
+            self.cache.put(code, json.dumps(result.rounds), salt)
+        return result
+
+    def verify_all(self, drivers, jobs=1, sizes=None, tolerance=DEFAULT_TOLERANCE):
+        """并行编译需要测量的驱动，再逐个计时 (同时计时会互相干扰)"""
+        try:
+            pending = [driver for driver in drivers if self.cached_rounds(driver, sizes) is None]
+            with ThreadPoolExecutor(max_workers=jobs) as executor:
+                list(executor.map(self.bench.prepare, pending))
+            return [self.verify(driver, sizes, tolerance) for driver in drivers]
+        finally:
+            if self.cache is not None:
+                self.cache.save()
+
+
+STATUS_LABELS = {
+    'ok': '✅ 一致',
+    'mismatch': '❌ 不一致',
+    'suspect': '⚠️  疑似不一致',
+    'unstable': '⚠️  不稳定',
+    'unannotated': 'ℹ️  无标注',
+    'unsupported': 'ℹ️  模型外',
+    'insufficient': '⚠️  点数不足',
+}
+
+
+def print_report(results, tolerance, verbose=False):
+    for result in results:
+        status = result.status(tolerance)
+        cached = ' (缓存)' if result.cached else ''
+        excess = f"，超出期望 {result.excess:+.2f}±{result.margin:.2f}" if not math.isinf(result.margin) else ''
+        # 一致但最优模型不同时 (只差对数因子)，说明两者在测量规模下无法区分
+        same = '，与期望在测量规模下无法区分' if status == 'ok' and result.best != result.expected else ''
+        print(f"{STATUS_LABELS[status]} {result.name}{cached}: 期望 {result.expected or '-'}，"
+              f"拟合 {result.best or '-'} (指数 {result.exponent:.2f}{excess}{same})")
+        if result.stated is not None:
+            print(f"    标注: {result.stated}  [{result.source}]")
+        if verbose or status in ('mismatch', 'suspect', 'unstable'):
+            for number, timings in enumerate(result.rounds, 1):
+                sizes = ', '.join(f'{size}: {seconds * 1000:.3f}ms' for size, seconds in timings.items())
+                print(f"    第{number}轮: {sizes}")
+            fits = ', '.join(f'{name}: {value:.3f}' for name, value in result.residuals.items())
+            print(f"    残差: {fits}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='时间复杂度实测验证')
+    parser.add_argument('names', nargs='*',
+                       help='只验证名称包含这些字符串的驱动 (默认: 全部)')
+    parser.add_argument('--file', default='Algorithm-template.tex',
+                       help='LaTeX文件 (默认: Algorithm-template.tex)')
+    parser.add_argument('--sizes', help='代替按倍数增长的规模，逗号分隔')
+    parser.add_argument('--factor', type=float, default=DEFAULT_FACTOR,
+                       help=f'规模增长倍数，从驱动 @sizes 的最小值增长到最大值 (默认: {DEFAULT_FACTOR})')
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT,
+                       help=f'每个规模每轮的计时次数，取最小值 (默认: {DEFAULT_REPEAT})')
+    parser.add_argument('--rounds', type=int, default=DEFAULT_ROUNDS,
+                       help=f'独立测量的轮数，结论不一致时报告为不稳定且不缓存 (默认: {DEFAULT_ROUNDS})')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                       help=f'实测增长指数超出期望模型的容差 (默认: {DEFAULT_TOLERANCE})')
+    parser.add_argument('-j', '--jobs', type=int, default=0,
+                       help='并行编译驱动的进程数，0 表示使用全部CPU核心；计时总是逐个进行 (默认: 0)')
+    parser.add_argument('--cxx', default=os.environ.get('CXX', 'g++'),
+                       help='C++编译器 (默认: g++)')
+    parser.add_argument('--no-cache', action='store_true',
+                       help='忽略缓存，重新计时')
+    parser.add_argument('-v', '--verbose', action='store_true',
+                       help='显示每个驱动的计时和各模型残差')
+    parser.add_argument('--json', help='把结果写入JSON文件')
+
+    args = parser.parse_args()
+
+    if not os.path.exists(args.file):
+        print(f"错误: 文件 {args.file} 不存在")
+        sys.exit(1)
+
+    verifier = ComplexityVerifier(args.file, cxx=args.cxx, repeat=args.repeat, factor=args.factor,
+                                  use_cache=not args.no_cache, rounds=args.rounds)
+    drivers = find_drivers(names=args.names)
+    sizes = [int(size) for size in args.sizes.split(',')] if args.sizes else None
+    jobs = args.jobs if args.jobs > 0 else (os.cpu_count() or 1)
+
+    print(f"📈 验证 {len(drivers)} 个驱动的时间复杂度 ({jobs} 并行编译，{args.rounds} 轮计时)...")
+    try:
+        results = verifier.verify_all(drivers, jobs, sizes, args.tolerance)
+    except (RuntimeError, ValueError) as e:
+        print(f"错误: {e}")
+        sys.exit(1)
+
+    print_report(results, args.tolerance, args.verbose)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump([result.to_dict(args.tolerance) for result in results], f, ensure_ascii=False, indent=2)
+
+    unstable = [result for result in results if result.status(args.tolerance) == 'unstable']
+    if unstable:
+        print(f"⚠️  {len(unstable)} 个模板各轮测量的结论不一致，未写入缓存，可增大 --repeat/--rounds 后重试")
+    suspects = [result for result in results if result.status(args.tolerance) == 'suspect']
+    if suspects:
+        print(f"⚠️  {len(suspects)} 个模板的实测增长可能与标注不一致 (点估计超出 ±{args.tolerance} 或最优模型不同)，"
+              f"可增大规模或 --repeat 后确认")
+    mismatches = [result for result in results if result.status(args.tolerance) == 'mismatch']
+    if mismatches:
+        print(f"❌ {len(mismatches)} 个模板的实测增长与标注不一致")
+        sys.exit(1)
+    if not suspects:
+        print("✅ 未发现与标注不一致的模板")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,397 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+监视 .tex 文件，保存后只运行受影响的步骤
+轮询文件改动并做防抖，按 tex_index 比较出改动的章节和代码块：
+有新的C++代码块时格式化，正文改动时重新生成 Markdown，最后增量编译；
+编译过程中再次保存会取消当前编译，状态 (队列、各步骤耗时) 写入 JSON 状态文件
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import argparse
+import threading
+import contextlib
+
+import cpp_lexer
+import format_tex_cpp_v2
+from tex_index import TexIndex, write_if_changed
+from format_cache import FormatCache, default_cache_path, rules_version
+from tex_to_markdown import LaTeXToMarkdownConverter
+from build_tex import DEFAULT_ENGINE, DEFAULT_STATE_DIR, file_hash, prepare_builder
+
+STAGES = ('format', 'markdown', 'build')
+DEFAULT_INTERVAL = 0.5
+DEFAULT_DEBOUNCE = 1.0
+# 状态文件中保留的最近任务数
+HISTORY_SIZE = 20
+# 由编译和预渲染生成、不需要监视的文件
+IGNORED_PREFIXES = ('_minted', '_prerender')
+IGNORED_SUFFIXES = ('-prerendered.tex',)
+
+
+def section_digests(index):
+    """每个标题节点自身内容 (不含子节点) 的哈希，键为标题路径"""
+    data = index.data()
+    digests = {}
+    for node in index.root.walk():
+        end = node.children[0].start if node.children else node.end
+        digests['/'.join(node.path)] = hashlib.sha1(data[node.start:end]).hexdigest()
+    return digests
+
+
+def cpp_block_hashes(index):
+    return {block.hash for block in index.blocks_by_language(*format_tex_cpp_v2.CPP_LANGUAGES)}
+
+
+class ChangeSet:
+    """两次索引之间的差异"""
+
+    def __init__(self, old, new, files=()):
+        self.files = sorted(files)
+        if old is None:
+            self.sections = ['/'.join(node.path) for node in new.sections()]
+            self.blocks = sorted(cpp_block_hashes(new))
+            return
+        old_digests, new_digests = section_digests(old), section_digests(new)
+        self.sections = [path for path in new_digests if old_digests.get(path) != new_digests[path]]
+        self.sections += [path for path in old_digests if path not in new_digests]
+        # 只有新出现的代码块需要格式化
+        self.blocks = sorted(cpp_block_hashes(new) - cpp_block_hashes(old))
+
+    def describe(self):
+        names = [path.replace('/', ' > ') if path else '导言区' for path in self.sections]
+        text = ', '.join(names[:3]) + (f' 等{len(names)}处' if len(names) > 3 else '')
+        if self.blocks:
+            text += f' ({len(self.blocks)} 个新代码块)'
+        return text or '其他输入文件'
+
+    def to_dict(self):
+        return {'files': self.files, 'sections': self.sections, 'blocks': len(self.blocks)}
+
+
+class StageResult:
+    def __init__(self, name, status, seconds=0.0, detail=''):
+        # done / skipped / failed / cancelled
+        self.name = name
+        self.status = status
+        self.seconds = seconds
+        self.detail = detail
+
+    def to_dict(self):
+        return {'stage': self.name, 'status': self.status, 'seconds': self.seconds, 'detail': self.detail}
+
+
+class Job:
+    """一次保存 (防抖合并后) 触发的处理"""
+
+    def __init__(self, number, files):
+        self.number = number
+        self.files = sorted(files)
+        self.changes = None
+        self.stage = None
+        self.stages = []
+        self.status = 'queued'
+        self.started = time.time()
+        self.seconds = 0.0
+        self.cancelled = False
+        self.builder = None
+
+    def cancel(self):
+        self.cancelled = True
+        if self.builder is not None:
+            self.builder.cancel()
+
+    def to_dict(self):
+        return {
+            'job': self.number, 'status': self.status, 'stage': self.stage,
+            'started': self.started, 'seconds': self.seconds,
+            'changes': self.changes.to_dict() if self.changes else {'files': self.files},
+            'stages': [stage.to_dict() for stage in self.stages],
+        }
+
+
+class TexWatcher:
+    """轮询监视一个 .tex 文件及其 \\input 的文件"""
+
+    def __init__(self, tex_file, engine, stages=STAGES, markdown=None, interval=DEFAULT_INTERVAL,
+                 debounce=DEFAULT_DEBOUNCE, status_path=None, prerender=False, jobs=0):
+        self.tex_file = os.path.abspath(tex_file)
+        self.directory = os.path.dirname(self.tex_file)
+        stem = os.path.splitext(os.path.basename(self.tex_file))[0]
+        self.engine = engine
+        self.stages = [stage for stage in STAGES if stage in stages]
+        self.markdown = markdown or os.path.join(self.directory, f'{stem}.md')
+        self.interval = interval
+        self.debounce = debounce
+        self.status_path = status_path or os.path.join(self.directory, DEFAULT_STATE_DIR, f'{stem}-watch.json')
+        self.prerender = prerender
+        self.jobs = jobs
+
+        self.lock = threading.Lock()
+        # 路径 -> ((mtime_ns, size), 内容哈希)
+        self.known = {}
+        self.index = None
+        self.pending = set()
+        self.last_change = 0.0
+        self.current = None
+        self.worker = None
+        self.history = []
+        self.job_count = 0
+        self.watch_paths({self.tex_file})
+
+    def watch_paths(self, paths):
+        with self.lock:
+            for path in paths:
+                if path not in self.known:
+                    self.known[path] = (self.stat(path), file_hash(path))
+
+    def ignored(self, path):
+        relative = os.path.relpath(path, self.directory)
+        return relative.startswith(IGNORED_PREFIXES) or relative.endswith(IGNORED_SUFFIXES)
+
+    @staticmethod
+    def stat(path):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def poll(self):
+        """返回内容确实发生变化的文件 (只改了 mtime 的不算)"""
+        changed = []
+        with self.lock:
+            for path, (stat, digest) in self.known.items():
+                current = self.stat(path)
+                if current == stat:
+                    continue
+                current_digest = file_hash(path)
+                self.known[path] = (current, current_digest)
+                if current_digest != digest:
+                    changed.append(path)
+        return changed
+
+    def expect(self, path, data):
+        """记录本进程即将写入的字节，写入后轮询不会把它当作新的改动"""
+        with self.lock:
+            self.known[path] = (None, hashlib.sha256(data).hexdigest())
+
+    def step(self, now=None):
+        """一次轮询：记录改动、取消过时的编译、防抖结束后启动新任务"""
+        now = time.monotonic() if now is None else now
+        changed = self.poll()
+        if changed:
+            self.pending.update(changed)
+            self.last_change = now
+            current = self.current
+            if current is not None and not current.cancelled:
+                print(f"🛑 检测到新的保存，取消任务 #{current.number}")
+                current.cancel()
+
+        running = self.worker is not None and self.worker.is_alive()
+        if self.pending and not running and now - self.last_change >= self.debounce:
+            self.start(self.pending)
+            self.pending = set()
+        self.write_status()
+
+    def start(self, files):
+        self.job_count += 1
+        job = Job(self.job_count, files)
+        self.current = job
+        self.worker = threading.Thread(target=self.run_job, args=(job,), daemon=True)
+        self.worker.start()
+
+    def run_job(self, job):
+        started = time.perf_counter()
+        job.status = 'running'
+        try:
+            index = TexIndex.build(self.tex_file)
+            job.changes = ChangeSet(self.index, index, [os.path.relpath(path, self.directory) for path in job.files])
+            print(f"🔔 任务 #{job.number}: {job.changes.describe()}")
+
+            for name in self.stages:
+                if job.cancelled:
+                    break
+                job.stage = name
+                self.write_status()
+                stage_started = time.perf_counter()
+                status, detail = getattr(self, f'run_{name}')(job, index)
+                job.stages.append(StageResult(name, status, time.perf_counter() - stage_started, detail))
+                print(f"   {name}: {status} {detail} ({job.stages[-1].seconds:.2f}s)")
+                if status == 'failed':
+                    break
+                if name == 'format' and status == 'done':
+                    index = TexIndex.build(self.tex_file)
+
+            # 被取消的任务不更新基准索引，改动会并入下一次任务
+            if not job.cancelled:
+                self.index = index
+            if job.cancelled:
+                job.status = 'cancelled'
+            elif any(stage.status == 'failed' for stage in job.stages):
+                job.status = 'failed'
+            else:
+                job.status = 'done'
+        except Exception as e:
+            job.status = 'failed'
+            job.stages.append(StageResult(job.stage or 'index', 'failed', detail=str(e)))
+            print(f"❌ 任务 #{job.number} 出错: {e}")
+        finally:
+            job.stage = None
+            job.builder = None
+            job.seconds = time.perf_counter() - started
+            with self.lock:
+                self.history = (self.history + [job])[-HISTORY_SIZE:]
+            if self.current is job:
+                self.current = None
+            self.write_status()
+
+    def run_format(self, job, index):
+        if not job.changes.blocks:
+            return 'skipped', '没有新的C++代码块'
+        # 哈希和解码用同一份字节：文本模式读取会转换换行，CRLF 文件的哈希就对不上了
+        with open(self.tex_file, 'rb') as f:
+            raw = f.read()
+        crlf = b'\r\n' in raw
+        content = raw.decode('utf-8').replace('\r\n', '\n')
+        cache = FormatCache(default_cache_path(self.tex_file, 'format_tex_cpp_v2'),
+                            rules_version(format_tex_cpp_v2.__file__, cpp_lexer.__file__))
+        formatted = format_tex_cpp_v2.format_latex_cpp_blocks(content, cache=cache)
+        cache.save()
+        if formatted == content:
+            return 'skipped', '格式无需修改'
+        # 格式化期间又保存过时不能覆盖新的内容
+        if job.cancelled or file_hash(self.tex_file) != hashlib.sha256(raw).hexdigest():
+            return 'cancelled', '文件已被再次修改'
+        # 按原文件的换行写回，写入的字节和记录的哈希一致
+        if crlf:
+            formatted = formatted.replace('\n', '\r\n')
+        self.expect(self.tex_file, formatted.encode('utf-8'))
+        write_if_changed(self.tex_file, formatted, newline='')
+        return 'done', f'格式化了 {cache.misses} 个代码块'
+
+    def run_markdown(self, job, index):
+        if not job.changes.sections:
+            return 'skipped', '文档内容没有改动'
+        converter = LaTeXToMarkdownConverter()
+        # 转换器逐步打印进度，监视模式下不需要
+        with contextlib.redirect_stdout(io.StringIO()):
+            markdown = converter.convert(index.text())
+        written = write_if_changed(self.markdown, markdown)
+        return 'done', os.path.relpath(self.markdown, self.directory) + ('' if written else ' (无变化)')
+
+    def run_build(self, job, index):
+        builder = prepare_builder(self.tex_file, self.engine, prerender=self.prerender, jobs=self.jobs)
+        job.builder = builder
+        if job.cancelled:
+            return 'cancelled', ''
+        result = builder.build()
+        # 之后也监视 .fls 中记录的输入文件
+        self.watch_paths(path for path in builder.recorded_inputs()
+                         if path != builder.tex_file and not self.ignored(path))
+        if result.status == 'built':
+            return 'done', f'{len(result.passes)} 次编译'
+        if result.status == 'skipped':
+            return 'skipped', result.reason
+        return result.status, f'查看 {os.path.relpath(builder.log_path, self.directory)}'
+
+    def status(self):
+        with self.lock:
+            history = [job.to_dict() for job in self.history]
+            watched = sorted(os.path.relpath(path, self.directory) for path in self.known)
+        current = self.current
+        if current is not None:
+            state = 'running'
+        elif self.pending:
+            state = 'waiting'
+        else:
+            state = 'idle'
+        return {
+            'pid': os.getpid(),
+            'file': self.tex_file,
+            'state': state,
+            'updated': time.time(),
+            'queue': sorted(os.path.relpath(path, self.directory) for path in self.pending),
+            'current': current.to_dict() if current is not None else None,
+            'history': history,
+            'watched': watched,
+        }
+
+    def write_status(self):
+        os.makedirs(os.path.dirname(self.status_path), exist_ok=True)
+        status = self.status()
+        tmp_path = f'{self.status_path}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(status, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.status_path)
+
+    def run(self, stop=None):
+        """启动时先检查一次，然后持续轮询直到 stop 被设置"""
+        stop = stop or threading.Event()
+        self.pending.add(self.tex_file)
+        try:
+            while not stop.is_set():
+                self.step()
+                stop.wait(self.interval)
+        finally:
+            current = self.current
+            if current is not None:
+                current.cancel()
+            if self.worker is not None:
+                self.worker.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='监视 .tex 文件，保存后增量格式化、转换和编译')
+    parser.add_argument('file', nargs='?', default='Algorithm-template.tex',
+                       help='要监视的LaTeX文件 (默认: Algorithm-template.tex)')
+    parser.add_argument('--stages', default=','.join(STAGES),
+                       help=f'要运行的步骤，逗号分隔 (默认: {",".join(STAGES)})')
+    parser.add_argument('--markdown', help='Markdown输出路径 (默认: 与 .tex 同名的 .md)')
+    parser.add_argument('--interval', type=float, default=DEFAULT_INTERVAL,
+                       help=f'轮询间隔秒数 (默认: {DEFAULT_INTERVAL})')
+    parser.add_argument('--debounce', type=float, default=DEFAULT_DEBOUNCE,
+                       help=f'最后一次保存后等待的秒数 (默认: {DEFAULT_DEBOUNCE})')
+    parser.add_argument('--status', help='状态文件路径 (默认: .build_cache/<文件名>-watch.json)')
+    parser.add_argument('--engine', default=os.environ.get('XELATEX', DEFAULT_ENGINE),
+                       help='编译引擎，也可通过环境变量 XELATEX 指定 (默认: xelatex)')
+    parser.add_argument('--prerender', action='store_true', help='预渲染代码块后编译，不需要 -shell-escape')
+    parser.add_argument('-j', '--jobs', type=int, default=0,
+                       help='预渲染的并行进程数，0 表示使用全部CPU核心 (默认: 0)')
+
+    args = parser.parse_args()
+
+    if not os.path.exists(args.file):
+        print(f"错误: 文件 {args.file} 不存在")
+        sys.exit(1)
+    stages = [stage.strip() for stage in args.stages.split(',') if stage.strip()]
+    unknown = [stage for stage in stages if stage not in STAGES]
+    if unknown:
+        print(f"错误: 未知的步骤 {', '.join(unknown)}，可选: {', '.join(STAGES)}")
+        sys.exit(1)
+    engine = args.engine
+    if 'build' in stages:
+        engine = shutil.which(args.engine)
+        if engine is None:
+            print(f"错误: {args.engine} 未找到！请确保已安装LaTeX发行版。")
+            sys.exit(1)
+
+    watcher = TexWatcher(args.file, engine, stages, markdown=args.markdown, interval=args.interval,
+                         debounce=args.debounce, status_path=args.status,
+                         prerender=args.prerender, jobs=args.jobs)
+    print(f"👀 正在监视 {args.file} (步骤: {', '.join(watcher.stages)})，按 Ctrl+C 退出")
+    print(f"📊 状态文件: {os.path.relpath(watcher.status_path)}")
+    try:
+        watcher.run()
+    except KeyboardInterrupt:
+        print("\n👋 停止监视")
+
+
+if __name__ == '__main__':
+    main()